@@ -205,6 +205,18 @@ def tests(session: Session) -> None:
     session.run("pytest", *args)
 
 
+@nox.session(python=general_py_version)
+def benchmarks(session: Session) -> None:
+    """Run the benchmarks."""
+    args = session.posargs or ["-m", "benchmark"]
+    packages = ["pytest", "pytest-mock", "pytest-datafiles", "./"]
+
+    install_with_constraints(
+        session, packages=packages, include_dev=False, callback=install_dependencies
+    )
+    session.run("pytest", "--benchmark", "-s", *args)
+
+
 @nox.session(python=supported_py_versions)
 def typeguard(session: Session) -> None:
     """Runtime type checking using Typeguard."""
@@ -38,12 +38,15 @@ class Config(Dictionizer):
     default_repository: str
     repository_configurations: Mapping[str, RepositoryConfiguration]
     default_reports: Set[str]
-    requests_cache: Mapping[str, Union[str, int]]
     logging_configuration: Mapping
     logging_configuration_file: Optional[Path]
     local_plugin_paths: List[str] = field(default_factory=list)
     local_report_plugins: Mapping[str, str] = field(default_factory=dict)
     metadata: Optional[Mapping[str, Any]] = None
+    metadata_cache: Mapping[str, Any] = field(default_factory=dict)
+    repository_lookup: Mapping[str, Any] = field(default_factory=dict)
+    report_configurations: Mapping[str, Mapping[str, Any]] = field(default_factory=dict)
+    requests_cache: Mapping[str, Union[str, int]] = field(default_factory=dict)
 
     def __post_init__(self):
         """Performs post init checks.
@@ -52,8 +55,8 @@ class Config(Dictionizer):
             ValueError: if the config isn't meeting the mark
         """
         import sys
+        import warnings
         from string import Template
-        from requests_cache import install_cache
         from valiant.log import configure_logging
 
         if self.default_repository not in self.repository_configurations.keys():
@@ -62,6 +65,21 @@ class Config(Dictionizer):
                 " was not provided in the list of repositories."
             )
 
+        from valiant.repositories.lookup import LOOKUP_MODES
+
+        if self.repository_lookup_mode not in LOOKUP_MODES:
+            raise ValueError(
+                f"Unknown repository lookup mode ({self.repository_lookup_mode})"
+                f" - expected one of {', '.join(LOOKUP_MODES)}"
+            )
+
+        for name in self.repository_lookup.get("repositories", []):
+            if name not in self.repository_configurations:
+                raise ValueError(
+                    f"The lookup repository ({name})"
+                    " was not provided in the list of repositories."
+                )
+
         sys.path.extend(self.local_plugin_paths)
 
         # Make sure the required directories exist
@@ -87,17 +105,12 @@ class Config(Dictionizer):
             file_config=self.logging_configuration_file,
         )
 
-        rcache_dir = Template(self.requests_cache["file"])
-
-        install_cache(
-            rcache_dir.substitute(
-                log_dir=self.log_dir,
-                cache_dir=self.cache_dir,
-                configuration_dir=self.configuration_dir,
-            ),
-            backend=self.requests_cache["backend"],
-            expire_after=self.requests_cache["expire_after"],
-        )
+        if self.requests_cache:
+            warnings.warn(
+                "The requests_cache setting is no longer used"
+                " - responses are cached in the metadata_cache",
+                DeprecationWarning,
+            )
 
     def to_dict(self) -> Dict:
         """Convert to dict.
@@ -124,7 +137,9 @@ class Config(Dictionizer):
                     "logging_configuration_file": str(self.logging_configuration_file)
                     if self.logging_configuration_file
                     else None,
-                    "requests_cache": self.requests_cache,
+                    "metadata_cache": self.metadata_cache,
+                    "repository_lookup": self.repository_lookup,
+                    "report_configurations": self.report_configurations,
                     "local-plugins": {
                         "paths": [str(i) for i in self.local_plugin_paths],
                         "valiant.report": self.local_report_plugins,
@@ -179,6 +194,59 @@ class Config(Dictionizer):
 
         return def_repo, repositories
 
+    def _substitute_path(self, value: str) -> Path:
+        from string import Template
+
+        return Path(
+            Template(value).substitute(
+                log_dir=self.log_dir,
+                cache_dir=self.cache_dir,
+                configuration_dir=self.configuration_dir,
+            )
+        )
+
+    @property
+    def artifact_cache_dir(self) -> Path:
+        """The directory holding downloaded package artifacts."""
+        return self.cache_dir / "artifacts"  # noqa: DAR201
+
+    @property
+    def metadata_cache_file(self) -> Optional[Path]:
+        """The metadata cache database (None if the cache is disabled)."""
+        if not self.metadata_cache.get("file"):
+            return None  # noqa: DAR201
+
+        return self._substitute_path(str(self.metadata_cache["file"]))
+
+    @property
+    def metadata_store_dir(self) -> Optional[Path]:
+        """The parsed metadata store (None if the store or the cache is disabled)."""
+        if not self.metadata_cache_file or not self.metadata_cache.get("store_dir"):
+            return None  # noqa: DAR201
+
+        return self._substitute_path(str(self.metadata_cache["store_dir"]))
+
+    @property
+    def repository_lookup_mode(self) -> str:
+        """How packages are looked up across the repositories."""
+        return str(self.repository_lookup.get("mode", "single"))  # noqa: DAR201
+
+    @property
+    def repository_lookup_configurations(self) -> List[RepositoryConfiguration]:
+        """The repositories used for lookups, in order.
+
+        Returns:
+            The repositories listed in `repository_lookup.repositories` or, if
+            none are listed, the default repository followed by the others.
+        """
+        names = list(self.repository_lookup.get("repositories", []))
+        if not names:
+            names = [self.default_repository] + [
+                n for n in self.repository_names if n != self.default_repository
+            ]
+
+        return [self.get_repository_configuration(n) for n in names]
+
     @property
     def default_repository_name(self) -> str:
         """The default repo name."""
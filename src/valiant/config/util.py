@@ -55,10 +55,20 @@ def get_valiant_base_config() -> ConfigMap:
                 "log_dir": dirs.user_log_dir,
                 "default_repository": "pypi",
                 "default_reports": ["basic", "spdx", "safety"],
-                "requests_cache": {
-                    "file": f"$cache_dir/{app}-{version}-requests-cache",
+                "metadata_cache": {
+                    "file": f"$cache_dir/{app}-{version}-metadata-cache.sqlite",
                     "backend": "sqlite",
+                    "max_size": 512 * 1024 * 1024,
+                    "compression": "auto",
                     "expire_after": 86400,
+                    "stale_while_revalidate": False,
+                    "negative_expire_after": 3600,
+                    "store_dir": f"$cache_dir/{app}-metadata-store",
+                },
+                "repository_lookup": {
+                    "mode": "single",
+                    "repositories": [],
+                    "hedge_delay": 0.5,
                 },
                 "repository_configurations": {"pypi": PyPiRepository.get_pypi_config()},
                 "local-plugins": {"paths": [], "valiant.reports": {}},
@@ -92,6 +102,9 @@ class ConfigMapBuilder:
         self.repository_configurations: Mapping[str, RepositoryConfiguration]
         self.default_reports: Set[str]
         self.requests_cache: Mapping[str, Union[str, int]]
+        self.metadata_cache: Mapping[str, Any]
+        self.repository_lookup: Mapping[str, Any]
+        self.report_configurations: Mapping[str, Mapping[str, Any]]
         self.logging_configuration: Mapping
         self.logging_configuration_file: Optional[Path]
         self.local_plugin_paths: List[str]
@@ -108,6 +121,9 @@ class ConfigMapBuilder:
             default_reports=self.default_reports,
             repository_configurations=self.repository_configurations,
             requests_cache=self.requests_cache,
+            metadata_cache=self.metadata_cache,
+            repository_lookup=self.repository_lookup,
+            report_configurations=self.report_configurations,
             logging_configuration=self.logging_configuration,
             logging_configuration_file=self.logging_configuration_file,
             local_plugin_paths=self.local_plugin_paths,
@@ -201,7 +217,10 @@ class ConfigMapBuilder:
         builder.repository_configurations = ConfigMapBuilder._extract_repo_confs(
             valiant_conf["repository_configurations"]
         )
-        builder.requests_cache = valiant_conf["requests_cache"]
+        builder.requests_cache = valiant_conf.get("requests_cache", {})
+        builder.metadata_cache = valiant_conf.get("metadata_cache", {})
+        builder.repository_lookup = valiant_conf.get("repository_lookup", {})
+        builder.report_configurations = valiant_conf.get("report_configurations", {})
 
         (
             builder.logging_configuration_file,
@@ -25,6 +25,7 @@ from valiant import Valiant
 from .commands import (
     AboutCommand,
     AuditCommand,
+    CacheCommand,
     ConfigCommand,
     ReportCommand,
     ShowCommand,
@@ -46,6 +47,7 @@ class Cli(BaseApplication):
             AboutCommand(),
             ConfigCommand(),
             AuditCommand(),
+            CacheCommand(),
             ReportCommand(),
             ShowCommand(),
         )
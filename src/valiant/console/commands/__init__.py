@@ -21,6 +21,7 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 from .about import AboutCommand
 from .audit import AuditCommand
+from .cache import CacheCommand
 from .config import ConfigCommand
 from .report import ReportCommand
 from .show import ShowCommand
@@ -41,6 +41,7 @@ class AuditCommand(BaseCommand):
         {requirements-file : The file containing a requirements list}
         {reports? : One or more reports to run (optional - default is all reports)}
         {--s|short : Single table output}
+        {--j|jobs=1 : The number of packages to audit concurrently}
 
     The audit command expects a very basic requirements file with one line per requirement
     and each requirement pinned to a specific version (e.g. texttable==1.6.2)
@@ -65,20 +66,22 @@ class AuditCommand(BaseCommand):
             report_list = self.argument("reports").split(",")
 
         try:
+            jobs = int(self.option("jobs"))
             package_list = parse_requirements_file(requirements)
 
             for req in package_list:
                 if len(req.versions) < 1 and req.versions[0][0] != "==":
                     raise ValueError(f"A pinned version is required for {req.package}.")
 
-                package_metadata = self.valiant.get_package_metadata(
-                    package_name=req.package, package_version=req.versions[0][1],
-                )
-                reports = self.valiant.get_package_reports(
-                    package_metadata, reports=set(report_list)
-                )
+            results = self.valiant.audit_packages(
+                [(req.package, req.versions[0][1]) for req in package_list],
+                reports=set(report_list),
+                jobs=jobs,
+            )
+
+            for result in results:
                 payloads.append(
-                    Payload(metadata=reports.package_metadata, reports=reports.reports)
+                    Payload(metadata=result.package_metadata, reports=result.reports)
                 )
 
             if format == "json":
@@ -71,6 +71,14 @@ class BaseCommand(CleoCommand):
             BaseCommand.__valiant = Valiant(conf)
         return BaseCommand.__valiant
 
+    def wrap_handle(self, args, io, command):  # type: ignore # noqa: ANN001,ANN201,D102
+        try:
+            return super().wrap_handle(args, io, command)
+        finally:
+            # Keep a running total of the metadata cache's hit rate
+            if BaseCommand.__valiant:
+                BaseCommand.__valiant.save_cache_stats()
+
     @property
     def valiant(self) -> Valiant:
         """Access the Valiant application object."""
@@ -0,0 +1,294 @@
+"""CLI Command: cache.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import re
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from valiant.repositories import CacheStats, MetadataCache, StoreStats
+from valiant.util import parse_requirements_file
+
+from .base_command import BaseCommand
+
+
+_DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+_SIZE_UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+
+
+def parse_duration(value: str) -> float:
+    """Converts a duration such as `90`, `12h` or `7d` to seconds.
+
+    Args:
+        value: A number with an optional unit (s, m, h, d or w)
+
+    Returns:
+        The number of seconds
+
+    Raises:
+        ValueError: If the duration isn't understood
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*", value.lower())
+    if not match:
+        raise ValueError(f"Unable to read the duration {value} (e.g. 12h or 7d).")
+    return float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+
+def parse_size(value: str) -> int:
+    """Converts a size such as `1048576`, `512M` or `2G` to bytes.
+
+    Args:
+        value: A number with an optional unit (K, M or G)
+
+    Returns:
+        The number of bytes
+
+    Raises:
+        ValueError: If the size isn't understood
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmg]?)b?\s*", value.lower())
+    if not match:
+        raise ValueError(f"Unable to read the size {value} (e.g. 512M or 2G).")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+
+class CacheSubCommand(BaseCommand):
+    """Common methods for the cache commands."""
+
+    def metadata_cache(self) -> MetadataCache:
+        """The configured metadata cache.
+
+        Returns:
+            The metadata cache
+
+        Raises:
+            ValueError: If the metadata cache is disabled
+        """
+        cache = self.valiant.metadata_cache
+        if not cache:
+            raise ValueError("The metadata cache is disabled in the configuration.")
+        return cache
+
+    def output(self, data: Dict, text: str) -> None:
+        """Outputs the data to the required format."""  # noqa:DAR101
+        format = self.option("out")
+        if format == "json":
+            import json
+
+            self.line(json.dumps(data))
+        elif format == "toml":
+            import toml
+
+            self.line(
+                toml.dumps({"tool": {self.valiant.application_name: {"cache": data}}})
+            )
+        else:
+            self.line(text)
+
+
+class CacheWarmCommand(CacheSubCommand):
+    """Fetches package metadata into the cache.
+
+    warm
+        {requirements-file : The file containing a requirements list}
+        {--j|jobs=8 : The number of packages to fetch concurrently}
+
+    Each requirement must be pinned to a specific version (e.g. texttable==1.6.2).
+    """
+
+    def handle(self) -> Optional[int]:  # noqa: D102
+        try:
+            self.metadata_cache()
+            packages = self.packages(Path(self.argument("requirements-file")))
+            results = self.valiant.warm_cache(packages, jobs=int(self.option("jobs")))
+        except Exception as e:
+            self.output_error(e, format=self.option("out"))
+            return 1
+
+        failed = [(n, v, e) for n, v, e in results if e]
+        lines = [f"<info>Cached</info>: {len(results) - len(failed)} packages"]
+        lines += [f"<error>{n}=={v}</error>: {e}" for n, v, e in failed]
+        self.output(
+            {
+                "cached": len(results) - len(failed),
+                "failed": [
+                    {"name": n, "version": v, "error": str(e)} for n, v, e in failed
+                ],
+            },
+            "\n".join(lines),
+        )
+        return 1 if failed else 0
+
+    @staticmethod
+    def packages(requirements: Path) -> List[Tuple[str, str]]:
+        """Reads the pinned packages from a requirements file.
+
+        Args:
+            requirements: The requirements file
+
+        Returns:
+            A (name, version) tuple for each requirement
+
+        Raises:
+            ValueError: If a requirement isn't pinned to a version
+        """
+        packages = []
+        for req in parse_requirements_file(requirements):
+            if len(req.versions) != 1 or req.versions[0][0] != "==":
+                raise ValueError(f"A pinned version is required for {req.package}.")
+            packages.append((req.package, req.versions[0][1]))
+        return packages
+
+
+class CacheStatsCommand(CacheSubCommand):
+    """Describes the cache contents and hit rate.
+
+    stats
+    """
+
+    def handle(self) -> Optional[int]:  # noqa: D102
+        try:
+            stats = self.metadata_cache().summary()
+            store = self.valiant.metadata_store
+            store_stats = store.summary() if store else None
+        except Exception as e:
+            self.output_error(e, format=self.option("out"))
+            return 1
+
+        data = stats.to_dict()
+        if store_stats:
+            data["store"] = store_stats.to_dict()
+        self.output(data, self.to_text(stats, store_stats))
+        return 0
+
+    @staticmethod
+    def to_text(stats: CacheStats, store_stats: Optional[StoreStats] = None) -> str:
+        """Prepares the text representation.
+
+        Args:
+            stats: The cache stats
+            store_stats: The metadata store stats
+
+        Returns:
+            The stats for your terminal
+        """
+        hit_rate = "-" if stats.hit_rate is None else f"{stats.hit_rate:.1%}"
+        ratio = (
+            "-" if stats.compression_ratio is None else f"{stats.compression_ratio:.1f}"
+        )
+        max_size = f"{stats.max_size:,}" if stats.max_size else "unlimited"
+
+        def histogram(ages: Dict[str, int]) -> str:
+            return ", ".join(
+                f"{'' if k == 'older' else '<'}{k}: {v}" for k, v in ages.items()
+            )
+
+        store = ""
+        if store_stats:
+            store = (
+                f"\n<info>Store</info>: <comment>{store_stats.refs}</comment> records"
+                f" ({store_stats.objects} objects, {store_stats.size:,} bytes"
+                f" in {store_stats.versions} versions)"
+            )
+
+        return (
+            f"<info>Backend</info>: <comment>{stats.backend}</comment>"
+            f"\n<info>Entries</info>: <comment>{stats.entries}</comment>"
+            f" (<comment>{stats.missing_entries}</comment> missing packages)"
+            f"\n<info>Size</info>: <comment>{stats.size:,}</comment> bytes"
+            f" (maximum <comment>{max_size}</comment>)"
+            f"\n<info>Hit rate</info>: <comment>{hit_rate}</comment>"
+            f" ({stats.hits} hits, {stats.revalidated} revalidated,"
+            f" {stats.misses} misses)"
+            f"\n<info>Compression ratio</info>: <comment>{ratio}</comment>"
+            f" ({stats.body_bytes:,} bytes stored in {stats.stored_bytes:,})"
+            f"\n<info>Stored</info>: <comment>{histogram(stats.stored_ages)}</comment>"
+            "\n<info>Accessed</info>: "
+            f"<comment>{histogram(stats.accessed_ages)}</comment>"
+            f"{store}"
+        )
+
+
+class CachePruneCommand(CacheSubCommand):
+    """Removes old entries from the cache.
+
+    prune
+        {--max-age= : Remove entries older than this (e.g. 12h, 7d)}
+        {--max-size= : Then remove the least recently used entries until the cache
+        is no larger than this (e.g. 512M, 2G)}
+
+    The metadata store is pruned too: records for outdated versions of the
+    metadata model, records older than --max-age and unreferenced objects
+    are removed.
+    """
+
+    def handle(self) -> Optional[int]:  # noqa: D102
+        try:
+            max_age = self.option("max-age")
+            max_size = self.option("max-size")
+            if not (max_age or max_size):
+                raise ValueError("Provide --max-age and/or --max-size.")
+
+            cache = self.metadata_cache()
+            removed = cache.prune(
+                max_age=parse_duration(max_age) if max_age else None,
+                max_size=parse_size(max_size) if max_size else None,
+            )
+            size = cache.backend.size
+
+            store = self.valiant.metadata_store
+            store_removed = (
+                store.prune(max_age=parse_duration(max_age) if max_age else None)
+                if store
+                else None
+            )
+        except Exception as e:
+            self.output_error(e, format=self.option("out"))
+            return 1
+
+        data: Dict = {"removed": removed, "size": size}
+        text = (
+            f"<info>Removed</info>: <comment>{removed}</comment> entries"
+            f"\n<info>Size</info>: <comment>{size:,}</comment> bytes"
+        )
+        if store_removed is not None:
+            data["store_removed"] = store_removed
+            text += (
+                "\n<info>Store removed</info>: "
+                f"<comment>{store_removed['refs']}</comment> records"
+                f" ({store_removed['objects']} objects,"
+                f" {store_removed['versions']} outdated versions)"
+            )
+
+        self.output(data, text)
+        return 0
+
+
+class CacheCommand(BaseCommand):
+    """Manages the metadata cache.
+
+    cache
+    """
+
+    commands = [CacheWarmCommand(), CacheStatsCommand(), CachePruneCommand()]
+
+    def handle(self) -> Optional[int]:  # noqa: D102
+        return self.call("help", self._config.name)
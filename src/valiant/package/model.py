@@ -19,10 +19,12 @@ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
 IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
+import zipfile
+
 from abc import abstractmethod
 from dataclasses import asdict, dataclass
 from datetime import datetime
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 
 from packaging.requirements import Requirement
 from valiant.util import Dictionizer
@@ -124,6 +126,8 @@ class ArtifactMetadata(Dictionizer):
     def upload_time_iso_8601(self) -> datetime:  # pragma: no cover
         """The ISO 8601-compliant timestamp of the upload.
 
+        This is None if the repository doesn't provide the upload time.
+
         See: https://en.wikipedia.org/wiki/ISO_8601
         """
 
@@ -143,7 +147,9 @@ class ArtifactMetadata(Dictionizer):
             "python_version": self.python_version,
             "requires_python": self.requires_python,
             "size": self.size,
-            "upload_time_iso_8601": self.upload_time_iso_8601.isoformat(),
+            "upload_time_iso_8601": self.upload_time_iso_8601.isoformat()
+            if self.upload_time_iso_8601
+            else None,
             "url": self.url,
         }
 
@@ -261,6 +267,30 @@ class PackageCoordinates(Dictionizer):
 class PackageMetadata(Dictionizer):
     """The metadata for a Python package."""
 
+    artifact_opener: Optional[Callable[[ArtifactMetadata], zipfile.ZipFile]] = None
+    """Set by repositories that can open the package's artifacts."""
+
+    def open_artifact(self, artifact: ArtifactMetadata) -> zipfile.ZipFile:
+        """Opens a zip-based artifact (such as a wheel) for inspection.
+
+        Where the repository supports it, only the parts of the archive
+        that are read (e.g. `METADATA`, `RECORD` or license files) are fetched.
+
+        Args:
+            artifact: One of the package's artifacts
+
+        Returns:
+            The archive - close it when done
+
+        Raises:
+            NotImplementedError: If the package's repository can't open artifacts
+        """
+        if self.artifact_opener is None:
+            raise NotImplementedError(
+                f"The repository for {self.name} can't open artifacts."
+            )
+        return self.artifact_opener(artifact)
+
     def _requirement_to_dict(self, req: Requirement) -> Dict:
         return {
             "name": req.name,
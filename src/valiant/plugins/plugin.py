@@ -188,3 +188,20 @@ class PluginWrapper:
         """Call the plugin's run method with kwargs."""  # noqa:DAR101,DAR201
         if self._plugin:
             return self._plugin.run(**kwargs)
+
+    @property
+    def batched(self) -> bool:
+        """Checks if the plugin prepares a batch of reports at once.
+
+        This property implicitly loads the plugin.
+
+        Returns:
+            True if the plugin provides `run_batch`
+        """
+        plugin = self.plugin
+        return bool(getattr(plugin, "batched", lambda: False)())
+
+    def run_batch(self, **kwargs: Any) -> Any:
+        """Call the plugin's run_batch method with kwargs."""  # noqa:DAR101,DAR201
+        if self._plugin:
+            return self._plugin.run_batch(**kwargs)  # type: ignore
@@ -0,0 +1,458 @@
+"""A memory-mapped index of OSV advisories.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import zipfile
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion, Version
+
+from valiant.log import get_logger
+
+
+log = get_logger()
+
+INDEX_FILE = "osv-index.bin"
+"""The name of the index file kept in the plugin's cache directory."""
+
+ECOSYSTEM = "PyPI"
+
+_MAGIC = b"VALOSV01"
+# magic, source fingerprint, slot count, package count, advisory count
+_HEADER = struct.Struct("<8s16sIII")
+_SLOT = struct.Struct("<QI")  # name hash, package record offset (0 for an empty slot)
+_PACKAGE = struct.Struct("<HII")  # name length, range count, version count
+_RANGE = struct.Struct("<BHHI")  # end type, introduced length, end length, advisory
+_VERSION = struct.Struct("<HI")  # version length, advisory offset
+_ADVISORY = struct.Struct("<I")  # advisory length
+
+_OPEN, _FIXED, _LAST_AFFECTED = range(3)
+
+_ADVISORY_FIELDS = (
+    "id",
+    "summary",
+    "details",
+    "aliases",
+    "modified",
+    "published",
+    "severity",
+    "references",
+)
+
+_Range = Tuple[int, str, str, int]
+
+
+def _hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+@lru_cache(maxsize=4096)
+def _version(value: str) -> Optional[Version]:
+    try:
+        return Version(value)
+    except InvalidVersion:
+        return None
+
+
+def read_advisories(source: Path) -> Iterator[Dict[str, Any]]:
+    """Reads the advisories in an OSV dump.
+
+    Args:
+        source: A directory of OSV JSON files or a zip file of them (such
+            as the ecosystem `all.zip` exports)
+
+    Yields:
+        Each advisory
+
+    Raises:
+        ValueError: If the source isn't a directory or zip file
+    """
+    if source.is_dir():
+        for path in sorted(source.rglob("*.json")):
+            try:
+                with open(path, "rb") as f:
+                    yield json.load(f)
+            except ValueError as e:
+                log.warning(f"Skipping an unreadable advisory: {e}", path=str(path))
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for name in sorted(archive.namelist()):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    yield json.loads(archive.read(name))
+                except ValueError as e:
+                    log.warning(f"Skipping an unreadable advisory: {e}", path=name)
+    else:
+        raise ValueError(f"The OSV source must be a directory or zip file: {source}")
+
+
+def _affected_ranges(affected: Mapping[str, Any]) -> Iterator[Tuple[int, str, str]]:
+    """Turns the ECOSYSTEM range events into (end type, introduced, end) tuples."""
+    for affected_range in affected.get("ranges", []):
+        if affected_range.get("type") != "ECOSYSTEM":
+            continue
+
+        introduced: Optional[str] = None
+        for event in affected_range.get("events", []):
+            if "introduced" in event:
+                introduced = "" if event["introduced"] == "0" else event["introduced"]
+            elif introduced is not None and "fixed" in event:
+                yield _FIXED, introduced, event["fixed"]
+                introduced = None
+            elif introduced is not None and "last_affected" in event:
+                yield _LAST_AFFECTED, introduced, event["last_affected"]
+                introduced = None
+
+        if introduced is not None:
+            yield _OPEN, introduced, ""
+
+
+class OsvIndex:
+    """Maps PyPI package versions to the OSV advisories affecting them.
+
+    The index file holds a hash table of package names, the affected
+    version ranges for each package and a compact copy of each advisory.
+    The file is memory-mapped when opened, so a lookup only touches the
+    pages for the package concerned and a miss is a single hash table probe.
+
+    Affected versions come from the advisories' `ECOSYSTEM` ranges - the
+    explicit `versions` list is only used when an advisory has no such range.
+    """
+
+    def __init__(self, buffer: Any):
+        """New instance.
+
+        Args:
+            buffer: The index data (e.g. a memory map)
+
+        Raises:
+            ValueError: If the buffer doesn't hold an index
+        """
+        if len(buffer) < _HEADER.size:
+            raise ValueError("The OSV index is incomplete")
+
+        (
+            magic,
+            self.fingerprint,
+            self._slots,
+            self._packages,
+            self._advisories,
+        ) = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC:
+            raise ValueError("The OSV index has an unknown format")
+
+        self._buffer = buffer
+
+    @staticmethod
+    def source_fingerprint(source: Path) -> bytes:
+        """Identifies the current state of an OSV dump.
+
+        Args:
+            source: The directory or zip file
+
+        Returns:
+            A digest of the source's path and its files' sizes and modification times
+        """
+        digest = hashlib.blake2b(str(source.resolve()).encode("utf-8"), digest_size=16)
+        paths = sorted(source.rglob("*.json")) if source.is_dir() else [source]
+        for path in paths:
+            stat = path.stat()
+            digest.update(f"\0{path}\0{stat.st_size}\0{stat.st_mtime_ns}".encode())
+        return digest.digest()
+
+    @staticmethod
+    def build(advisories: Iterable[Mapping[str, Any]], fingerprint: bytes) -> bytes:
+        """Prepares the index data.
+
+        Args:
+            advisories: The OSV advisories
+            fingerprint: Identifies the source of the advisories
+
+        Returns:
+            The index data
+        """
+        packages: Dict[str, Tuple[List[_Range], List[Tuple[str, int]]]] = {}
+        encoded: List[bytes] = []
+        offset = 0
+
+        for advisory in advisories:
+            if advisory.get("withdrawn") or "id" not in advisory:
+                continue
+
+            ranges: List[Tuple[str, Tuple[int, str, str]]] = []
+            versions: List[Tuple[str, str]] = []
+            for affected in advisory.get("affected", []):
+                package = affected.get("package", {})
+                if package.get("ecosystem") != ECOSYSTEM or not package.get("name"):
+                    continue
+                name = canonicalize_name(package["name"])
+                found = [(name, r) for r in _affected_ranges(affected)]
+                ranges += found
+                if not found:
+                    versions += [(name, v) for v in affected.get("versions", [])]
+
+            if not ranges and not versions:
+                continue
+
+            for name, (end_type, introduced, end) in ranges:
+                packages.setdefault(name, ([], []))[0].append(
+                    (end_type, introduced, end, offset)
+                )
+            for name, version in versions:
+                packages.setdefault(name, ([], []))[1].append((version, offset))
+
+            data = json.dumps(
+                {k: advisory[k] for k in _ADVISORY_FIELDS if k in advisory},
+                separators=(",", ":"),
+            ).encode("utf-8")
+            encoded.append(_ADVISORY.pack(len(data)) + data)
+            offset += _ADVISORY.size + len(data)
+
+        return OsvIndex._layout(packages, encoded, fingerprint)
+
+    @staticmethod
+    def _layout(
+        packages: Mapping[str, Tuple[List[_Range], List[Tuple[str, int]]]],
+        encoded: List[bytes],
+        fingerprint: bytes,
+    ) -> bytes:
+        slots = 8
+        while slots < len(packages) * 2:
+            slots *= 2
+
+        advisory_base = _HEADER.size + _SLOT.size * slots
+        package_base = advisory_base + sum(len(a) for a in encoded)
+
+        table = [(0, 0)] * slots
+        records = bytearray()
+
+        for name, (ranges, versions) in packages.items():
+            key = name.encode("utf-8")
+            h = _hash(key)
+            slot = h % slots
+            while table[slot][1]:
+                slot = (slot + 1) % slots
+            table[slot] = (h, package_base + len(records))
+
+            records += _PACKAGE.pack(len(key), len(ranges), len(versions)) + key
+            for end_type, introduced, end, advisory in ranges:
+                start, stop = introduced.encode("utf-8"), end.encode("utf-8")
+                records += _RANGE.pack(
+                    end_type, len(start), len(stop), advisory_base + advisory
+                )
+                records += start + stop
+            for version, advisory in versions:
+                value = version.encode("utf-8")
+                records += _VERSION.pack(len(value), advisory_base + advisory) + value
+
+        return b"".join(
+            [_HEADER.pack(_MAGIC, fingerprint, slots, len(packages), len(encoded))]
+            + [_SLOT.pack(*s) for s in table]
+            + encoded
+            + [bytes(records)]
+        )
+
+    @staticmethod
+    def create(source: Path, path: Path) -> Path:
+        """Indexes an OSV dump and writes the index file.
+
+        Args:
+            source: The directory or zip file of advisories
+            path: The index file
+
+        Returns:
+            The index file
+        """
+        data = OsvIndex.build(
+            read_advisories(source), OsvIndex.source_fingerprint(source)
+        )
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, str(path))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+        return path
+
+    @staticmethod
+    def open(path: Path) -> "OsvIndex":
+        """Memory-maps an index file.
+
+        Args:
+            path: The index file
+
+        Returns:
+            The index
+        """
+        with open(path, "rb") as f:
+            return OsvIndex(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @staticmethod
+    def load(source: Path, path: Optional[Path] = None) -> "OsvIndex":
+        """Opens the index for an OSV dump, (re)building it if needed.
+
+        Args:
+            source: The directory or zip file of advisories
+            path: The index file - without one the index is kept in memory
+
+        Returns:
+            The index
+        """
+        fingerprint = OsvIndex.source_fingerprint(source)
+
+        if not path:
+            return OsvIndex(OsvIndex.build(read_advisories(source), fingerprint))
+
+        if path.exists():
+            try:
+                index = OsvIndex.open(path)
+                if index.fingerprint == fingerprint:
+                    return index
+                index.close()
+            except (OSError, ValueError) as e:
+                log.warning(f"Rebuilding the OSV index: {e}", path=str(path))
+
+        log.info("Indexing OSV advisories", source=str(source), path=str(path))
+        return OsvIndex.open(OsvIndex.create(source, path))
+
+    def __len__(self) -> int:
+        """The number of indexed packages."""
+        return self._packages  # noqa: DAR201
+
+    @property
+    def advisory_count(self) -> int:
+        """The number of indexed advisories."""  # noqa: DAR201
+        return self._advisories
+
+    def _find(self, name: str) -> Optional[Tuple[int, int, int]]:
+        key = canonicalize_name(name).encode("utf-8")
+        h = _hash(key)
+        slot = h % self._slots
+
+        for _ in range(self._slots):
+            slot_hash, offset = _SLOT.unpack_from(
+                self._buffer, _HEADER.size + _SLOT.size * slot
+            )
+            if not offset:
+                return None
+
+            if slot_hash == h:
+                key_len, ranges, versions = _PACKAGE.unpack_from(self._buffer, offset)
+                start = offset + _PACKAGE.size
+                if self._buffer[start : start + key_len] == key:
+                    return start + key_len, ranges, versions
+
+            slot = (slot + 1) % self._slots
+
+        return None
+
+    def _read(self, offset: int, length: int) -> str:
+        return bytes(self._buffer[offset : offset + length]).decode("utf-8")
+
+    def lookup(self, name: str, version: str) -> List[int]:
+        """Finds the advisories affecting a package version.
+
+        Args:
+            name: The package name (it's canonicalised)
+            version: The package version
+
+        Returns:
+            The offsets of the matching advisories - see `advisory`
+        """
+        found = self._find(name)
+        target = _version(version)
+        if not found or target is None:
+            return []
+
+        offset, ranges, versions = found
+        matches: List[int] = []
+
+        for _ in range(ranges):
+            end_type, start_len, end_len, advisory = _RANGE.unpack_from(
+                self._buffer, offset
+            )
+            offset += _RANGE.size
+            introduced = self._read(offset, start_len)
+            end = self._read(offset + start_len, end_len)
+            offset += start_len + end_len
+
+            if advisory not in matches and self._affects(
+                target, end_type, introduced, end
+            ):
+                matches.append(advisory)
+
+        for _ in range(versions):
+            value_len, advisory = _VERSION.unpack_from(self._buffer, offset)
+            offset += _VERSION.size
+            affected = _version(self._read(offset, value_len))
+            offset += value_len
+
+            if advisory not in matches and affected == target:
+                matches.append(advisory)
+
+        return matches
+
+    @staticmethod
+    def _affects(target: Version, end_type: int, introduced: str, end: str) -> bool:
+        lower = _version(introduced) if introduced else None
+        if (introduced and lower is None) or (lower is not None and target < lower):
+            return False
+
+        if end_type == _OPEN:
+            return True
+
+        upper = _version(end)
+        if upper is None:
+            return False
+        return target < upper if end_type == _FIXED else target <= upper
+
+    def advisory(self, offset: int) -> Dict[str, Any]:
+        """Reads an advisory.
+
+        Args:
+            offset: An offset returned by `lookup`
+
+        Returns:
+            The advisory's id, summary, details, aliases, dates, severity and references
+        """
+        (length,) = _ADVISORY.unpack_from(self._buffer, offset)
+        start = offset + _ADVISORY.size
+        return json.loads(bytes(self._buffer[start : start + length]))
+
+    def close(self) -> None:
+        """Releases the memory map (if there is one)."""
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
@@ -0,0 +1,174 @@
+"""Reporting on OSV advisories held locally.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import threading
+
+from enum import Enum
+from pathlib import Path
+from typing import Any, ClassVar, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from valiant.log import get_logger
+from valiant.package import PackageCoordinates, PackageMetadata
+from valiant.plugins.reports import BaseReportPlugin
+from valiant.reports import Finding, FindingCategory, FindingLevel, Report
+
+from .index import INDEX_FILE, OsvIndex
+
+
+log = get_logger()
+
+
+class OsvId(Enum):
+    """Setup for findings."""
+
+    VULNERABILITY_FOUND = "OSV001"
+
+    def __init__(self, id: str):
+        """Constructor."""  # noqa: DAR101
+        self.id = id
+        self.category = FindingCategory.SECURITY.value
+        self.level = FindingLevel.PRIORITY
+
+    def generate_finding(
+        self, coordinates: PackageCoordinates, advisory: Mapping[str, Any]
+    ) -> Finding:
+        """Preps a finding.
+
+        Args:
+            coordinates: The package coordinates
+            advisory: The OSV advisory affecting the package
+
+        Returns:
+            The configured finding.
+        """
+        return Finding(
+            coordinates=coordinates,
+            id=self.id,
+            category=self.category,
+            level=self.level,
+            title="Vulnerability found",
+            message=advisory.get("summary")
+            or advisory.get("details")
+            or advisory["id"],
+            data=dict(advisory),
+            url=f"https://osv.dev/vulnerability/{advisory['id']}",
+        )
+
+
+class OsvReportPlugin(BaseReportPlugin):
+    """Checks packages against a local copy of the OSV database."""
+
+    name = "osv"
+    vendor = "Valiant"
+    display_name = "OSV"
+    version = "0.1"
+    url = "https://osv.dev/"
+
+    _indexes: ClassVar[Dict[Tuple[Path, Optional[Path]], OsvIndex]] = {}
+    _indexes_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    @classmethod
+    def index(cls) -> Optional[OsvIndex]:
+        """Opens the index for the configured advisories.
+
+        The index is opened once per process and rebuilt when the source changes.
+
+        Returns:
+            The index or None if no `source` is configured or it can't be read
+        """
+        configuration = cls.configuration or {}
+        if not configuration.get("source"):
+            log.warning("No source is configured for the OSV report plugin")
+            return None
+
+        source = Path(configuration["source"]).expanduser()
+        path: Optional[Path] = None
+        if configuration.get("index"):
+            path = Path(configuration["index"]).expanduser()
+        elif cls.cache_dir:
+            path = cls.cache_dir / INDEX_FILE
+
+        with cls._indexes_lock:
+            if (source, path) not in cls._indexes:
+                try:
+                    cls._indexes[(source, path)] = OsvIndex.load(source, path)
+                except (OSError, ValueError) as e:
+                    log.warning(
+                        f"Failed to load the OSV advisories: {e}", source=str(source)
+                    )
+                    return None
+            return cls._indexes[(source, path)]
+
+    @classmethod
+    def prepare_reports(
+        cls, packages: Sequence[PackageMetadata], configuration_dir: Path
+    ) -> List[Report]:
+        """Looks up the whole batch in the OSV index.
+
+        Args:
+            packages: The metadata for each package to report on
+            configuration_dir: A likely location for config files
+
+        Returns:
+            One report per package, in the same order as `packages`
+        """
+        index = cls.index()
+        reports: List[Report] = []
+
+        for package_metadata in packages:
+            report = Report(cls.report_provider_details())
+            matches = (
+                index.lookup(package_metadata.name, package_metadata.version)
+                if index
+                else []
+            )
+            for offset in matches:
+                report.add_finding(
+                    OsvId.VULNERABILITY_FOUND.generate_finding(
+                        package_metadata.coordinates, index.advisory(offset)  # type: ignore
+                    )
+                )
+
+            log.info(
+                f"OSV reporter located {len(report.findings)} findings"
+                f" for {str(package_metadata.coordinates)}",
+                package_name=package_metadata.name,
+                package_version=package_metadata.version,
+                repository_url=package_metadata.repository_url,
+            )
+            reports.append(report)
+
+        return reports
+
+    @classmethod
+    def prepare_report(
+        cls, package_metadata: PackageMetadata, configuration_dir: Path
+    ) -> Report:
+        """Constructs the report.
+
+        Args:
+            package_metadata: containing at least the package metadata
+            configuration_dir: A likely location for config files
+
+        Returns:
+            The report.
+        """
+        return cls.prepare_reports([package_metadata], configuration_dir)[0]
@@ -20,7 +20,7 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 from pathlib import Path
-from typing import Any, final
+from typing import Any, List, Mapping, Optional, Sequence, final
 
 from valiant.package import PackageMetadata
 from valiant.plugins import BasePlugin, PluginTypeManager
@@ -30,6 +30,28 @@ from valiant.reports import Report, ReportProviderDetails
 class BaseReportPlugin(BasePlugin):
     """Base class for report plugins."""
 
+    configuration: Mapping[str, Any] = {}
+    """The plugin's entry in the `report_configurations` setting."""
+
+    cache_dir: Optional[Path] = None
+    """A directory in which the plugin can keep files between runs."""
+
+    @classmethod
+    def configure(
+        cls, configuration: Mapping[str, Any], cache_dir: Optional[Path] = None
+    ) -> None:
+        """Provides the plugin's configuration.
+
+        Valiant calls this once the plugin is loaded. Overload it to check
+        the configuration - but call this implementation too.
+
+        Args:
+            configuration: The plugin's entry in the `report_configurations` setting
+            cache_dir: A directory in which the plugin can keep files between runs
+        """
+        cls.configuration = dict(configuration)
+        cls.cache_dir = cache_dir
+
     @final
     @classmethod
     def run(cls, **kwargs: Any) -> Report:  # pragma: no cover
@@ -49,6 +71,61 @@ class BaseReportPlugin(BasePlugin):
             configuration_dir=kwargs["configuration_dir"],
         )
 
+    @final
+    @classmethod
+    def run_batch(cls, **kwargs: Any) -> List[Report]:  # pragma: no cover
+        """Proxies the call to prepare_reports.
+
+        Report plugins shouldn't overload this method. Instead, provide
+        your own prepare_reports.
+
+        Args:
+            kwargs: The usual open slather of args
+
+        Returns:
+            A report for each package, in the same order as the packages.
+        """
+        return cls.prepare_reports(
+            packages=kwargs["packages"],
+            configuration_dir=kwargs["configuration_dir"],
+        )
+
+    @final
+    @classmethod
+    def batched(cls) -> bool:
+        """Checks if the plugin provides its own prepare_reports.
+
+        Returns:
+            True if the plugin prepares a batch of reports at once
+        """
+        return cls.prepare_reports.__func__ is not (  # type: ignore
+            BaseReportPlugin.prepare_reports.__func__  # type: ignore
+        )
+
+    @classmethod
+    def prepare_reports(
+        cls, packages: Sequence[PackageMetadata], configuration_dir: Path
+    ) -> List[Report]:
+        """Prepares the reports for a batch of packages.
+
+        Valiant passes all of an audit's packages to this method so that
+        plugins with costly setup (such as loading a database) only pay
+        for it once. By default, `prepare_report` is called for each package.
+
+        Args:
+            packages: The metadata for each package
+            configuration_dir: A likely location for config files
+
+        Returns:
+            A report for each package, in the same order as the packages
+        """
+        return [
+            cls.prepare_report(
+                package_metadata=package_metadata, configuration_dir=configuration_dir
+            )
+            for package_metadata in packages
+        ]
+
     @classmethod
     def prepare_report(
         cls, package_metadata: PackageMetadata, configuration_dir: Path
@@ -85,3 +162,22 @@ class ReportPlugins(PluginTypeManager):
     """All of the report plugins registered through entry-points/config."""
 
     namespace = "valiant.report"
+
+    def configure_plugins(
+        self,
+        configurations: Mapping[str, Mapping[str, Any]],
+        cache_dir: Optional[Path] = None,
+    ) -> None:
+        """Passes each loaded plugin its configuration.
+
+        Args:
+            configurations: Plugin configuration keyed by plugin name
+            cache_dir: The Valiant cache directory (each plugin gets a subdirectory)
+        """
+        for name, wrapper in self.plugins.items():
+            plugin = wrapper.plugin
+            if hasattr(plugin, "configure"):
+                plugin.configure(  # type: ignore
+                    configurations.get(name, {}),
+                    cache_dir=cache_dir / "plugins" / name if cache_dir else None,
+                )
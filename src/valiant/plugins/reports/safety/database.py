@@ -0,0 +1,233 @@
+"""A process-wide handle on the Safety vulnerability database.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import threading
+
+from pathlib import Path
+from typing import Any, ClassVar, Dict, Iterable, List, Optional, Tuple
+
+from safety.safety import Vulnerability, fetch_database, get_vulnerabilities
+
+from valiant.log import get_logger
+
+from .index import INDEX_FILE, VulnerabilityIndex
+
+
+log = get_logger()
+
+
+class SafetyDatabase:
+    """The Safety database, fetched at most once per process.
+
+    `safety.safety.check` fetches the database every time it is called, which
+    is one download (or file read) per audited package. This class fetches the
+    summary (`insecure.json`) and full (`insecure_full.json`) databases on first
+    use and then holds onto them for all subsequent checks. Versions are
+    looked up using a `VulnerabilityIndex`, which is saved in `cache_dir`
+    and only rebuilt when the database changes.
+
+    Use `SafetyDatabase.get` rather than the constructor so that instances are
+    shared between callers using the same source.
+    """
+
+    _instances: ClassVar[Dict[Tuple[Any, ...], "SafetyDatabase"]] = {}
+    _instances_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(
+        self,
+        key: Optional[str] = None,
+        db_mirror: Optional[str] = None,
+        cached: bool = False,
+        cache_dir: Optional[Path] = None,
+    ):
+        """Constructor.
+
+        Args:
+            key: A pyup.io API key
+            db_mirror: A URL or local directory holding the database files
+            cached: Use Safety's own on-disk cache of the downloaded database
+            cache_dir: Where to keep the index (optional)
+        """
+        self._key = key
+        self._db_mirror = db_mirror
+        self._cached = cached
+        self._cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._insecure: Optional[Dict[str, Any]] = None
+        self._full: Optional[Dict[str, Any]] = None
+        self._index: Optional[VulnerabilityIndex] = None
+
+    @classmethod
+    def get(
+        cls,
+        key: Optional[str] = None,
+        db_mirror: Optional[str] = None,
+        cached: bool = False,
+        cache_dir: Optional[Path] = None,
+    ) -> "SafetyDatabase":
+        """Returns the shared database instance for the source.
+
+        Args:
+            key: A pyup.io API key
+            db_mirror: A URL or local directory holding the database files
+            cached: Use Safety's own on-disk cache of the downloaded database
+            cache_dir: Where to keep the index (optional)
+
+        Returns:
+            The database
+        """
+        instance_key = (key, db_mirror, cached, cache_dir)
+        with cls._instances_lock:
+            if instance_key not in cls._instances:
+                cls._instances[instance_key] = cls(
+                    key=key, db_mirror=db_mirror, cached=cached, cache_dir=cache_dir
+                )
+            return cls._instances[instance_key]
+
+    @classmethod
+    def reset(cls) -> None:
+        """Drops all shared instances - the next check fetches afresh."""
+        with cls._instances_lock:
+            cls._instances.clear()
+
+    def _fetch(self, full: bool) -> Dict[str, Any]:
+        log.info(
+            "Fetching the Safety database",
+            full=full,
+            db_mirror=self._db_mirror,
+            cached=self._cached,
+        )
+        return fetch_database(
+            full=full,
+            key=self._key or False,
+            db=self._db_mirror or False,
+            cached=self._cached,
+            proxy={},
+        )
+
+    @property
+    def insecure(self) -> Dict[str, Any]:
+        """The summary database: package name to vulnerable specifiers."""  # noqa: DAR201
+        with self._lock:
+            if self._insecure is None:
+                self._insecure = self._fetch(full=False)
+            return self._insecure
+
+    @property
+    def full(self) -> Dict[str, Any]:
+        """The full database, with the advisory details."""  # noqa: DAR201
+        with self._lock:
+            if self._full is None:
+                self._full = self._fetch(full=True)
+            return self._full
+
+    @property
+    def index(self) -> VulnerabilityIndex:
+        """The index of the summary database."""  # noqa: DAR201
+        insecure = self.insecure
+        with self._lock:
+            if self._index is None:
+                self._index = self._load_index(insecure)
+            return self._index
+
+    def _load_index(self, insecure: Dict[str, Any]) -> VulnerabilityIndex:
+        path = self._cache_dir / INDEX_FILE if self._cache_dir else None
+        if path:
+            fingerprint = VulnerabilityIndex.fingerprint_database(insecure)
+            index = VulnerabilityIndex.load(path, fingerprint)
+            if index is not None:
+                return index
+
+        log.info("Indexing the Safety database", packages=len(insecure))
+        index = VulnerabilityIndex.build(insecure)
+        if path:
+            try:
+                index.save(path)
+            except OSError as e:
+                log.warning(f"Could not save the Safety index: {e}", path=str(path))
+        return index
+
+    def check(
+        self,
+        packages: Iterable[Tuple[str, str]],
+        ignore_ids: Iterable[str] = (),
+    ) -> List[List[Vulnerability]]:
+        """Checks a batch of packages against the database.
+
+        This mirrors `safety.safety.check` but answers for all of the
+        packages using the one copy of the database.
+
+        Args:
+            packages: (name, version) pairs
+            ignore_ids: Vulnerability IDs to leave out of the results
+
+        Returns:
+            The vulnerabilities for each package, in the order of `packages`
+        """
+        ignore = frozenset(ignore_ids)
+        index = self.index
+        results: List[List[Vulnerability]] = []
+
+        for package_name, version in packages:
+            vulnerabilities: List[Vulnerability] = []
+
+            for specifier in index.lookup(package_name, version):
+                vulnerabilities.extend(
+                    self._vulnerabilities(
+                        index.database_name(package_name) or package_name,
+                        specifier,
+                        version,
+                        ignore,
+                    )
+                )
+
+            results.append(vulnerabilities)
+
+        return results
+
+    def _vulnerabilities(
+        self, name: str, specifier: str, version: str, ignore: frozenset
+    ) -> List[Vulnerability]:
+        full = self.full
+        cve_data = full.get("$meta", {}).get("cve", {})
+        found: List[Vulnerability] = []
+
+        for data in get_vulnerabilities(pkg=name, spec=specifier, db=full):
+            vuln_id = data.get("id", "").replace("pyup.io-", "")
+            if not vuln_id or vuln_id in ignore:
+                continue
+            cve_id = data.get("cve")
+            if cve_id:
+                cve_id = cve_id.split(",")[0].strip()
+            cve_meta = cve_data.get(cve_id, {})
+            found.append(
+                Vulnerability(
+                    name=name,
+                    spec=specifier,
+                    version=version,
+                    advisory=data.get("advisory"),
+                    vuln_id=vuln_id,
+                    cvssv2=cve_meta.get("cvssv2", None),
+                    cvssv3=cve_meta.get("cvssv3", None),
+                )
+            )
+
+        return found
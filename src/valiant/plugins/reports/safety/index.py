@@ -0,0 +1,323 @@
+"""An index of the Safety database for quick version lookups.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import hashlib
+import json
+import os
+import re
+
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from packaging.specifiers import InvalidSpecifier, Specifier, SpecifierSet
+from packaging.version import InvalidVersion, Version
+
+from valiant.log import get_logger
+
+
+log = get_logger()
+
+INDEX_FILE = "safety-index.json"
+INDEX_FORMAT = 1
+
+_NAME_SEPARATORS = re.compile(r"[-_.]+")
+
+
+def normalize_name(name: str) -> str:
+    """Normalises a package name as per PEP 503.
+
+    Args:
+        name: The package name
+
+    Returns:
+        The normalised name
+    """
+    return _NAME_SEPARATORS.sub("-", name).lower()
+
+
+class _Interval(NamedTuple):
+    lower: Optional[Version]
+    lower_inclusive: bool
+    upper: Optional[Version]
+    upper_inclusive: bool
+
+    def contains_point(self, point: Version) -> bool:
+        if self.lower is not None and (
+            point < self.lower or (point == self.lower and not self.lower_inclusive)
+        ):
+            return False
+        if self.upper is not None and (
+            point > self.upper or (point == self.upper and not self.upper_inclusive)
+        ):
+            return False
+        return True
+
+    def contains_gap(self, below: Optional[Version], above: Optional[Version]) -> bool:
+        # A gap lies between two neighbouring bounds and every interval either
+        # covers all of it or none of it
+        if self.lower is not None and (below is None or self.lower > below):
+            return False
+        if self.upper is not None and (above is None or self.upper < above):
+            return False
+        return True
+
+
+_UNBOUNDED = _Interval(None, False, None, False)
+
+
+def _to_interval(specifier: str) -> Optional[_Interval]:
+    """Converts a specifier set made up of simple comparisons into an interval.
+
+    Returns None for anything else (`~=`, `!=`, wildcards, local versions etc).
+    """
+    lower, lower_inclusive, upper, upper_inclusive = _UNBOUNDED
+
+    for clause in (c.strip() for c in specifier.split(",")):
+        if not clause:
+            continue
+        try:
+            spec = Specifier(clause)
+            version = Version(spec.version)
+        except (InvalidSpecifier, InvalidVersion):
+            return None
+
+        if spec.operator not in ("<", "<=", ">", ">=", "==") or version.local:
+            return None
+
+        if spec.operator in (">", ">=", "=="):
+            inclusive = spec.operator != ">"
+            if lower is None or version > lower or (version == lower and not inclusive):
+                lower, lower_inclusive = version, inclusive
+        if spec.operator in ("<", "<=", "=="):
+            inclusive = spec.operator != "<"
+            if upper is None or version < upper or (version == upper and not inclusive):
+                upper, upper_inclusive = version, inclusive
+
+    return _Interval(lower, lower_inclusive, upper, upper_inclusive)
+
+
+def _index_package(name: str, specifiers: List[str]) -> Dict[str, Any]:
+    intervals: List[Tuple[int, _Interval]] = []
+    fallback: List[int] = []
+
+    for i, specifier in enumerate(specifiers):
+        interval = _to_interval(specifier)
+        if interval is None:
+            fallback.append(i)
+        else:
+            intervals.append((i, interval))
+
+    bounds = sorted(
+        {
+            bound
+            for _, interval in intervals
+            for bound in (interval.lower, interval.upper)
+            if bound is not None
+        }
+    )
+
+    # Cell 2k is the gap below bounds[k] and cell 2k + 1 is bounds[k] itself
+    cells: List[List[int]] = []
+    for k in range(len(bounds) + 1):
+        below = bounds[k - 1] if k > 0 else None
+        above = bounds[k] if k < len(bounds) else None
+        cells.append([i for i, iv in intervals if iv.contains_gap(below, above)])
+        if above is not None:
+            cells.append([i for i, iv in intervals if iv.contains_point(above)])
+
+    return {
+        "name": name,
+        "specifiers": specifiers,
+        "bounds": [str(bound) for bound in bounds],
+        "cells": cells,
+        "fallback": fallback,
+    }
+
+
+class VulnerabilityIndex:
+    """Maps package versions to the vulnerable specifiers that include them.
+
+    Each package's specifiers are flattened into a sorted list of version
+    bounds. Looking a version up is then a dictionary lookup for the package
+    and a binary search of its bounds. Specifiers that aren't simple ranges
+    are checked individually.
+
+    Candidates are confirmed with `SpecifierSet.contains` so that the
+    results match Safety's own check (e.g. pre-release handling).
+    """
+
+    def __init__(self, packages: Mapping[str, Any], fingerprint: str):
+        """Constructor.
+
+        Args:
+            packages: The indexed data - use `build` or `load` to create it
+            fingerprint: Identifies the database the index was built from
+        """
+        self._packages = packages
+        self.fingerprint = fingerprint
+        self._bounds: Dict[str, List[Version]] = {}
+        self._specifier_sets: Dict[str, Optional[SpecifierSet]] = {}
+
+    def __len__(self) -> int:
+        """The number of packages in the index."""  # noqa: DAR201
+        return len(self._packages)
+
+    @staticmethod
+    def fingerprint_database(insecure: Mapping[str, Any]) -> str:
+        """Identifies a version of the Safety database.
+
+        Args:
+            insecure: The summary (`insecure.json`) database
+
+        Returns:
+            The database timestamp if it has one, otherwise a digest of its content
+        """
+        timestamp = insecure.get("$meta", {}).get("timestamp")
+        if timestamp:
+            return f"timestamp:{timestamp}"
+
+        content = json.dumps(insecure, sort_keys=True).encode("utf-8")
+        return f"sha256:{hashlib.sha256(content).hexdigest()}"
+
+    @classmethod
+    def build(cls, insecure: Mapping[str, Any]) -> "VulnerabilityIndex":
+        """Indexes the summary database.
+
+        Args:
+            insecure: The summary (`insecure.json`) database
+
+        Returns:
+            The index
+        """
+        packages: Dict[str, Any] = {}
+        for name, specifiers in insecure.items():
+            if name.startswith("$"):
+                continue
+            packages[normalize_name(name)] = _index_package(name, list(specifiers))
+
+        return cls(packages, cls.fingerprint_database(insecure))
+
+    @classmethod
+    def load(cls, path: Path, fingerprint: str) -> Optional["VulnerabilityIndex"]:
+        """Loads a saved index.
+
+        Args:
+            path: The index file
+            fingerprint: The fingerprint of the current database
+
+        Returns:
+            The index or None if the file is missing, unreadable or out of date
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if data.get("format") != INDEX_FORMAT or data.get("fingerprint") != fingerprint:
+            return None
+
+        return cls(data["packages"], fingerprint)
+
+    def save(self, path: Path) -> None:
+        """Writes the index to a file.
+
+        Args:
+            path: The index file
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "format": INDEX_FORMAT,
+                    "fingerprint": self.fingerprint,
+                    "packages": self._packages,
+                },
+                f,
+            )
+        os.replace(tmp, path)
+
+    def database_name(self, name: str) -> Optional[str]:
+        """Finds a package's name as it appears in the database.
+
+        Args:
+            name: The package name
+
+        Returns:
+            The database's name for the package or None if it isn't listed
+        """
+        entry = self._packages.get(normalize_name(name))
+        return entry["name"] if entry else None
+
+    def _package_bounds(self, name: str, entry: Mapping[str, Any]) -> List[Version]:
+        bounds = self._bounds.get(name)
+        if bounds is None:
+            bounds = [Version(bound) for bound in entry["bounds"]]
+            self._bounds[name] = bounds
+        return bounds
+
+    def _specifier_set(self, specifier: str) -> Optional[SpecifierSet]:
+        if specifier not in self._specifier_sets:
+            try:
+                self._specifier_sets[specifier] = SpecifierSet(specifier)
+            except InvalidSpecifier:
+                log.warning(f"Ignoring an invalid Safety specifier: {specifier}")
+                self._specifier_sets[specifier] = None
+        return self._specifier_sets[specifier]
+
+    def _candidates(
+        self, name: str, entry: Mapping[str, Any], version: str
+    ) -> List[int]:
+        try:
+            public = Version(Version(version).public)
+        except InvalidVersion:
+            return list(range(len(entry["specifiers"])))
+
+        bounds = self._package_bounds(name, entry)
+        k = bisect_left(bounds, public)
+        cell = 2 * k + 1 if k < len(bounds) and bounds[k] == public else 2 * k
+        return sorted(set(entry["cells"][cell]).union(entry["fallback"]))
+
+    def lookup(self, name: str, version: str) -> List[str]:
+        """Finds the vulnerable specifiers that include a package version.
+
+        Args:
+            name: The package name
+            version: The package version
+
+        Returns:
+            The matching specifiers, in database order
+        """
+        name = normalize_name(name)
+        entry = self._packages.get(name)
+        if not entry:
+            return []
+
+        matches: List[str] = []
+        for i in self._candidates(name, entry, version):
+            specifier = entry["specifiers"][i]
+            spec_set = self._specifier_set(specifier)
+            if spec_set is not None and spec_set.contains(version):
+                matches.append(specifier)
+
+        return matches
@@ -25,19 +25,19 @@ import os
 
 from enum import Enum
 from pathlib import Path
-from typing import Dict, List
+from typing import Any, Dict, List, Sequence, Union
 
 from safety import __author__ as safety_author
 from safety import __version__ as safety_version
 from safety.safety import Vulnerability
-from safety.safety import check as safety_check
-from safety.util import Package as SafetyPackage
 from valiant.log import get_logger
 from valiant.package import PackageCoordinates, PackageMetadata
 from valiant.plugins.reports import BaseReportPlugin
 from valiant.reports import Finding, FindingCategory, FindingLevel, Report
 from valiant.util import Dictionizer
 
+from .database import SafetyDatabase
+
 
 log = get_logger()
 
@@ -99,65 +99,89 @@ class SafetyReportPlugin(BaseReportPlugin):
     url = "https://pyup.io/safety/"
 
     @classmethod
-    def prepare_report(
-        cls, package_metadata: PackageMetadata, configuration_dir: Path
-    ) -> Report:
-        """Constructs the report.
+    def settings(cls) -> Dict[str, Any]:
+        """Resolves the plugin settings.
+
+        Values in the `report_configurations.safety` configuration take
+        precedence over the `SAFETY_API_KEY` and `SAFETY_IGNORE_IDS`
+        environment variables.
+
+        Returns:
+            The key, db_mirror, cached and ignore_ids settings
+        """
+        configuration = cls.configuration or {}
+
+        ignore_ids: Union[str, Sequence[str]] = configuration.get(
+            "ignore_ids", os.getenv("SAFETY_IGNORE_IDS", "")
+        )
+        if isinstance(ignore_ids, str):
+            ignore_ids = ignore_ids.split(",")
+
+        return {
+            "key": configuration.get("key", os.getenv("SAFETY_API_KEY", None)),
+            "db_mirror": configuration.get("db_mirror", None),
+            "cached": bool(configuration.get("cache", False)),
+            "ignore_ids": [str(id).strip() for id in ignore_ids if str(id).strip()],
+        }
+
+    @classmethod
+    def prepare_reports(
+        cls, packages: Sequence[PackageMetadata], configuration_dir: Path
+    ) -> List[Report]:
+        """Checks the whole batch with a single pass over the Safety database.
 
         Args:
-            package_metadata: containing at least the package metadata
+            packages: The metadata for each package to report on
             configuration_dir: A likely location for config files
 
         Returns:
-            The report.
-        """
-        # Prep config
+            One report per package, in the same order as `packages`
         """
-        if self.configuration:
-            key: Optional[str] = self.configuration.get("key", None)
-            db: Optional[str] = self.configuration.get("db", None)
-            ignore_ids: Optional[str] = self.configuration.get("ignore_ids", None)
-        else:
-            key = None
-            db = None
-            ignore_ids = None
-        """
-        key = os.getenv("SAFETY_API_KEY", None)
-        db = None
-        ignore_ids = os.getenv("SAFETY_IGNORE_IDS", None)
-        ignore_id_list: List[str] = []
-
-        if ignore_ids:
-            ignore_id_list = [id.strip() for id in ignore_ids.split(",")]
-
-        packages = [
-            SafetyPackage(key=package_metadata.name, version=package_metadata.version)
-        ]
-
-        vulnerabilities: List[Vulnerability] = safety_check(
-            packages=packages,
-            key=key,
-            db_mirror=db,
-            cached=False,
-            ignore_ids=ignore_id_list,
-            proxy=None,
+        settings = cls.settings()
+        database = SafetyDatabase.get(
+            key=settings["key"],
+            db_mirror=settings["db_mirror"],
+            cached=settings["cached"],
+            cache_dir=cls.cache_dir,
         )
 
-        report = Report(cls.report_provider_details())
+        results = database.check(
+            [(package.name, package.version) for package in packages],
+            ignore_ids=settings["ignore_ids"],
+        )
 
-        for v in vulnerabilities:
-            report.add_finding(
-                SafetyId.VULNERABILITY_FOUND.generate_finding(
-                    package_metadata.coordinates, v
+        reports: List[Report] = []
+        for package_metadata, vulnerabilities in zip(packages, results):
+            report = Report(cls.report_provider_details())
+            for v in vulnerabilities:
+                report.add_finding(
+                    SafetyId.VULNERABILITY_FOUND.generate_finding(
+                        package_metadata.coordinates, v
+                    )
                 )
+
+            log.info(
+                f"Safety reporter located {len(report.findings)} findings"
+                f" for {str(package_metadata.coordinates)}",
+                package_name=package_metadata.name,
+                package_version=package_metadata.version,
+                repository_url=package_metadata.repository_url,
             )
+            reports.append(report)
 
-        log.info(
-            f"Safety reporter located {len(report.findings)} findings"
-            f" for {str(package_metadata.coordinates)}",
-            package_name=package_metadata.name,
-            package_version=package_metadata.version,
-            repository_url=package_metadata.repository_url,
-        )
+        return reports
 
-        return report
+    @classmethod
+    def prepare_report(
+        cls, package_metadata: PackageMetadata, configuration_dir: Path
+    ) -> Report:
+        """Constructs the report.
+
+        Args:
+            package_metadata: containing at least the package metadata
+            configuration_dir: A likely location for config files
+
+        Returns:
+            The report.
+        """
+        return cls.prepare_reports([package_metadata], configuration_dir)[0]
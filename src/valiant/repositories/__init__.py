@@ -19,7 +19,15 @@ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
 IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
+from .archive import HttpRangeFile
+from .concurrency import AdaptiveConcurrency
 from .config import RepositoryConfiguration
+from .downloader import ArtifactDownloader
 from .exceptions import PackageNotFoundException, RepositoryException, ValidationError
 from .factory import RepositoryFactory
-from .repository import BaseRepository
+from .metadata_cache import CachedMetadata, CacheStats, MetadataCache
+from .metadata_store import MetadataStore, StoreStats
+from .repository import BaseAsyncRepository, BaseRepository
+from .scheduler import RequestScheduler
+from .session import create_download_session, create_session
+from .singleflight import AsyncSingleFlight, SingleFlight
@@ -0,0 +1,244 @@
+"""Reads zip-based artifacts (e.g. wheels) with HTTP range requests.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import bisect
+import io
+import re
+import tempfile
+import zipfile
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from valiant.log import get_logger
+from valiant.package import ArtifactMetadata
+
+from .downloader import DOWNLOAD_CHUNK_SIZE, ArtifactDownloader
+from .exceptions import RepositoryException
+
+
+log = get_logger()
+
+RANGE_BLOCK_SIZE = 64 * 1024
+"""The minimum number of bytes requested by a range request."""
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+
+
+class RangeNotSupported(RepositoryException):
+    """The server doesn't support range requests for the URL."""
+
+
+class HttpRangeFile(io.RawIOBase):
+    """A read-only, seekable file over HTTP range requests.
+
+    Only the parts of the file that are read are requested (in blocks of at
+    least `block_size` bytes) and these are kept for later reads. The end of
+    the file is requested when the instance is created - this is where a zip
+    archive keeps its central directory.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        session: requests.Session,
+        timeout: Any = None,
+        block_size: int = RANGE_BLOCK_SIZE,
+    ):
+        """New instance.
+
+        Args:
+            url: The file URL
+            session: The session used for the requests
+            timeout: The request timeout (as used by `requests`)
+            block_size: The minimum request size
+
+        Raises:
+            RangeNotSupported: If the server doesn't support range requests
+        """
+        super().__init__()
+        self.url = url
+        self.requests = 0
+        self.bytes_fetched = 0
+        self._session = session
+        self._timeout = timeout
+        self._block_size = block_size
+        self._starts: List[int] = []
+        self._chunks: Dict[int, bytes] = {}
+        self._pos = 0
+        self.size = 0
+        self._request(f"bytes=-{block_size}")
+
+    def _request(self, byte_range: str) -> Tuple[int, int]:
+        """Requests a range of the file.
+
+        Args:
+            byte_range: The `Range` header value
+
+        Returns:
+            The start and length of the chunk received
+
+        Raises:
+            RangeNotSupported: If the response isn't a partial response
+        """
+        with self._session.get(
+            self.url,
+            headers={"Range": byte_range, "Accept-Encoding": "identity"},
+            timeout=self._timeout,
+            stream=True,
+        ) as r:
+            if r.status_code != requests.codes.partial_content:
+                raise RangeNotSupported(
+                    f"Range request for {self.url} returned {r.status_code}"
+                )
+
+            match = _CONTENT_RANGE.match(r.headers.get("Content-Range", ""))
+            if not match:
+                raise RangeNotSupported(f"Unexpected Content-Range from {self.url}")
+
+            start, self.size = int(match.group(1)), int(match.group(3))
+            data = r.content
+
+        self.requests += 1
+        self.bytes_fetched += len(data)
+        if data:
+            bisect.insort(self._starts, start)
+            self._chunks[start] = data
+
+        return start, len(data)
+
+    def _read_range(self, start: int, end: int) -> bytes:
+        out = bytearray()
+        pos = start
+
+        while pos < end:
+            i = bisect.bisect_right(self._starts, pos) - 1
+            if i >= 0:
+                chunk_start = self._starts[i]
+                chunk = self._chunks[chunk_start]
+                if pos < chunk_start + len(chunk):
+                    piece = chunk[pos - chunk_start : end - chunk_start]
+                    out += piece
+                    pos += len(piece)
+                    continue
+
+            # Fetch up to the next chunk we already have
+            next_start = self._starts[i + 1] if i + 1 < len(self._starts) else self.size
+            fetch_end = min(max(end, pos + self._block_size), next_start, self.size)
+            chunk_start, length = self._request(f"bytes={pos}-{fetch_end - 1}")
+
+            # Without this, a response that misses `pos` is requested forever
+            if not chunk_start <= pos < chunk_start + length:
+                raise RangeNotSupported(
+                    f"Range request for {self.url} returned bytes"
+                    f" {chunk_start}-{chunk_start + length - 1} rather than {pos}"
+                )
+
+        return bytes(out)
+
+    def readable(self) -> bool:  # noqa: D102
+        return True
+
+    def seekable(self) -> bool:  # noqa: D102
+        return True
+
+    def tell(self) -> int:  # noqa: D102
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:  # noqa: D102
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+
+        self._pos = max(0, self._pos)
+        return self._pos
+
+    def readinto(self, b: Any) -> int:  # noqa: D102
+        end = min(self._pos + len(b), self.size)
+        if end <= self._pos:
+            return 0
+
+        data = self._read_range(self._pos, end)
+        b[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+def open_artifact(
+    artifact: ArtifactMetadata,
+    session: requests.Session,
+    timeout: Any = None,
+    downloader: Optional[ArtifactDownloader] = None,
+) -> zipfile.ZipFile:
+    """Opens a zip-based artifact (such as a wheel) for inspection.
+
+    Only the archive's central directory and the members that are read are
+    requested from the server. Servers that don't support range requests
+    have the artifact downloaded in full - through the downloader (and its
+    cache) if one is provided.
+
+    Members read with range requests are checked against their CRC but the
+    artifact's SHA-256 digest can't be verified without the whole file.
+
+    Args:
+        artifact: The artifact
+        session: The session used for the requests
+        timeout: The request timeout (as used by `requests`)
+        downloader: Used to download the artifact when ranges aren't supported
+
+    Returns:
+        The archive
+
+    Raises:
+        RepositoryException: If the artifact couldn't be opened
+    """
+    try:
+        try:
+            return zipfile.ZipFile(HttpRangeFile(artifact.url, session, timeout))
+        except RangeNotSupported as e:
+            log.info(
+                "Range requests not supported - downloading the artifact",
+                url=artifact.url,
+                reason=str(e),
+            )
+
+        if downloader:
+            return zipfile.ZipFile(downloader.fetch(artifact, session, timeout))
+
+        spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        with session.get(artifact.url, stream=True, timeout=timeout) as r:
+            if r.status_code != requests.codes.ok:
+                raise RepositoryException(
+                    f"Unable to download {artifact.url} ({r.status_code})"
+                )
+            for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                spool.write(chunk)
+
+        spool.seek(0)
+        return zipfile.ZipFile(spool)  # type: ignore
+    except (zipfile.BadZipFile, requests.RequestException) as e:
+        raise RepositoryException(f"Unable to open the artifact {artifact.url}: {e}")
@@ -0,0 +1,251 @@
+"""The cache backend interface.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import time
+
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from valiant.util import Dictionizer
+
+
+BACKENDS = ("sqlite", "mmap", "memory")
+"""The available backends."""
+
+ACCESS_RESOLUTION = 60.0
+"""Access times are only recorded when they're older than this (seconds)."""
+
+
+@dataclass(frozen=True)
+class CacheEntry(Dictionizer):
+    """Describes an entry held by a cache backend.
+
+    Attributes:
+        key: The entry's key
+        size: The size of the value (in bytes)
+        stored_at: When the value was stored (epoch seconds)
+        accessed_at: When the value was last read or stored (epoch seconds)
+    """
+
+    key: str
+    size: int
+    stored_at: float
+    accessed_at: float
+
+    def to_dict(self) -> Dict:  # noqa:D102
+        return asdict(self)
+
+
+class CacheBackend(ABC):
+    """Stores byte values against string keys.
+
+    Backends can be limited to `max_size` bytes (0 for no limit), evicting
+    the least recently used entries as new entries are stored. Backends that
+    keep their data on disk can be shared by several processes.
+
+    Backends also hold named records (such as the cache stats) alongside the
+    entries - these are never evicted or pruned and aren't counted in `size`.
+    """
+
+    name = ""
+    """The backend type (as used by `open_backend`)."""
+
+    def __init__(self, max_size: int = 0):
+        """New instance.
+
+        Args:
+            max_size: The most bytes kept (0 for no limit)
+        """
+        self.max_size = max(0, max_size)
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Retrieves a value, marking it as recently used.
+
+        Args:
+            key: The key
+
+        # noqa: DAR202
+        Returns:
+            The value or None if there isn't one
+
+        Raises:
+            NotImplementedError: Because this is an abstract implementation.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, key: str, value: bytes) -> None:
+        """Stores a value, evicting old entries if the backend is full.
+
+        Args:
+            key: The key
+            value: The value
+
+        Raises:
+            NotImplementedError: Because this is an abstract implementation.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        """Removes a value.
+
+        Args:
+            key: The key
+
+        # noqa: DAR202
+        Returns:
+            True if there was a value to remove
+
+        Raises:
+            NotImplementedError: Because this is an abstract implementation.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def entries(self) -> Iterator[CacheEntry]:
+        """Describes the entries held by the backend.
+
+        # noqa: DAR202
+        Returns:
+            The entries, in no particular order
+
+        Raises:
+            NotImplementedError: Because this is an abstract implementation.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_record(self, name: str) -> Optional[bytes]:
+        """Retrieves a named record.
+
+        Args:
+            name: The record name (letters, digits, `_`, `-` and `.`)
+
+        # noqa: DAR202
+        Returns:
+            The record or None if there isn't one
+
+        Raises:
+            NotImplementedError: Because this is an abstract implementation.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def put_record(self, name: str, value: bytes) -> None:
+        """Stores a named record, replacing any existing record.
+
+        Args:
+            name: The record name (letters, digits, `_`, `-` and `.`)
+            value: The record
+
+        Raises:
+            NotImplementedError: Because this is an abstract implementation.
+        """
+        raise NotImplementedError
+
+    @property
+    def size(self) -> int:
+        """The number of bytes held."""
+        return sum(e.size for e in self.entries())  # noqa: DAR201
+
+    def prune(
+        self, max_age: Optional[float] = None, max_size: Optional[int] = None
+    ) -> int:
+        """Removes old entries.
+
+        Args:
+            max_age: Remove entries stored more than this many seconds ago
+            max_size: Then remove the least recently used entries until no
+                more than this many bytes are held
+
+        Returns:
+            The number of entries removed
+        """
+        removed = self._prunable(list(self.entries()), max_age, max_size)
+        return sum(1 for e in removed if self.delete(e.key))
+
+    @staticmethod
+    def _prunable(
+        entries: List[CacheEntry],
+        max_age: Optional[float] = None,
+        max_size: Optional[int] = None,
+    ) -> List[CacheEntry]:
+        """Selects the entries removed by `prune`."""  # noqa: DAR101,DAR201
+        entries = sorted(entries, key=lambda e: e.accessed_at)
+        removed: List[CacheEntry] = []
+
+        if max_age is not None:
+            cutoff = time.time() - max_age
+            removed = [e for e in entries if e.stored_at < cutoff]
+            entries = [e for e in entries if e.stored_at >= cutoff]
+
+        if max_size is not None:
+            size = sum(e.size for e in entries)
+            while entries and size > max_size:
+                entry = entries.pop(0)
+                size -= entry.size
+                removed.append(entry)
+
+        return removed
+
+    def close(self) -> None:
+        """Releases any resources held by the backend."""
+
+
+def open_backend(backend: str, path: Optional[Path], max_size: int = 0) -> CacheBackend:
+    """Creates a cache backend.
+
+    Args:
+        backend: The backend type - one of `sqlite`, `mmap` or `memory`
+        path: The sqlite database file or the mmap directory (unused by `memory`)
+        max_size: The most bytes kept (0 for no limit)
+
+    Returns:
+        The backend
+
+    Raises:
+        ValueError: If the backend type isn't known or needs a path
+    """
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown cache backend ({backend}) - expected one of {', '.join(BACKENDS)}"
+        )
+
+    if backend == "memory":
+        from .memory import MemoryBackend
+
+        return MemoryBackend(max_size=max_size)
+
+    if path is None:
+        raise ValueError(f"The {backend} cache backend needs a path")
+
+    if backend == "mmap":
+        from .mmap import MmapBackend
+
+        return MmapBackend(path, max_size=max_size)
+
+    from .sqlite import SqliteBackend
+
+    return SqliteBackend(path, max_size=max_size)
@@ -0,0 +1,96 @@
+"""An in-memory cache backend.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional, Tuple
+
+from .backend import CacheBackend, CacheEntry
+
+
+class MemoryBackend(CacheBackend):
+    """Keeps values in memory for the life of the process.
+
+    Entries are held in least recently used order so eviction is cheap.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_size: int = 0):
+        """New instance.
+
+        Args:
+            max_size: The most bytes kept (0 for no limit)
+        """
+        super().__init__(max_size)
+        self._entries: "OrderedDict[str, Tuple[bytes, float, float]]" = OrderedDict()
+        self._records: Dict[str, bytes] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:  # noqa: D102
+        return self._size
+
+    def get(self, key: str) -> Optional[bytes]:  # noqa: D102
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries[key] = (entry[0], entry[1], time.time())
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def get_record(self, name: str) -> Optional[bytes]:  # noqa: D102
+        return self._records.get(name)
+
+    def put_record(self, name: str, value: bytes) -> None:  # noqa: D102
+        self._records[name] = value
+
+    def put(self, key: str, value: bytes) -> None:  # noqa: D102
+        now = time.time()
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._size -= len(old[0])
+            self._entries[key] = (value, now, now)
+            self._size += len(value)
+
+            while self.max_size and self._size > self.max_size and self._entries:
+                _, (evicted, _, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def delete(self, key: str) -> bool:  # noqa: D102
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is None:
+                return False
+            self._size -= len(old[0])
+            return True
+
+    def entries(self) -> Iterator[CacheEntry]:  # noqa: D102
+        with self._lock:
+            items = list(self._entries.items())
+
+        for key, (value, stored_at, accessed_at) in items:
+            yield CacheEntry(key, len(value), stored_at, accessed_at)
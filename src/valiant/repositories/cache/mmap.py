@@ -0,0 +1,374 @@
+"""A memory-mapped, append-only cache backend.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from valiant.log import get_logger
+
+from .backend import ACCESS_RESOLUTION, CacheBackend, CacheEntry
+
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+
+log = get_logger()
+
+DATA_FILE = "data"
+LOCK_FILE = "lock"
+RECORD_PREFIX = "record-"
+"""Named records are kept in files with this prefix."""
+
+_MAGIC = b"VALCACH2"
+_RECORD = struct.Struct("<BIId")  # operation, key length, value length, timestamp
+_PUT = 1
+_DELETE = 2
+_TOUCH = 3
+_RECORD_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+EVICTION_TARGET = 0.9
+"""Eviction frees space down to this fraction of `max_size`."""
+
+
+class MmapBackend(CacheBackend):
+    """Keeps values in an append-only file that is memory-mapped for reading.
+
+    Much like LMDB, readers don't take locks: each process maps the data file
+    and indexes the records it holds, picking up records appended by other
+    processes as the file grows. Writers append records whilst holding an
+    exclusive lock on a separate lock file.
+
+    Replaced and deleted values are reclaimed by compaction, which writes the
+    live entries to a new file and swaps it into place - processes that have
+    the old file mapped keep reading it until they notice the swap. Reads
+    append a small record noting the access time (at most once a minute per
+    entry) so the least recently used entries, as seen by all processes, are
+    dropped when the file grows beyond `max_size`. Named records are kept in
+    separate files.
+
+    The backend relies on `fcntl` and isn't available on Windows.
+    """
+
+    name = "mmap"
+
+    def __init__(self, path: Path, max_size: int = 0, compact_ratio: float = 0.5):
+        """New instance.
+
+        Args:
+            path: The directory holding the data and lock files
+            max_size: The most bytes kept (0 for no limit)
+            compact_ratio: Compact once this fraction of the file is unused
+
+        Raises:
+            ValueError: If `fcntl` isn't available
+        """
+        if fcntl is None:  # pragma: no cover
+            raise ValueError("The mmap cache backend isn't available on this platform")
+
+        super().__init__(max_size)
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self._data_path = path / DATA_FILE
+        self._lock = threading.RLock()
+        self._index: Dict[str, Tuple[int, int, float]] = {}
+        self._accessed: Dict[str, float] = {}
+        self._live = 0
+        self._file: Optional[Any] = None
+        self._map: Optional[mmap.mmap] = None
+        self._inode: Optional[Tuple[int, int]] = None
+        self._scanned = 0
+
+        path.mkdir(parents=True, exist_ok=True)
+        self._lock_fd = os.open(str(path / LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        with self._locked():
+            if not self._is_data_file():
+                self._write_file(self._data_path, [])
+            self._refresh()
+
+    def _is_data_file(self) -> bool:
+        """Checks the data file exists and was written by this version."""
+        try:
+            with open(self._data_path, "rb") as f:
+                magic = f.read(len(_MAGIC))
+        except FileNotFoundError:
+            return False
+
+        if magic != _MAGIC:
+            log.warning("Replacing an old cache file", path=str(self._data_path))
+            return False
+        return True
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._lock:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    @property
+    def size(self) -> int:  # noqa: D102
+        with self._lock:
+            self._refresh()
+            return self._live
+
+    def _file_size(self) -> int:
+        return len(self._map) if self._map is not None else 0
+
+    def _refresh(self) -> None:
+        """Picks up records appended (or a compacted file swapped in) by others."""
+        st = os.stat(self._data_path)
+        if (st.st_dev, st.st_ino) != self._inode:
+            self._reopen()
+        elif st.st_size > self._file_size():
+            self._remap()
+        self._scan()
+
+    def _reopen(self) -> None:
+        self._close_file()
+        self._file = open(self._data_path, "rb")
+        st = os.fstat(self._file.fileno())
+        self._inode = (st.st_dev, st.st_ino)
+        self._index = {}
+        self._accessed = {}
+        self._live = 0
+        self._remap()
+
+        if self._map is None or self._map[: len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"{self._data_path} isn't a valiant cache file")
+        self._scanned = len(_MAGIC)
+
+    def _remap(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if os.fstat(self._file.fileno()).st_size:  # type: ignore
+            self._map = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ  # type: ignore
+            )
+
+    def _scan(self) -> None:
+        buffer = self._map
+        if buffer is None:
+            return
+
+        pos = self._scanned
+        while pos + _RECORD.size <= len(buffer):
+            operation, key_length, value_length, stored_at = _RECORD.unpack_from(
+                buffer, pos
+            )
+            key_start = pos + _RECORD.size
+            end = key_start + key_length + value_length
+            if operation not in (_PUT, _DELETE, _TOUCH) or end > len(buffer):
+                break  # An incomplete (or damaged) record
+
+            key = buffer[key_start : key_start + key_length].decode("utf-8")
+            if operation == _TOUCH:
+                if key in self._index:
+                    self._accessed[key] = max(self._accessed[key], stored_at)
+                pos = end
+                continue
+
+            old = self._index.pop(key, None)
+            if old:
+                self._live -= old[1]
+            if operation == _PUT:
+                self._index[key] = (key_start + key_length, value_length, stored_at)
+                self._live += value_length
+                self._accessed[key] = max(self._accessed.get(key, 0.0), stored_at)
+            else:
+                self._accessed.pop(key, None)
+            pos = end
+
+        self._scanned = pos
+
+    def get(self, key: str) -> Optional[bytes]:  # noqa: D102
+        with self._lock:
+            self._refresh()
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            offset, length, _ = entry
+            value = bytes(self._map[offset : offset + length])  # type: ignore
+
+            # Avoid a write for every read
+            now = time.time()
+            if now - self._accessed[key] > ACCESS_RESOLUTION:
+                with self._locked():
+                    self._append(_TOUCH, key, b"", now)
+                    self._compact_if_needed()
+            return value
+
+    def get_record(self, name: str) -> Optional[bytes]:  # noqa: D102
+        try:
+            return (self.path / self._record_file(name)).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put_record(self, name: str, value: bytes) -> None:  # noqa: D102
+        fd, temp = tempfile.mkstemp(dir=str(self.path), prefix=".record-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(temp, self.path / self._record_file(name))
+        except BaseException:
+            os.unlink(temp)
+            raise
+
+    @staticmethod
+    def _record_file(name: str) -> str:
+        if not _RECORD_NAME.match(name):
+            raise ValueError(f"Invalid record name ({name})")
+        return RECORD_PREFIX + name
+
+    def put(self, key: str, value: bytes) -> None:  # noqa: D102
+        with self._locked():
+            self._append(_PUT, key, value, time.time())
+
+            if self.max_size and self._live > self.max_size:
+                self._evict(keep=key)
+            else:
+                self._compact_if_needed()
+
+    def delete(self, key: str) -> bool:  # noqa: D102
+        with self._locked():
+            self._refresh()
+            if key not in self._index:
+                return False
+            self._append(_DELETE, key, b"", time.time())
+            self._compact_if_needed()
+            return True
+
+    def entries(self) -> Iterator[CacheEntry]:  # noqa: D102
+        with self._lock:
+            self._refresh()
+            entries = [
+                CacheEntry(key, length, stored_at, self._accessed.get(key, stored_at))
+                for key, (_, length, stored_at) in self._index.items()
+            ]
+        return iter(entries)
+
+    def prune(  # noqa: D102
+        self, max_age: Optional[float] = None, max_size: Optional[int] = None
+    ) -> int:
+        with self._locked():
+            self._refresh()
+            removed = self._prunable(list(self.entries()), max_age, max_size)
+            if removed:
+                self._compact(drop={e.key for e in removed})
+            return len(removed)
+
+    def close(self) -> None:  # noqa: D102
+        with self._lock:
+            self._close_file()
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+    def _close_file(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._inode = None
+
+    def _append(self, operation: int, key: str, value: bytes, stored_at: float) -> None:
+        """Appends a record - the caller holds the lock."""
+        self._refresh()
+        if os.stat(self._data_path).st_size > self._scanned:
+            # A writer failed part way through a record - rewrite the file
+            self._compact()
+
+        encoded = key.encode("utf-8")
+        with open(self._data_path, "ab") as f:
+            f.write(
+                _RECORD.pack(operation, len(encoded), len(value), stored_at)
+                + encoded
+                + value
+            )
+        self._refresh()
+
+    def _compact_if_needed(self) -> None:
+        unused = self._file_size() - self._live
+        if unused > 1024 * 1024 and unused > self._file_size() * self.compact_ratio:
+            self._compact()
+
+    def _evict(self, keep: str) -> None:
+        target = self.max_size * EVICTION_TARGET
+        drop: Set[str] = set()
+        live = self._live
+        for key in sorted(self._index, key=lambda k: self._accessed.get(k, 0)):
+            if live <= target:
+                break
+            if key != keep:
+                drop.add(key)
+                live -= self._index[key][1]
+        self._compact(drop)
+
+    def _compact(self, drop: Optional[Set[str]] = None) -> None:
+        """Rewrites the live entries to a new file - the caller holds the lock."""
+        records = [
+            (
+                key,
+                bytes(self._map[offset : offset + length]),  # type: ignore
+                stored_at,
+                self._accessed.get(key, stored_at),
+            )
+            for key, (offset, length, stored_at) in self._index.items()
+            if not drop or key not in drop
+        ]
+        self._write_file(self._data_path, records)
+        self._refresh()
+
+    def _write_file(
+        self, path: Path, records: List[Tuple[str, bytes, float, float]]
+    ) -> None:
+        fd, temp = tempfile.mkstemp(dir=str(self.path), prefix=".data-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_MAGIC)
+                for key, value, stored_at, accessed_at in records:
+                    encoded = key.encode("utf-8")
+                    f.write(_RECORD.pack(_PUT, len(encoded), len(value), stored_at))
+                    f.write(encoded)
+                    f.write(value)
+                    if accessed_at > stored_at:
+                        f.write(_RECORD.pack(_TOUCH, len(encoded), 0, accessed_at))
+                        f.write(encoded)
+            os.replace(temp, path)
+        except BaseException:
+            os.unlink(temp)
+            raise
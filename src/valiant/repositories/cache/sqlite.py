@@ -0,0 +1,200 @@
+"""An SQLite cache backend.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+from typing import Iterator, Optional
+
+from .backend import ACCESS_RESOLUTION, CacheBackend, CacheEntry
+
+
+EVICTION_BATCH = 64
+"""The number of entries considered at a time when evicting."""
+
+
+class SqliteBackend(CacheBackend):
+    """Keeps values in an SQLite database.
+
+    The database uses write-ahead logging so readers aren't blocked by a
+    writer, and any number of processes can share it - writers wait (up to
+    `timeout` seconds) for each other rather than failing. The total size
+    is tracked in the database so eviction doesn't need to scan the entries.
+    """
+
+    name = "sqlite"
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            stored_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+        CREATE TABLE IF NOT EXISTS totals (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            size INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO totals (id, size)
+            SELECT 0, COALESCE(SUM(size), 0) FROM entries;
+        CREATE TABLE IF NOT EXISTS records (
+            name TEXT PRIMARY KEY,
+            value BLOB NOT NULL
+        );
+    """
+
+    def __init__(self, path: Path, max_size: int = 0, timeout: float = 30.0):
+        """New instance.
+
+        Args:
+            path: The database file
+            max_size: The most bytes kept (0 for no limit)
+            timeout: Seconds to wait for another writer
+        """
+        super().__init__(max_size)
+        self.path = path
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(
+            str(self.path),
+            timeout=timeout,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SqliteBackend._SCHEMA)
+
+    @property
+    def size(self) -> int:  # noqa: D102
+        with self._lock:
+            return int(self._db.execute("SELECT size FROM totals").fetchone()[0])
+
+    def get(self, key: str) -> Optional[bytes]:  # noqa: D102
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, accessed_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            # Avoid a write for every read
+            if now - row[1] > ACCESS_RESOLUTION:
+                self._db.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+
+        return bytes(row[0])
+
+    def get_record(self, name: str) -> Optional[bytes]:  # noqa: D102
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM records WHERE name = ?", (name,)
+            ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def put_record(self, name: str, value: bytes) -> None:  # noqa: D102
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO records (name, value) VALUES (?, ?)",
+                (name, value),
+            )
+
+    def put(self, key: str, value: bytes) -> None:  # noqa: D102
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._adjust(-self._size_of(key))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries"
+                    " (key, value, size, stored_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, value, len(value), now, now),
+                )
+                self._adjust(len(value))
+                if self.max_size:
+                    self._evict(self.max_size, keep=key)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def delete(self, key: str) -> bool:  # noqa: D102
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            row = self._db.execute(
+                "SELECT size FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._adjust(-row[0])
+            self._db.execute("COMMIT")
+        return row is not None
+
+    def entries(self) -> Iterator[CacheEntry]:  # noqa: D102
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, size, stored_at, accessed_at FROM entries"
+            ).fetchall()
+
+        for row in rows:
+            yield CacheEntry(*row)
+
+    def close(self) -> None:  # noqa: D102
+        with self._lock:
+            self._db.close()
+
+    def _size_of(self, key: str) -> int:
+        row = self._db.execute(
+            "SELECT size FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+    def _adjust(self, delta: int) -> None:
+        if delta:
+            self._db.execute("UPDATE totals SET size = size + ?", (delta,))
+
+    def _evict(self, max_size: int, keep: str) -> None:
+        """Removes the least recently used entries until the size is within bounds."""
+        total = int(self._db.execute("SELECT size FROM totals").fetchone()[0])
+        while total > max_size:
+            rows = self._db.execute(
+                "SELECT key, size FROM entries WHERE key != ?"
+                " ORDER BY accessed_at LIMIT ?",
+                (keep, EVICTION_BATCH),
+            ).fetchall()
+            if not rows:
+                break
+
+            for key, size in rows:
+                if total <= max_size:
+                    break
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                self._adjust(-size)
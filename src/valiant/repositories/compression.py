@@ -0,0 +1,250 @@
+"""Compression for cached metadata bodies.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import threading
+import zlib
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+COMPRESSION_MODES = ("auto", "zstd", "zlib", "none")
+"""The `compression` settings - `auto` prefers zstd when it's installed."""
+
+MIN_COMPRESS_SIZE = 256
+"""Bodies smaller than this (in bytes) are stored as they are."""
+
+_DICTIONARY_FRAGMENTS = [
+    # Least common first - zlib favours matches at the end of its dictionary
+    '"Operating System :: Microsoft :: Windows", "Operating System :: POSIX", ',
+    '"Operating System :: MacOS :: MacOS X", "Topic :: Utilities", ',
+    '"Topic :: Software Development :: Libraries :: Python Modules", ',
+    '"Programming Language :: Python :: Implementation :: PyPy", ',
+    '"Programming Language :: Python :: Implementation :: CPython", ',
+    '"Programming Language :: Python :: 2.7", "Programming Language :: Python :: 2", ',
+    '"Natural Language :: English", "Environment :: Console", ',
+    '"License :: OSI Approved :: BSD License", ',
+    '"License :: OSI Approved :: Apache Software License", ',
+    '"License :: OSI Approved :: MIT License", ',
+    '"Development Status :: 4 - Beta", ',
+    '"Development Status :: 5 - Production/Stable", ',
+    '"Intended Audience :: Developers", "Operating System :: OS Independent", ',
+    '"Programming Language :: Python :: 3.6", "Programming Language :: Python :: 3.7", ',
+    '"Programming Language :: Python :: 3.8", "Programming Language :: Python :: 3.9", ',
+    '"Programming Language :: Python :: 3", "Programming Language :: Python", ',
+    '{"info": {"author": "", "author_email": "", "bugtrack_url": null, ',
+    '"classifiers": [], "description": "", ',
+    '"description_content_type": "text/markdown", ',
+    '"description_content_type": "text/x-rst", "docs_url": null, ',
+    '"download_url": "", "downloads": {"last_day": -1, "last_month": -1, ',
+    '"last_week": -1}, "home_page": "https://github.com/", "keywords": "", ',
+    '"license": "MIT", "maintainer": "", "maintainer_email": "", "name": "", ',
+    '"package_url": "https://pypi.org/project/", "platform": "", ',
+    '"project_url": "https://pypi.org/project/", "project_urls": {"Homepage": "", ',
+    '"Documentation": "https://", "Source": "https://github.com/"}, ',
+    '"release_url": "https://pypi.org/project/", "requires_dist": null, ',
+    '"requires_python": ">=3.6", "summary": "", "version": "", ',
+    '"yanked": false, "yanked_reason": null}, "last_serial": ',
+    '"releases": {"": [',
+    '], "urls": [',
+    '"packagetype": "sdist", "python_version": "source", ',
+    '.tar.gz", "has_sig": false, "md5_digest": "", ',
+    '-py3-none-any.whl", "has_sig": false, "md5_digest": "", ',
+    '"packagetype": "bdist_wheel", "python_version": "py3", ',
+    '"requires_python": null, "size": ',
+    '"upload_time": "20", "upload_time_iso_8601": "20',
+    '.000000Z", "url": "https://files.pythonhosted.org/packages/',
+    '"yanked": false, "yanked_reason": null}, ',
+    '{"comment_text": "", "digests": {"md5": "", "sha256": ""}, "downloads": -1, ',
+    '"filename": "',
+]
+
+WAREHOUSE_DICTIONARY = "".join(_DICTIONARY_FRAGMENTS).encode("utf-8")
+"""A preset dictionary of the text that's common to Warehouse JSON responses."""
+
+DICTIONARY_ID = "warehouse1"
+"""Identifies `WAREHOUSE_DICTIONARY` in stored entries - change it with the text."""
+
+
+class BodyCodec(ABC):
+    """Compresses and decompresses cached bodies."""
+
+    name = ""
+    """Identifies the codec (and dictionary) in stored entries."""
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """Compresses a body.
+
+        Args:
+            data: The body
+
+        # noqa: DAR202
+        Returns:
+            The compressed body
+
+        Raises:
+            NotImplementedError: Because this is an abstract implementation.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        """Decompresses a body.
+
+        Args:
+            data: The compressed body
+
+        # noqa: DAR202
+        Returns:
+            The body
+
+        Raises:
+            NotImplementedError: Because this is an abstract implementation.
+        """
+        raise NotImplementedError
+
+
+class ZlibCodec(BodyCodec):
+    """Deflate using the Warehouse preset dictionary."""
+
+    name = f"zlib+{DICTIONARY_ID}"
+
+    def __init__(self, level: Optional[int] = None):
+        """New instance.
+
+        Args:
+            level: The compression level (1-9)
+        """
+        self.level = 6 if level is None else level
+
+    def compress(self, data: bytes) -> bytes:  # noqa: D102
+        c = zlib.compressobj(self.level, zdict=WAREHOUSE_DICTIONARY)
+        return c.compress(data) + c.flush()
+
+    def decompress(self, data: bytes) -> bytes:  # noqa: D102
+        d = zlib.decompressobj(zdict=WAREHOUSE_DICTIONARY)
+        return d.decompress(data) + d.flush()
+
+
+class ZstdCodec(BodyCodec):
+    """Zstandard using the Warehouse dictionary (needs the `zstandard` package).
+
+    Zstandard contexts aren't thread-safe so each thread gets its own.
+    """
+
+    name = f"zstd+{DICTIONARY_ID}"
+
+    def __init__(self, level: Optional[int] = None):
+        """New instance.
+
+        Args:
+            level: The compression level (1-22)
+
+        Raises:
+            ValueError: If the `zstandard` package isn't installed
+        """
+        if zstandard is None:
+            raise ValueError(
+                "zstd compression needs the zstandard package (the `zstd` extra)"
+            )
+        self.level = 3 if level is None else level
+        self._dictionary = zstandard.ZstdCompressionDict(
+            WAREHOUSE_DICTIONARY, dict_type=zstandard.DICT_TYPE_RAWCONTENT
+        )
+        self._local = threading.local()
+
+    def _contexts(self) -> Any:
+        local = self._local
+        if not hasattr(local, "compressor"):
+            local.compressor = zstandard.ZstdCompressor(
+                level=self.level, dict_data=self._dictionary
+            )
+            local.decompressor = zstandard.ZstdDecompressor(dict_data=self._dictionary)
+        return local
+
+    def compress(self, data: bytes) -> bytes:  # noqa: D102
+        return self._contexts().compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:  # noqa: D102
+        try:
+            return self._contexts().decompressor.decompress(data)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Could not decompress the zstd body: {e}") from e
+
+
+_CODECS: Dict[str, Any] = {ZlibCodec.name: ZlibCodec, ZstdCodec.name: ZstdCodec}
+_decoders: Dict[str, BodyCodec] = {}
+_decoders_lock = threading.Lock()
+
+
+def get_codec(mode: str = "auto", level: Optional[int] = None) -> Optional[BodyCodec]:
+    """Creates the codec for a `compression` setting.
+
+    Args:
+        mode: One of `auto`, `zstd`, `zlib` or `none`
+        level: The compression level (None for the codec's default)
+
+    Returns:
+        The codec or None if bodies aren't compressed
+
+    Raises:
+        ValueError: If the mode isn't known or zstd isn't available
+    """
+    if mode not in COMPRESSION_MODES:
+        raise ValueError(
+            f"Unknown compression ({mode}) - expected one of "
+            f"{', '.join(COMPRESSION_MODES)}"
+        )
+
+    if mode == "none":
+        return None
+    if mode == "zstd" or (mode == "auto" and zstandard is not None):
+        return ZstdCodec(level)
+    return ZlibCodec(level)
+
+
+def decompress(name: str, data: bytes) -> bytes:
+    """Decompresses a body stored by the named codec.
+
+    Args:
+        name: The codec name recorded with the body
+        data: The compressed body
+
+    Returns:
+        The body
+
+    Raises:
+        ValueError: If the codec isn't known or isn't available
+    """
+    codec = _decoders.get(name)
+    if codec is None:
+        if name not in _CODECS:
+            raise ValueError(f"Unknown compression codec ({name})")
+        with _decoders_lock:
+            codec = _decoders.setdefault(name, _CODECS[name]())
+    return codec.decompress(data)
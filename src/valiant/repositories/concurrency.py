@@ -0,0 +1,190 @@
+"""Adaptive concurrency limits for repository requests.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import threading
+import time
+
+from typing import Callable, Optional
+
+from valiant.log import get_logger
+
+
+log = get_logger()
+
+
+class AdaptiveConcurrency:
+    """Limits the requests in flight to a repository, adjusting the limit AIMD-style.
+
+    Each successful request adds `1 / limit` to the limit (so the limit grows
+    by one for each limit's worth of successful requests) whilst it's being
+    reached. Failed requests (errors, throttled or unavailable responses)
+    multiply the limit by `backoff_ratio`, as does latency that stays high.
+    Only one decrease is made for the requests that were in flight when the
+    limit was last decreased.
+
+    Latency is tracked with two exponentially weighted moving averages of the
+    successful responses: a long-window `baseline` and a short-window `recent`
+    latency (each is the plain average until it has seen `1 / smoothing`
+    responses). Latency is high when the recent latency is more than
+    `latency_tolerance` times the baseline - a few slow responses in amongst
+    fast ones don't count. Latency isn't judged until `warmup` responses have
+    been seen.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: Optional[int] = None,
+        backoff_ratio: float = 0.75,
+        latency_tolerance: float = 2.0,
+        baseline_smoothing: float = 0.02,
+        recent_smoothing: float = 0.1,
+        warmup: int = 10,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """New instance.
+
+        Args:
+            name: The repository name (for logging)
+            initial_limit: The starting limit
+            min_limit: The lowest limit
+            max_limit: The highest limit (defaults to the initial limit)
+            backoff_ratio: Multiplies the limit when it's decreased
+            latency_tolerance: Recent latencies above this multiple of the
+                baseline decrease the limit
+            baseline_smoothing: The weight given to each response when
+                updating the baseline latency
+            recent_smoothing: The weight given to each response when
+                updating the recent latency
+            warmup: The number of responses seen before latency is judged
+            clock: Provides the (monotonic) time
+        """
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit or initial_limit)
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.baseline_smoothing = baseline_smoothing
+        self.recent_smoothing = recent_smoothing
+        self.warmup = warmup
+        self._clock = clock
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial_limit)))
+        self._in_flight = 0
+        self._baseline = 0.0
+        self._recent = 0.0
+        self._samples = 0
+        self._last_decrease = float("-inf")
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        """The current concurrency limit."""
+        return int(self._limit)  # noqa: DAR201
+
+    @property
+    def baseline(self) -> float:
+        """The baseline latency (in seconds)."""
+        return self._baseline  # noqa: DAR201
+
+    @property
+    def recent(self) -> float:
+        """The recent latency (in seconds)."""
+        return self._recent  # noqa: DAR201
+
+    @property
+    def in_flight(self) -> int:
+        """The number of requests in flight."""
+        return self._in_flight  # noqa: DAR201
+
+    def acquire(self) -> float:
+        """Waits until a request can be sent.
+
+        Returns:
+            The start time to pass to `release`
+        """
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+            return self._clock()
+
+    def release(self, started: float, ok: bool) -> None:
+        """Records a completed request and adjusts the limit.
+
+        Args:
+            started: The time returned by `acquire`
+            ok: False if the request failed or was throttled
+        """
+        latency = self._clock() - started
+
+        with self._condition:
+            saturated = self._in_flight >= self.limit
+            self._in_flight -= 1
+            previous = self.limit
+
+            if ok:
+                self._record_latency(latency)
+
+            reason = "saturated"
+            if not ok:
+                reason = "errors"
+            elif self._congested():
+                reason = "latency"
+
+            if reason != "saturated":
+                self._decrease(started)
+            elif saturated:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+            if self.limit != previous:
+                log.info(
+                    "Concurrency adjusted",
+                    repository=self.name,
+                    concurrency=self.limit,
+                    previous_concurrency=previous,
+                    reason=reason,
+                    latency=round(latency, 3),
+                    ok=ok,
+                )
+
+            self._condition.notify_all()
+
+    def _record_latency(self, latency: float) -> None:
+        self._samples += 1
+        weight = max(self.baseline_smoothing, 1 / self._samples)
+        self._baseline += (latency - self._baseline) * weight
+        weight = max(self.recent_smoothing, 1 / self._samples)
+        self._recent += (latency - self._recent) * weight
+
+    def _congested(self) -> bool:
+        return (
+            self._samples > self.warmup
+            and self._recent > self.latency_tolerance * self._baseline
+        )
+
+    def _decrease(self, started: float) -> None:
+        # Requests sent before the last decrease were part of the same congestion
+        if started < self._last_decrease:
+            return
+        self._last_decrease = self._clock()
+        self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
@@ -20,12 +20,30 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 from dataclasses import asdict, dataclass
-from typing import Dict, Optional
-from urllib.parse import ParseResult, urlparse, urlunparse
+from typing import Dict, Optional, Tuple
+from urllib.parse import ParseResult, urlparse, urlsplit, urlunparse, urlunsplit
 
 from valiant.util import Dictionizer
 
 
+METADATA_FETCH_MODES = ("version", "project")
+
+
+def strip_credentials(url: str) -> str:
+    """Removes any credentials (`user:password@` or `token@`) from a URL.
+
+    Args:
+        url: The URL
+
+    Returns:
+        The URL without credentials - e.g. for logging
+    """
+    parts = urlsplit(url)
+    if "@" not in parts.netloc:
+        return url
+    return urlunsplit(parts._replace(netloc=parts.netloc.rpartition("@")[2]))
+
+
 @dataclass(frozen=True)
 class RepositoryConfiguration(Dictionizer):
     """A Python package repository.
@@ -40,6 +58,34 @@ class RepositoryConfiguration(Dictionizer):
         password: The access password (accompanies a username)
         token: An access token (used instead of username:password)
         repository_type: The software used to host the repository
+        pool_maxsize: The maximum number of open connections to the repository host
+        connect_timeout: Seconds to wait when connecting to the repository
+        read_timeout: Seconds to wait for the repository to send data
+        metadata_fetch_mode: How package metadata is requested from the repository:
+                  `version` (the default) requests each package version
+                  separately whilst `project` requests a project's metadata
+                  once and uses it for the project's latest version.
+        stream_metadata: Stream metadata responses, dropping the package
+                  description and the files listed for each release as they
+                  arrive rather than holding the full response in memory.
+        rate_limit: The maximum requests per second sent to the repository
+                  (0 for no limit).
+        rate_limit_burst: The number of requests that can be sent at once
+                  before the rate limit applies.
+        max_retries: The number of times throttled (429), unavailable
+                  (502/503/504) and failed requests are retried.
+        backoff_factor: The base delay (in seconds) between retries - this
+                  doubles for each retry and is jittered.
+        backoff_max: The longest delay (in seconds) between retries, including
+                  delays requested by a `Retry-After` header.
+        adaptive_concurrency: Adjust the number of requests in flight to the
+                  repository (starting at `pool_maxsize`) based on the latency
+                  and errors seen.
+        min_concurrency: The lowest number of requests in flight allowed when
+                  using adaptive concurrency.
+        max_concurrency: The highest number of requests in flight allowed when
+                  using adaptive concurrency (0 for `pool_maxsize`). The
+                  connection pool is enlarged to match.
     """
 
     name: str
@@ -48,10 +94,48 @@ class RepositoryConfiguration(Dictionizer):
     password: Optional[str] = None
     token: Optional[str] = None
     repository_type: str = "unknown"
+    pool_maxsize: int = 10
+    connect_timeout: float = 10.0
+    read_timeout: float = 30.0
+    metadata_fetch_mode: str = "version"
+    stream_metadata: bool = False
+    rate_limit: float = 0.0
+    rate_limit_burst: int = 10
+    max_retries: int = 3
+    backoff_factor: float = 0.5
+    backoff_max: float = 60.0
+    adaptive_concurrency: bool = False
+    min_concurrency: int = 1
+    max_concurrency: int = 0
+
+    def __post_init__(self) -> None:
+        """Performs post init checks.
+
+        Raises:
+            ValueError: if the metadata_fetch_mode isn't recognised
+        """
+        if self.metadata_fetch_mode not in METADATA_FETCH_MODES:
+            raise ValueError(
+                f"Unknown metadata_fetch_mode ({self.metadata_fetch_mode}) "
+                f"- expected one of {', '.join(METADATA_FETCH_MODES)}"
+            )
 
     def to_dict(self) -> Dict:  # noqa:D102
         return asdict(self)
 
+    @property
+    def connection_pool_size(self) -> int:
+        """The number of connections to pool for the repository host."""
+        size = self.pool_maxsize
+        if self.adaptive_concurrency:
+            size = max(size, self.max_concurrency)
+        return max(1, size)  # noqa: DAR201
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """The (connect, read) timeout tuple used by `requests`."""
+        return (self.connect_timeout, self.read_timeout)  # noqa: DAR201
+
     def get_access_url(self) -> str:
         """Provides the full url with credentials.
 
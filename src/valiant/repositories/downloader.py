@@ -0,0 +1,338 @@
+"""Downloads and verifies package artifacts.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlsplit
+
+import requests
+
+from valiant.log import get_logger
+from valiant.package import ArtifactMetadata
+
+from .exceptions import RepositoryException, ValidationError
+from .repository import BaseRepository
+from .singleflight import SingleFlight
+
+
+log = get_logger()
+
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+"""The size of the chunks read from artifact downloads."""
+
+
+class ArtifactDownloader:
+    """Downloads package artifacts into a content-addressed cache.
+
+    Artifacts are streamed to disk in chunks with their SHA-256 digest
+    calculated on the way. A download is only kept if the digest matches the
+    artifact's `sha256_digest` and is stored as
+    `<cache dir>/<digest[:2]>/<digest>/<filename>`. Artifacts that are
+    already in the cache aren't downloaded again.
+
+    Artifacts without a published digest are stored under their calculated
+    digest - they're downloaded every time as there's no way to look them up.
+
+    Instances can be shared by threads and concurrent requests for the same
+    artifact share a single download.
+    """
+
+    def __init__(self, cache_dir: Path, jobs: int = 4):
+        """New instance.
+
+        Args:
+            cache_dir: The artifact cache directory
+            jobs: The number of artifacts to download at once in `fetch_many`
+        """
+        self.cache_dir = cache_dir
+        self.jobs = max(1, jobs)
+        self._lock = threading.Lock()
+        self._flights: SingleFlight[Path] = SingleFlight()
+        self._stats: Dict[str, int] = {"downloaded": 0, "skipped": 0, "bytes": 0}
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Counts the artifacts downloaded and skipped and the bytes downloaded."""
+        with self._lock:  # noqa: DAR201
+            return dict(self._stats)
+
+    @staticmethod
+    def filename(artifact: ArtifactMetadata) -> str:
+        """The artifact's file name, taken from its URL.
+
+        Args:
+            artifact: The artifact
+
+        Returns:
+            The file name
+
+        Raises:
+            ValidationError: If the URL doesn't end with a usable file name
+        """
+        name = os.path.basename(unquote(urlsplit(artifact.url).path))
+
+        if name in ("", ".", "..") or "/" in name or "\\" in name or "\0" in name:
+            raise ValidationError(
+                f"The artifact URL {artifact.url} doesn't end with a usable file name"
+            )
+
+        return name
+
+    def path_for(self, digest: str, filename: str) -> Path:
+        """The cache location for an artifact.
+
+        Args:
+            digest: The artifact's SHA-256 digest
+            filename: The artifact's file name
+
+        Returns:
+            The path (which may not exist yet)
+
+        Raises:
+            ValidationError: If the digest or file name would leave the cache
+        """
+        if not re.fullmatch(r"[0-9a-f]{64}", digest):
+            raise ValidationError(
+                f"The artifact digest {digest} isn't a SHA-256 digest"
+            )
+
+        path = self.cache_dir / digest[:2] / digest / filename
+        try:
+            path.resolve().relative_to(self.cache_dir.resolve())
+        except ValueError:
+            raise ValidationError(
+                f"The artifact file name {filename} is outside the artifact cache"
+            )
+
+        return path
+
+    def cached(self, artifact: ArtifactMetadata) -> Optional[Path]:
+        """Locates an artifact in the cache.
+
+        Args:
+            artifact: The artifact
+
+        Returns:
+            The path to the artifact or None if it isn't in the cache
+        """
+        if not artifact.sha256_digest:
+            return None
+
+        path = self.path_for(artifact.sha256_digest.lower(), self.filename(artifact))
+        return path if path.is_file() else None
+
+    @staticmethod
+    def preferred(artifacts: Sequence[ArtifactMetadata]) -> ArtifactMetadata:
+        """Selects the artifact that best represents a package version.
+
+        Pure Python wheels are preferred, then source distributions.
+
+        Args:
+            artifacts: A package version's artifacts
+
+        Returns:
+            The preferred artifact
+
+        Raises:
+            RepositoryException: If there are no artifacts
+        """
+        if not artifacts:
+            raise RepositoryException("The package has no artifacts to download")
+
+        def rank(artifact: ArtifactMetadata) -> int:
+            if artifact.package_type == "bdist_wheel":
+                return 0 if artifact.url.endswith("-none-any.whl") else 2
+            return 1 if artifact.package_type == "sdist" else 3
+
+        return sorted(artifacts, key=rank)[0]
+
+    def fetch(
+        self, artifact: ArtifactMetadata, session: requests.Session, timeout: Any = None
+    ) -> Path:
+        """Provides an artifact, downloading it if it isn't in the cache.
+
+        Args:
+            artifact: The artifact
+            session: The session used to download the artifact
+            timeout: The request timeout (as used by `requests`)
+
+        Returns:
+            The path to the artifact in the cache
+        """
+        return self._flights.do(
+            artifact.sha256_digest or artifact.url,
+            lambda: self._fetch(artifact, session, timeout),
+        )
+
+    def fetch_many(
+        self,
+        artifacts: Sequence[ArtifactMetadata],
+        session: requests.Session,
+        timeout: Any = None,
+    ) -> List[Path]:
+        """Provides several artifacts, downloading them in parallel.
+
+        Args:
+            artifacts: The artifacts
+            session: The session used to download the artifacts
+            timeout: The request timeout (as used by `requests`)
+
+        Returns:
+            The paths to the artifacts, in the same order as `artifacts`
+        """
+        if len(artifacts) <= 1:
+            return [self.fetch(a, session, timeout) for a in artifacts]
+
+        with ThreadPoolExecutor(
+            max_workers=min(self.jobs, len(artifacts)),
+            thread_name_prefix="valiant-download",
+        ) as executor:
+            return list(
+                executor.map(lambda a: self.fetch(a, session, timeout), artifacts)
+            )
+
+    def fetch_packages(
+        self,
+        repository: BaseRepository,
+        packages: Sequence[Tuple[str, str]],
+        session: requests.Session,
+        timeout: Any = None,
+    ) -> List[Path]:
+        """Provides the preferred artifact for several package versions.
+
+        The package versions are looked up and downloaded in parallel.
+
+        Args:
+            repository: The repository providing the package metadata
+            packages: A sequence of (name, version) tuples
+            session: The session used to download the artifacts
+            timeout: The request timeout (as used by `requests`)
+
+        Returns:
+            The paths to the artifacts, in the same order as `packages`
+        """
+
+        def fetch(package: Tuple[str, str]) -> Path:
+            artifacts = repository.show(*package).artifacts
+            return self.fetch(self.preferred(artifacts), session, timeout)
+
+        if len(packages) <= 1:
+            return [fetch(p) for p in packages]
+
+        with ThreadPoolExecutor(
+            max_workers=min(self.jobs, len(packages)),
+            thread_name_prefix="valiant-download",
+        ) as executor:
+            return list(executor.map(fetch, packages))
+
+    def _fetch(
+        self, artifact: ArtifactMetadata, session: requests.Session, timeout: Any
+    ) -> Path:
+        """Downloads an artifact into the cache.
+
+        Args:
+            artifact: The artifact
+            session: The session used to download the artifact
+            timeout: The request timeout
+
+        Returns:
+            The path to the artifact in the cache
+
+        Raises:
+            RepositoryException: If the download failed
+            ValidationError: If the download doesn't match the expected digest
+        """
+        existing = self.cached(artifact)
+        if existing:
+            with self._lock:
+                self._stats["skipped"] += 1
+            log.debug(
+                "Artifact already downloaded", url=artifact.url, path=str(existing)
+            )
+            return existing
+
+        filename = self.filename(artifact)
+        expected = (artifact.sha256_digest or "").lower()
+        sha256 = hashlib.sha256()
+        size = 0
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(self.cache_dir), prefix=".download-")
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                with session.get(artifact.url, stream=True, timeout=timeout) as r:
+                    if r.status_code != requests.codes.ok:
+                        raise RepositoryException(
+                            f"Unable to download {artifact.url} ({r.status_code})"
+                        )
+
+                    for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        sha256.update(chunk)
+                        f.write(chunk)
+                        size += len(chunk)
+
+            digest = sha256.hexdigest()
+            if expected and digest != expected:
+                raise ValidationError(
+                    f"The download from {artifact.url} failed its hash check"
+                    f" (expected {expected}, received {digest})"
+                )
+
+            path = self.path_for(digest, filename)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, str(path))
+        except requests.RequestException as e:
+            os.unlink(tmp)
+            raise RepositoryException(f"Unable to download {artifact.url}: {e}")
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+        with self._lock:
+            self._stats["downloaded"] += 1
+            self._stats["bytes"] += size
+
+        if not expected:
+            log.warning("Artifact has no digest to verify", url=artifact.url)
+
+        log.info("Artifact downloaded", url=artifact.url, path=str(path), size=size)
+        return path
+
+
+@lru_cache(maxsize=None)
+def default_downloader() -> ArtifactDownloader:
+    """A shared downloader for repositories created without one.
+
+    Artifacts are kept in the system's temporary directory.
+
+    Returns:
+        The downloader
+    """
+    return ArtifactDownloader(Path(tempfile.gettempdir()) / "valiant-artifacts")
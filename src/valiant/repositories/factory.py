@@ -19,40 +19,112 @@ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
 IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
+from threading import Lock
+from typing import Optional
+
 from .config import RepositoryConfiguration
-from .repository import BaseRepository
+from .downloader import ArtifactDownloader
+from .metadata_cache import MetadataCache
+from .metadata_store import MetadataStore
+from .repository import BaseAsyncRepository, BaseRepository
 
 
 class RepositoryFactory:
     """Helps construct a repository instance based on the configuration."""
 
-    def __init__(self):
-        """Constructor."""
+    def __init__(
+        self,
+        metadata_cache: MetadataCache = None,
+        metadata_store: MetadataStore = None,
+        downloader: ArtifactDownloader = None,
+    ):
+        """Constructor.
+
+        Args:
+            metadata_cache: Passed to the repositories for caching their metadata
+            metadata_store: Passed to the repositories for storing parsed metadata
+            downloader: Passed to the repositories for downloading artifacts
+        """
         from typing import Dict
 
+        self._metadata_cache: Optional[MetadataCache] = metadata_cache
+        self._metadata_store: Optional[MetadataStore] = metadata_store
+        self._downloader: Optional[ArtifactDownloader] = downloader
         self._cache: Dict[str, BaseRepository] = {}
+        self._async_cache: Dict[str, BaseAsyncRepository] = {}
+        self._lock = Lock()
 
     def _instantiate_handler(self, conf: RepositoryConfiguration) -> BaseRepository:
+        from .mirror import LocalMirrorRepository
         from .pypi import PyPiRepository
+        from .simple import SimpleIndexRepository
 
         if conf.repository_type in PyPiRepository.list_supported_repository_types():
-            return PyPiRepository(conf)
+            return PyPiRepository(
+                conf,
+                metadata_cache=self._metadata_cache,
+                metadata_store=self._metadata_store,
+                downloader=self._downloader,
+            )
+
+        if (
+            conf.repository_type
+            in LocalMirrorRepository.list_supported_repository_types()
+        ):
+            return LocalMirrorRepository(conf)
+
+        if (
+            conf.repository_type
+            in SimpleIndexRepository.list_supported_repository_types()
+        ):
+            return SimpleIndexRepository(
+                conf,
+                downloader=self._downloader,
+                metadata_cache=self._metadata_cache,
+            )
 
         raise ValueError(
             f"Unable to handle repositories of type {conf.repository_type}"
         )
 
-    def _check_cache(self, conf: RepositoryConfiguration) -> BaseRepository:
-        if conf.name in self._cache:
-            if self._cache[conf.name].repository_configuration != conf:
-                raise ValueError(
-                    "Cache clash"
-                    " - repository configuration uses the same name as an existing cache entry"
-                )
-        else:
-            self._cache[conf.name] = self._instantiate_handler(conf)
+    def _instantiate_async_handler(
+        self, conf: RepositoryConfiguration
+    ) -> BaseAsyncRepository:
+        from .mirror import AsyncLocalMirrorRepository
+        from .pypi import AsyncPyPiRepository
+
+        if (
+            conf.repository_type
+            in AsyncPyPiRepository.list_supported_repository_types()
+        ):
+            return AsyncPyPiRepository(
+                conf,
+                metadata_cache=self._metadata_cache,
+                metadata_store=self._metadata_store,
+            )
+
+        if (
+            conf.repository_type
+            in AsyncLocalMirrorRepository.list_supported_repository_types()
+        ):
+            return AsyncLocalMirrorRepository(conf)
 
-        return self._cache[conf.name]
+        raise ValueError(
+            f"Unable to handle repositories of type {conf.repository_type} with asyncio"
+        )
+
+    def _check_cache(self, conf: RepositoryConfiguration) -> BaseRepository:
+        with self._lock:
+            if conf.name in self._cache:
+                if self._cache[conf.name].repository_configuration != conf:
+                    raise ValueError(
+                        "Cache clash"
+                        " - repository configuration uses the same name as an existing cache entry"
+                    )
+            else:
+                self._cache[conf.name] = self._instantiate_handler(conf)
+
+            return self._cache[conf.name]
 
     def get_repository(
         self, repository_configuration: RepositoryConfiguration,
@@ -67,6 +139,43 @@ class RepositoryFactory:
         """
         return self._check_cache(repository_configuration)
 
+    def get_async_repository(
+        self, repository_configuration: RepositoryConfiguration,
+    ) -> BaseAsyncRepository:
+        """Factory method for asyncio-based repositories.
+
+        Args:
+            repository_configuration: The repository config
+
+        Returns:
+            An async repository instance that handles the type set in the config
+
+        Raises:
+            ValueError: If the configuration clashes with a cached repository
+        """
+        conf = repository_configuration
+        with self._lock:
+            if conf.name in self._async_cache:
+                if self._async_cache[conf.name].repository_configuration != conf:
+                    raise ValueError(
+                        "Cache clash"
+                        " - repository configuration uses the same name as an existing cache entry"
+                    )
+            else:
+                self._async_cache[conf.name] = self._instantiate_async_handler(conf)
+
+            return self._async_cache[conf.name]
+
+    async def close_async_repositories(self) -> None:
+        """Closes any async repositories created by the factory."""
+        with self._lock:
+            repositories = list(self._async_cache.values())
+
+        for repo in repositories:
+            await repo.close()
+
     def reset_cache(self) -> None:
         """Clears the cache."""
-        self._cache = {}
+        with self._lock:
+            self._cache = {}
+            self._async_cache = {}
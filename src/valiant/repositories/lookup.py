@@ -0,0 +1,343 @@
+"""Package lookups across several repositories.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import threading
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from valiant.log import get_logger
+from valiant.package import PackageMetadata
+
+from .exceptions import PackageNotFoundException, RepositoryException, ValidationError
+from .repository import BaseAsyncRepository, BaseRepository
+
+
+log = get_logger()
+
+LOOKUP_MODES = ("single", "fallback", "hedged")
+
+_Repository = Union[BaseRepository, BaseAsyncRepository]
+
+
+class _BaseRepositoryLookup:
+    """The configuration and counters shared by the lookup classes."""
+
+    def __init__(
+        self,
+        repositories: Sequence[Any],
+        mode: str = "fallback",
+        hedge_delay: float = 0.5,
+    ):
+        """New instance.
+
+        Args:
+            repositories: The repositories, in the order they're used
+            mode: One of `single`, `fallback` or `hedged`
+            hedge_delay: Seconds to wait before asking the next repository
+
+        Raises:
+            ValueError: If the mode isn't recognised or there are no repositories
+        """
+        if mode not in LOOKUP_MODES:
+            raise ValueError(
+                f"Unknown repository lookup mode ({mode})"
+                f" - expected one of {', '.join(LOOKUP_MODES)}"
+            )
+        if not repositories:
+            raise ValueError("At least one repository is required.")
+
+        self.repositories = list(repositories[:1] if mode == "single" else repositories)
+        self.mode = mode
+        self.hedge_delay = hedge_delay
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {"lookups": 0, "fallbacks": 0, "hedges": 0}
+        self._wins: Dict[str, int] = {}
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Counts the lookups, fallbacks and hedged requests.
+
+        The number of lookups answered by each repository is keyed by the
+        repository's name.
+
+        Returns:
+            A dict of counters
+        """
+        with self._lock:
+            return {**self._stats, **self._wins}
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._stats[counter] += 1
+
+    def _answered(self, repository: _Repository) -> None:
+        name = repository.repository_configuration.name
+        with self._lock:
+            self._wins[name] = self._wins.get(name, 0) + 1
+
+    @staticmethod
+    def _log_miss(
+        repository: _Repository, name: str, version: str, error: Exception
+    ) -> None:
+        log.info(
+            "Repository lookup missed",
+            package_name=name,
+            package_version=version,
+            repository_url=repository.repository_configuration.base_url,
+            error=str(error),
+        )
+
+    @staticmethod
+    def _error(
+        name: str, version: str, errors: List[RepositoryException]
+    ) -> RepositoryException:
+        for error in errors:
+            if isinstance(error, ValidationError):
+                return error
+
+        return PackageNotFoundException(
+            f"{name} {version} was not found in any repository: "
+            + "; ".join(str(e) for e in errors)
+        )
+
+
+class RepositoryLookup(_BaseRepositoryLookup):
+    """Looks up packages across an ordered list of repositories.
+
+    In `fallback` mode the repositories are tried in order until one has the
+    package. In `hedged` mode the next repository is also asked once
+    `hedge_delay` seconds pass without an answer (or as soon as a repository
+    fails) and the first answer wins. Slower lookups are left to finish in
+    the background and their results are dropped. `single` mode only uses
+    the first repository.
+
+    Hedged lookups run in a thread pool owned by the lookup - call `close`
+    to shut it down.
+    """
+
+    repositories: List[BaseRepository]
+
+    def __init__(
+        self,
+        repositories: Sequence[BaseRepository],
+        mode: str = "fallback",
+        hedge_delay: float = 0.5,
+        max_workers: Optional[int] = None,
+    ):
+        """New instance.
+
+        Args:
+            repositories: The repositories, in the order they're used
+            mode: One of `single`, `fallback` or `hedged`
+            hedge_delay: Seconds to wait before asking the next repository
+            max_workers: The size of the thread pool used by hedged lookups
+                (defaults to the `ThreadPoolExecutor` default)
+        """
+        super().__init__(repositories, mode=mode, hedge_delay=hedge_delay)
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="valiant-hedge"
+                )
+            return self._executor
+
+    def close(self) -> None:
+        """Shuts down the thread pool, leaving any slower lookups to finish."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False)
+
+    def show(self, name: str, version: str) -> PackageMetadata:
+        """Provides details for a specific package version.
+
+        Args:
+            name: The package name
+            version: The package version
+
+        Returns:
+            The metadata from the first repository to answer
+
+        Raises:
+            PackageNotFoundException: When no repository has the package. # noqa: DAR402
+            ValidationError: The package metadata could not be parsed. # noqa: DAR402
+        """
+        self._count("lookups")
+
+        if self.mode == "hedged" and len(self.repositories) > 1:
+            return self._show_hedged(name, version)
+        return self._show_in_order(name, version)
+
+    def _show_in_order(self, name: str, version: str) -> PackageMetadata:
+        errors: List[RepositoryException] = []
+
+        for repository in self.repositories:
+            if errors:
+                self._count("fallbacks")
+            try:
+                metadata = repository.show(name, version)
+            except RepositoryException as e:
+                self._log_miss(repository, name, version, e)
+                errors.append(e)
+                continue
+
+            self._answered(repository)
+            return metadata
+
+        raise self._error(name, version, errors)
+
+    def _show_hedged(self, name: str, version: str) -> PackageMetadata:
+        errors: List[RepositoryException] = []
+        pending: Dict[Future, BaseRepository] = {}
+        waiting = list(self.repositories)
+        executor = self._get_executor()
+
+        def ask_next(counter: Optional[str]) -> None:
+            repository = waiting.pop(0)
+            if counter:
+                self._count(counter)
+            pending[executor.submit(repository.show, name, version)] = repository
+
+        ask_next(None)
+        while pending:
+            done, _ = wait(
+                pending,
+                timeout=self.hedge_delay if waiting else None,
+                return_when=FIRST_COMPLETED,
+            )
+
+            if not done:
+                ask_next("hedges")
+                continue
+
+            for future in done:
+                repository = pending.pop(future)
+                try:
+                    metadata = future.result()
+                except RepositoryException as e:
+                    self._log_miss(repository, name, version, e)
+                    errors.append(e)
+                    if waiting:
+                        ask_next("fallbacks")
+                    continue
+
+                self._answered(repository)
+                return metadata
+
+        raise self._error(name, version, errors)
+
+
+class AsyncRepositoryLookup(_BaseRepositoryLookup):
+    """The asyncio counterpart to `RepositoryLookup`.
+
+    The modes work in the same way except that, in `hedged` mode, slower
+    lookups are cancelled once a repository answers.
+    """
+
+    repositories: List[BaseAsyncRepository]
+
+    async def show(self, name: str, version: str) -> PackageMetadata:
+        """Provides details for a specific package version.
+
+        Args:
+            name: The package name
+            version: The package version
+
+        Returns:
+            The metadata from the first repository to answer
+
+        Raises:
+            PackageNotFoundException: When no repository has the package. # noqa: DAR402
+            ValidationError: The package metadata could not be parsed. # noqa: DAR402
+        """
+        self._count("lookups")
+
+        if self.mode == "hedged" and len(self.repositories) > 1:
+            return await self._show_hedged(name, version)
+        return await self._show_in_order(name, version)
+
+    async def _show_in_order(self, name: str, version: str) -> PackageMetadata:
+        errors: List[RepositoryException] = []
+
+        for repository in self.repositories:
+            if errors:
+                self._count("fallbacks")
+            try:
+                metadata = await repository.show(name, version)
+            except RepositoryException as e:
+                self._log_miss(repository, name, version, e)
+                errors.append(e)
+                continue
+
+            self._answered(repository)
+            return metadata
+
+        raise self._error(name, version, errors)
+
+    async def _show_hedged(self, name: str, version: str) -> PackageMetadata:
+        import asyncio
+
+        errors: List[RepositoryException] = []
+        pending: Dict[Any, BaseAsyncRepository] = {}
+        waiting = list(self.repositories)
+
+        def ask_next(counter: Optional[str]) -> None:
+            repository = waiting.pop(0)
+            if counter:
+                self._count(counter)
+            pending[asyncio.ensure_future(repository.show(name, version))] = repository
+
+        try:
+            ask_next(None)
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=self.hedge_delay if waiting else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                if not done:
+                    ask_next("hedges")
+                    continue
+
+                for task in done:
+                    repository = pending.pop(task)
+                    try:
+                        metadata = task.result()
+                    except RepositoryException as e:
+                        self._log_miss(repository, name, version, e)
+                        errors.append(e)
+                        if waiting:
+                            ask_next("fallbacks")
+                        continue
+
+                    self._answered(repository)
+                    return metadata
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise self._error(name, version, errors)
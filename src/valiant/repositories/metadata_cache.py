@@ -0,0 +1,560 @@
+"""A revalidating store for repository metadata responses.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import json
+import struct
+import threading
+import time
+import zlib
+
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+from valiant.log import get_logger
+from valiant.util import Dictionizer
+
+from .cache import CacheBackend, CacheEntry, open_backend
+from .compression import MIN_COMPRESS_SIZE, decompress, get_codec
+from .config import strip_credentials
+
+
+log = get_logger()
+
+_ENTRY_HEADER = struct.Struct("<I")  # validators (JSON) length
+
+STATS_RECORD = "stats"
+"""The backend record holding the hit/miss counters."""
+
+_LEGACY_STATS_KEY = "stats:counters"
+
+COUNTERS = ("hits", "revalidated", "misses", "body_bytes", "stored_bytes")
+"""Responses served from the cache, revalidated by the repository or downloaded -
+along with the size of the downloaded bodies before and after compression."""
+
+AGE_BUCKETS: List[Tuple[str, float]] = [
+    ("1h", 3600),
+    ("1d", 86400),
+    ("7d", 7 * 86400),
+    ("30d", 30 * 86400),
+    ("older", float("inf")),
+]
+"""Age histogram buckets - each counts the entries younger than its limit."""
+
+
+@dataclass(frozen=True)
+class CachedMetadata(Dictionizer):
+    """A cached metadata response and its validators.
+
+    Attributes:
+        url: The metadata URL
+        body: The (decoded) response body
+        etag: The response's `ETag` header
+        last_modified: The response's `Last-Modified` header
+        last_serial: The response's `X-PyPI-Last-Serial` header
+        stored_at: When the response was stored or last revalidated (epoch seconds)
+        content_type: The response's `Content-Type` header
+    """
+
+    url: str
+    body: bytes
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    last_serial: Optional[int] = None
+    stored_at: float = 0.0
+    content_type: Optional[str] = None
+
+    def to_dict(self) -> Dict:  # noqa:D102
+        d = asdict(self)
+        d.pop("body")
+        return d
+
+    @property
+    def age(self) -> float:
+        """Seconds since the response was stored or last revalidated."""
+        return time.time() - self.stored_at  # noqa: DAR201
+
+    @property
+    def revalidatable(self) -> bool:
+        """True if the response can be revalidated with a conditional request."""
+        return bool(self.etag or self.last_modified)  # noqa: DAR201
+
+    @property
+    def source_tag(self) -> str:
+        """Identifies the response that the entry holds.
+
+        The validators identify the response when the server provides them.
+        Otherwise the time the response was stored is used.
+
+        Returns:
+            The tag
+        """
+        if self.etag or self.last_modified or self.last_serial is not None:
+            return f"{self.etag}|{self.last_modified}|{self.last_serial}"
+        return f"@{self.stored_at}"
+
+    def json(self) -> Any:
+        """The body as JSON."""  # noqa: DAR201
+        return json.loads(self.body)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Request headers used to revalidate the response.
+
+        Returns:
+            The `If-None-Match` and/or `If-Modified-Since` headers
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+@dataclass(frozen=True)
+class CacheStats(Dictionizer):
+    """Describes the contents and effectiveness of a metadata cache.
+
+    Attributes:
+        backend: The backend type
+        entries: The number of cached responses
+        missing_entries: The number of packages recorded as missing
+        size: The bytes held by the backend
+        max_size: The most bytes kept by the backend (0 for no limit)
+        hits: Responses served from the cache without a request
+        revalidated: Responses that the repository confirmed were unchanged
+        misses: Responses downloaded into the cache
+        body_bytes: The size of the downloaded bodies
+        stored_bytes: The size of the downloaded bodies once compressed
+        stored_ages: Entry counts by the time since they were stored or revalidated
+        accessed_ages: Entry counts by the time since they were last used
+    """
+
+    backend: str
+    entries: int
+    missing_entries: int
+    size: int
+    max_size: int
+    hits: int = 0
+    revalidated: int = 0
+    misses: int = 0
+    body_bytes: int = 0
+    stored_bytes: int = 0
+    stored_ages: Dict[str, int] = field(default_factory=dict)
+    accessed_ages: Dict[str, int] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict:  # noqa:D102
+        d = asdict(self)
+        d["hit_rate"] = self.hit_rate
+        d["compression_ratio"] = self.compression_ratio
+        return d
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        """The fraction of lookups answered without downloading (None if unused)."""
+        total = self.hits + self.revalidated + self.misses
+        if not total:
+            return None  # noqa: DAR201
+        return (self.hits + self.revalidated) / total
+
+    @property
+    def compression_ratio(self) -> Optional[float]:
+        """How many times smaller downloaded bodies are once compressed."""
+        if not self.stored_bytes:
+            return None  # noqa: DAR201
+        return self.body_bytes / self.stored_bytes
+
+    @staticmethod
+    def age_histogram(ages: List[float]) -> Dict[str, int]:
+        """Counts ages into the `AGE_BUCKETS`.
+
+        Args:
+            ages: Ages in seconds
+
+        Returns:
+            The number of ages falling in each bucket
+        """
+        histogram = {name: 0 for name, _ in AGE_BUCKETS}
+        for age in ages:
+            name = next(name for name, limit in AGE_BUCKETS if age < limit)
+            histogram[name] += 1
+        return histogram
+
+
+class MetadataCache:
+    """Stores metadata responses along with their validators.
+
+    Once a response is older than `expire_after` it is revalidated using a
+    conditional request (`If-None-Match`/`If-Modified-Since`) rather than
+    being downloaded again. A `304 Not Modified` reply renews the cached copy.
+
+    With `stale_while_revalidate` enabled, repositories return an expired
+    response straight away and revalidate it in the background.
+
+    Package versions that a repository doesn't have are also recorded (per
+    repository) for `negative_expire_after` seconds so that repeated lookups
+    fail without a request.
+
+    Any credentials in a URL are removed before it is stored.
+
+    Entries are kept by a cache backend (`sqlite`, `mmap` or `memory`) that
+    can be limited to `max_size` bytes, evicting the least recently used
+    entries. The sqlite and mmap backends can be shared by several processes.
+
+    Response bodies are compressed (`compression`) with zstd when the
+    `zstandard` package is installed and zlib otherwise, using a preset
+    dictionary of common Warehouse JSON text. Entries record their codec so a
+    cache can be read whatever `compression` is set to.
+
+    Cache hits, revalidations and misses are counted (see `stats`) and added
+    to totals kept in the backend by `save_stats`.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path],
+        expire_after: float = 86400,
+        stale_while_revalidate: bool = False,
+        negative_expire_after: float = 3600,
+        backend: Union[str, CacheBackend] = "sqlite",
+        max_size: int = 0,
+        compression: str = "auto",
+        compression_level: Optional[int] = None,
+    ):
+        """New instance.
+
+        Args:
+            path: The sqlite database file or mmap directory (unused by `memory`)
+            expire_after: Seconds before a response needs revalidation
+            stale_while_revalidate: Serve expired responses whilst revalidating
+            negative_expire_after: Seconds to remember that a package is missing
+            backend: The backend type - or a backend instance
+            max_size: The most bytes kept by the backend (0 for no limit)
+            compression: One of `auto`, `zstd`, `zlib` or `none`
+            compression_level: The compression level (None for the default)
+        """
+        self.path = path
+        self.expire_after = expire_after
+        self.stale_while_revalidate = stale_while_revalidate
+        self.negative_expire_after = negative_expire_after
+        self.backend: CacheBackend = (
+            open_backend(backend, path, max_size)
+            if isinstance(backend, str)
+            else backend
+        )
+        self.codec = get_codec(compression, compression_level)
+        self._lock = threading.Lock()
+        self._counters: Counter = Counter()
+        self._unsaved: Counter = Counter()
+
+    @staticmethod
+    def from_config(config: Mapping[str, Any], path: Path) -> "MetadataCache":
+        """Creates an instance from a `metadata_cache` configuration entry.
+
+        Args:
+            config: The configuration mapping
+            path: The database file (an mmap backend uses a `.mmap` directory)
+
+        Returns:
+            A new instance
+        """
+        backend = str(config.get("backend", "sqlite"))
+        if backend == "mmap":
+            # The mmap backend keeps its files in a directory
+            path = path.with_suffix(".mmap")
+
+        return MetadataCache(
+            path=path,
+            expire_after=float(config.get("expire_after", 86400)),
+            stale_while_revalidate=bool(config.get("stale_while_revalidate", False)),
+            negative_expire_after=float(config.get("negative_expire_after", 3600)),
+            backend=backend,
+            max_size=int(config.get("max_size", 0)),
+            compression=str(config.get("compression", "auto")),
+            compression_level=(
+                int(config["compression_level"])
+                if config.get("compression_level") is not None
+                else None
+            ),
+        )
+
+    @staticmethod
+    def _key(url: str) -> str:
+        """Removes any credentials from the URL."""
+        return strip_credentials(url)  # noqa: DAR101,DAR201
+
+    @staticmethod
+    def _missing_key(repository: str, name: str, version: Optional[str]) -> str:
+        return f"missing:{repository}\0{name}\0{version or ''}"
+
+    @staticmethod
+    def _pack(header: Dict[str, Any], body: bytes) -> bytes:
+        encoded = json.dumps(header).encode("utf-8")
+        return _ENTRY_HEADER.pack(len(encoded)) + encoded + body
+
+    @staticmethod
+    def _unpack(value: bytes) -> Tuple[Dict[str, Any], bytes]:
+        """Splits a stored value into its header and (still compressed) body."""
+        (length,) = _ENTRY_HEADER.unpack_from(value)  # noqa: DAR101,DAR201
+        start = _ENTRY_HEADER.size
+        return json.loads(value[start : start + length]), value[start + length :]
+
+    def _encode(self, entry: CachedMetadata) -> bytes:
+        body = entry.body
+        codec = None
+        if self.codec and len(body) >= MIN_COMPRESS_SIZE:
+            compressed = self.codec.compress(body)
+            if len(compressed) < len(body):
+                body, codec = compressed, self.codec.name
+
+        self._count("body_bytes", len(entry.body))
+        self._count("stored_bytes", len(body))
+        header = {
+            "etag": entry.etag,
+            "last_modified": entry.last_modified,
+            "last_serial": entry.last_serial,
+            "stored_at": entry.stored_at,
+            "content_type": entry.content_type,
+        }
+        if codec:
+            header["codec"] = codec
+        return self._pack(header, body)
+
+    @staticmethod
+    def _decode(url: str, value: bytes, with_body: bool = True) -> CachedMetadata:
+        header, body = MetadataCache._unpack(value)
+        codec = header.pop("codec", None)
+        if not with_body:
+            body = b""
+        elif codec:
+            body = decompress(codec, body)
+        return CachedMetadata(url=url, body=body, **header)
+
+    def is_fresh(self, entry: CachedMetadata) -> bool:
+        """Checks if an entry can be used without revalidation.
+
+        Args:
+            entry: The cached entry
+
+        Returns:
+            True if the entry hasn't expired
+        """
+        return entry.age < self.expire_after
+
+    def get(self, url: str, with_body: bool = True) -> Optional[CachedMetadata]:
+        """Retrieves the cached response for a URL.
+
+        Args:
+            url: The metadata URL
+            with_body: Set to False to only read the validators (the body is empty)
+
+        Returns:
+            The cached response or None if there isn't one (or it can't be read)
+        """
+        key = self._key(url)
+        value = self.backend.get(f"url:{key}")
+        if value is None:
+            return None
+
+        try:
+            return self._decode(key, value, with_body)
+        except (ValueError, TypeError, zlib.error, struct.error) as e:
+            # e.g. compressed by a host with the zstd extra or corrupted
+            log.warning(f"Discarding an unreadable metadata cache entry: {e}", url=key)
+            self.backend.delete(f"url:{key}")
+            return None
+
+    def put(self, url: str, body: bytes, headers: Mapping[str, str]) -> CachedMetadata:
+        """Stores a response.
+
+        Args:
+            url: The metadata URL
+            body: The response body
+            headers: The response headers
+
+        Returns:
+            The cached entry
+        """
+        serial = headers.get("X-PyPI-Last-Serial")
+        entry = CachedMetadata(
+            url=self._key(url),
+            body=body,
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            last_serial=int(serial) if serial and serial.isdigit() else None,
+            stored_at=time.time(),
+            content_type=headers.get("Content-Type"),
+        )
+
+        self.backend.put(f"url:{entry.url}", self._encode(entry))
+        self._count("misses")
+        return entry
+
+    def touch(self, url: str) -> None:
+        """Marks a cached response as revalidated.
+
+        Args:
+            url: The metadata URL
+        """
+        key = f"url:{self._key(url)}"
+        value = self.backend.get(key)
+        if value:
+            # Only the header changes - the body is kept as it was stored
+            header, body = self._unpack(value)
+            header["stored_at"] = time.time()
+            self.backend.put(key, self._pack(header, body))
+            self._count("revalidated")
+
+    def record_hit(self) -> None:
+        """Counts a response served from the cache without a request."""
+        self._count("hits")
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] += amount
+            self._unsaved[counter] += amount
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """The hits, revalidations, misses and body sizes counted by this instance."""
+        with self._lock:
+            return {c: self._counters[c] for c in COUNTERS}  # noqa: DAR201
+
+    def _saved_stats(self) -> Dict[str, int]:
+        value = self.backend.get_record(STATS_RECORD)
+        if value is None:
+            # Earlier versions kept the counters as a (evictable) cache entry
+            value = self.backend.get(_LEGACY_STATS_KEY)
+        saved = json.loads(value) if value else {}
+        return {c: int(saved.get(c, 0)) for c in COUNTERS}
+
+    def save_stats(self) -> None:
+        """Adds the counts since the last save to the totals held in the backend.
+
+        Concurrent saves from several processes can lose counts - the totals
+        are only a guide to how effective the cache is.
+        """
+        with self._lock:
+            unsaved, self._unsaved = self._unsaved, Counter()
+        if not unsaved:
+            return
+
+        try:
+            totals = self._saved_stats()
+            for counter in COUNTERS:
+                totals[counter] += unsaved[counter]
+            self.backend.put_record(STATS_RECORD, json.dumps(totals).encode("utf-8"))
+            self.backend.delete(_LEGACY_STATS_KEY)
+        except Exception as e:
+            log.warning("Failed to save the metadata cache stats", error=str(e))
+
+    def summary(self) -> CacheStats:
+        """Describes the cache contents and the saved hit/miss totals.
+
+        Returns:
+            The cache stats
+        """
+        now = time.time()
+        entries: List[CacheEntry] = []
+        missing = 0
+        for entry in self.backend.entries():
+            if entry.key.startswith("url:"):
+                entries.append(entry)
+            elif entry.key.startswith("missing:"):
+                missing += 1
+
+        totals = self._saved_stats()
+        with self._lock:
+            for counter in COUNTERS:
+                totals[counter] += self._unsaved[counter]
+
+        return CacheStats(
+            backend=self.backend.name,
+            entries=len(entries),
+            missing_entries=missing,
+            size=self.backend.size,
+            max_size=self.backend.max_size,
+            stored_ages=CacheStats.age_histogram([now - e.stored_at for e in entries]),
+            accessed_ages=CacheStats.age_histogram(
+                [now - e.accessed_at for e in entries]
+            ),
+            **totals,
+        )
+
+    def prune(
+        self, max_age: Optional[float] = None, max_size: Optional[int] = None
+    ) -> int:
+        """Removes old entries.
+
+        Args:
+            max_age: Remove entries stored (or revalidated) more than this
+                many seconds ago
+            max_size: Then remove the least recently used entries until no
+                more than this many bytes are held
+
+        Returns:
+            The number of entries removed
+        """
+        return self.backend.prune(max_age=max_age, max_size=max_size)
+
+    def is_missing(self, repository: str, name: str, version: Optional[str]) -> bool:
+        """Checks if a package version was recently found to be missing.
+
+        Args:
+            repository: The repository name
+            name: The (canonical) package name
+            version: The package version (None for the project)
+
+        Returns:
+            True if the repository recently reported that it doesn't have the package
+        """
+        key = self._missing_key(repository, name, version)
+        value = self.backend.get(key)
+        if value is None:
+            return False
+
+        if time.time() - json.loads(value)["stored_at"] < self.negative_expire_after:
+            return True
+
+        self.backend.delete(key)
+        return False
+
+    def put_missing(
+        self, repository: str, name: str, version: Optional[str], status: int
+    ) -> None:
+        """Records that a package version is missing from a repository.
+
+        Args:
+            repository: The repository name
+            name: The (canonical) package name
+            version: The package version (None for the project)
+            status: The HTTP status returned by the repository
+        """
+        self.backend.put(
+            self._missing_key(repository, name, version),
+            json.dumps({"status": status, "stored_at": time.time()}).encode("utf-8"),
+        )
+
+    def close(self) -> None:
+        """Saves the stats and closes the backend."""
+        self.save_stats()
+        self.backend.close()
@@ -0,0 +1,356 @@
+"""A content-addressed store of parsed package metadata.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import hashlib
+import marshal
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from valiant.log import get_logger
+from valiant.util import Dictionizer
+
+
+log = get_logger()
+
+STORE_FORMAT = 1
+"""The layout/encoding version of the store - bump to discard existing stores."""
+
+USED_MARKER = ".used"
+"""Touched when a namespace version is opened - `prune` keeps the latest."""
+
+GC_GRACE_PERIOD = 300
+"""Objects written (or reused) more recently than this many seconds survive GC.
+
+This covers a `put` that has written its object but not yet its ref.
+"""
+
+
+@dataclass(frozen=True)
+class StoreStats(Dictionizer):
+    """Describes the contents of a metadata store.
+
+    Attributes:
+        versions: The number of namespace versions held
+        refs: The number of stored records
+        objects: The number of distinct records
+        size: The bytes held by the records
+    """
+
+    versions: int
+    refs: int
+    objects: int
+    size: int
+
+    def to_dict(self) -> Dict:  # noqa:D102
+        return asdict(self)
+
+
+class MetadataStore:
+    """Stores parsed (normalised) metadata records on disk.
+
+    Records are plain Python structures encoded with `marshal` - a compact
+    binary form that loads much faster than JSON and skips the validation
+    done when metadata is first parsed.
+
+    The layout is content-addressed:
+
+    * `objects/ab/abcd...` holds each record under the SHA-256 of its encoding
+    * `refs/ef/efgh...` maps a repository and key to an object along with
+      the `source` the record was parsed from (e.g. the response's validators)
+
+    A record is only returned when the caller's `source` matches the stored
+    one so that records parsed from an outdated response are never used.
+
+    Each namespace (e.g. `pypi`) is stored in a directory tagged with the
+    store format and a caller-provided model version. The records kept for
+    previous versions are left in place until `prune` removes them.
+
+    Files are written atomically so a store can be shared by threads and
+    processes.
+    """
+
+    def __init__(self, path: Path):
+        """New instance.
+
+        Args:
+            path: The base directory for the store
+        """
+        self.path = path
+        self._namespaces: set = set()
+
+    def _namespace_dir(self, namespace: str, version: str) -> Path:
+        ns_dir = self.path / f"{namespace}-v{STORE_FORMAT}-{version}"
+
+        if ns_dir not in self._namespaces:
+            # Marks this version as the one in use (see `prune`)
+            try:
+                ns_dir.mkdir(parents=True, exist_ok=True)
+                (ns_dir / USED_MARKER).touch()
+            except OSError as e:
+                log.warning(
+                    "Unable to mark the metadata store version in use",
+                    path=str(ns_dir),
+                    error=str(e),
+                )
+            self._namespaces.add(ns_dir)
+
+        return ns_dir
+
+    def _version_dirs(self) -> Dict[str, List[Path]]:
+        """Groups the namespace version directories by namespace."""  # noqa: DAR201
+        versions: Dict[str, List[Path]] = {}
+        if self.path.is_dir():
+            for entry in self.path.iterdir():
+                match = re.match(r"(.+?)-v\d+-", entry.name)
+                if match and entry.is_dir():
+                    versions.setdefault(match.group(1), []).append(entry)
+        return versions
+
+    @staticmethod
+    def _last_used(ns_dir: Path) -> float:
+        try:
+            return (ns_dir / USED_MARKER).stat().st_mtime
+        except OSError:
+            return 0.0
+
+    @staticmethod
+    def _fan_out(base: Path, digest: str) -> Path:
+        return base / digest[:2] / digest
+
+    @staticmethod
+    def _ref_digest(repository: str, key: str) -> str:
+        return hashlib.sha256(f"{repository}\0{key}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, str(path))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def get(
+        self, namespace: str, version: str, repository: str, key: str, source: str
+    ) -> Optional[Any]:
+        """Retrieves a record.
+
+        Args:
+            namespace: The record type
+            version: The version of the record type's model
+            repository: The repository name
+            key: The record key (e.g. the metadata URL)
+            source: Identifies the data that the record was parsed from
+
+        Returns:
+            The record or None if there's no record for the source
+        """
+        ns_dir = self._namespace_dir(namespace, version)
+        ref_path = self._fan_out(ns_dir / "refs", self._ref_digest(repository, key))
+
+        try:
+            stored_source, digest = marshal.loads(ref_path.read_bytes())
+            if stored_source != source:
+                return None
+
+            blob = self._fan_out(ns_dir / "objects", digest).read_bytes()
+            if hashlib.sha256(blob).hexdigest() != digest:
+                raise ValueError("The record doesn't match its digest")
+
+            return marshal.loads(blob)
+        except FileNotFoundError:
+            return None
+        except (EOFError, TypeError, ValueError) as e:
+            log.warning(
+                "Ignoring an unreadable metadata store entry",
+                repository=repository,
+                key=key,
+                error=str(e),
+            )
+            return None
+
+    def put(
+        self,
+        namespace: str,
+        version: str,
+        repository: str,
+        key: str,
+        source: str,
+        record: Any,
+    ) -> str:
+        """Stores a record.
+
+        Args:
+            namespace: The record type
+            version: The version of the record type's model
+            repository: The repository name
+            key: The record key (e.g. the metadata URL)
+            source: Identifies the data that the record was parsed from
+            record: The record - a structure that `marshal` can encode
+
+        Returns:
+            The record's digest
+        """
+        ns_dir = self._namespace_dir(namespace, version)
+        blob = marshal.dumps(record)
+        digest = hashlib.sha256(blob).hexdigest()
+
+        obj_path = self._fan_out(ns_dir / "objects", digest)
+        try:
+            # Reused objects are touched so that a concurrent GC keeps them
+            os.utime(str(obj_path))
+        except FileNotFoundError:
+            self._write(obj_path, blob)
+
+        self._write(
+            self._fan_out(ns_dir / "refs", self._ref_digest(repository, key)),
+            marshal.dumps((source, digest)),
+        )
+
+        return digest
+
+    def prune(self, max_age: Optional[float] = None) -> Dict[str, int]:
+        """Removes records that are no longer needed.
+
+        For each namespace, only the most recently opened version is kept.
+        Records stored more than `max_age` seconds ago are then removed,
+        followed by any objects that no record refers to.
+
+        Args:
+            max_age: Remove records stored more than this many seconds ago
+
+        Returns:
+            The number of `versions`, `refs` and `objects` removed
+        """
+        removed = {"versions": 0, "refs": 0, "objects": 0}
+        now = time.time()
+
+        for ns_dirs in self._version_dirs().values():
+            ns_dirs.sort(key=self._last_used, reverse=True)
+            for ns_dir in ns_dirs[1:]:
+                log.info("Removing outdated metadata store", path=str(ns_dir))
+                shutil.rmtree(ns_dir, ignore_errors=True)
+                self._namespaces.discard(ns_dir)
+                removed["versions"] += 1
+
+            ns_dir = ns_dirs[0]
+            refs, referenced = self._prune_refs(ns_dir, max_age, now)
+            removed["refs"] += refs
+            removed["objects"] += self._prune_objects(ns_dir, referenced, now)
+
+        return removed
+
+    def _prune_refs(
+        self, ns_dir: Path, max_age: Optional[float], now: float
+    ) -> Tuple[int, Set[str]]:
+        """Removes expired (or unreadable) refs.
+
+        Args:
+            ns_dir: The namespace version directory
+            max_age: Remove refs stored more than this many seconds ago
+            now: The current time
+
+        Returns:
+            The number of refs removed and the digests the others refer to
+        """
+        removed = 0
+        referenced: Set[str] = set()
+
+        for ref_path in self._files(ns_dir / "refs"):
+            try:
+                if max_age is not None and now - ref_path.stat().st_mtime > max_age:
+                    ref_path.unlink()
+                    removed += 1
+                    continue
+                referenced.add(marshal.loads(ref_path.read_bytes())[1])
+            except FileNotFoundError:
+                continue
+            except (EOFError, TypeError, ValueError, IndexError):
+                ref_path.unlink()
+                removed += 1
+
+        return removed, referenced
+
+    def _prune_objects(self, ns_dir: Path, referenced: Set[str], now: float) -> int:
+        """Removes the objects that aren't referenced.
+
+        Args:
+            ns_dir: The namespace version directory
+            referenced: The digests of the objects in use
+            now: The current time
+
+        Returns:
+            The number of objects removed
+        """
+        removed = 0
+
+        for obj_path in self._files(ns_dir / "objects"):
+            if obj_path.name in referenced:
+                continue
+            try:
+                if now - obj_path.stat().st_mtime > GC_GRACE_PERIOD:
+                    obj_path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+
+        return removed
+
+    def summary(self) -> StoreStats:
+        """Describes the store's contents.
+
+        Returns:
+            The store stats
+        """
+        versions = refs = objects = size = 0
+        for ns_dirs in self._version_dirs().values():
+            versions += len(ns_dirs)
+            for ns_dir in ns_dirs:
+                refs += sum(1 for _ in self._files(ns_dir / "refs"))
+                for obj_path in self._files(ns_dir / "objects"):
+                    try:
+                        size += obj_path.stat().st_size
+                    except FileNotFoundError:
+                        continue
+                    objects += 1
+
+        return StoreStats(versions=versions, refs=refs, objects=objects, size=size)
+
+    @staticmethod
+    def _files(base: Path) -> List[Path]:
+        """Lists the fanned-out files (skipping partly written ones)."""  # noqa: DAR101,DAR201
+        if not base.is_dir():
+            return []
+        return [
+            p
+            for p in base.glob("*/*")
+            if not p.name.startswith(".tmp-") and p.is_file()
+        ]
@@ -0,0 +1,300 @@
+"""A memory-mapped lookup index for a local metadata mirror.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+from packaging.utils import canonicalize_name
+
+
+INDEX_FILE = ".valiant-index"
+"""The name of the index file kept in the mirror's root directory."""
+
+_MAGIC = b"VALIDX01"
+_HEADER = struct.Struct("<8sII")  # magic, slot count, entry count
+_SLOT = struct.Struct("<QI")  # key hash, record offset (0 for an empty slot)
+_RECORD = struct.Struct("<HH")  # key length, path length
+
+
+def _index_key(name: str, version: Optional[str]) -> bytes:
+    return f"{canonicalize_name(name)}\0{version or ''}".encode("utf-8")
+
+
+def _hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+class MirrorIndex:
+    """Maps package versions to their metadata files in a mirror.
+
+    The index is a hash table stored in a single file that is memory-mapped
+    when opened - lookups take constant time and only touch the pages they
+    need, regardless of the size of the mirror.
+
+    The mirror's root directory holds a directory per project, using the
+    same layout as the Warehouse JSON API::
+
+        <root>/<project>/json              the project (latest version)
+        <root>/<project>/<version>/json    a specific version
+
+    The JSON metadata saved by bandersnatch (`json = true`) is also read when
+    the root is bandersnatch's `web` directory. It only holds the project
+    metadata, so only the latest version of each project is available::
+
+        <root>/json/<project>              the project (latest version)
+        <root>/pypi/<project>/json         the same (older bandersnatch releases)
+    """
+
+    def __init__(self, buffer: Any):
+        """New instance.
+
+        Args:
+            buffer: The index data (e.g. a memory map)
+
+        Raises:
+            ValueError: If the buffer doesn't hold an index
+        """
+        if len(buffer) < _HEADER.size:
+            raise ValueError("The mirror index is incomplete")
+
+        magic, self._slots, self._entries = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC:
+            raise ValueError("The mirror index has an unknown format")
+
+        self._buffer = buffer
+
+    @staticmethod
+    def open(path: Path) -> "MirrorIndex":
+        """Memory-maps an index file.
+
+        Args:
+            path: The index file
+
+        Returns:
+            The index
+        """
+        with open(path, "rb") as f:
+            return MirrorIndex(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @staticmethod
+    def is_bandersnatch(root: Path) -> bool:
+        """Checks if a mirror uses the bandersnatch layout.
+
+        Args:
+            root: The mirror's root directory
+
+        Returns:
+            True if the root holds bandersnatch's `json` and `pypi` directories
+        """
+        return (root / "json").is_dir() and (root / "pypi").is_dir()
+
+    @staticmethod
+    def candidates(root: Path, name: str, version: Optional[str]) -> List[Path]:
+        """Lists the files that could hold a package's metadata.
+
+        This finds files added to the mirror after it was indexed.
+
+        Args:
+            root: The mirror's root directory
+            name: The project name
+            version: The version (None for the project metadata)
+
+        Returns:
+            The possible metadata files
+        """
+        names = [name] if name == name.lower() else [name, name.lower()]
+
+        if MirrorIndex.is_bandersnatch(root):
+            if version:
+                return []
+            return [root / "json" / n for n in names] + [
+                root / "pypi" / n / "json" for n in names
+            ]
+
+        suffix = Path(version, "json") if version else Path("json")
+        return [root / n / suffix for n in names]
+
+    @staticmethod
+    def scan(root: Path) -> List[Tuple[str, Optional[str], str]]:
+        """Lists the metadata files in a mirror.
+
+        Args:
+            root: The mirror's root directory
+
+        Returns:
+            A list of (project, version, path) tuples - the version is None
+            for project metadata and the path is relative to the root
+        """
+        if MirrorIndex.is_bandersnatch(root):
+            return MirrorIndex._scan_bandersnatch(root)
+
+        entries: List[Tuple[str, Optional[str], str]] = []
+
+        with os.scandir(root) as projects:
+            for project in projects:
+                if project.name.startswith(".") or not project.is_dir():
+                    continue
+
+                with os.scandir(project.path) as items:
+                    for item in items:
+                        if item.name == "json" and item.is_file():
+                            entries.append((project.name, None, f"{project.name}/json"))
+                        elif item.is_dir() and os.path.isfile(
+                            os.path.join(item.path, "json")
+                        ):
+                            entries.append(
+                                (
+                                    project.name,
+                                    item.name,
+                                    f"{project.name}/{item.name}/json",
+                                )
+                            )
+
+        return entries
+
+    @staticmethod
+    def _scan_bandersnatch(root: Path) -> List[Tuple[str, Optional[str], str]]:
+        entries: List[Tuple[str, Optional[str], str]] = []
+        projects = set()
+
+        with os.scandir(root / "json") as files:
+            for f in files:
+                if not f.name.startswith(".") and f.is_file():
+                    entries.append((f.name, None, f"json/{f.name}"))
+                    projects.add(canonicalize_name(f.name))
+
+        # Older releases only wrote pypi/<project>/json
+        with os.scandir(root / "pypi") as dirs:
+            for d in dirs:
+                if (
+                    canonicalize_name(d.name) not in projects
+                    and d.is_dir()
+                    and os.path.isfile(os.path.join(d.path, "json"))
+                ):
+                    entries.append((d.name, None, f"pypi/{d.name}/json"))
+
+        return entries
+
+    @staticmethod
+    def build(entries: List[Tuple[str, Optional[str], str]]) -> bytes:
+        """Prepares the index data.
+
+        Args:
+            entries: The (project, version, path) tuples to index
+
+        Returns:
+            The index data
+        """
+        slots = 8
+        while slots < len(entries) * 2:
+            slots *= 2
+
+        table = [(0, 0)] * slots
+        records = bytearray()
+        base = _HEADER.size + _SLOT.size * slots
+
+        for name, version, path in entries:
+            key = _index_key(name, version)
+            data = path.encode("utf-8")
+            h = _hash(key)
+            slot = h % slots
+            while table[slot][1]:
+                slot = (slot + 1) % slots
+            table[slot] = (h, base + len(records))
+            records += _RECORD.pack(len(key), len(data)) + key + data
+
+        return b"".join(
+            [_HEADER.pack(_MAGIC, slots, len(entries))]
+            + [_SLOT.pack(*s) for s in table]
+            + [bytes(records)]
+        )
+
+    @staticmethod
+    def create(root: Path, path: Path = None) -> Path:
+        """Indexes a mirror and writes the index file.
+
+        Args:
+            root: The mirror's root directory
+            path: The index file (defaults to a file in the root directory)
+
+        Returns:
+            The index file
+        """
+        path = path or root / INDEX_FILE
+        data = MirrorIndex.build(MirrorIndex.scan(root))
+
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, str(path))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+        return path
+
+    def __len__(self) -> int:
+        """The number of indexed files."""
+        return self._entries  # noqa: DAR201
+
+    def lookup(self, name: str, version: Optional[str]) -> Optional[str]:
+        """Finds the metadata file for a package version.
+
+        Args:
+            name: The package name (it's canonicalised)
+            version: The package version (None for the project metadata)
+
+        Returns:
+            The file's path relative to the mirror root or None if it's not indexed
+        """
+        key = _index_key(name, version)
+        h = _hash(key)
+        slot = h % self._slots
+
+        for _ in range(self._slots):
+            slot_hash, offset = _SLOT.unpack_from(
+                self._buffer, _HEADER.size + _SLOT.size * slot
+            )
+            if not offset:
+                return None
+
+            if slot_hash == h:
+                key_len, path_len = _RECORD.unpack_from(self._buffer, offset)
+                start = offset + _RECORD.size
+                if self._buffer[start : start + key_len] == key:
+                    start += key_len
+                    return bytes(self._buffer[start : start + path_len]).decode("utf-8")
+
+            slot = (slot + 1) % self._slots
+
+        return None
+
+    def close(self) -> None:
+        """Releases the memory map (if there is one)."""
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
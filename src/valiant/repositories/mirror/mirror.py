@@ -0,0 +1,268 @@
+"""Serves package metadata from a local mirror.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import json
+import threading
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote, urlparse
+
+from valiant.log import get_logger
+from valiant.repositories import (
+    BaseAsyncRepository,
+    BaseRepository,
+    PackageNotFoundException,
+    RepositoryConfiguration,
+)
+from valiant.repositories.pypi import PyPiPackageMetadata
+
+from .index import INDEX_FILE, MirrorIndex
+
+
+log = get_logger()
+
+
+class LocalMirrorRepository(BaseRepository):
+    """A local directory of Warehouse-format JSON metadata.
+
+    This suits air-gapped environments and bulk audits - metadata is read
+    from disk and no network access is needed.
+
+    The `base_url` is the mirror's root directory (a path or a `file://` URL)
+    and the mirror uses the Warehouse JSON API layout or bandersnatch's JSON
+    layout (see `MirrorIndex`).
+
+    The mirror is indexed into a `.valiant-index` file in the root directory
+    on first use - delete the file to index a mirror again. Files added to
+    the mirror since it was indexed are still found but take a little longer.
+    """
+
+    def __init__(self, repository_configuration: RepositoryConfiguration):
+        """New instance.
+
+        Args:
+            repository_configuration: A RepositoryConfiguration instance
+        """
+        super().__init__(repository_configuration)
+        self._root = self.mirror_root(repository_configuration)
+        self._index: Optional[MirrorIndex] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def list_supported_repository_types(cls) -> List[str]:
+        """Lists the repository types support by this implementation."""
+        return ["local", "mirror"]  # noqa: DAR201
+
+    @staticmethod
+    def mirror_root(repository_configuration: RepositoryConfiguration) -> Path:
+        """The mirror's root directory.
+
+        Args:
+            repository_configuration: The repository config
+
+        Returns:
+            The directory set by the `base_url`
+        """
+        url = repository_configuration.base_url
+        if url.startswith("file:"):
+            return Path(unquote(urlparse(url).path))
+        return Path(url).expanduser()
+
+    @property
+    def index(self) -> MirrorIndex:
+        """The mirror's index - created if the mirror hasn't been indexed.
+
+        Returns:
+            The index
+
+        Raises:
+            PackageNotFoundException: If the mirror directory doesn't exist
+        """
+        with self._lock:
+            if self._index is None:
+                if not self._root.is_dir():
+                    raise PackageNotFoundException(
+                        f"The mirror directory ({self._root}) does not exist"
+                    )
+
+                path = self._root / INDEX_FILE
+                if path.is_file():
+                    try:
+                        self._index = MirrorIndex.open(path)
+                    except ValueError as e:
+                        log.warning(
+                            "Ignoring an unreadable mirror index",
+                            path=str(path),
+                            error=str(e),
+                        )
+
+                if self._index is None:
+                    self._index = self._create_index()
+
+            return self._index
+
+    def _create_index(self) -> MirrorIndex:
+        try:
+            path = MirrorIndex.create(self._root)
+        except OSError as e:
+            # A read-only mirror is indexed in memory instead
+            log.warning(
+                "Unable to write the mirror index",
+                repository_url=self.repository_configuration.base_url,
+                error=str(e),
+            )
+            return MirrorIndex(MirrorIndex.build(MirrorIndex.scan(self._root)))
+
+        index = MirrorIndex.open(path)
+        log.info(
+            "Mirror indexed",
+            repository_url=self.repository_configuration.base_url,
+            entries=len(index),
+        )
+        return index
+
+    def _find(self, name: str, version: Optional[str]) -> Optional[Path]:
+        entry = self.index.lookup(name, version)
+        if entry:
+            return self._root / entry
+
+        # Look for files added after the mirror was indexed
+        for candidate in MirrorIndex.candidates(self._root, name, version):
+            if candidate.is_file():
+                return candidate
+
+        return None
+
+    def _load(self, name: str, version: str) -> Dict[Any, Any]:
+        path = self._find(name, version)
+        if path:
+            return json.loads(path.read_bytes())
+
+        # A project's metadata describes its latest version
+        path = self._find(name, None)
+        if path:
+            data = json.loads(path.read_bytes())
+            if data.get("info", {}).get("version") == version:
+                return data
+
+        log.error(
+            "Package not found",
+            package_name=name,
+            package_version=version,
+            repository_url=self.repository_configuration.base_url,
+        )
+        raise PackageNotFoundException(
+            f"No result for {name} {version} in the mirror at {self._root}"
+        )
+
+    def show(self, name: str, version: str) -> PyPiPackageMetadata:
+        """Provides details for a specific package version.
+
+        Args:
+            name: The package name
+            version: The package version
+
+        Returns:
+            A package instance if it can be located.
+
+        Raises:
+            PackageNotFoundException: When the package cannot be found
+            ValidationError: The package metadata could not be parsed. # noqa: DAR402
+        """
+        try:
+            data = self._load(name, version)
+        except (OSError, ValueError) as e:
+            raise PackageNotFoundException(f"Failed to access package metadata: {e}")
+
+        log.info(
+            "Package found",
+            package_name=name,
+            package_version=version,
+            repository_url=self.repository_configuration.base_url,
+        )
+        return PyPiPackageMetadata(
+            repository_url=self.repository_configuration.base_url, package_data=data
+        )
+
+    def download(self, name: str, version: str) -> Path:
+        """Provides details for a specific package version.
+
+        Args:
+            name: The package name
+            version: The package version
+
+        # noqa: DAR202
+        Returns:
+            The path to the download if the artifact can be located.
+
+        Raises:
+            NotImplementedError: Because this is an abstract implementation.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Releases the index."""
+        with self._lock:
+            if self._index:
+                self._index.close()
+                self._index = None
+
+
+class AsyncLocalMirrorRepository(BaseAsyncRepository):
+    """The asyncio interface to a `LocalMirrorRepository`.
+
+    Lookups read from the disk so they run in the event loop's default executor.
+    """
+
+    def __init__(self, repository_configuration: RepositoryConfiguration):
+        """New instance.
+
+        Args:
+            repository_configuration: A RepositoryConfiguration instance
+        """
+        super().__init__(repository_configuration)
+        self._mirror = LocalMirrorRepository(repository_configuration)
+
+    @classmethod
+    def list_supported_repository_types(cls) -> List[str]:
+        """Lists the repository types support by this implementation."""
+        return LocalMirrorRepository.list_supported_repository_types()  # noqa: DAR201
+
+    async def show(self, name: str, version: str) -> PyPiPackageMetadata:
+        """Provides details for a specific package version.
+
+        Args:
+            name: The package name
+            version: The package version
+
+        Returns:
+            A package instance if it can be located.
+
+        Raises:
+            PackageNotFoundException: When the package cannot be found # noqa: DAR402
+            ValidationError: The package metadata could not be parsed. # noqa: DAR402
+        """
+        return await self._run_blocking(self._mirror.show, name, version)
+
+    async def close(self) -> None:
+        """Releases the index."""
+        await self._run_blocking(self._mirror.close)
@@ -0,0 +1,423 @@
+"""Asyncio support for pypi.org.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import json
+
+from typing import Any, Dict, List, Optional
+
+from packaging.utils import canonicalize_name
+
+from valiant.log import get_logger
+from valiant.repositories import (
+    AsyncSingleFlight,
+    BaseAsyncRepository,
+    CachedMetadata,
+    MetadataCache,
+    MetadataStore,
+    PackageNotFoundException,
+    RepositoryConfiguration,
+    RepositoryException,
+    ValidationError,
+)
+from valiant.util.jsonstream import JsonSubtreeFilter
+
+from .model import PyPiPackageMetadata
+from .pypi import STREAM_CHUNK_SIZE, STREAM_SKIPPED_FIELDS, PyPiRepository
+
+
+log = get_logger()
+
+
+class AsyncPyPiRepository(BaseAsyncRepository):
+    """An asyncio client for the central Python repository.
+
+    This requires the optional `aiohttp` package (`pip install valiant[async]`).
+
+    The underlying HTTP session is created on first use and is tied to the
+    running event loop. Call `close` when you're done with the repository.
+    Metadata cache and store I/O runs in the loop's default executor.
+
+    Requests aren't sent through a `RequestScheduler`, so the repository's
+    `rate_limit`, retry and `adaptive_concurrency` settings don't apply -
+    the number of requests in flight is set by the caller (e.g. the
+    `concurrency` passed to `show_many`) and the connection pool size.
+
+    See: https://warehouse.readthedocs.io/api-reference/json/
+    """
+
+    def __init__(
+        self,
+        repository_configuration: RepositoryConfiguration,
+        metadata_cache: MetadataCache = None,
+        metadata_store: MetadataStore = None,
+    ):
+        """New instance.
+
+        Args:
+            repository_configuration: A RepositoryConfiguration instance
+            metadata_cache: Stores metadata responses between runs
+            metadata_store: Stores parsed metadata between runs
+        """
+        super().__init__(repository_configuration)
+        self._metadata_cache = metadata_cache
+        self._metadata_store = metadata_store
+        self._revalidating: Dict[str, Any] = {}
+        self._session: Optional[Any] = None
+        self._session_loop: Optional[Any] = None
+        self._projects: Dict[str, Dict[Any, Any]] = {}
+        self._flights: AsyncSingleFlight[Any] = AsyncSingleFlight()
+
+    @classmethod
+    def list_supported_repository_types(cls) -> List[str]:
+        """Lists the repository types support by this implementation."""
+        return PyPiRepository.list_supported_repository_types()  # noqa: DAR201
+
+    async def _get_session(self) -> Any:
+        import asyncio
+
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        if self._session and self._session_loop is not loop:
+            # Sessions can't be shared across event loops
+            if not self._session_loop.is_closed():  # type: ignore
+                await self._session.close()
+            self._session = None
+            self._revalidating = {}
+
+        if not self._session or self._session.closed:
+            conf = self.repository_configuration
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=conf.connection_pool_size,
+                    limit_per_host=conf.connection_pool_size,
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=conf.connect_timeout, sock_read=conf.read_timeout
+                ),
+                raise_for_status=False,
+            )
+            self._session_loop = loop
+
+        return self._session
+
+    async def _load_package_manifest(
+        self, name: str, version: str
+    ) -> PyPiPackageMetadata:
+        """Provides the metadata from the store or the JSON metadata.
+
+        Args:
+            name: The package name.
+            version: The package version.
+
+        Returns:
+            The package metadata.
+        """
+        conf = self.repository_configuration
+        url = PyPiRepository.manifest_url(conf, name, version)
+
+        metadata = await self._run_blocking(
+            PyPiRepository.load_stored_metadata,
+            conf,
+            url,
+            self._metadata_cache,
+            self._metadata_store,
+        )
+        if metadata:
+            self._log_found(name, version, cache_used=True, store_used=True)
+            return metadata
+
+        metadata = PyPiPackageMetadata(
+            repository_url=conf.base_url,
+            package_data=await self._load_json(url, name, version),
+        )
+        await self._run_blocking(
+            PyPiRepository.store_metadata,
+            conf,
+            url,
+            metadata,
+            self._metadata_cache,
+            self._metadata_store,
+        )
+        return metadata
+
+    async def _load_from_project(self, name: str, version: str) -> PyPiPackageMetadata:
+        """Provides version metadata by way of the project's metadata.
+
+        See `PyPiRepository._load_from_project`.
+
+        Args:
+            name: The package name.
+            version: The package version.
+
+        Returns:
+            The package metadata.
+        """
+        key = canonicalize_name(name)
+        project = self._projects.get(key)
+
+        if project is None:
+            url = PyPiRepository.project_url(self.repository_configuration, name)
+            project = self._projects.setdefault(
+                key,
+                await self._flights.do(
+                    (self.repository_configuration.name, key, None),
+                    lambda: self._load_json(url, name, None),
+                ),
+            )
+
+        if project.get("info", {}).get("version") == version:
+            log.info(
+                "Package version served from project metadata",
+                package_name=name,
+                package_version=version,
+                repository_url=self.repository_configuration.base_url,
+            )
+            return PyPiPackageMetadata(
+                repository_url=self.repository_configuration.base_url,
+                package_data=project,
+            )
+
+        return await self._load_package_manifest(name, version)
+
+    async def _load_json(
+        self, url: str, name: str, version: Optional[str]
+    ) -> Dict[Any, Any]:
+        """Provides JSON metadata from the metadata cache or the repository.
+
+        See `PyPiRepository._load_json`.
+
+        Args:
+            url: The metadata URL
+            name: The package name.
+            version: The package version (None for project metadata).
+
+        Returns:
+            The JSON-based metadata.
+
+        Raises:
+            PackageNotFoundException: When the package is known to be missing.
+        """
+        import asyncio
+
+        cache = self._metadata_cache
+
+        if cache and await self._run_blocking(
+            cache.is_missing,
+            self.repository_configuration.name,
+            canonicalize_name(name),
+            version,
+        ):
+            log.info(
+                "Package known to be missing",
+                package_name=name,
+                package_version=version,
+                repository_url=self.repository_configuration.base_url,
+            )
+            raise PackageNotFoundException(
+                f"No result for {name} {version or ''} (cached)"
+            )
+
+        cache_key = PyPiRepository.metadata_cache_key(
+            self.repository_configuration, url
+        )
+        cached = await self._run_blocking(cache.get, cache_key) if cache else None
+
+        if cache and cached:
+            if cache.is_fresh(cached):
+                cache.record_hit()
+                self._log_found(name, version, cache_used=True)
+                return self._parse_json(cached.json())
+
+            if cache.stale_while_revalidate:
+                cache.record_hit()
+                if url not in self._revalidating:
+                    task = asyncio.ensure_future(
+                        self._revalidate(url, cached, name, version)
+                    )
+                    self._revalidating[url] = task
+                    task.add_done_callback(lambda _: self._revalidating.pop(url, None))
+                self._log_found(name, version, cache_used=True, stale=True)
+                return self._parse_json(cached.json())
+
+        return await self._fetch_json(url, name, version, cached)
+
+    async def _fetch_json(
+        self,
+        url: str,
+        name: str,
+        version: Optional[str],
+        cached: Optional[CachedMetadata] = None,
+    ) -> Dict[Any, Any]:
+        """Downloads JSON metadata from the repository.
+
+        Args:
+            url: The metadata URL
+            name: The package name.
+            version: The package version (None for project metadata).
+            cached: A cached response to revalidate
+
+        Returns:
+            The JSON-based metadata.
+
+        Raises:
+            PackageNotFoundException: When the URL doesn't work.
+        """
+        session = await self._get_session()
+        headers = cached.conditional_headers() if cached else {}
+        cache_key = PyPiRepository.metadata_cache_key(
+            self.repository_configuration, url
+        )
+
+        async with session.get(url, headers=headers) as r:
+            if r.status == 304 and cached:
+                await self._run_blocking(
+                    self._metadata_cache.touch, cache_key  # type: ignore
+                )
+                self._log_found(name, version, cache_used=True, revalidated=True)
+                return self._parse_json(cached.json())
+
+            if r.status != 200:
+                log.error(
+                    "Package not found",
+                    package_name=name,
+                    package_version=version,
+                    repository_url=self.repository_configuration.base_url,
+                    status_code=r.status,
+                )
+                if self._metadata_cache and r.status in (404, 410):
+                    await self._run_blocking(
+                        self._metadata_cache.put_missing,
+                        self.repository_configuration.name,
+                        canonicalize_name(name),
+                        version,
+                        r.status,
+                    )
+                raise PackageNotFoundException(f"No result for {url}")
+
+            if self.repository_configuration.stream_metadata:
+                stream = JsonSubtreeFilter(STREAM_SKIPPED_FIELDS)
+                async for chunk in r.content.iter_chunked(STREAM_CHUNK_SIZE):
+                    stream.feed(chunk)
+                body = stream.close().encode("utf-8")
+            else:
+                body = await r.read()
+
+        if self._metadata_cache:
+            entry = await self._run_blocking(
+                self._metadata_cache.put, cache_key, body, r.headers
+            )
+            self._log_found(
+                name,
+                version,
+                cache_used=False,
+                revalidated=False,
+                last_serial=entry.last_serial,
+            )
+        else:
+            self._log_found(name, version, cache_used=False)
+
+        return self._parse_json(json.loads(body))
+
+    async def _revalidate(
+        self, url: str, cached: CachedMetadata, name: str, version: Optional[str]
+    ) -> None:
+        try:
+            await self._fetch_json(url, name, version, cached)
+        except Exception as e:
+            log.warning(
+                "Background revalidation failed",
+                package_name=name,
+                package_version=version,
+                repository_url=self.repository_configuration.base_url,
+                error=str(e),
+            )
+
+    @staticmethod
+    def _parse_json(data: Optional[Dict[Any, Any]]) -> Dict[Any, Any]:
+        if data is None:
+            raise RepositoryException("The JSON response was empty.")
+
+        return data
+
+    def _log_found(
+        self, name: str, version: Optional[str], cache_used: bool, **kwargs: Any
+    ) -> None:
+        log.info(
+            "Package found",
+            package_name=name,
+            package_version=version,
+            repository_url=self.repository_configuration.base_url,
+            cache_enabled=self._metadata_cache is not None,
+            cache_used=cache_used,
+            **kwargs,
+        )
+
+    async def show(self, name: str, version: str) -> PyPiPackageMetadata:
+        """Provides details for a specific package version.
+
+        Args:
+            name: The package name
+            version: The package version
+
+        Returns:
+            A package instance if it can be located.
+
+        Raises:
+            PackageNotFoundException: When the package cannot be found
+            ValidationError: The package metadata could not be parsed. # noqa: DAR402
+        """
+        # Concurrent lookups for the same package version share one request
+        return await self._flights.do(
+            (self.repository_configuration.name, canonicalize_name(name), version),
+            lambda: self._show(name, version),
+        )
+
+    async def _show(self, name: str, version: str) -> PyPiPackageMetadata:
+        import asyncio
+
+        import aiohttp
+
+        try:
+            if self.repository_configuration.metadata_fetch_mode == "project":
+                return await self._load_from_project(name, version)
+            return await self._load_package_manifest(name, version)
+        except ValidationError:
+            raise
+        except (
+            PackageNotFoundException,
+            RepositoryException,
+            aiohttp.ClientError,
+            asyncio.TimeoutError,
+        ) as e:
+            raise PackageNotFoundException(f"Failed to access package metadata: {e}")
+
+    async def close(self) -> None:
+        """Waits for any background revalidation then closes the HTTP session."""
+        import asyncio
+
+        if self._revalidating:
+            await asyncio.gather(*self._revalidating.values())
+
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
@@ -25,8 +25,10 @@ returned by the PyPi API.
 
 See: https://warehouse.readthedocs.io/api-reference/json/
 """
+from dataclasses import asdict, field, fields
 from datetime import datetime
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
 import marshmallow
 
@@ -65,7 +67,6 @@ class Info:
     author_email: str
     bugtrack_url: Optional[str]
     classifiers: List[str]
-    description: str
     description_content_type: Optional[str]
     docs_url: Optional[str]
     download_url: Optional[str]
@@ -87,6 +88,7 @@ class Info:
     version: str
     yanked: Optional[bool]
     # yanked_reason: Optional[str]
+    description: Optional[str] = None
 
     class Meta:
         """Marshmallow meta class."""
@@ -156,13 +158,76 @@ class PyPiPackage:
 
     info: Info
     last_serial: int
-    releases: Dict[str, List[Release]]
     urls: List[ArtifactUrl]
+    releases: Dict[str, List[Release]] = field(default_factory=dict)
+
+
+@lru_cache(maxsize=None)
+def pypi_package_core_schema() -> marshmallow.Schema:
+    """The schema for loading PyPiPackage instances without the bulky fields.
+
+    Building the schema is costly so a single instance is shared. The
+    `releases` map and `info.description` are skipped - these are loaded on
+    request by `PyPiPackageMetadata`.
+
+    Returns:
+        A PyPiPackage schema instance
+    """
+    return class_schema(PyPiPackage)(
+        exclude=("releases", "info.description"), unknown=marshmallow.EXCLUDE
+    )
+
+
+@lru_cache(maxsize=None)
+def pypi_release_schema() -> marshmallow.Schema:
+    """The schema for loading Release instances.
+
+    Returns:
+        A Release schema instance
+    """
+    return class_schema(Release)()
+
+
+@lru_cache(maxsize=None)
+def pypi_model_version() -> str:
+    """Identifies the version of the data model.
+
+    The version changes whenever a field is added, removed or retyped and is
+    used to invalidate stored records (see `PyPiPackageMetadata.to_record`).
+
+    Returns:
+        A short digest of the model's fields
+    """
+    import hashlib
+
+    signature = [
+        (cls.__name__, f.name, str(f.type))
+        for cls in (PyPiPackage, Info, Downloads, ArtifactUrl, Release)
+        for f in fields(cls)
+    ]
+    return hashlib.sha256(repr(signature).encode("utf-8")).hexdigest()[:12]
+
+
+def _plain(value: Any) -> Any:
+    """Converts datetimes so that a structure can be stored by `marshal`."""
+    if isinstance(value, datetime):  # noqa: DAR101,DAR201
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return value
 
 
 @dataclass
 class PyPiPackageMetadata(PackageMetadata):
-    """Provides the required PackageMetadata interface for a PyPiPackage."""
+    """Provides the required PackageMetadata interface for a PyPiPackage.
+
+    Only the `info` (less the description) and `urls` entries are validated
+    when an instance is created. The description and the (often very large)
+    `releases` map are loaded when first requested and the artifacts and
+    requirements are prepared on first use.
+    """
 
     def __init__(self, repository_url: str, package_data: Dict):
         """Constructor.
@@ -175,50 +240,141 @@ class PyPiPackageMetadata(PackageMetadata):
         Raises:
             ValidationError: when the data could not be correctly mapped.
         """
-        self._repository_url = repository_url
-        self._parsed_classifiers: Optional[List[Classifier]] = None
-        self._artifacts: List[ArtifactMetadata] = []
-
         try:
-            schema = class_schema(PyPiPackage)()
-            self._pkg = schema.load(package_data)
+            pkg = pypi_package_core_schema().load(package_data)
         except marshmallow.exceptions.ValidationError as ve:
             raise ValidationError(f"Could not validate the JSON data: {ve}") from ve
 
-        self._requires_dist: Dict[str, List[Requirement]] = {}
-        if self._pkg.info.requires_dist:
-            for item in self._pkg.info.requires_dist:
-                req = Requirement(item)
-                if req.name not in self._requires_dist:
-                    self._requires_dist[req.name] = [req]
-                else:
-                    self._requires_dist[req.name].append(req)
-
-        # Process the urls into artifacts
-        for entry in self._pkg.urls:
-            self._artifacts.append(
-                ArtifactMetadataImpl(
-                    comment_text=entry.comment_text,
-                    digests=entry.digests,
-                    sha256_digest=entry.digests.get("sha256", None),
-                    signed=entry.has_sig,
-                    signature_url=f"{entry.url}.asc",
-                    package_type=entry.packagetype,
-                    python_version=entry.python_version,
-                    requires_python=entry.requires_python,
-                    size=entry.size,
-                    upload_time_iso_8601=entry.upload_time_iso_8601,
-                    url=entry.url,
-                )
+        # Only hold on to the parts of the raw data that are loaded later
+        self._setup(
+            repository_url,
+            pkg,
+            package_data["info"].get("description"),
+            package_data.get("releases") or {},
+        )
+
+    def _setup(
+        self,
+        repository_url: str,
+        pkg: PyPiPackage,
+        raw_description: Any,
+        raw_releases: Dict[str, Any],
+    ) -> None:
+        self._repository_url = repository_url
+        self._parsed_classifiers: Optional[List[Classifier]] = None
+        self._artifacts: Optional[List[ArtifactMetadata]] = None
+        self._requires_dist: Optional[Dict[str, List[Requirement]]] = None
+        self._releases: Optional[Dict[str, List[Release]]] = None
+        self._pkg = pkg
+        self._raw_description = raw_description
+        self._raw_releases = raw_releases
+
+    def to_record(self) -> Dict[str, Any]:
+        """Provides the validated metadata as a plain structure for storage.
+
+        The structure only holds types that `marshal` can encode.
+
+        Returns:
+            The record (see `from_record`)
+        """
+        info = asdict(self._pkg.info)
+        info["description"] = self._raw_description
+        if self._pkg.info.description is not None:
+            info["description"] = self._pkg.info.description
+
+        releases = self._raw_releases
+        if self._releases is not None:
+            releases = {v: [asdict(r) for r in f] for v, f in self._releases.items()}
+
+        return _plain(
+            {
+                "info": info,
+                "last_serial": self._pkg.last_serial,
+                "urls": [asdict(u) for u in self._pkg.urls],
+                "releases": releases,
+            }
+        )
+
+    @classmethod
+    def from_record(
+        cls, repository_url: str, record: Dict[str, Any]
+    ) -> "PyPiPackageMetadata":
+        """Creates an instance from a record without validating it again.
+
+        Args:
+            repository_url: The URL for the repo that provided this metadata.
+            record: A record prepared by `to_record` for the current model version
+
+        Returns:
+            A new instance
+        """
+        info = dict(record["info"])
+        description = info.pop("description")
+        info["downloads"] = Downloads(**info["downloads"])
+
+        urls = []
+        for entry in record["urls"]:
+            url = dict(entry)
+            url["upload_time"] = datetime.fromisoformat(url["upload_time"])
+            url["upload_time_iso_8601"] = datetime.fromisoformat(
+                url["upload_time_iso_8601"]
             )
+            urls.append(ArtifactUrl(**url))
+
+        pkg = PyPiPackage(
+            info=Info(**info), last_serial=record["last_serial"], urls=urls
+        )
+
+        metadata = cls.__new__(cls)
+        metadata._setup(repository_url, pkg, description, record["releases"])
+        return metadata
 
     @property
     def name(self) -> str:  # noqa: D102
         return self._pkg.info.name
 
     @property
-    def description(self) -> str:  # noqa: D102
-        return self._pkg.info.description
+    def description(self) -> str:
+        """The package description - loaded on first request.
+
+        Returns:
+            The description text
+
+        Raises:
+            ValidationError: when the description isn't text
+        """
+        if self._pkg.info.description is None and self._raw_description is not None:
+            if not isinstance(self._raw_description, str):
+                raise ValidationError("Could not validate the package description.")
+            self._pkg.info.description = self._raw_description
+            self._raw_description = None
+
+        return self._pkg.info.description or ""
+
+    @property
+    def releases(self) -> Dict[str, List[Release]]:
+        """The files for each of the package's releases - loaded on first request.
+
+        Returns:
+            A dictionary of releases files with the version as key
+
+        Raises:
+            ValidationError: when the releases data could not be correctly mapped.
+        """
+        if self._releases is None:
+            schema = pypi_release_schema()
+            try:
+                self._releases = {
+                    version: schema.load(files, many=True)
+                    for version, files in self._raw_releases.items()
+                }
+            except (marshmallow.exceptions.ValidationError, AttributeError) as ve:
+                raise ValidationError(
+                    f"Could not validate the releases data: {ve}"
+                ) from ve
+            self._raw_releases = {}
+
+        return self._releases
 
     @property
     def summary(self) -> str:  # noqa: D102
@@ -313,6 +469,12 @@ class PyPiPackageMetadata(PackageMetadata):
             A dictionary of parsed Requirements with the requirement name as key
             See: (https://packaging.pypa.io/en/latest/requirements/)
         """
+        if self._requires_dist is None:
+            self._requires_dist = {}
+            for item in self._pkg.info.requires_dist or []:
+                req = Requirement(item)
+                self._requires_dist.setdefault(req.name, []).append(req)
+
         return self._requires_dist
 
     @property
@@ -351,4 +513,22 @@ class PyPiPackageMetadata(PackageMetadata):
         Returns:
             A dictionary of parsed Requirements with the requirement name as key
         """
+        if self._artifacts is None:
+            self._artifacts = [
+                ArtifactMetadataImpl(
+                    comment_text=entry.comment_text,
+                    digests=entry.digests,
+                    sha256_digest=entry.digests.get("sha256", None),
+                    signed=entry.has_sig,
+                    signature_url=f"{entry.url}.asc",
+                    package_type=entry.packagetype,
+                    python_version=entry.python_version,
+                    requires_python=entry.requires_python,
+                    size=entry.size,
+                    upload_time_iso_8601=entry.upload_time_iso_8601,
+                    url=entry.url,
+                )
+                for entry in self._pkg.urls
+            ]
+
         return self._artifacts
@@ -19,26 +19,58 @@ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
 IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
+import json
 import sys
+import threading
+import zipfile
 
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import requests
 
+from packaging.utils import canonicalize_name
+
 from valiant.log import get_logger
+from valiant.package import ArtifactMetadata
 from valiant.repositories import (
+    ArtifactDownloader,
     BaseRepository,
+    CachedMetadata,
+    MetadataCache,
+    MetadataStore,
     PackageNotFoundException,
     RepositoryConfiguration,
     RepositoryException,
+    RequestScheduler,
+    SingleFlight,
+    ValidationError,
+    create_download_session,
+    create_session,
 )
+from valiant.repositories.archive import open_artifact
+from valiant.repositories.downloader import default_downloader
+from valiant.repositories.scheduler import RETRY_STATUSES
+from valiant.util.jsonstream import filter_json
 
-from .model import PyPiPackageMetadata
+from .model import PyPiPackageMetadata, pypi_model_version
 
 
 log = get_logger()
 
+STREAM_CHUNK_SIZE = 64 * 1024
+"""The size of the chunks read from streamed responses."""
+
+STREAM_SKIPPED_FIELDS = {("info", "description"): "null", ("releases", "*"): "[]"}
+"""The values dropped from streamed responses, with the JSON put in their place.
+
+The version keys of the `releases` map are kept but not their file lists.
+"""
+
+METADATA_STORE_NAMESPACE = "pypi"
+"""The metadata store namespace for parsed PyPi metadata."""
+
 
 class PyPiRepository(BaseRepository):
     """The central Python repository.
@@ -48,64 +80,524 @@ class PyPiRepository(BaseRepository):
     See: https://warehouse.readthedocs.io/api-reference/json/
     """
 
+    def __init__(
+        self,
+        repository_configuration: RepositoryConfiguration,
+        metadata_cache: MetadataCache = None,
+        metadata_store: MetadataStore = None,
+        downloader: ArtifactDownloader = None,
+    ):
+        """New instance.
+
+        Each instance holds its own pooled HTTP session so that connections
+        to the repository are kept alive and reused across lookups.
+
+        When the configuration's `metadata_fetch_mode` is `project`, the
+        instance also holds each project's metadata for reuse across versions.
+
+        Responses are stored in the metadata cache (if provided) and
+        revalidated with conditional requests once they expire. The parsed
+        metadata is kept in the metadata store (if provided, along with the
+        cache) and used for as long as the cached response stays fresh.
+
+        Args:
+            repository_configuration: A RepositoryConfiguration instance
+            metadata_cache: Stores metadata responses between runs
+            metadata_store: Stores parsed metadata between runs
+            downloader: Downloads artifacts into the artifact cache
+        """
+        super().__init__(repository_configuration)
+        self._metadata_cache = metadata_cache
+        self._metadata_store = metadata_store
+        self._downloader = downloader or default_downloader()
+        self._download_session: Optional[requests.Session] = None
+        self._scheduler = RequestScheduler.for_configuration(repository_configuration)
+        self._session: requests.Session = create_session(
+            repository_configuration, scheduler=self._scheduler
+        )
+        self._revalidator: Optional[ThreadPoolExecutor] = None
+        self._revalidating: Dict[str, Future] = {}
+        self._projects: Dict[str, Dict[Any, Any]] = {}
+        self._fetch_stats: Dict[str, int] = {"lookups": 0, "requests": 0}
+        self._lock = threading.Lock()
+        self._flights: SingleFlight[Any] = SingleFlight()
+
+    @property
+    def session(self) -> requests.Session:
+        """The HTTP session used to access the repository."""
+        return self._session  # noqa: DAR201
+
+    @property
+    def scheduler(self) -> RequestScheduler:
+        """Paces and retries the requests sent to the repository."""
+        return self._scheduler  # noqa: DAR201
+
+    @property
+    def fetch_stats(self) -> Dict[str, int]:
+        """Counts the lookups, requests and requests saved by this instance.
+
+        Lookups that shared an in-flight request are counted as `coalesced`.
+
+        Returns:
+            A dict of counters
+        """
+        with self._lock:
+            stats = dict(self._fetch_stats)
+        stats["coalesced"] = self._flights.coalesced
+        stats["requests_saved"] = stats["lookups"] - stats["requests"]
+        return stats
+
     @classmethod
     def list_supported_repository_types(cls) -> List[str]:
         """Lists the repository types support by this implementation."""
         return ["warehouse", "pypi"]  # noqa: DAR201
 
-    def _load_package_manifest(self, name: str, version: str) -> Dict[Any, Any]:
-        """Downloads the JSON metadata from the repository.
+    @staticmethod
+    def manifest_url(
+        repository_configuration: RepositoryConfiguration, name: str, version: str
+    ) -> str:
+        """The URL for a package version's JSON metadata.
 
         Args:
+            repository_configuration: The repository config
             name: The package name.
             version: The package version.
 
         Returns:
-            The JSON-based metadata (as a string).
+            The URL (including any access credentials)
+        """
+        return f"{repository_configuration.get_access_url()}/{name}/{version}/json"
 
-        Raises:
-            PackageNotFoundException: When the URL doesn't work.
-            RepositoryException: If the JSON data is empty(None)
+    @staticmethod
+    def project_url(
+        repository_configuration: RepositoryConfiguration, name: str
+    ) -> str:
+        """The URL for a project's JSON metadata (covering all versions).
+
+        Args:
+            repository_configuration: The repository config
+            name: The package name.
+
+        Returns:
+            The URL (including any access credentials)
         """
-        url = f"{self.repository_configuration.get_access_url()}/{name}/{version}/json"
+        return f"{repository_configuration.get_access_url()}/{name}/json"
 
-        r = requests.get(url)
-        if r.status_code != requests.codes.ok:
-            log.error(
-                "Package not found",
-                package_name=name,
-                package_version=version,
-                repository_url=self.repository_configuration.base_url,
-                status_code=r.status_code,
+    @staticmethod
+    def metadata_cache_key(
+        repository_configuration: RepositoryConfiguration, url: str
+    ) -> str:
+        """The metadata cache key for a URL.
+
+        Streamed responses are trimmed so they're cached separately.
+
+        Args:
+            repository_configuration: The repository config
+            url: The metadata URL
+
+        Returns:
+            The cache key
+        """
+        if repository_configuration.stream_metadata:
+            return f"{url}#stream"
+        return url
+
+    @staticmethod
+    def load_stored_metadata(
+        repository_configuration: RepositoryConfiguration,
+        url: str,
+        metadata_cache: Optional[MetadataCache],
+        metadata_store: Optional[MetadataStore],
+    ) -> Optional[PyPiPackageMetadata]:
+        """Provides metadata from the metadata store, skipping the parsing.
+
+        Stored metadata is only used whilst the cached response it was
+        parsed from is fresh.
+
+        Args:
+            repository_configuration: The repository config
+            url: The metadata URL
+            metadata_cache: The metadata cache
+            metadata_store: The metadata store
+
+        Returns:
+            The metadata or None if there's no usable record
+        """
+        if not (metadata_cache and metadata_store):
+            return None
+
+        entry = metadata_cache.get(
+            PyPiRepository.metadata_cache_key(repository_configuration, url),
+            with_body=False,
+        )
+        if not entry or not metadata_cache.is_fresh(entry):
+            return None
+
+        record = metadata_store.get(
+            METADATA_STORE_NAMESPACE,
+            pypi_model_version(),
+            repository_configuration.name,
+            entry.url,
+            entry.source_tag,
+        )
+        if record is None:
+            return None
+
+        metadata_cache.record_hit()
+        return PyPiPackageMetadata.from_record(
+            repository_configuration.base_url, record
+        )
+
+    @staticmethod
+    def store_metadata(
+        repository_configuration: RepositoryConfiguration,
+        url: str,
+        metadata: PyPiPackageMetadata,
+        metadata_cache: Optional[MetadataCache],
+        metadata_store: Optional[MetadataStore],
+    ) -> None:
+        """Puts parsed metadata in the metadata store.
+
+        Args:
+            repository_configuration: The repository config
+            url: The metadata URL
+            metadata: The metadata parsed from the cached response
+            metadata_cache: The metadata cache
+            metadata_store: The metadata store
+        """
+        if not (metadata_cache and metadata_store):
+            return
+
+        entry = metadata_cache.get(
+            PyPiRepository.metadata_cache_key(repository_configuration, url),
+            with_body=False,
+        )
+        if not entry:
+            return
+
+        try:
+            metadata_store.put(
+                METADATA_STORE_NAMESPACE,
+                pypi_model_version(),
+                repository_configuration.name,
+                entry.url,
+                entry.source_tag,
+                metadata.to_record(),
+            )
+        except (OSError, ValueError) as e:
+            log.warning(
+                "Failed to store the package metadata",
+                package_name=metadata.name,
+                package_version=metadata.version,
+                repository_url=repository_configuration.base_url,
+                error=str(e),
             )
-            raise PackageNotFoundException(f"No result for {url}")
 
-        if hasattr(r, "cache_used"):
-            log.info(
-                "Package found",
-                package_name=name,
-                package_version=version,
-                repository_url=self.repository_configuration.base_url,
-                cache_enabled=True,
-                cache_used=r.cache_used,  # type: ignore
+    def _load_package_manifest(self, name: str, version: str) -> PyPiPackageMetadata:
+        """Provides the metadata from the store or the JSON metadata.
+
+        Args:
+            name: The package name.
+            version: The package version.
+
+        Returns:
+            The package metadata.
+        """
+        conf = self.repository_configuration
+        url = self.manifest_url(conf, name, version)
+
+        metadata = self.load_stored_metadata(
+            conf, url, self._metadata_cache, self._metadata_store
+        )
+        if metadata:
+            self._log_found(name, version, cache_used=True, store_used=True)
+            return metadata
+
+        metadata = PyPiPackageMetadata(
+            repository_url=conf.base_url,
+            package_data=self._load_json(url, name, version),
+        )
+        self.store_metadata(
+            conf, url, metadata, self._metadata_cache, self._metadata_store
+        )
+        return metadata
+
+    def _load_project_manifest(self, name: str) -> Dict[Any, Any]:
+        """Provides a project's JSON metadata, downloading it only once.
+
+        Args:
+            name: The package name.
+
+        Returns:
+            The JSON-based metadata for the project's latest version
+            along with the list of all releases.
+        """
+        key = canonicalize_name(name)
+
+        with self._lock:
+            data = self._projects.get(key)
+
+        if data is None:
+            url = self.project_url(self.repository_configuration, name)
+            data = self._flights.do(
+                (self.repository_configuration.name, key, None),
+                lambda: self._load_json(url, name, None),
             )
-        else:
+            with self._lock:
+                data = self._projects.setdefault(key, data)
+
+        return data
+
+    def _load_json(
+        self, url: str, name: str, version: Optional[str] = None
+    ) -> Dict[Any, Any]:
+        """Provides JSON metadata from the metadata cache or the repository.
+
+        Args:
+            url: The metadata URL
+            name: The package name.
+            version: The package version (None for project metadata).
+
+        Returns:
+            The JSON-based metadata.
+
+        Raises:
+            PackageNotFoundException: When the package is known to be missing.
+        """
+        cache = self._metadata_cache
+
+        if cache and cache.is_missing(
+            self.repository_configuration.name, canonicalize_name(name), version
+        ):
             log.info(
-                "Package found",
+                "Package known to be missing",
                 package_name=name,
                 package_version=version,
                 repository_url=self.repository_configuration.base_url,
-                cache_enabled=False,
+            )
+            raise PackageNotFoundException(
+                f"No result for {name} {version or ''} (cached)"
+            )
+
+        cache_key = self.metadata_cache_key(self.repository_configuration, url)
+        cached = cache.get(cache_key) if cache else None
+
+        if cache and cached:
+            if cache.is_fresh(cached):
+                cache.record_hit()
+                self._log_found(name, version, cache_used=True)
+                return self._parse_json(cached.json())
+
+            if cache.stale_while_revalidate:
+                cache.record_hit()
+                self._revalidate_in_background(url, cached, name, version)
+                self._log_found(name, version, cache_used=True, stale=True)
+                return self._parse_json(cached.json())
+
+        return self._fetch_json(url, name, version, cached)
+
+    def _fetch_json(
+        self,
+        url: str,
+        name: str,
+        version: Optional[str],
+        cached: Optional[CachedMetadata] = None,
+    ) -> Dict[Any, Any]:
+        """Downloads JSON metadata from the repository.
+
+        Args:
+            url: The metadata URL
+            name: The package name.
+            version: The package version (None for project metadata).
+            cached: A cached response to revalidate
+
+        Returns:
+            The JSON-based metadata.
+
+        Raises:
+            PackageNotFoundException: When the URL doesn't work.
+        """
+        with self._lock:
+            self._fetch_stats["requests"] += 1
+
+        stream = self.repository_configuration.stream_metadata
+        cache_key = self.metadata_cache_key(self.repository_configuration, url)
+        headers = cached.conditional_headers() if cached else {}
+        r = self._session.get(
+            url,
+            headers=headers,
+            timeout=self.repository_configuration.timeout,
+            stream=stream,
+        )
+
+        try:
+            if r.status_code == requests.codes.not_modified and cached:
+                self._metadata_cache.touch(cache_key)  # type: ignore
+                self._log_found(name, version, cache_used=True, revalidated=True)
+                return self._parse_json(cached.json())
+
+            if r.status_code in RETRY_STATUSES:
+                log.error(
+                    "Repository unavailable",
+                    package_name=name,
+                    package_version=version,
+                    repository_url=self.repository_configuration.base_url,
+                    status_code=r.status_code,
+                    **self._scheduler.stats,
+                )
+                raise RepositoryException(
+                    f"The repository is unavailable ({r.status_code}) for {url}"
+                )
+
+            if r.status_code != requests.codes.ok:
+                log.error(
+                    "Package not found",
+                    package_name=name,
+                    package_version=version,
+                    repository_url=self.repository_configuration.base_url,
+                    status_code=r.status_code,
+                )
+                if self._metadata_cache and r.status_code in (
+                    requests.codes.not_found,
+                    requests.codes.gone,
+                ):
+                    self._metadata_cache.put_missing(
+                        self.repository_configuration.name,
+                        canonicalize_name(name),
+                        version,
+                        r.status_code,
+                    )
+                raise PackageNotFoundException(f"No result for {url}")
+
+            if stream:
+                text = filter_json(
+                    r.iter_content(chunk_size=STREAM_CHUNK_SIZE), STREAM_SKIPPED_FIELDS
+                )
+                body = text.encode("utf-8")
+                data = json.loads(text)
+            else:
+                body = r.content if self._metadata_cache else b""
+                data = r.json()
+        finally:
+            if stream:
+                r.close()
+
+        if self._metadata_cache:
+            entry = self._metadata_cache.put(cache_key, body, r.headers)
+            self._log_found(
+                name,
+                version,
                 cache_used=False,
+                revalidated=False,
+                last_serial=entry.last_serial,
             )
+        else:
+            self._log_found(name, version, cache_used=getattr(r, "cache_used", None))
 
-        data = r.json()
+        return self._parse_json(data)
 
+    @staticmethod
+    def _parse_json(data: Optional[Dict[Any, Any]]) -> Dict[Any, Any]:
         if data is None:
             raise RepositoryException("The JSON response was empty.")
 
         return data
 
+    def _log_found(
+        self,
+        name: str,
+        version: Optional[str],
+        cache_used: Optional[bool],
+        **kwargs: Any,
+    ) -> None:
+        log.info(
+            "Package found",
+            package_name=name,
+            package_version=version,
+            repository_url=self.repository_configuration.base_url,
+            cache_enabled=self._metadata_cache is not None or cache_used is not None,
+            cache_used=bool(cache_used),
+            **kwargs,
+        )
+
+    def _revalidate_in_background(
+        self, url: str, cached: CachedMetadata, name: str, version: Optional[str]
+    ) -> None:
+        def revalidate() -> None:
+            try:
+                self._fetch_json(url, name, version, cached)
+            except Exception as e:
+                log.warning(
+                    "Background revalidation failed",
+                    package_name=name,
+                    package_version=version,
+                    repository_url=self.repository_configuration.base_url,
+                    error=str(e),
+                )
+            finally:
+                with self._lock:
+                    self._revalidating.pop(url, None)
+
+        with self._lock:
+            if url in self._revalidating:
+                return
+
+            if not self._revalidator:
+                self._revalidator = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="valiant-revalidate"
+                )
+
+            self._revalidating[url] = self._revalidator.submit(revalidate)
+
+    def wait_for_revalidation(self, timeout: float = None) -> None:
+        """Waits for any background revalidation to complete.
+
+        Args:
+            timeout: The maximum number of seconds to wait
+        """
+        with self._lock:
+            pending = list(self._revalidating.values())
+
+        wait(pending, timeout=timeout)
+
+    def _load_from_project(self, name: str, version: str) -> PyPiPackageMetadata:
+        """Provides version metadata by way of the project's metadata.
+
+        The project metadata describes the latest version in full but only
+        lists the files for other releases. Only the latest version is
+        answered from the project metadata - other versions (including any
+        the project doesn't list yet) still require their own request.
+
+        Args:
+            name: The package name.
+            version: The package version.
+
+        Returns:
+            The package metadata.
+        """
+        project = self._load_project_manifest(name)
+
+        if project.get("info", {}).get("version") == version:
+            self._log_project_reuse(name, version)
+            return PyPiPackageMetadata(
+                repository_url=self.repository_configuration.base_url,
+                package_data=project,
+            )
+
+        return self._load_package_manifest(name, version)
+
+    def _log_project_reuse(self, name: str, version: str) -> None:
+        stats = self.fetch_stats
+        log.info(
+            "Package version served from project metadata",
+            package_name=name,
+            package_version=version,
+            repository_url=self.repository_configuration.base_url,
+            lookups=stats["lookups"],
+            requests=stats["requests"],
+            requests_saved=stats["requests_saved"],
+        )
+
     def show(self, name: str, version: str) -> PyPiPackageMetadata:
         """Provides details for a specific package version.
 
@@ -120,30 +612,92 @@ class PyPiRepository(BaseRepository):
             PackageNotFoundException: When the package cannot be found
             ValidationError: The package metadata could not be parsed. # noqa: DAR402
         """
-        try:
-            data = self._load_package_manifest(name, version)
-        except (PackageNotFoundException, RepositoryException) as e:
-            raise PackageNotFoundException(f"Failed to access package metadata: {e}")
+        with self._lock:
+            self._fetch_stats["lookups"] += 1
 
-        return PyPiPackageMetadata(
-            repository_url=self.repository_configuration.base_url, package_data=data
+        # Concurrent lookups for the same package version share one request
+        metadata = self._flights.do(
+            (self.repository_configuration.name, canonicalize_name(name), version),
+            lambda: self._show(name, version),
         )
+        metadata.artifact_opener = self.open_artifact
+        return metadata
+
+    def _show(self, name: str, version: str) -> PyPiPackageMetadata:
+        try:
+            if self.repository_configuration.metadata_fetch_mode == "project":
+                return self._load_from_project(name, version)
+            return self._load_package_manifest(name, version)
+        except ValidationError:
+            raise
+        except (
+            PackageNotFoundException,
+            RepositoryException,
+            requests.RequestException,
+        ) as e:
+            raise PackageNotFoundException(f"Failed to access package metadata: {e}")
 
     def download(self, name: str, version: str) -> Path:
-        """Provides details for a specific package version.
+        """Downloads the preferred artifact for a package version.
+
+        Pure Python wheels are preferred, then source distributions. The
+        artifact is verified against its SHA-256 digest and kept in the
+        artifact cache - it isn't downloaded again.
 
         Args:
             name: The package name
             version: The package version
 
-        # noqa: DAR202
         Returns:
-            The path to the download if the artifact can be located.
+            The path to the downloaded artifact.
+        """
+        return self.download_many([(name, version)])[0]
 
-        Raises:
-            NotImplementedError: Because this is an abstract implementation.
+    def download_many(self, packages: Sequence[Tuple[str, str]]) -> List[Path]:
+        """Downloads the preferred artifacts for several package versions in parallel.
+
+        Args:
+            packages: A sequence of (name, version) tuples
+
+        Returns:
+            The paths to the downloads, in the same order as `packages`
         """
-        raise NotImplementedError
+        return self._downloader.fetch_packages(
+            self,
+            packages,
+            self.download_session,
+            timeout=self.repository_configuration.timeout,
+        )
+
+    def open_artifact(self, artifact: ArtifactMetadata) -> zipfile.ZipFile:
+        """Opens a zip-based artifact (such as a wheel) for inspection.
+
+        Only the archive's central directory and the members that are read
+        are fetched (using HTTP range requests). The artifact is downloaded
+        in full if the server doesn't support range requests.
+
+        Args:
+            artifact: The artifact
+
+        Returns:
+            The archive
+        """
+        return open_artifact(
+            artifact,
+            self.download_session,
+            timeout=self.repository_configuration.timeout,
+            downloader=self._downloader,
+        )
+
+    @property
+    def download_session(self) -> requests.Session:
+        """The (uncached) session used for artifacts."""
+        with self._lock:
+            if self._download_session is None:
+                self._download_session = create_download_session(
+                    self.repository_configuration, self._scheduler
+                )
+            return self._download_session  # noqa: DAR201
 
     @staticmethod
     def get_pypi_config() -> RepositoryConfiguration:
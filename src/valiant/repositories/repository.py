@@ -19,19 +19,26 @@ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
 IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
+import functools
+import zipfile
+
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import List
+from typing import Any, Callable, List, Sequence, Tuple, TypeVar
 
-from ..package import PackageMetadata
+from ..package import ArtifactMetadata, PackageMetadata
 from .config import RepositoryConfiguration
 
 
-class BaseRepository(ABC):
-    """Interface definition for repo functionality."""
+T = TypeVar("T")
+
+
+class _ConfiguredRepository(ABC):
+    """Functionality common to the sync and async repository interfaces."""
 
     def __init__(
-        self, repository_configuration: RepositoryConfiguration,
+        self,
+        repository_configuration: RepositoryConfiguration,
     ):
         """New instance.
 
@@ -74,6 +81,10 @@ class BaseRepository(ABC):
         """Lists the repository types support by this implementation."""
         return []  # noqa: DAR201
 
+
+class BaseRepository(_ConfiguredRepository):
+    """Interface definition for repo functionality."""
+
     @abstractmethod
     def show(self, name: str, version: str) -> PackageMetadata:
         """Provides details for a specific package version.
@@ -109,3 +120,104 @@ class BaseRepository(ABC):
             NotImplementedError: Because this is an abstract implementation.
         """
         raise NotImplementedError
+
+    def download_many(self, packages: Sequence[Tuple[str, str]]) -> List[Path]:
+        """Downloads the artifacts for several package versions.
+
+        Implementations may download the artifacts in parallel - this default
+        downloads them one at a time.
+
+        Args:
+            packages: A sequence of (name, version) tuples
+
+        Returns:
+            The paths to the downloads, in the same order as `packages`
+        """
+        return [self.download(name, version) for name, version in packages]
+
+    def open_artifact(self, artifact: ArtifactMetadata) -> zipfile.ZipFile:
+        """Opens a zip-based artifact (such as a wheel) for inspection.
+
+        Args:
+            artifact: The artifact
+
+        # noqa: DAR202
+        Returns:
+            The archive
+
+        Raises:
+            NotImplementedError: If the repository can't open artifacts.
+        """
+        raise NotImplementedError
+
+
+class BaseAsyncRepository(_ConfiguredRepository):
+    """Interface definition for asyncio-based repo functionality.
+
+    This is the async sibling of `BaseRepository` for use by applications
+    that already run inside an event loop.
+    """
+
+    @abstractmethod
+    async def show(self, name: str, version: str) -> PackageMetadata:
+        """Provides details for a specific package version.
+
+        Args:
+            name: The package name
+            version: The package version
+
+        # noqa: DAR202
+        Returns:
+            A package instance if it can be located.
+
+        Raises:
+            NotImplementedError: Because this is an abstract implementation.
+            PackageNotFoundException: When the package cannot be found. # noqa: DAR402
+            ValidationError: The package metadata could not be parsed. # noqa: DAR402
+        """
+        raise NotImplementedError
+
+    async def show_many(
+        self, packages: Sequence[Tuple[str, str]], concurrency: int = 10
+    ) -> List[PackageMetadata]:
+        """Provides details for a list of package versions.
+
+        Args:
+            packages: A sequence of (name, version) tuples
+            concurrency: The maximum number of lookups to run at once
+
+        Returns:
+            The package details in the same order as `packages`.
+        """
+        import asyncio
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def bounded_show(name: str, version: str) -> PackageMetadata:
+            async with semaphore:
+                return await self.show(name, version)
+
+        return list(
+            await asyncio.gather(
+                *[bounded_show(name, version) for name, version in packages]
+            )
+        )
+
+    async def close(self) -> None:
+        """Releases any resources (e.g. connections) held by the repository."""
+
+    @staticmethod
+    async def _run_blocking(function: Callable[..., T], *args: Any) -> T:
+        """Runs blocking (e.g. disk) I/O in the event loop's default executor.
+
+        Args:
+            function: The blocking function
+            args: The function's arguments
+
+        Returns:
+            The function's result
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(function, *args))
@@ -0,0 +1,321 @@
+"""Rate limiting and retries for repository requests.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import random
+import threading
+import time
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+from valiant.log import get_logger
+
+from .concurrency import AdaptiveConcurrency
+from .config import RepositoryConfiguration, strip_credentials
+
+
+log = get_logger()
+
+RETRY_STATUSES = frozenset((429, 502, 503, 504))
+"""Responses that are retried (after a delay)."""
+
+RETRY_METHODS = frozenset(("GET", "HEAD"))
+"""Only idempotent requests are retried."""
+
+
+def parse_retry_after(value: Optional[str], now: Optional[datetime] = None) -> float:
+    """Reads a `Retry-After` header.
+
+    Args:
+        value: The header value - seconds or an HTTP date
+        now: The current time (defaults to now)
+
+    Returns:
+        The number of seconds to wait (0 if the header is missing or invalid)
+    """
+    if not value:
+        return 0.0
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return 0.0
+
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - (now or datetime.now(timezone.utc))).total_seconds())
+
+
+class RequestScheduler:
+    """Paces and retries the requests sent to a repository.
+
+    Requests take a token from a token bucket that refills at `rate_limit`
+    tokens per second and holds up to `rate_limit_burst` tokens. A rate limit
+    of 0 lets requests through immediately.
+
+    Throttled (429) and unavailable (502/503/504) responses, and connection
+    errors, are retried up to `max_retries` times. The delay honours the
+    response's `Retry-After` header and otherwise backs off exponentially
+    (`backoff_factor * 2 ** retry`) with full jitter. Both are capped at
+    `backoff_max` seconds. A `Retry-After` pauses every request to the
+    repository, not just the one that received it.
+
+    Requests in flight can also be limited by an `AdaptiveConcurrency`.
+    """
+
+    def __init__(
+        self,
+        rate_limit: float = 0.0,
+        rate_limit_burst: int = 10,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        backoff_max: float = 60.0,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Any] = time.sleep,
+    ):
+        """New instance.
+
+        Args:
+            rate_limit: Requests per second (0 for no limit)
+            rate_limit_burst: The number of requests that can be sent at once
+            max_retries: The number of times a request is retried
+            backoff_factor: The base delay (in seconds) between retries
+            backoff_max: The longest delay (in seconds) between retries
+            concurrency: Limits the requests in flight
+            clock: Provides the (monotonic) time
+            sleep: Waits for a number of seconds
+        """
+        self.rate_limit = max(0.0, rate_limit)
+        self.rate_limit_burst = max(1, rate_limit_burst)
+        self.max_retries = max(0, max_retries)
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.concurrency = concurrency
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(self.rate_limit_burst)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._stats: Dict[str, Any] = {
+            "requests": 0,
+            "retries": 0,
+            "throttled": 0,
+            "throttled_seconds": 0.0,
+        }
+
+    @classmethod
+    def for_configuration(
+        cls, repository_configuration: RepositoryConfiguration
+    ) -> "RequestScheduler":
+        """Creates a scheduler using a repository's settings.
+
+        Args:
+            repository_configuration: The repository config
+
+        Returns:
+            A new scheduler
+        """
+        concurrency = None
+        if repository_configuration.adaptive_concurrency:
+            concurrency = AdaptiveConcurrency(
+                repository_configuration.name,
+                initial_limit=repository_configuration.pool_maxsize,
+                min_limit=repository_configuration.min_concurrency,
+                max_limit=repository_configuration.max_concurrency or None,
+            )
+
+        return cls(
+            rate_limit=repository_configuration.rate_limit,
+            rate_limit_burst=repository_configuration.rate_limit_burst,
+            max_retries=repository_configuration.max_retries,
+            backoff_factor=repository_configuration.backoff_factor,
+            backoff_max=repository_configuration.backoff_max,
+            concurrency=concurrency,
+        )
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Counts the requests, retries and throttled responses.
+
+        `throttled_seconds` is the time requests spent waiting for the
+        rate limit or before being retried.
+
+        Returns:
+            A dict of counters
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def _wait(self, seconds: float) -> None:
+        if seconds > 0:
+            with self._lock:
+                self._stats["throttled_seconds"] += seconds
+            self._sleep(seconds)
+
+    def acquire(self) -> None:
+        """Waits until a request can be sent."""
+        with self._lock:
+            self._stats["requests"] += 1
+            now = self._clock()
+            wait = self._paused_until - now
+
+            if self.rate_limit:
+                self._tokens = min(
+                    self.rate_limit_burst,
+                    self._tokens + (now - self._updated) * self.rate_limit,
+                )
+                self._updated = now
+                # Reserve a token - waiting callers queue up behind each other
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens / self.rate_limit)
+
+        self._wait(wait)
+
+    def retry_delay(
+        self, retry: int, response: Optional[requests.Response] = None
+    ) -> float:
+        """Determines how long to wait before a retry.
+
+        Args:
+            retry: The retry number (starting at 0)
+            response: The response being retried (if there was one)
+
+        Returns:
+            The delay in seconds
+        """
+        retry_after = 0.0
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+
+        if retry_after:
+            delay = min(retry_after, self.backoff_max)
+            with self._lock:
+                self._paused_until = max(self._paused_until, self._clock() + delay)
+            return delay
+
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_factor * (2**retry))
+        )
+
+    def _attempt(self, request: Callable[[], requests.Response]) -> requests.Response:
+        if self.concurrency is None:
+            return request()
+
+        started = self.concurrency.acquire()
+        ok = False
+        try:
+            response = request()
+            ok = response.status_code not in RETRY_STATUSES
+            return response
+        finally:
+            self.concurrency.release(started, ok)
+
+    def send(
+        self,
+        request: Callable[[], requests.Response],
+        method: str = "GET",
+        url: Optional[str] = None,
+    ) -> requests.Response:
+        """Sends a request, retrying it if needed.
+
+        Args:
+            request: Sends the request and returns its response
+            method: The request method - only GET and HEAD are retried
+            url: The request URL (for logging)
+
+        Returns:
+            The response - this may be an error response once retries run out
+
+        Raises:
+            ConnectionError: If the request couldn't be sent after retrying
+        """
+        retries = self.max_retries if method.upper() in RETRY_METHODS else 0
+
+        retry = 0
+        while True:
+            self.acquire()
+
+            try:
+                response = self._attempt(request)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if retry >= retries:
+                    raise
+                delay = self.retry_delay(retry)
+                reason: Any = type(e).__name__
+            else:
+                if response.status_code not in RETRY_STATUSES or retry >= retries:
+                    return response
+                delay = self.retry_delay(retry, response)
+                reason = response.status_code
+                response.close()
+                if reason == requests.codes.too_many_requests:
+                    with self._lock:
+                        self._stats["throttled"] += 1
+
+            with self._lock:
+                self._stats["retries"] += 1
+
+            log.warning(
+                "Retrying request",
+                url=strip_credentials(url) if url else url,
+                reason=reason,
+                retry=retry + 1,
+                delay=round(delay, 3),
+            )
+            self._wait(delay)
+            retry += 1
+
+
+class ScheduledAdapter(HTTPAdapter):
+    """An HTTP adapter that sends requests through a `RequestScheduler`."""
+
+    def __init__(self, scheduler: RequestScheduler, **kwargs: Any):
+        """New instance.
+
+        Args:
+            scheduler: The scheduler for the requests
+            kwargs: Passed to `HTTPAdapter`
+        """
+        super().__init__(**kwargs)
+        self.scheduler = scheduler
+
+    def send(  # type: ignore
+        self, request: requests.PreparedRequest, **kwargs: Any
+    ) -> requests.Response:
+        """Sends the request through the scheduler."""  # noqa: DAR101,DAR201
+        return self.scheduler.send(
+            lambda: super(ScheduledAdapter, self).send(request, **kwargs),
+            method=request.method or "GET",
+            url=request.url,
+        )
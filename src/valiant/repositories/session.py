@@ -0,0 +1,172 @@
+"""HTTP sessions for talking to repositories.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+from dataclasses import replace
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from requests.auth import AuthBase, HTTPBasicAuth
+from urllib3.util import make_headers
+
+from .config import RepositoryConfiguration
+from .scheduler import RequestScheduler, ScheduledAdapter
+
+
+class RepositoryAuth(AuthBase):
+    """Sends the repository credentials to the repository host only.
+
+    Artifacts are often served from another host (e.g. a CDN) and the
+    credentials shouldn't be sent there.
+    """
+
+    def __init__(self, host: str, username: str, password: str):
+        """New instance.
+
+        Args:
+            host: The repository host (and port)
+            username: The username (or access token)
+            password: The password
+        """
+        self.host = host
+        self._auth = HTTPBasicAuth(username, password)
+
+    def __call__(self, r: requests.PreparedRequest) -> requests.PreparedRequest:
+        """Adds the credentials to requests for the repository host."""  # noqa: DAR101,DAR201
+        if urlsplit(r.url).netloc.rpartition("@")[2] == self.host:
+            return self._auth(r)
+        return r
+
+
+def repository_auth(
+    repository_configuration: RepositoryConfiguration,
+) -> Optional[RepositoryAuth]:
+    """Prepares the authentication for a repository's requests.
+
+    Args:
+        repository_configuration: The repository config
+
+    Returns:
+        The authentication or None if the repository doesn't have credentials
+    """
+    host = urlsplit(repository_configuration.base_url).netloc
+    if repository_configuration.token:
+        return RepositoryAuth(host, repository_configuration.token, "")
+    if repository_configuration.username:
+        return RepositoryAuth(
+            host,
+            repository_configuration.username,
+            repository_configuration.password or "",
+        )
+    return None
+
+
+def _scheduled_adapter(
+    repository_configuration: RepositoryConfiguration, scheduler: RequestScheduler
+) -> ScheduledAdapter:
+    return ScheduledAdapter(
+        scheduler,
+        pool_connections=1,
+        pool_maxsize=repository_configuration.connection_pool_size,
+        pool_block=True,
+    )
+
+
+def create_session(
+    repository_configuration: RepositoryConfiguration,
+    scheduler: Optional[RequestScheduler] = None,
+) -> requests.Session:
+    """Prepares a pooled, keep-alive session for a repository.
+
+    The session's connection pool holds up to `pool_maxsize` (or, with adaptive
+    concurrency, `max_concurrency`) connections to the repository host and
+    requests block until a connection is free, so the session can be shared
+    by worker threads. Responses are negotiated with gzip/deflate
+    compression (and brotli if a brotli package is installed).
+
+    Any repository credentials are only sent to the repository host.
+
+    Requests are sent through the `scheduler` (rate limiting and retries) -
+    sessions for the same repository should share one. A scheduler is created
+    from the repository config if one isn't provided.
+
+    Args:
+        repository_configuration: The repository config
+        scheduler: Paces and retries the session's requests
+
+    Returns:
+        A session ready to talk to the repository
+    """
+    session = requests.Session()
+    adapter = _scheduled_adapter(
+        repository_configuration,
+        scheduler or RequestScheduler.for_configuration(repository_configuration),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    session.auth = repository_auth(repository_configuration)
+    session.headers["Connection"] = "keep-alive"
+    session.headers["Accept-Encoding"] = make_headers(accept_encoding=True)[
+        "accept-encoding"
+    ]
+
+    return session
+
+
+def create_download_session(
+    repository_configuration: RepositoryConfiguration, scheduler: RequestScheduler
+) -> requests.Session:
+    """Prepares a session for downloading a repository's artifacts.
+
+    Artifacts are often served from another host (e.g. files.pythonhosted.org).
+    Requests to the repository host go through the repository's `scheduler`
+    but requests to other hosts get their own scheduler, so they don't use up
+    the repository's rate limit, wait on its `Retry-After` pauses or affect
+    its adaptive concurrency. That scheduler retries requests in the same way
+    but doesn't apply the repository's `rate_limit`.
+
+    Args:
+        repository_configuration: The repository config
+        scheduler: The repository's scheduler
+
+    Returns:
+        A session ready to download artifacts
+    """
+    session = create_session(
+        repository_configuration,
+        scheduler=RequestScheduler.for_configuration(
+            replace(
+                repository_configuration,
+                name=f"{repository_configuration.name}-artifacts",
+                rate_limit=0.0,
+            )
+        ),
+    )
+
+    base_url = urlsplit(repository_configuration.base_url)
+    session.mount(
+        f"{base_url.scheme}://{base_url.netloc}/",
+        _scheduled_adapter(repository_configuration, scheduler),
+    )
+
+    return session
@@ -0,0 +1,289 @@
+"""Data model for simple index projects and core metadata.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+See: https://www.python.org/dev/peps/pep-0503/
+See: https://www.python.org/dev/peps/pep-0691/
+See: https://packaging.python.org/specifications/core-metadata/
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from email.message import Message
+from typing import Dict, List, Optional
+
+from packaging.requirements import Requirement
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion, Version
+from valiant.package import (
+    ArtifactMetadata,
+    ArtifactMetadataImpl,
+    Classifier,
+    PackageMetadata,
+)
+
+
+SDIST_EXTENSIONS = (".tar.gz", ".tar.bz2", ".tar.xz", ".tgz", ".zip")
+"""The file extensions used by source distributions."""
+
+
+@dataclass(frozen=True)
+class SimpleFile:
+    """A file listed on a project's simple index page.
+
+    Attributes:
+        filename: The file name
+        url: The (absolute) download URL
+        hashes: The file's hashes, keyed by the hash name
+        requires_python: The file's `Requires-Python` value
+        core_metadata: The hashes of the file's core metadata (PEP 658)
+                       or None if the index doesn't provide the metadata
+        yanked: True if the file has been yanked (PEP 592)
+        gpg_sig: True if the file has a signature
+        size: The file size in bytes (if provided)
+        upload_time: The upload time (if provided)
+    """
+
+    filename: str
+    url: str
+    hashes: Dict[str, str] = field(default_factory=dict)
+    requires_python: Optional[str] = None
+    core_metadata: Optional[Dict[str, str]] = None
+    yanked: bool = False
+    gpg_sig: bool = False
+    size: int = 0
+    upload_time: Optional[datetime] = None
+
+    @property
+    def package_type(self) -> str:
+        """The packaging type of the file (e.g. `bdist_wheel` or `sdist`)."""
+        if self.filename.endswith(".whl"):  # noqa: DAR201
+            return "bdist_wheel"
+        if self.filename.endswith(".egg"):
+            return "bdist_egg"
+        return "sdist"
+
+    @property
+    def python_version(self) -> str:
+        """The file's Python tag (`source` for source distributions)."""
+        if self.filename.endswith((".whl", ".egg")):  # noqa: DAR201
+            parts = self.filename.rsplit(".", 1)[0].split("-")
+            return parts[-3] if self.filename.endswith(".whl") else parts[-1]
+        return "source"
+
+    def version(self, name: str) -> Optional[str]:
+        """Extracts the package version from the file name.
+
+        Args:
+            name: The package name
+
+        Returns:
+            The version or None if the file name isn't for the package
+        """
+        if self.filename.endswith((".whl", ".egg")):
+            stem = self.filename.rsplit(".", 1)[0]
+        else:
+            stem = next(
+                (
+                    self.filename[: -len(ext)]
+                    for ext in SDIST_EXTENSIONS
+                    if self.filename.endswith(ext)
+                ),
+                None,
+            )
+            if stem is None:
+                return None
+
+        parts = stem.split("-")
+        canonical = canonicalize_name(name)
+        for i in range(1, len(parts)):
+            if canonicalize_name("-".join(parts[:i])) == canonical:
+                return parts[i]
+
+        return None
+
+    def is_version(self, name: str, version: str) -> bool:
+        """Checks if the file belongs to a package version.
+
+        Args:
+            name: The package name
+            version: The package version
+
+        Returns:
+            True if the file name matches the package version
+        """
+        file_version = self.version(name)
+        if file_version is None:
+            return False
+
+        try:
+            return Version(file_version) == Version(version)
+        except InvalidVersion:
+            return file_version == version
+
+    def to_artifact(self) -> ArtifactMetadata:
+        """Describes the file as an artifact.
+
+        Returns:
+            The artifact metadata
+        """
+        return ArtifactMetadataImpl(
+            comment_text="",
+            digests=self.hashes,
+            sha256_digest=self.hashes.get("sha256", None),
+            signed=self.gpg_sig,
+            signature_url=f"{self.url.split('#', 1)[0]}.asc",
+            package_type=self.package_type,
+            python_version=self.python_version,
+            requires_python=[
+                p.strip() for p in (self.requires_python or "").split(",") if p.strip()
+            ],
+            size=self.size,
+            upload_time_iso_8601=self.upload_time,  # type: ignore
+            url=self.url,
+        )
+
+
+class SimplePackageMetadata(PackageMetadata):
+    """Provides the PackageMetadata interface from core metadata.
+
+    The core metadata is usually read from a distribution's PEP 658
+    `.metadata` file. If the index doesn't provide one, only the details
+    available from the simple index (the name, version and files) are known.
+    """
+
+    def __init__(
+        self,
+        repository_url: str,
+        name: str,
+        version: str,
+        files: List[SimpleFile],
+        core_metadata: Message = None,
+    ):
+        """Constructor.
+
+        Args:
+            repository_url: The URL for the repo that provided this metadata.
+            name: The package name (used if the core metadata is missing)
+            version: The package version (used if the core metadata is missing)
+            files: The files for the package version
+            core_metadata: The parsed core metadata
+        """
+        self._repository_url = repository_url
+        self._name = name
+        self._version = version
+        self._files = files
+        self._meta = core_metadata if core_metadata is not None else Message()
+        self._parsed_classifiers: Optional[List[Classifier]] = None
+        self._requires_dist: Optional[Dict[str, List[Requirement]]] = None
+
+        self._project_urls: Dict[str, str] = {}
+        for entry in self._meta.get_all("Project-URL") or []:
+            label, _, url = entry.partition(",")
+            self._project_urls[label.strip()] = url.strip()
+
+    def _field(self, name: str) -> str:
+        value = self._meta.get(name)
+        if value is None or value == "UNKNOWN":
+            return ""
+        return str(value)
+
+    @property
+    def name(self) -> str:  # noqa: D102
+        return self._field("Name") or self._name
+
+    @property
+    def version(self) -> str:  # noqa: D102
+        return self._field("Version") or self._version
+
+    @property
+    def summary(self) -> str:  # noqa: D102
+        return self._field("Summary")
+
+    @property
+    def description(self) -> str:  # noqa: D102
+        if self._meta.get("Description"):
+            return self._field("Description")
+
+        payload = self._meta.get_payload()
+        return payload if isinstance(payload, str) else ""
+
+    @property
+    def license(self) -> str:  # noqa: D102
+        return self._field("License") or self._field("License-Expression")
+
+    @property
+    def classifiers(self) -> List[str]:  # noqa: D102
+        return list(self._meta.get_all("Classifier") or [])
+
+    @property
+    def classifiers_parsed(self) -> List[Classifier]:  # noqa: D102
+        if self._parsed_classifiers is None:
+            self._parsed_classifiers = [Classifier.parse(c) for c in self.classifiers]
+
+        return self._parsed_classifiers
+
+    @property
+    def repository_url(self) -> str:  # noqa: D102
+        return self._repository_url
+
+    @property
+    def url_code(self) -> str:  # noqa: D102
+        for item in ["Code", "Repository", "Source", "Source Code"]:
+            if item in self._project_urls:
+                return self._project_urls[item]
+
+        return ""
+
+    @property
+    def url_documentation(self) -> str:  # noqa: D102
+        return self._project_urls.get("Documentation", "")
+
+    @property
+    def url_project(self) -> str:  # noqa: D102
+        return self._field("Home-page") or self._project_urls.get("Homepage", "")
+
+    @property
+    def url_issue_tracker(self) -> str:  # noqa: D102
+        for item in ["Issue tracker", "Issues", "Bug Tracker"]:
+            if item in self._project_urls:
+                return self._project_urls[item]
+
+        return ""
+
+    @property
+    def requires_python(self) -> List[str]:  # noqa: D102
+        return [
+            p.strip() for p in self._field("Requires-Python").split(",") if p.strip()
+        ]
+
+    @property
+    def requires_dist(self) -> Dict[str, List[Requirement]]:  # noqa: D102
+        if self._requires_dist is None:
+            self._requires_dist = {}
+            for item in self._meta.get_all("Requires-Dist") or []:
+                req = Requirement(item)
+                self._requires_dist.setdefault(req.name, []).append(req)
+
+        return self._requires_dist
+
+    @property
+    def artifacts(self) -> List[ArtifactMetadata]:  # noqa: D102
+        return [f.to_artifact() for f in self._files]
@@ -0,0 +1,181 @@
+"""Parsers for simple index project pages.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import codecs
+
+from datetime import datetime
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from .model import SimpleFile
+
+
+JSON_CONTENT_TYPE = "application/vnd.pypi.simple.v1+json"
+"""The PEP 691 content type for JSON project pages."""
+
+ACCEPT_HEADER = f"{JSON_CONTENT_TYPE}, text/html;q=0.1"
+"""Prefer the JSON form of a project page but accept HTML."""
+
+
+def _parse_hash(value: Optional[str]) -> Dict[str, str]:
+    """Parses a `<name>=<value>` hash (e.g. from a URL fragment)."""
+    if not value or "=" not in value:  # noqa: DAR101,DAR201
+        return {}
+    name, _, digest = value.partition("=")
+    return {name: digest}
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def parse_json_page(page_url: str, data: Dict[str, Any]) -> List[SimpleFile]:
+    """Lists the files in a PEP 691 JSON project page.
+
+    Args:
+        page_url: The page URL - used to resolve relative file URLs
+        data: The decoded JSON page
+
+    Returns:
+        The files listed in the page
+    """
+    files: List[SimpleFile] = []
+
+    for entry in data.get("files", []):
+        # PEP 714 renamed dist-info-metadata to core-metadata
+        core_metadata = entry.get("core-metadata", entry.get("dist-info-metadata"))
+        if core_metadata is True:
+            core_metadata = {}
+        elif not isinstance(core_metadata, dict):
+            core_metadata = None
+
+        files.append(
+            SimpleFile(
+                filename=entry["filename"],
+                url=urljoin(page_url, entry["url"]),
+                hashes=dict(entry.get("hashes") or {}),
+                requires_python=entry.get("requires-python"),
+                core_metadata=core_metadata,
+                yanked=bool(entry.get("yanked", False)),
+                gpg_sig=bool(entry.get("gpg-sig", False)),
+                size=int(entry.get("size") or 0),
+                upload_time=_parse_time(entry.get("upload-time")),
+            )
+        )
+
+    return files
+
+
+class SimpleHTMLParser(HTMLParser):
+    """Collects the file links from a PEP 503 HTML project page.
+
+    Data can be fed in chunks as it arrives.
+    """
+
+    def __init__(self, page_url: str):
+        """New instance.
+
+        Args:
+            page_url: The page URL - used to resolve relative file URLs
+        """
+        super().__init__(convert_charrefs=True)
+        self.base_url = page_url
+        self.files: List[SimpleFile] = []
+        self._anchor: Optional[Dict[str, Optional[str]]] = None
+        self._text: List[str] = []
+
+    def handle_starttag(  # noqa: D102
+        self, tag: str, attrs: List[Tuple[str, Optional[str]]]
+    ) -> None:
+        if tag == "base":
+            href = dict(attrs).get("href")
+            if href:
+                self.base_url = urljoin(self.base_url, href)
+        elif tag == "a":
+            self._anchor = dict(attrs)
+            self._text = []
+
+    def handle_data(self, data: str) -> None:  # noqa: D102
+        if self._anchor is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag: str) -> None:  # noqa: D102
+        if tag != "a" or self._anchor is None:
+            return
+
+        attrs, self._anchor = self._anchor, None
+        href = attrs.get("href")
+        if not href:
+            return
+
+        url = urljoin(self.base_url, href)
+        filename = "".join(self._text).strip() or url.split("#")[0].rsplit("/", 1)[-1]
+        fragment = url.partition("#")[2]
+
+        core_metadata = attrs.get(
+            "data-core-metadata", attrs.get("data-dist-info-metadata")
+        )
+
+        self.files.append(
+            SimpleFile(
+                filename=filename,
+                url=url,
+                hashes=_parse_hash(fragment),
+                requires_python=attrs.get("data-requires-python"),
+                core_metadata=None
+                if core_metadata is None
+                else _parse_hash(core_metadata),
+                yanked="data-yanked" in attrs,
+                gpg_sig=attrs.get("data-gpg-sig") == "true",
+            )
+        )
+
+
+def parse_html_page(
+    page_url: str, chunks: Iterable[bytes], encoding: str = None
+) -> List[SimpleFile]:
+    """Lists the files in a PEP 503 HTML project page.
+
+    The page is parsed as the chunks arrive.
+
+    Args:
+        page_url: The page URL - used to resolve relative file URLs
+        chunks: The page content
+        encoding: The page encoding (defaults to UTF-8)
+
+    Returns:
+        The files listed in the page
+    """
+    decoder = codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    parser = SimpleHTMLParser(page_url)
+
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    return parser.files
@@ -0,0 +1,403 @@
+"""Repository access through the simple index API (PEP 503/691).
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import hashlib
+import json
+import threading
+import zipfile
+
+from email.message import Message
+from email.parser import BytesParser
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import requests
+
+from packaging.utils import canonicalize_name
+
+from valiant.log import get_logger
+from valiant.package import ArtifactMetadata
+from valiant.repositories import (
+    ArtifactDownloader,
+    BaseRepository,
+    CachedMetadata,
+    MetadataCache,
+    PackageNotFoundException,
+    RepositoryConfiguration,
+    RepositoryException,
+    RequestScheduler,
+    SingleFlight,
+    ValidationError,
+    create_download_session,
+    create_session,
+)
+from valiant.repositories.archive import open_artifact
+from valiant.repositories.downloader import default_downloader
+
+from .model import SimpleFile, SimplePackageMetadata
+from .parser import ACCEPT_HEADER, JSON_CONTENT_TYPE, parse_html_page, parse_json_page
+
+
+log = get_logger()
+
+PAGE_CHUNK_SIZE = 64 * 1024
+"""The size of the chunks read from HTML project pages."""
+
+
+class SimpleIndexRepository(BaseRepository):
+    """A repository accessed through its simple index.
+
+    Suits indexes that don't provide the Warehouse JSON API (e.g. devpi,
+    Artifactory or a static file server). The `base_url` is the index URL,
+    such as https://pypi.org/simple
+
+    Project pages are requested in the PEP 691 JSON form, falling back to
+    the PEP 503 HTML form (which is parsed as it's downloaded). Core metadata
+    is read from the PEP 658 `.metadata` file of one of the version's files
+    rather than by downloading a distribution. Without a `.metadata` file,
+    only the details listed in the index (the files) are available.
+    """
+
+    def __init__(
+        self,
+        repository_configuration: RepositoryConfiguration,
+        downloader: ArtifactDownloader = None,
+        metadata_cache: MetadataCache = None,
+    ):
+        """New instance.
+
+        Project pages are stored in the metadata cache (if provided) and
+        revalidated with conditional requests once they expire. Core metadata
+        files don't change so they're used for as long as they're cached.
+
+        Args:
+            repository_configuration: A RepositoryConfiguration instance
+            downloader: Downloads artifacts into the artifact cache
+            metadata_cache: Stores project pages and core metadata between runs
+        """
+        super().__init__(repository_configuration)
+        self._metadata_cache = metadata_cache
+        self._scheduler = RequestScheduler.for_configuration(repository_configuration)
+        self._session: requests.Session = create_session(
+            repository_configuration, scheduler=self._scheduler
+        )
+        self._downloader = downloader or default_downloader()
+        self._download_session: Optional[requests.Session] = None
+
+        self._pages: Dict[str, List[SimpleFile]] = {}
+        self._lock = threading.Lock()
+        self._flights: SingleFlight[List[SimpleFile]] = SingleFlight()
+
+    @classmethod
+    def list_supported_repository_types(cls) -> List[str]:
+        """Lists the repository types support by this implementation."""
+        return ["simple"]  # noqa: DAR201
+
+    @property
+    def session(self) -> requests.Session:
+        """The HTTP session used to access the repository."""
+        return self._session  # noqa: DAR201
+
+    @property
+    def scheduler(self) -> RequestScheduler:
+        """Paces and retries the requests sent to the repository."""
+        return self._scheduler  # noqa: DAR201
+
+    def project_page_url(self, name: str) -> str:
+        """The URL for a project's page.
+
+        Args:
+            name: The package name
+
+        Returns:
+            The URL for the normalised project name
+        """
+        base_url = self.repository_configuration.base_url.rstrip("/")
+        return f"{base_url}/{canonicalize_name(name)}/"
+
+    def list_files(self, name: str) -> List[SimpleFile]:
+        """Lists a project's files, requesting the project page only once.
+
+        Args:
+            name: The package name
+
+        Returns:
+            The files listed on the project's page
+        """
+        key = canonicalize_name(name)
+
+        with self._lock:
+            files = self._pages.get(key)
+
+        if files is None:
+            files = self._flights.do(
+                (self.repository_configuration.name, key, None),
+                lambda: self._load_page(name),
+            )
+            with self._lock:
+                files = self._pages.setdefault(key, files)
+
+        return files
+
+    def _load_page(self, name: str) -> List[SimpleFile]:
+        url = self.project_page_url(name)
+        headers = {"Accept": ACCEPT_HEADER}
+
+        cached = self._metadata_cache.get(url) if self._metadata_cache else None
+        if cached:
+            if self._metadata_cache.is_fresh(cached):  # type: ignore
+                self._metadata_cache.record_hit()  # type: ignore
+                return self._parse_cached_page(cached)
+            headers.update(cached.conditional_headers())
+
+        r = self._session.get(
+            url,
+            headers=headers,
+            timeout=self.repository_configuration.timeout,
+            stream=self._metadata_cache is None,
+        )
+
+        try:
+            if r.status_code == requests.codes.not_modified and cached:
+                self._metadata_cache.touch(url)  # type: ignore
+                return self._parse_cached_page(cached)
+
+            if r.status_code != requests.codes.ok:
+                log.error(
+                    "Package not found",
+                    package_name=name,
+                    repository_url=self.repository_configuration.base_url,
+                    status_code=r.status_code,
+                )
+                raise PackageNotFoundException(f"No result for {url}")
+
+            if self._metadata_cache:
+                entry = self._metadata_cache.put(url, r.content, r.headers)
+                return self._parse_cached_page(entry)
+
+            return self._parse_page(
+                r.url or url,
+                r.headers.get("Content-Type", ""),
+                r.iter_content(chunk_size=PAGE_CHUNK_SIZE),
+                r.encoding,
+            )
+        finally:
+            r.close()
+
+    def _parse_cached_page(self, entry: CachedMetadata) -> List[SimpleFile]:
+        content_type = entry.content_type or ""
+        return self._parse_page(
+            entry.url,
+            content_type,
+            [entry.body],
+            requests.utils.get_encoding_from_headers({"content-type": content_type}),
+        )
+
+    @staticmethod
+    def _parse_page(
+        page_url: str,
+        content_type: str,
+        chunks: Iterable[bytes],
+        encoding: Optional[str],
+    ) -> List[SimpleFile]:
+        try:
+            if content_type.split(";")[0].strip() == JSON_CONTENT_TYPE:
+                return parse_json_page(page_url, json.loads(b"".join(chunks)))
+
+            return parse_html_page(page_url, chunks, encoding)
+        except ValueError as e:
+            raise RepositoryException(
+                f"Unable to read the project page {page_url}: {e}"
+            )
+
+    def _load_core_metadata(self, file: SimpleFile) -> Message:
+        """Downloads and parses a file's PEP 658 core metadata.
+
+        Args:
+            file: The distribution file
+
+        Returns:
+            The parsed metadata
+
+        Raises:
+            ValidationError: If the metadata doesn't match its hash
+            RepositoryException: If the metadata couldn't be downloaded
+        """
+        url = f"{file.url.split('#', 1)[0]}.metadata"
+        cached = self._metadata_cache.get(url) if self._metadata_cache else None
+
+        headers: Mapping[str, str] = {}
+        if cached:
+            self._metadata_cache.record_hit()  # type: ignore
+            content = cached.body
+        else:
+            r = self._session.get(url, timeout=self.repository_configuration.timeout)
+            if r.status_code != requests.codes.ok:
+                raise RepositoryException(
+                    f"Unable to download the core metadata ({r.status_code}) from {url}"
+                )
+            content, headers = r.content, r.headers
+
+        expected = (file.core_metadata or {}).get("sha256")
+        if expected and hashlib.sha256(content).hexdigest() != expected:
+            raise ValidationError(f"The core metadata from {url} failed its hash check")
+
+        if self._metadata_cache and not cached:
+            self._metadata_cache.put(url, content, headers)
+
+        return BytesParser().parsebytes(content)
+
+    @staticmethod
+    def _choose_metadata_file(files: List[SimpleFile]) -> Optional[SimpleFile]:
+        """Selects the file to read the core metadata from.
+
+        Args:
+            files: The files for a package version
+
+        Returns:
+            A file with core metadata - wheels are preferred to other files
+        """
+        candidates = [f for f in files if f.core_metadata is not None]
+        candidates.sort(key=lambda f: (f.yanked, f.package_type != "bdist_wheel"))
+        return candidates[0] if candidates else None
+
+    def show(self, name: str, version: str) -> SimplePackageMetadata:
+        """Provides details for a specific package version.
+
+        Args:
+            name: The package name
+            version: The package version
+
+        Returns:
+            A package instance if it can be located.
+
+        Raises:
+            PackageNotFoundException: When the package cannot be found
+            ValidationError: The package metadata could not be parsed. # noqa: DAR402
+        """
+        try:
+            files = [f for f in self.list_files(name) if f.is_version(name, version)]
+
+            if not files:
+                raise PackageNotFoundException(
+                    f"No files are listed for {name} {version}"
+                )
+
+            metadata_file = self._choose_metadata_file(files)
+            core_metadata = None
+            if metadata_file:
+                core_metadata = self._load_core_metadata(metadata_file)
+            else:
+                log.warning(
+                    "No core metadata available",
+                    package_name=name,
+                    package_version=version,
+                    repository_url=self.repository_configuration.base_url,
+                )
+        except ValidationError:
+            raise
+        except (
+            PackageNotFoundException,
+            RepositoryException,
+            requests.RequestException,
+        ) as e:
+            raise PackageNotFoundException(f"Failed to access package metadata: {e}")
+
+        log.info(
+            "Package found",
+            package_name=name,
+            package_version=version,
+            repository_url=self.repository_configuration.base_url,
+            files=len(files),
+            core_metadata=metadata_file is not None,
+        )
+
+        metadata = SimplePackageMetadata(
+            repository_url=self.repository_configuration.base_url,
+            name=name,
+            version=version,
+            files=files,
+            core_metadata=core_metadata,
+        )
+        metadata.artifact_opener = self.open_artifact
+        return metadata
+
+    def download(self, name: str, version: str) -> Path:
+        """Downloads the preferred artifact for a package version.
+
+        Pure Python wheels are preferred, then source distributions. The
+        artifact is verified against its SHA-256 digest and kept in the
+        artifact cache - it isn't downloaded again.
+
+        Args:
+            name: The package name
+            version: The package version
+
+        Returns:
+            The path to the downloaded artifact.
+        """
+        return self.download_many([(name, version)])[0]
+
+    def download_many(self, packages: Sequence[Tuple[str, str]]) -> List[Path]:
+        """Downloads the preferred artifacts for several package versions in parallel.
+
+        Args:
+            packages: A sequence of (name, version) tuples
+
+        Returns:
+            The paths to the downloads, in the same order as `packages`
+        """
+        return self._downloader.fetch_packages(
+            self,
+            packages,
+            self.download_session,
+            timeout=self.repository_configuration.timeout,
+        )
+
+    def open_artifact(self, artifact: ArtifactMetadata) -> zipfile.ZipFile:
+        """Opens a zip-based artifact (such as a wheel) for inspection.
+
+        Only the archive's central directory and the members that are read
+        are fetched (using HTTP range requests). The artifact is downloaded
+        in full if the server doesn't support range requests.
+
+        Args:
+            artifact: The artifact
+
+        Returns:
+            The archive
+        """
+        return open_artifact(
+            artifact,
+            self.download_session,
+            timeout=self.repository_configuration.timeout,
+            downloader=self._downloader,
+        )
+
+    @property
+    def download_session(self) -> requests.Session:
+        """The (uncached) session used for artifacts."""
+        with self._lock:
+            if self._download_session is None:
+                self._download_session = create_download_session(
+                    self.repository_configuration, self._scheduler
+                )
+            return self._download_session  # noqa: DAR201
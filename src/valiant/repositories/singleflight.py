@@ -0,0 +1,129 @@
+"""Coalesces concurrent duplicate calls into a single call.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import threading
+
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, TypeVar
+
+
+T = TypeVar("T")
+
+
+class _Call:
+    """An in-flight call."""
+
+    def __init__(self) -> None:  # noqa: D107
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Any = None
+
+
+class SingleFlight(Generic[T]):
+    """Runs one call per key at a time and shares its outcome with all callers.
+
+    The first caller for a key runs the function. Any other caller that arrives
+    whilst that call is in flight waits and receives the same result (or has the
+    same exception raised). Nothing is kept once the call completes.
+    """
+
+    def __init__(self) -> None:  # noqa: D107
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Calls `fn` unless a call for `key` is already in flight.
+
+        Args:
+            key: Identifies the work being done
+            fn: Performs the work
+
+        Returns:
+            The result of the (possibly shared) call
+
+        Raises:
+            Exception: Whatever the (possibly shared) call raised # noqa: DAR401,DAR402
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+
+class AsyncSingleFlight(Generic[T]):
+    """The asyncio counterpart to `SingleFlight`.
+
+    The shared call runs as a task so a waiter being cancelled doesn't cancel
+    the call for everyone else.
+    """
+
+    def __init__(self) -> None:  # noqa: D107
+        self._calls: Dict[Hashable, Any] = {}
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Awaits `fn()` unless a call for `key` is already in flight.
+
+        Args:
+            key: Identifies the work being done
+            fn: Returns an awaitable that performs the work
+
+        Returns:
+            The result of the (possibly shared) call
+        """
+        import asyncio
+
+        task = self._calls.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+
+            def _done(t: Any) -> None:
+                if self._calls.get(key) is t:
+                    del self._calls[key]
+
+            task.add_done_callback(_done)
+
+        return await asyncio.shield(task)
@@ -0,0 +1,286 @@
+"""Incremental JSON decoding that skips unwanted subtrees.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import codecs
+import json
+import re
+
+from typing import Any, Iterable, List, Mapping, Optional, Tuple
+
+
+_STRUCTURAL = re.compile(r'["{}\[\],:]')
+_SKIP_STRUCTURAL = re.compile(r'["{}\[\]]')
+_STRING_REST = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+_STRING_SPECIAL = re.compile(r'["\\]')
+_NON_WHITESPACE = re.compile(r"\S")
+_SCALAR_END = re.compile(r"[\s,}\]]")
+
+Path = Tuple[str, ...]
+
+
+class _Frame:
+    """An open object or array."""
+
+    __slots__ = ("kind", "key", "expect_key")
+
+    def __init__(self, kind: str) -> None:  # noqa: D107
+        self.kind = kind
+        self.key = ""
+        self.expect_key = kind == "{"
+
+
+class JsonSubtreeFilter:
+    """Copies JSON text from a stream of chunks, replacing selected values.
+
+    Values are selected by their path of object keys from the document root,
+    with `*` matching any key and `#` standing for an array element. For
+    example, `("releases", "*")` selects every value in the top-level
+    `releases` object. A selected value is dropped as it streams past (without
+    being buffered or decoded) and the replacement JSON text is written in its
+    place.
+
+    The filter only tracks enough of the JSON structure to follow the paths -
+    the output should be passed to `json.loads` for decoding and validation.
+    """
+
+    def __init__(self, replacements: Mapping[Path, str]):
+        """New instance.
+
+        Args:
+            replacements: Maps the path of each value to drop to replacement JSON text
+        """
+        self._replacements = dict(replacements)
+        self._depths = {len(path) for path in self._replacements}
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._out: List[str] = []
+        self._pending = ""
+        self._stack: List[_Frame] = []
+        self._value_pending = True
+        self._skipping = False
+        self._skip_depth = 0
+        self._skip_scalar = False
+        self._skip_in_string = False
+        self._skip_escape = False
+
+    def feed(self, data: bytes) -> None:
+        """Processes the next chunk of the document.
+
+        Args:
+            data: UTF-8 encoded JSON text
+        """
+        text = self._pending + self._decoder.decode(data)
+        self._pending = ""
+        self._process(text)
+
+    def close(self) -> str:
+        """Completes the processing.
+
+        Returns:
+            The filtered JSON text
+
+        Raises:
+            ValueError: If the document was incomplete
+        """
+        self._process(self._pending + self._decoder.decode(b"", final=True))
+
+        if self._skip_scalar:
+            self._skipping = self._skip_scalar = False
+
+        if self._pending or self._stack or self._skipping:
+            raise ValueError("The JSON document is incomplete")
+
+        return "".join(self._out)
+
+    def _replacement(self) -> Optional[str]:
+        depth = len(self._stack)
+        if depth not in self._depths:
+            return None
+
+        path = [f.key if f.kind == "{" else "#" for f in self._stack]
+        for pattern, replacement in self._replacements.items():
+            if len(pattern) == depth and all(
+                p == "*" or p == k for p, k in zip(pattern, path)
+            ):
+                return replacement
+
+        return None
+
+    def _process(self, text: str) -> None:  # noqa: C901
+        i, n = 0, len(text)
+
+        while i < n:
+            if self._skipping:
+                i = self._skip(text, i)
+                continue
+
+            if self._value_pending:
+                m = _NON_WHITESPACE.search(text, i)
+                if not m:
+                    self._out.append(text[i:])
+                    return
+
+                j = m.start()
+                self._out.append(text[i:j])
+                i = j
+                c = text[j]
+                self._value_pending = False
+
+                replacement = None if c in "}]" else self._replacement()
+                if replacement is not None:
+                    self._out.append(replacement)
+                    self._skipping = True
+                    if c == '"':
+                        self._skip_in_string = True
+                        i += 1
+                    elif c in "{[":
+                        self._skip_depth = 1
+                        i += 1
+                    else:
+                        self._skip_scalar = True
+                    continue
+
+            m = _STRUCTURAL.search(text, i)
+            if not m:
+                self._out.append(text[i:])
+                return
+
+            j = m.start()
+            self._out.append(text[i:j])
+            c = text[j]
+
+            if c == '"':
+                end = _STRING_REST.match(text, j + 1)
+                if not end:
+                    self._pending = text[j:]
+                    return
+
+                token = text[j : end.end()]
+                if self._stack and self._stack[-1].expect_key:
+                    self._stack[-1].key = json.loads(token)
+                    self._stack[-1].expect_key = False
+                self._out.append(token)
+                i = end.end()
+                continue
+
+            self._out.append(c)
+            i = j + 1
+
+            if c == ":":
+                self._value_pending = True
+            elif c == ",":
+                if self._stack[-1].kind == "{":
+                    self._stack[-1].expect_key = True
+                else:
+                    self._value_pending = True
+            elif c in "{[":
+                self._stack.append(_Frame(c))
+                self._value_pending = c == "["
+            else:
+                self._stack.pop()
+
+    def _skip(self, text: str, i: int) -> int:  # noqa: C901
+        """Drops text until the skipped value is complete.
+
+        Args:
+            text: The text being processed
+            i: The current position
+
+        Returns:
+            The position at which processing should continue
+        """
+        n = len(text)
+
+        if self._skip_scalar:
+            m = _SCALAR_END.search(text, i)
+            if not m:
+                return n
+            self._skipping = self._skip_scalar = False
+            return m.start()
+
+        while i < n:
+            if self._skip_in_string:
+                if self._skip_escape:
+                    self._skip_escape = False
+                    i += 1
+                    continue
+
+                m = _STRING_SPECIAL.search(text, i)
+                if not m:
+                    return n
+
+                i = m.end()
+                if m.group() == "\\":
+                    self._skip_escape = True
+                    continue
+
+                self._skip_in_string = False
+                if self._skip_depth == 0:
+                    self._skipping = False
+                    return i
+                continue
+
+            m = _SKIP_STRUCTURAL.search(text, i)
+            if not m:
+                return n
+
+            i = m.end()
+            c = m.group()
+            if c == '"':
+                self._skip_in_string = True
+            elif c in "{[":
+                self._skip_depth += 1
+            else:
+                self._skip_depth -= 1
+                if self._skip_depth == 0:
+                    self._skipping = False
+                    return i
+
+        return n
+
+
+def filter_json(chunks: Iterable[bytes], replacements: Mapping[Path, str]) -> str:
+    """Filters a chunked JSON document.
+
+    Args:
+        chunks: The UTF-8 encoded document
+        replacements: Maps the path of each value to drop to replacement JSON text
+
+    Returns:
+        The filtered JSON text
+    """
+    f = JsonSubtreeFilter(replacements)
+    for chunk in chunks:
+        f.feed(chunk)
+
+    return f.close()
+
+
+def loads_filtered(chunks: Iterable[bytes], replacements: Mapping[Path, str]) -> Any:
+    """Decodes a chunked JSON document, skipping the selected values.
+
+    Args:
+        chunks: The UTF-8 encoded document
+        replacements: Maps the path of each value to drop to replacement JSON text
+
+    Returns:
+        The decoded document
+    """
+    return json.loads(filter_json(chunks, replacements))
@@ -19,15 +19,23 @@ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
 IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
+from concurrent.futures import Executor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Mapping, Optional, Set, Tuple
+from threading import Lock
+from typing import List, Mapping, Optional, Sequence, Set, Tuple
 
 from valiant.config import Config
 from valiant.package import PackageMetadata
+from valiant.plugins import PluginWrapper
 from valiant.plugins.reports import ReportPlugins
-from valiant.reports import ReportSet
-from valiant.repositories import RepositoryConfiguration
+from valiant.reports import Report, ReportSet
+from valiant.repositories import (
+    MetadataCache,
+    MetadataStore,
+    RepositoryConfiguration,
+)
+from valiant.repositories.lookup import AsyncRepositoryLookup, RepositoryLookup
 
 from .__about__ import (
     application_copyright_holder,
@@ -83,10 +91,28 @@ class Valiant:
         Args:
             config: The application configuration
         """
-        from valiant.repositories import RepositoryFactory
+        from valiant.repositories import ArtifactDownloader, RepositoryFactory
 
         self._config: Config = config
-        self._repo_factory = RepositoryFactory()
+
+        self._metadata_cache: Optional[MetadataCache] = None
+        if self._config.metadata_cache_file:
+            self._metadata_cache = MetadataCache.from_config(
+                self._config.metadata_cache, self._config.metadata_cache_file
+            )
+
+        self._metadata_store: Optional[MetadataStore] = None
+        if self._config.metadata_store_dir:
+            self._metadata_store = MetadataStore(self._config.metadata_store_dir)
+
+        self._repo_factory = RepositoryFactory(
+            metadata_cache=self._metadata_cache,
+            metadata_store=self._metadata_store,
+            downloader=ArtifactDownloader(self._config.artifact_cache_dir),
+        )
+        self._repository_lookup: Optional[RepositoryLookup] = None
+        self._async_repository_lookup: Optional[AsyncRepositoryLookup] = None
+        self._repository_lookup_lock = Lock()
 
         local_plugins: Optional[Mapping[str, str]] = None
         if self._config.local_report_plugins:
@@ -94,6 +120,9 @@ class Valiant:
 
         self._report_plugins: ReportPlugins = ReportPlugins(local_plugins=local_plugins)
         self._report_plugins.load_plugins()
+        self._report_plugins.configure_plugins(
+            self._config.report_configurations, cache_dir=self._config.cache_dir
+        )
 
     @staticmethod
     def application_details() -> Tuple:  # noqa: D102
@@ -215,6 +244,67 @@ class Valiant:
 
         return set()
 
+    @property
+    def metadata_cache(self) -> Optional[MetadataCache]:
+        """The metadata cache (None if the cache is disabled)."""
+        return self._metadata_cache  # noqa: DAR201
+
+    @property
+    def metadata_store(self) -> Optional[MetadataStore]:
+        """The parsed metadata store (None if the store is disabled)."""
+        return self._metadata_store  # noqa: DAR201
+
+    def _get_repository_configuration(
+        self, repository_name: Optional[str] = None
+    ) -> RepositoryConfiguration:
+        if repository_name:
+            return self._config.get_repository_configuration(repository_name)
+
+        return self._config.default_repository_configuration
+
+    @property
+    def repository_lookup(self) -> RepositoryLookup:
+        """Looks up packages across the configured repositories.
+
+        The lookup mode (`single`, `fallback` or `hedged`) and the order of
+        the repositories are set in the `repository_lookup` configuration.
+
+        Returns:
+            The lookup for the configured repositories
+        """
+        with self._repository_lookup_lock:
+            if self._repository_lookup is None:
+                lookup = self._config.repository_lookup
+                self._repository_lookup = RepositoryLookup(
+                    [
+                        self._repo_factory.get_repository(conf)
+                        for conf in self._config.repository_lookup_configurations
+                    ],
+                    mode=self._config.repository_lookup_mode,
+                    hedge_delay=float(lookup.get("hedge_delay", 0.5)),
+                )
+            return self._repository_lookup
+
+    @property
+    def async_repository_lookup(self) -> AsyncRepositoryLookup:
+        """The asyncio counterpart to `repository_lookup`.
+
+        Returns:
+            The lookup for the configured repositories
+        """
+        with self._repository_lookup_lock:
+            if self._async_repository_lookup is None:
+                lookup = self._config.repository_lookup
+                self._async_repository_lookup = AsyncRepositoryLookup(
+                    [
+                        self._repo_factory.get_async_repository(conf)
+                        for conf in self._config.repository_lookup_configurations
+                    ],
+                    mode=self._config.repository_lookup_mode,
+                    hedge_delay=float(lookup.get("hedge_delay", 0.5)),
+                )
+            return self._async_repository_lookup
+
     def get_package_metadata(
         self,
         package_name: str,
@@ -223,6 +313,9 @@ class Valiant:
     ) -> PythonPackagePayload:
         """Gets the metadata for the requested package.
 
+        Without a `repository_name`, packages are looked up using the
+        configured `repository_lookup` mode.
+
         Args:
             package_name: The package name
             package_version: The package version
@@ -231,11 +324,16 @@ class Valiant:
         Returns:
             A payload with the package metadata.
         """
-        if repository_name:
-            repo_config = self._config.get_repository_configuration(repository_name)
-        else:
-            repo_config = self._config.default_repository_configuration
+        if not repository_name and self._config.repository_lookup_mode != "single":
+            metadata = self.repository_lookup.show(package_name, package_version)
+            return PythonPackagePayload(
+                repository_base_url=metadata.repository_url,
+                package_name=package_name,
+                package_version=package_version,
+                package_metadata=metadata,
+            )
 
+        repo_config = self._get_repository_configuration(repository_name)
         repo = self._repo_factory.get_repository(repo_config)
 
         metadata = repo.show(package_name, package_version)
@@ -260,6 +358,73 @@ class Valiant:
         Returns:
             A new payload instance enhanced with reports.
 
+        Raises:
+            ValueError: If any of the requested reports aren't available in the list
+                        of loaded report plugins.
+        """
+        report_set = ReportSet()
+        for report_plugin in self._get_report_plugins(reports):
+            report_set.add_report(
+                report_plugin.run(
+                    configuration_dir=self.configuration_dir,
+                    package_metadata=payload.package_metadata,
+                )
+            )
+
+        return payload.clone_with_reports(report_set)
+
+    def get_batch_reports(
+        self,
+        payloads: Sequence[PythonPackagePayload],
+        reports: Set[str] = None,
+        jobs: int = 1,
+    ) -> List[PythonPackagePayload]:
+        """Prepares the reports for a batch of packages.
+
+        Report plugins that provide a `prepare_reports` hook are called once
+        with all of the packages. Other plugins are called for each package,
+        using up to `jobs` worker threads.
+
+        Args:
+            payloads: Payloads generated by `get_package_metadata`
+            reports: A list of the specific reports to run.
+                     If no list is provided, all the configured reports are run.
+            jobs: The maximum number of packages to report on concurrently
+
+        Returns:
+            A new payload instance enhanced with reports for each package
+            (in the same order as `payloads`)
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        report_plugins = self._get_report_plugins(reports)
+        packages = [payload.package_metadata for payload in payloads]
+        report_sets = [ReportSet() for _ in payloads]
+
+        with ThreadPoolExecutor(
+            max_workers=jobs, thread_name_prefix="valiant-report"
+        ) as executor:
+            for report_plugin in report_plugins:
+                for report_set, report in zip(
+                    report_sets,
+                    self._run_report_plugin(report_plugin, packages, executor),
+                ):
+                    report_set.add_report(report)
+
+        return [
+            payload.clone_with_reports(report_set)
+            for payload, report_set in zip(payloads, report_sets)
+        ]
+
+    def _get_report_plugins(self, reports: Optional[Set[str]]) -> List[PluginWrapper]:
+        """Looks up the requested (or default) report plugins.
+
+        Args:
+            reports: The names of the reports (None for the default reports)
+
+        Returns:
+            The report plugins
+
         Raises:
             ValueError: If any of the requested reports aren't available in the list
                         of loaded report plugins.
@@ -272,17 +437,241 @@ class Valiant:
                 f"of the loaded report plugins ({self.loaded_report_plugin_names})"
             )
 
-        report_set = ReportSet()
+        report_plugins = []
         for report in report_list:
             report_plugin = self._report_plugins.get(report)
             if not report_plugin:
                 raise ValueError("")
+            report_plugins.append(report_plugin)
 
-            report_set.add_report(
-                report_plugin.run(
-                    configuration_dir=self.configuration_dir,
-                    package_metadata=payload.package_metadata,
+        return report_plugins
+
+    def _run_report_plugin(
+        self,
+        report_plugin: PluginWrapper,
+        packages: List[PackageMetadata],
+        executor: Executor,
+    ) -> List[Report]:
+        """Runs a report plugin for a batch of packages.
+
+        Args:
+            report_plugin: The report plugin
+            packages: The package metadata
+            executor: Runs per-package reports concurrently
+
+        Returns:
+            A report for each package
+
+        Raises:
+            ValueError: If a plugin doesn't provide a report for each package
+        """
+        if report_plugin.batched:
+            results = list(
+                report_plugin.run_batch(
+                    configuration_dir=self.configuration_dir, packages=packages
                 )
             )
+            if len(results) != len(packages):
+                raise ValueError(
+                    f"The {report_plugin.entry_point_name} report plugin prepared "
+                    f"{len(results)} reports for {len(packages)} packages."
+                )
+            return results
 
-        return payload.clone_with_reports(report_set)
+        return list(
+            executor.map(
+                lambda package_metadata: report_plugin.run(
+                    configuration_dir=self.configuration_dir,
+                    package_metadata=package_metadata,
+                ),
+                packages,
+            )
+        )
+
+    def audit_packages(
+        self,
+        packages: Sequence[Tuple[str, str]],
+        reports: Set[str] = None,
+        jobs: int = 1,
+    ) -> List[PythonPackagePayload]:
+        """Gathers the metadata and reports for a list of packages.
+
+        Package metadata is fetched by a pool of up to `jobs` worker threads.
+        The reports are then prepared for the whole list at once (see
+        `get_batch_reports`). The returned list is always in the same order
+        as `packages`.
+
+        Args:
+            packages: A sequence of (name, version) tuples
+            reports: A list of the specific reports to run.
+                     If no list is provided, all the configured reports are run.
+            jobs: The maximum number of packages to process concurrently
+
+        Returns:
+            A payload (with reports) for each package
+
+        Raises:
+            ValueError: If `jobs` is less than 1
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        if jobs < 1:
+            raise ValueError(f"The number of jobs must be at least 1 (got {jobs}).")
+
+        def metadata(package: Tuple[str, str]) -> PythonPackagePayload:
+            name, version = package
+            return self.get_package_metadata(package_name=name, package_version=version)
+
+        if jobs == 1:
+            payloads = [metadata(package) for package in packages]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=jobs, thread_name_prefix="valiant-audit"
+            ) as executor:
+                futures = [executor.submit(metadata, package) for package in packages]
+                try:
+                    payloads = [future.result() for future in futures]
+                finally:
+                    # Don't keep working through the list once a package has failed
+                    for future in futures:
+                        future.cancel()
+
+        return self.get_batch_reports(payloads, reports=reports, jobs=jobs)
+
+    def warm_cache(
+        self,
+        packages: Sequence[Tuple[str, str]],
+        jobs: int = 8,
+    ) -> List[Tuple[str, str, Optional[Exception]]]:
+        """Fetches the metadata for a list of packages into the metadata cache.
+
+        Packages that can't be fetched don't stop the others from being cached.
+
+        Args:
+            packages: A sequence of (name, version) tuples
+            jobs: The maximum number of packages to fetch concurrently
+
+        Returns:
+            A (name, version, error) tuple for each package - the error is
+            None if the package was cached
+
+        Raises:
+            ValueError: If `jobs` is less than 1
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        if jobs < 1:
+            raise ValueError(f"The number of jobs must be at least 1 (got {jobs}).")
+
+        def warm(package: Tuple[str, str]) -> Tuple[str, str, Optional[Exception]]:
+            name, version = package
+            try:
+                self.get_package_metadata(package_name=name, package_version=version)
+            except Exception as e:
+                return name, version, e
+            return name, version, None
+
+        try:
+            with ThreadPoolExecutor(
+                max_workers=jobs, thread_name_prefix="valiant-warm"
+            ) as executor:
+                return list(executor.map(warm, packages))
+        finally:
+            self.save_cache_stats()
+
+    def save_cache_stats(self) -> None:
+        """Adds this run's metadata cache hits and misses to the saved totals."""
+        if self._metadata_cache:
+            self._metadata_cache.save_stats()
+
+    async def get_package_metadata_async(
+        self,
+        package_name: str,
+        package_version: str,
+        repository_name: Optional[str] = None,
+    ) -> PythonPackagePayload:
+        """Gets the metadata for the requested package using asyncio.
+
+        Without a `repository_name`, packages are looked up using the
+        configured `repository_lookup` mode.
+
+        Args:
+            package_name: The package name
+            package_version: The package version
+            repository_name: The name(key) for the repository to use
+
+        Returns:
+            A payload with the package metadata.
+        """
+        if not repository_name and self._config.repository_lookup_mode != "single":
+            metadata = await self.async_repository_lookup.show(
+                package_name, package_version
+            )
+            return PythonPackagePayload(
+                repository_base_url=metadata.repository_url,
+                package_name=package_name,
+                package_version=package_version,
+                package_metadata=metadata,
+            )
+
+        repo_config = self._get_repository_configuration(repository_name)
+        repo = self._repo_factory.get_async_repository(repo_config)
+
+        metadata = await repo.show(package_name, package_version)
+
+        return PythonPackagePayload(
+            repository_base_url=repo_config.base_url,
+            package_name=package_name,
+            package_version=package_version,
+            package_metadata=metadata,
+        )
+
+    async def audit_packages_async(
+        self,
+        packages: Sequence[Tuple[str, str]],
+        reports: Set[str] = None,
+        concurrency: int = 10,
+    ) -> List[PythonPackagePayload]:
+        """Gathers the metadata and reports for a list of packages using asyncio.
+
+        Package metadata is fetched on the running event loop with up to
+        `concurrency` lookups in flight. Report plugins are synchronous so
+        the reports are prepared for the whole list (see `get_batch_reports`)
+        in the loop's default executor to avoid blocking the loop.
+        The returned list is always in the same order as `packages`.
+
+        Args:
+            packages: A sequence of (name, version) tuples
+            reports: A list of the specific reports to run.
+                     If no list is provided, all the configured reports are run.
+            concurrency: The maximum number of packages to process at once
+
+        Returns:
+            A payload (with reports) for each package
+
+        Raises:
+            ValueError: If `concurrency` is less than 1
+        """
+        import asyncio
+
+        if concurrency < 1:
+            raise ValueError(f"The concurrency must be at least 1 (got {concurrency}).")
+
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def metadata(package: Tuple[str, str]) -> PythonPackagePayload:
+            name, version = package
+            async with semaphore:
+                return await self.get_package_metadata_async(
+                    package_name=name, package_version=version
+                )
+
+        payloads = await asyncio.gather(*[metadata(package) for package in packages])
+        return await loop.run_in_executor(
+            None, self.get_batch_reports, list(payloads), reports, concurrency
+        )
+
+    async def close_async(self) -> None:
+        """Releases the resources held by async repositories."""
+        await self._repo_factory.close_async_repositories()
@@ -56,6 +56,80 @@ def test_no_default_repo(config_default_builder: ConfigBuilder) -> None:  # noqa
         get_config_instance(config_default_builder)
 
 
+def test_repository_lookup_order(config_default_builder: ConfigBuilder) -> None:
+    """Lookups use the default repository first unless an order is given."""
+    from valiant.config.source import MappingSource
+
+    repos = {
+        "mirror": {"name": "mirror", "base_url": "https://mirror.example.com/pypi"},
+        "pypi": {"name": "pypi", "base_url": "https://pypi.org/pypi"},
+    }
+    config_default_builder.add_source(
+        MappingSource(
+            {
+                "tool": {
+                    "valiant": {
+                        "repository_configurations": repos,
+                        "repository_lookup": {"mode": "fallback"},
+                    }
+                }
+            }
+        )
+    )
+    c = get_config_instance(config_default_builder)
+    assert c.repository_lookup_mode == "fallback"
+    assert [r.name for r in c.repository_lookup_configurations] == ["pypi", "mirror"]
+
+    config_default_builder.add_source(
+        MappingSource(
+            {
+                "tool": {
+                    "valiant": {
+                        "repository_lookup": {
+                            "mode": "hedged",
+                            "repositories": ["mirror", "pypi"],
+                        }
+                    }
+                }
+            }
+        )
+    )
+    c = get_config_instance(config_default_builder)
+    assert [r.name for r in c.repository_lookup_configurations] == ["mirror", "pypi"]
+
+
+def test_bad_repository_lookup(config_default_builder: ConfigBuilder) -> None:
+    """Expect failure for an unknown lookup mode or repository."""
+    from valiant.config.source import MappingSource
+
+    config_default_builder.add_source(
+        MappingSource({"tool": {"valiant": {"repository_lookup": {"mode": "random"}}}})
+    )
+    with pytest.raises(ValueError):
+        get_config_instance(config_default_builder)
+
+    config_default_builder.add_source(
+        MappingSource(
+            {"tool": {"valiant": {"repository_lookup": {"repositories": ["nope"]}}}}
+        )
+    )
+    with pytest.raises(ValueError):
+        get_config_instance(config_default_builder)
+
+
+def test_requests_cache_deprecated(config_default_builder: ConfigBuilder) -> None:
+    """The old requests_cache setting is ignored with a warning."""
+    from valiant.config.source import MappingSource
+
+    config_default_builder.add_source(
+        MappingSource(
+            {"tool": {"valiant": {"requests_cache": {"expire_after": 86400}}}}
+        )
+    )
+    with pytest.warns(DeprecationWarning):
+        get_config_instance(config_default_builder)
+
+
 """Start: Tests for Config.prepare_repository_configurations"""
 
 
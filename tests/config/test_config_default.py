@@ -38,8 +38,6 @@ def test_default_config(
     valiant_version: str,
 ) -> None:
     """Basic config test making sure the defaults come through correctly."""
-    from string import Template
-
     c = get_config_instance(config_default_builder)
 
     assert c.configuration_dir == tmp_path / "user_config_dir"
@@ -64,17 +62,24 @@ def test_default_config(
     # Logging
     assert not c.logging_configuration_file
 
-    # Requests cache
-    assert c.requests_cache["backend"] == "sqlite"
-    assert c.requests_cache["expire_after"] == 86400
-    assert (
-        Template(str(c.requests_cache["file"])).substitute(
-            log_dir=c.log_dir,
-            cache_dir=c.cache_dir,
-            configuration_dir=c.configuration_dir,
-        )
-        == f"{c.cache_dir}/{valiant_app_name}-{valiant_version}-requests-cache"
+    # The requests cache is no longer used
+    assert not c.requests_cache
+
+    # Metadata cache
+    assert c.metadata_cache["backend"] == "sqlite"
+    assert c.metadata_cache["max_size"] == 512 * 1024 * 1024
+    assert c.metadata_cache["compression"] == "auto"
+    assert c.metadata_cache["expire_after"] == 86400
+    assert not c.metadata_cache["stale_while_revalidate"]
+    assert c.metadata_cache_file == (
+        c.cache_dir / f"{valiant_app_name}-{valiant_version}-metadata-cache.sqlite"
     )
+    assert c.metadata_store_dir == c.cache_dir / f"{valiant_app_name}-metadata-store"
+
+    # Repository lookups
+    assert c.repository_lookup_mode == "single"
+    assert c.repository_lookup_configurations == [pypi_repo]
+    assert c.report_configurations == {}
 
 
 def test_default_config_to_dict(
@@ -110,12 +115,14 @@ def test_default_config_to_dict(
     # Logging
     assert not d["logging_configuration_file"]
 
-    # Requests Cache
-    assert d["requests_cache"]["backend"] == "sqlite"
-    assert d["requests_cache"]["expire_after"] == 86400
+    # The requests cache is no longer used
+    assert "requests_cache" not in d
+
+    # Metadata Cache
+    assert d["metadata_cache"]["expire_after"] == 86400
     assert (
-        d["requests_cache"]["file"]
-        == f"$cache_dir/{valiant_app_name}-{valiant_version}-requests-cache"
+        d["metadata_cache"]["file"]
+        == f"$cache_dir/{valiant_app_name}-{valiant_version}-metadata-cache.sqlite"
     )
 
 
@@ -76,7 +76,6 @@ def test_explicit_file_overlay_from_valiant_config(
     datafiles: py.path,
 ) -> None:
     """Provides an explicit TOML source to overlay the default config."""
-    from string import Template
     from valiant.config.source import TomlSource
 
     config_default_builder.add_source(
@@ -107,17 +106,14 @@ def test_explicit_file_overlay_from_valiant_config(
     # Logging
     assert not c.logging_configuration_file
 
-    # Requests cache
-    assert c.requests_cache["backend"] == "sqlite"
-    assert c.requests_cache["expire_after"] == 86400
-    assert (
-        Template(str(c.requests_cache["file"])).substitute(
-            log_dir=c.log_dir,
-            cache_dir=c.cache_dir,
-            configuration_dir=c.configuration_dir,
-        )
-        == f"{c.cache_dir}/{valiant_app_name}-{valiant_version}-requests-cache"
-    )
+    # The requests cache is no longer used
+    assert not c.requests_cache
+
+    # Metadata cache
+    assert c.metadata_cache["backend"] == "sqlite"
+    assert c.metadata_cache["max_size"] == 512 * 1024 * 1024
+    assert c.metadata_cache["expire_after"] == 86400
+    assert c.metadata_cache_file == c.cache_dir / "valiant-0.2.4-metadata-cache.sqlite"
 
 
 @pytest.mark.datafiles(os.path.join(FIXTURE_DIR, "logging.conf"))
@@ -38,7 +38,6 @@ def test_valiant_default_config_builder(
     valiant_version: str,
 ) -> None:
     """Tests the config builder with no config file overlays."""
-    from string import Template
     from valiant.config.util import create_valiant_builder
     from .util import get_config_instance
 
@@ -69,16 +68,14 @@ def test_valiant_default_config_builder(
     # Logging
     assert not c.logging_configuration_file
 
-    # Requests cache
-    assert c.requests_cache["backend"] == "sqlite"
-    assert c.requests_cache["expire_after"] == 86400
-    assert (
-        Template(str(c.requests_cache["file"])).substitute(
-            log_dir=c.log_dir,
-            cache_dir=c.cache_dir,
-            configuration_dir=c.configuration_dir,
-        )
-        == f"{c.cache_dir}/{valiant_app_name}-{valiant_version}-requests-cache"
+    # The requests cache is no longer used
+    assert not c.requests_cache
+
+    # Metadata cache
+    assert c.metadata_cache["backend"] == "sqlite"
+    assert c.metadata_cache["max_size"] == 512 * 1024 * 1024
+    assert c.metadata_cache_file == (
+        c.cache_dir / f"{valiant_app_name}-{valiant_version}-metadata-cache.sqlite"
     )
 
 
@@ -24,18 +24,42 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 import os
 
 from pathlib import Path
-from typing import Generator
+from typing import Generator, List
 
 import pytest
 
 from _pytest.config import Config
+from _pytest.config.argparsing import Parser
 from _pytest.fixtures import FixtureRequest
+from _pytest.nodes import Item
 
 from . import MonkeyPatch
 
 
+def pytest_addoption(parser: Parser) -> None:  # noqa: D103
+    parser.addoption(
+        "--benchmark", action="store_true", default=False, help="Run benchmarks."
+    )
+
+
 def pytest_configure(config: Config) -> None:  # noqa: D103
     config.addinivalue_line("markers", "e2e: mark as end-to-end test.")
+    config.addinivalue_line(
+        "markers",
+        "benchmark: mark as a benchmark (run with `--benchmark -s` to see timings).",
+    )
+
+
+def pytest_collection_modifyitems(  # noqa: D103
+    config: Config, items: List[Item]
+) -> None:
+    if config.getoption("--benchmark"):
+        return
+
+    skip = pytest.mark.skip(reason="Benchmarks only run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
 
 
 @pytest.fixture
@@ -98,8 +122,6 @@ def no_requests(monkeypatch):  # noqa: ANN001, ANN201
 
     # monkeypatch.delattr("requests.sessions.Session.request")
 
-    monkeypatch.setattr("requests_cache.install_cache", lambda *a, **kw: None)
-
 
 @pytest.fixture(autouse=True)
 def override_appdirs(monkeypatch: MonkeyPatch, tmp_path: Path):  # noqa: ANN001, ANN201
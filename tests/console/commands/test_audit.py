@@ -19,6 +19,8 @@ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
 IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
+from typing import Any
+
 import py
 import pytest
 
@@ -137,3 +139,30 @@ def test_cli_audit_toml(app: Cli, datafiles: py.path) -> None:
         assert "safety" in rep["reports"]
         assert "spdx" in rep["reports"]
         assert "basic" in rep["reports"]
+
+
+@pytest.mark.datafiles(TEST_FILE_DIR / "requirements-small.txt")
+def test_cli_audit_jobs(app: Cli, datafiles: py.path, monkeypatch: Any) -> None:
+    """Test that the `--jobs` option is handed through to the audit."""
+    from valiant import Valiant
+
+    calls = []
+
+    def mock_audit(self, packages, reports=None, jobs=1):  # noqa: ANN
+        calls.append((packages, jobs))
+        return []
+
+    monkeypatch.setattr(Valiant, "audit_packages", mock_audit)
+
+    command = app.find("audit")
+    command_tester = CommandTester(command)
+    result = command_tester.execute(
+        f"--jobs 4 {datafiles / 'requirements-small.txt'} -o json"
+    )
+
+    assert result == 0
+    assert len(calls) == 1
+    packages, jobs = calls[0]
+    assert jobs == 4
+    assert packages[0] == ("click", "7.1.1")
+    assert len(packages) == 7
@@ -0,0 +1,148 @@
+"""Test the cache commands.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import json
+
+from pathlib import Path
+from typing import Any, Generator
+
+import pytest
+
+from cleo import ApplicationTester
+from valiant.console import Cli
+from valiant.console.commands.base_command import BaseCommand
+from valiant.console.commands.cache import parse_duration, parse_size
+
+from ...repositories.pypi import FIXTURE_DIR
+from ...repositories.pypi.warehouse import FakeWarehouse
+
+
+@pytest.fixture
+def warehouse() -> Generator[FakeWarehouse, None, None]:
+    """Runs a local fake Warehouse server serving flask."""
+    server = FakeWarehouse().start()  # noqa: DAR301
+    server.add_package_file("flask", "1.1.1", Path(FIXTURE_DIR / "flask-1.1.1.json"))
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def config_file(tmp_path: Path, warehouse: FakeWarehouse, monkeypatch: Any) -> Path:
+    """A config file using the fake Warehouse (and a fresh Valiant instance)."""
+    monkeypatch.setattr(BaseCommand, "_BaseCommand__valiant", None)
+    config = tmp_path / "valiant.toml"
+    config.write_text(
+        f"""
+[tool.valiant]
+default_repository = "fake"
+cache_dir = "{tmp_path / 'cache'}"
+
+[tool.valiant.repository_configurations.fake]
+name = "fake"
+base_url = "{warehouse.base_url}"
+repository_type = "warehouse"
+"""
+    )
+    return config  # noqa: DAR201
+
+
+def _run(app: Cli, command: str, args: str) -> Any:
+    tester = ApplicationTester(app)
+    result = tester.execute(f"cache {command} {args}")
+    return result, tester.io.fetch_output()
+
+
+def test_parse_units() -> None:
+    """Durations and sizes can be given with units."""
+    assert parse_duration("90") == 90
+    assert parse_duration("12h") == 12 * 3600
+    assert parse_duration("7d") == 7 * 86400
+    assert parse_size("1024") == 1024
+    assert parse_size("512M") == 512 * 1024 * 1024
+    assert parse_size("1.5kb") == 1536
+
+    with pytest.raises(ValueError):
+        parse_duration("soon")
+    with pytest.raises(ValueError):
+        parse_size("-1G")
+
+
+def test_cli_cache_warm_stats_prune(
+    app: Cli,
+    config_file: Path,
+    tmp_path: Path,
+    warehouse: FakeWarehouse,
+) -> None:
+    """Warm the cache then check the stats and prune it."""
+    requirements = tmp_path / "requirements.txt"
+    requirements.write_text("flask==1.1.1\nmissing==1.0\n")
+
+    result, output = _run(app, "warm", f"-c {config_file} -o json {requirements}")
+    assert result == 1
+    output = json.loads(output)
+    assert output["cached"] == 1
+    assert [f["name"] for f in output["failed"]] == ["missing"]
+
+    # The second run doesn't need the network
+    requests = len(warehouse.requests)
+    requirements.write_text("flask==1.1.1\n")
+    result, _ = _run(app, "warm", f"-c {config_file} {requirements}")
+    assert result == 0
+    assert len(warehouse.requests) == requests
+
+    result, output = _run(app, "stats", f"-c {config_file} -o json")
+    assert result == 0
+    stats = json.loads(output)
+    assert stats["backend"] == "sqlite"
+    assert stats["entries"] == 1
+    assert stats["missing_entries"] == 1
+    assert stats["size"] > 0
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["stored_ages"]["1h"] == 1
+    assert stats["store"]["refs"] == stats["store"]["objects"] == 1
+
+    result, output = _run(app, "stats", f"-c {config_file}")
+    assert "Hit rate: 50.0%" in output
+    assert "Store: 1 records" in output
+
+    result, output = _run(app, "prune", f"-c {config_file} -o json --max-size 0")
+    assert result == 0
+    assert json.loads(output)["removed"] == 2
+    assert json.loads(output)["store_removed"] == {
+        "versions": 0,
+        "refs": 0,
+        "objects": 0,
+    }
+
+    result, output = _run(app, "prune", f"-c {config_file} -o json --max-age 0")
+    assert result == 0
+    assert json.loads(output)["store_removed"]["refs"] == 1
+
+    # The hit/miss totals are kept
+    result, output = _run(app, "stats", f"-c {config_file} -o json")
+    stats = json.loads(output)
+    assert stats["entries"] == stats["missing_entries"] == 0
+    assert stats["hits"] == 1
+
+    result, output = _run(app, "prune", f"-c {config_file}")
+    assert result == 1
@@ -0,0 +1,262 @@
+"""Test the OSV report plugin.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import json
+import zipfile
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from valiant.package import PackageCoordinates
+from valiant.plugins.reports.osv import OsvIndex, OsvReportPlugin
+from valiant.reports import FindingCategory, FindingLevel
+
+
+ADVISORIES: List[Dict[str, Any]] = [
+    {
+        "id": "PYSEC-2020-1",
+        "summary": "Remote code execution",
+        "details": "All the details.",
+        "aliases": ["CVE-2020-0001"],
+        "modified": "2020-06-01T00:00:00Z",
+        "affected": [
+            {
+                "package": {"ecosystem": "PyPI", "name": "Fake_Lib"},
+                "ranges": [
+                    {
+                        "type": "ECOSYSTEM",
+                        "events": [
+                            {"introduced": "0"},
+                            {"fixed": "1.0"},
+                            {"introduced": "2.0"},
+                            {"last_affected": "2.1"},
+                        ],
+                    },
+                    {"type": "GIT", "events": [{"introduced": "abc123"}]},
+                ],
+                "versions": ["0.1", "0.9", "2.0", "2.1"],
+            }
+        ],
+    },
+    {
+        "id": "PYSEC-2021-2",
+        "details": "Still open.",
+        "affected": [
+            {
+                "package": {"ecosystem": "PyPI", "name": "fake-lib"},
+                "ranges": [{"type": "ECOSYSTEM", "events": [{"introduced": "3.0"}]}],
+            },
+            {
+                "package": {"ecosystem": "npm", "name": "other-lib"},
+                "ranges": [{"type": "ECOSYSTEM", "events": [{"introduced": "0"}]}],
+            },
+        ],
+    },
+    {
+        "id": "PYSEC-2021-3",
+        "summary": "Listed versions",
+        "affected": [
+            {
+                "package": {"ecosystem": "PyPI", "name": "other.lib"},
+                "ranges": [{"type": "GIT", "events": [{"introduced": "abc123"}]}],
+                "versions": ["1.0", "1.1"],
+            }
+        ],
+    },
+    {
+        "id": "PYSEC-2021-4",
+        "withdrawn": "2021-01-01T00:00:00Z",
+        "affected": [
+            {
+                "package": {"ecosystem": "PyPI", "name": "other-lib"},
+                "ranges": [{"type": "ECOSYSTEM", "events": [{"introduced": "0"}]}],
+            }
+        ],
+    },
+]
+
+
+@pytest.fixture
+def osv_dir(tmp_path: Path) -> Path:
+    """An OSV dump as a directory of JSON files."""
+    source = tmp_path / "osv"
+    (source / "PyPI").mkdir(parents=True)
+    for advisory in ADVISORIES:
+        (source / "PyPI" / f"{advisory['id']}.json").write_text(json.dumps(advisory))
+    (source / "PyPI" / "broken.json").write_text("{oops")
+    return source
+
+
+@pytest.fixture
+def osv_zip(tmp_path: Path) -> Path:
+    """An OSV dump as a zip file."""
+    source = tmp_path / "all.zip"
+    with zipfile.ZipFile(source, "w") as archive:
+        for advisory in ADVISORIES:
+            archive.writestr(f"{advisory['id']}.json", json.dumps(advisory))
+    return source
+
+
+@pytest.fixture(autouse=True)
+def reset_plugin(monkeypatch: Any) -> None:
+    """Clears the plugin's configuration and open indexes."""
+    monkeypatch.setattr(OsvReportPlugin, "configuration", {})
+    monkeypatch.setattr(OsvReportPlugin, "cache_dir", None)
+    monkeypatch.setattr(OsvReportPlugin, "_indexes", {})
+
+
+@dataclass
+class MockPackage:
+    """A small pkg definition."""
+
+    name: str = "fake-lib"
+    version: str = "x.y.z"
+    repository_url: str = "http://repo.example.com"
+
+    @property
+    def coordinates(self) -> PackageCoordinates:  # noqa:D102
+        return PackageCoordinates(
+            name=self.name, version=self.version, repository_url=self.repository_url
+        )
+
+
+def _ids(index: OsvIndex, name: str, version: str) -> List[str]:
+    return [index.advisory(offset)["id"] for offset in index.lookup(name, version)]
+
+
+@pytest.mark.parametrize(
+    "name,version,expected",
+    [
+        ("fake-lib", "0.1", ["PYSEC-2020-1"]),
+        ("FAKE.lib", "0.9", ["PYSEC-2020-1"]),
+        ("fake-lib", "1.0", []),
+        ("fake-lib", "1.5", []),
+        ("fake-lib", "2.0", ["PYSEC-2020-1"]),
+        ("fake-lib", "2.1", ["PYSEC-2020-1"]),
+        ("fake-lib", "2.1.1", []),
+        ("fake-lib", "3.0", ["PYSEC-2021-2"]),
+        ("fake-lib", "10.0", ["PYSEC-2021-2"]),
+        ("fake-lib", "not-a-version", []),
+        ("other-lib", "1.0", ["PYSEC-2021-3"]),
+        ("other-lib", "1.0.0", ["PYSEC-2021-3"]),
+        ("other-lib", "1.2", []),
+        ("unknown", "1.0", []),
+    ],
+)
+def test_lookup(osv_dir: Path, name: str, version: str, expected: List[str]) -> None:
+    """Versions are matched against the affected ranges."""
+    index = OsvIndex.load(osv_dir)
+    assert _ids(index, name, version) == expected
+
+
+def test_index_file(osv_dir: Path, osv_zip: Path, tmp_path: Path) -> None:
+    """The index is written once and rebuilt when the source changes."""
+    path = tmp_path / "cache" / "osv-index.bin"
+
+    index = OsvIndex.load(osv_zip, path)
+    assert len(index) == 2
+    assert index.advisory_count == 3
+    assert _ids(index, "fake-lib", "0.1") == ["PYSEC-2020-1"]
+    advisory = index.advisory(index.lookup("fake-lib", "0.1")[0])
+    assert advisory["aliases"] == ["CVE-2020-0001"]
+    assert "affected" not in advisory
+    index.close()
+
+    written = path.stat().st_mtime_ns
+    OsvIndex.load(osv_zip, path).close()
+    assert path.stat().st_mtime_ns == written
+
+    index = OsvIndex.load(osv_dir, path)
+    assert index.fingerprint == OsvIndex.source_fingerprint(osv_dir)
+    assert _ids(index, "fake-lib", "3.0") == ["PYSEC-2021-2"]
+    index.close()
+
+    path.write_bytes(b"rubbish")
+    assert len(OsvIndex.load(osv_dir, path)) == 2
+
+
+def test_bad_source(tmp_path: Path) -> None:
+    """Sources must be a directory or zip file."""
+    source = tmp_path / "advisories.txt"
+    source.write_text("nope")
+    with pytest.raises(ValueError):
+        OsvIndex.load(source)
+
+
+def test_report_provider_details() -> None:
+    """Basic provider check."""
+    rpd = OsvReportPlugin.report_provider_details()
+    assert rpd.name == "osv"
+    assert rpd.display_name == "OSV"
+    assert OsvReportPlugin.batched()
+
+
+def test_not_configured() -> None:
+    """Without a source there's nothing to report."""
+    report = OsvReportPlugin.prepare_report(MockPackage(version="0.1"), Path())
+    assert report.all_findings == []
+
+
+@pytest.mark.parametrize("name,content", [("missing", None), ("bad.txt", "nope")])
+def test_unreadable_source(tmp_path: Path, name: str, content: Optional[str]) -> None:
+    """A missing or unreadable source is treated like no source."""
+    source = tmp_path / name
+    if content is not None:
+        source.write_text(content)
+    OsvReportPlugin.configure({"source": str(source)}, cache_dir=tmp_path / "osv")
+
+    assert OsvReportPlugin.index() is None
+    report = OsvReportPlugin.prepare_report(MockPackage(version="0.1"), Path())
+    assert report.all_findings == []
+
+
+def test_generate_reports(osv_zip: Path, tmp_path: Path) -> None:
+    """Findings are reported for each affected package."""
+    OsvReportPlugin.configure({"source": str(osv_zip)}, cache_dir=tmp_path / "osv")
+
+    reports = OsvReportPlugin.prepare_reports(
+        [
+            MockPackage(version="0.1"),
+            MockPackage(version="1.5"),
+            MockPackage("other-lib", "1.1"),
+        ],
+        Path(),
+    )
+    assert [len(r.findings) for r in reports] == [1, 0, 1]
+    assert (tmp_path / "osv" / "osv-index.bin").exists()
+
+    f = reports[0].all_findings[0]
+    assert f.id == "OSV001"
+    assert f.coordinates == PackageCoordinates(
+        name="fake-lib", version="0.1", repository_url="http://repo.example.com"
+    )
+    assert f.title == "Vulnerability found"
+    assert f.message == "Remote code execution"
+    assert f.level == FindingLevel.PRIORITY
+    assert f.category == FindingCategory.SECURITY.value
+    assert f.url == "https://osv.dev/vulnerability/PYSEC-2020-1"
+    assert f.data["aliases"] == ["CVE-2020-0001"]
+
+    assert reports[2].all_findings[0].message == "Listed versions"
+    assert OsvReportPlugin.index() is OsvReportPlugin.index()
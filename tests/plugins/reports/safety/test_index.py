@@ -0,0 +1,147 @@
+"""Test the Safety database index.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from packaging.specifiers import SpecifierSet
+from valiant.plugins.reports.safety import SafetyDatabase, VulnerabilityIndex
+
+
+SPECIFIERS = [
+    "<1.0",
+    "<=1.0",
+    ">=1.2,<1.4",
+    ">1.2,<=1.4",
+    "==1.5",
+    "==1.5.*",
+    "~=2.1",
+    "!=2.0,<3.0",
+    ">=3.0a1,<3.0",
+    "",
+    "<1,>2",
+]
+
+VERSIONS = [
+    "0.1",
+    "1.0a1",
+    "1.0",
+    "1.0+local",
+    "1.0.post1",
+    "1.2",
+    "1.2.post1",
+    "1.3",
+    "1.4",
+    "1.4.1",
+    "1.5",
+    "1.5.0",
+    "1.5.2",
+    "2.0",
+    "2.1",
+    "2.9",
+    "3.0b1",
+    "3.0",
+    "not-a-version",
+]
+
+INSECURE = {
+    "$meta": {"advisory": "...", "timestamp": 1590000000},
+    "Fake_Lib": SPECIFIERS,
+}
+
+
+@pytest.mark.parametrize("version", VERSIONS)
+def test_lookup_matches_specifier_sets(version: str) -> None:
+    """Lookups agree with checking each specifier set in turn."""
+    index = VulnerabilityIndex.build(INSECURE)
+
+    expected = [s for s in SPECIFIERS if SpecifierSet(s).contains(version)]
+    assert index.lookup("fake-lib", version) == expected
+
+
+def test_lookup_names() -> None:
+    """Package names are normalised as per PEP 503."""
+    index = VulnerabilityIndex.build(INSECURE)
+
+    assert len(index) == 1
+    assert index.lookup("FAKE.lib", "0.1") == ["<1.0", "<=1.0", "!=2.0,<3.0", ""]
+    assert index.database_name("fake__lib") == "Fake_Lib"
+    assert index.database_name("other") is None
+    assert index.lookup("other", "0.1") == []
+
+
+def test_fingerprint() -> None:
+    """The database timestamp is preferred over a digest."""
+    assert VulnerabilityIndex.fingerprint_database(INSECURE) == "timestamp:1590000000"
+
+    fingerprint = VulnerabilityIndex.fingerprint_database({"a": ["<1"]})
+    assert fingerprint.startswith("sha256:")
+    assert fingerprint != VulnerabilityIndex.fingerprint_database({"a": ["<2"]})
+
+
+def test_save_and_load(tmp_path: Path) -> None:
+    """Saved indexes are only loaded for the same database."""
+    path = tmp_path / "index" / "safety-index.json"
+    index = VulnerabilityIndex.build(INSECURE)
+    index.save(path)
+
+    loaded = VulnerabilityIndex.load(path, index.fingerprint)
+    assert loaded is not None
+    for version in VERSIONS:
+        assert loaded.lookup("fake-lib", version) == index.lookup("fake-lib", version)
+
+    assert VulnerabilityIndex.load(path, "timestamp:0") is None
+    assert VulnerabilityIndex.load(tmp_path / "missing.json", index.fingerprint) is None
+
+    path.write_text("{not json")
+    assert VulnerabilityIndex.load(path, index.fingerprint) is None
+
+
+def test_database_reuses_saved_index(tmp_path: Path, monkeypatch: Any) -> None:
+    """The index is rebuilt only when the database changes."""
+    import valiant.plugins.reports.safety.database
+
+    insecure = dict(INSECURE)
+    monkeypatch.setattr(
+        valiant.plugins.reports.safety.database,
+        "fetch_database",
+        lambda **kwargs: insecure,
+    )
+
+    builds = []
+    build = VulnerabilityIndex.build.__func__  # type: ignore
+
+    def counting_build(cls: Any, db: Any) -> VulnerabilityIndex:
+        builds.append(db)
+        return build(cls, db)
+
+    monkeypatch.setattr(VulnerabilityIndex, "build", classmethod(counting_build))
+
+    SafetyDatabase(cache_dir=tmp_path).index
+    SafetyDatabase(cache_dir=tmp_path).index
+    assert len(builds) == 1
+    assert (tmp_path / "safety-index.json").exists()
+
+    insecure["$meta"] = {"timestamp": 1600000000}
+    assert SafetyDatabase(cache_dir=tmp_path).index.fingerprint.endswith("1600000000")
+    assert len(builds) == 2
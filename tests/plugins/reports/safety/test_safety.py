@@ -20,14 +20,57 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Dict, Generator, List
+
+import pytest
 
-from safety.safety import Vulnerability
 from valiant.package import PackageCoordinates
-from valiant.plugins.reports.safety import SafetyReportPlugin
+from valiant.plugins.reports.safety import SafetyDatabase, SafetyReportPlugin
 from valiant.reports import FindingCategory, FindingLevel
 
 
+INSECURE = {"fake-lib": ["<1.0"], "other-lib": ["<2.0", ">=3.0,<3.1"]}
+
+INSECURE_FULL = {
+    "$meta": {"cve": {"CVE-2020-0001": {"cvssv2": 5.0, "cvssv3": 7.5}}},
+    "fake-lib": [
+        {
+            "id": "pyup.io-12345",
+            "specs": ["<1.0"],
+            "advisory": "vadvisory",
+            "cve": "CVE-2020-0001",
+        },
+    ],
+    "other-lib": [
+        {"id": "pyup.io-1234", "specs": ["<2.0"], "advisory": "old", "cve": None},
+        {"id": "pyup.io-5678", "specs": [">=3.0,<3.1"], "advisory": "3.0", "cve": ""},
+    ],
+}
+
+
+@pytest.fixture(autouse=True)
+def safety_db(monkeypatch: Any) -> Generator[List[Dict], None, None]:
+    """Serves the test database and records each fetch."""
+    import valiant.plugins.reports.safety.database
+
+    fetches: List[Dict] = []
+
+    def mock_fetch(**kwargs):  # noqa:ANN
+        fetches.append(kwargs)
+        return INSECURE_FULL if kwargs["full"] else INSECURE
+
+    monkeypatch.setattr(
+        valiant.plugins.reports.safety.database, "fetch_database", mock_fetch
+    )
+    monkeypatch.setattr(SafetyReportPlugin, "configuration", {})
+    monkeypatch.setattr(SafetyReportPlugin, "cache_dir", None)
+    monkeypatch.delenv("SAFETY_API_KEY", raising=False)
+    monkeypatch.delenv("SAFETY_IGNORE_IDS", raising=False)
+    SafetyDatabase.reset()
+    yield fetches
+    SafetyDatabase.reset()
+
+
 @dataclass
 class MockPackage:
     """A small pkg definition."""
@@ -51,76 +94,83 @@ def test_report_provider_details() -> None:
     assert rpd.version == "1.10.3"
 
 
-def test_safety_parameters(monkeypatch: Any) -> None:
+def test_safety_parameters(monkeypatch: Any, safety_db: List[Dict]) -> None:
     """Test the envvars are passed into the safety check."""
-    import valiant.plugins.reports.safety.provider
-
-    def mock_check(*args, **kwargs):  # noqa:ANN
-        assert kwargs["key"] == "APIKEY"
-        assert kwargs["ignore_ids"] == ["1234"]
-        return []
-
-    monkeypatch.setattr(
-        valiant.plugins.reports.safety.provider, "safety_check", mock_check,
-    )
-
     monkeypatch.setenv("SAFETY_API_KEY", "APIKEY")
-    monkeypatch.setenv("SAFETY_IGNORE_IDS", "1234")
+    monkeypatch.setenv("SAFETY_IGNORE_IDS", "12345")
 
     rp = SafetyReportPlugin()
-    rp.prepare_report(MockPackage(), "")
+    report = rp.prepare_report(MockPackage(version="0.9"), "")
+    assert len(report.all_findings) == 0
+    assert safety_db[0]["key"] == "APIKEY"
 
 
 def test_safety_parameters_ignore_list(monkeypatch: Any) -> None:
     """Test the ignore list is broken up correctly."""
-    import valiant.plugins.reports.safety.provider
+    monkeypatch.setenv("SAFETY_IGNORE_IDS", "1234, 5678,1357")
 
-    def mock_check(*args, **kwargs):  # noqa:ANN
-        assert kwargs["key"] == "APIKEY"
-        assert kwargs["ignore_ids"] == ["1234", "5678", "1357"]
-        return []
+    assert SafetyReportPlugin.settings()["ignore_ids"] == ["1234", "5678", "1357"]
+
+    rp = SafetyReportPlugin()
+    assert len(rp.prepare_report(MockPackage("other-lib", "1.0"), "").findings) == 0
 
-    monkeypatch.setattr(
-        valiant.plugins.reports.safety.provider, "safety_check", mock_check,
-    )
 
+def test_safety_configuration(monkeypatch: Any, safety_db: List[Dict]) -> None:
+    """Test the report configuration overrides the envvars."""
     monkeypatch.setenv("SAFETY_API_KEY", "APIKEY")
-    monkeypatch.setenv("SAFETY_IGNORE_IDS", "1234,5678,1357")
+    monkeypatch.setenv("SAFETY_IGNORE_IDS", "1234")
 
-    rp = SafetyReportPlugin()
-    rp.prepare_report(MockPackage(), "")
+    SafetyReportPlugin.configure(
+        {"key": "CONFKEY", "db_mirror": "/tmp/db", "cache": True, "ignore_ids": []}
+    )
+
+    assert SafetyReportPlugin.settings() == {
+        "key": "CONFKEY",
+        "db_mirror": "/tmp/db",
+        "cached": True,
+        "ignore_ids": [],
+    }
 
+    report = SafetyReportPlugin.prepare_report(MockPackage("other-lib", "1.0"), "")
+    assert len(report.all_findings) == 1
+    assert safety_db[0]["key"] == "CONFKEY"
+    assert safety_db[0]["db"] == "/tmp/db"
+    assert safety_db[0]["cached"] is True
+
+
+def test_safety_database_fetched_once(safety_db: List[Dict]) -> None:
+    """The database is only fetched once across reports."""
+    assert SafetyReportPlugin.batched()
+
+    reports = SafetyReportPlugin.prepare_reports(
+        [
+            MockPackage("Fake_Lib", "0.1"),
+            MockPackage("fake-lib", "1.0"),
+            MockPackage("other-lib", "3.0.1"),
+            MockPackage("unknown", "1.0"),
+        ],
+        "",
+    )
+    assert [len(r.findings) for r in reports] == [1, 0, 1, 0]
+    assert reports[2].all_findings[0].data["vuln_id"] == "5678"
+
+    SafetyReportPlugin.prepare_report(MockPackage("other-lib", "0.1"), "")
+
+    assert [f["full"] for f in safety_db] == [False, True]
 
-def test_safety_generate_report(monkeypatch: Any) -> None:
+
+def test_safety_generate_report() -> None:
     """Test the generate_report method."""
     import json
-    import valiant.plugins.reports.safety.provider
-
-    def mock_check(*args, **kwargs):  # noqa:ANN
-        return [
-            Vulnerability(
-                name="vname",
-                spec="vspec",
-                version="vversion",
-                advisory="vadvisory",
-                vuln_id="12345",
-                cvssv2="",
-                cvssv3="",
-            )
-        ]
-
-    monkeypatch.setattr(
-        valiant.plugins.reports.safety.provider, "safety_check", mock_check,
-    )
 
     rp = SafetyReportPlugin()
-    report = rp.prepare_report(MockPackage(), "")
+    report = rp.prepare_report(MockPackage(version="0.9"), "")
     assert len(report.all_findings) == 1
 
     f = report.all_findings[0]
     assert f.id == "SAFETY001"
     assert f.coordinates == PackageCoordinates(
-        name="fake-lib", version="x.y.z", repository_url="http://repo.example.com"
+        name="fake-lib", version="0.9", repository_url="http://repo.example.com"
     )
     assert f.title == "Vulnerability found"
     assert f.message == "vadvisory"
@@ -128,11 +178,12 @@ def test_safety_generate_report(monkeypatch: Any) -> None:
     assert f.category == FindingCategory.SECURITY.value
     assert f.url == "https://github.com/pyupio/safety-db"
 
-    assert f.data["name"] == "vname"
-    assert f.data["spec"] == "vspec"
-    assert f.data["version"] == "vversion"
+    assert f.data["name"] == "fake-lib"
+    assert f.data["spec"] == "<1.0"
+    assert f.data["version"] == "0.9"
     assert f.data["advisory"] == "vadvisory"
     assert f.data["vuln_id"] == "12345"
+    assert f.data["cvssv3"] == 7.5
 
     assert f.to_dict()["level"] == FindingLevel.PRIORITY.value
 
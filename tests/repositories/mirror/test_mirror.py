@@ -0,0 +1,195 @@
+"""Test the local mirror repository.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+import shutil
+
+from pathlib import Path
+
+import py
+import pytest
+
+from valiant.repositories import (
+    PackageNotFoundException,
+    RepositoryConfiguration,
+    RepositoryFactory,
+)
+from valiant.repositories.mirror import (
+    AsyncLocalMirrorRepository,
+    LocalMirrorRepository,
+    MirrorIndex,
+)
+from valiant.repositories.mirror.index import INDEX_FILE
+
+from ..pypi import ALL_PKG_FILES
+
+
+@pytest.fixture
+def mirror(datafiles: py.path, tmp_path: Path) -> Path:
+    """A small mirror with per-version and project metadata."""
+    root = tmp_path / "mirror"
+    for name, version in [("flask", "0.1"), ("Django", "3.0.4"), ("six", "1.14.0")]:
+        target = root / name / version
+        target.mkdir(parents=True)
+        shutil.copy(str(datafiles / f"{name.lower()}-{version}.json"), target / "json")
+
+    shutil.copy(str(datafiles / "flask-1.1.1.json"), root / "flask" / "json")
+    return root
+
+
+@pytest.fixture
+def bandersnatch_mirror(datafiles: py.path, tmp_path: Path) -> Path:
+    """A bandersnatch `web` directory with JSON metadata for two projects."""
+    root = tmp_path / "web"
+    for d in ["json", "pypi/flask", "pypi/six", "simple/flask", "packages"]:
+        (root / d).mkdir(parents=True)
+
+    shutil.copy(str(datafiles / "flask-1.1.1.json"), root / "json" / "flask")
+    (root / "pypi" / "flask" / "json").symlink_to("../../json/flask")
+    # Older bandersnatch releases only wrote pypi/<project>/json
+    shutil.copy(str(datafiles / "six-1.14.0.json"), root / "pypi" / "six" / "json")
+    return root
+
+
+def _config(root: Path) -> RepositoryConfiguration:
+    return RepositoryConfiguration(
+        name="mirror", base_url=str(root), repository_type="mirror"
+    )
+
+
+def test_index_lookup() -> None:
+    """Lookups find every entry and nothing else."""
+    entries = [(f"Pkg_{i}", f"1.{i}", f"pkg/{i}/json") for i in range(500)]
+    entries.append(("pkg-0", None, "pkg/json"))
+    index = MirrorIndex(MirrorIndex.build(entries))
+
+    assert len(index) == 501
+    for i in range(500):
+        assert index.lookup(f"pkg-{i}", f"1.{i}") == f"pkg/{i}/json"
+    assert index.lookup("PKG.0", None) == "pkg/json"
+    assert index.lookup("pkg-1", "1.2") is None
+    assert index.lookup("other", None) is None
+
+
+def test_index_format() -> None:
+    """Data that isn't an index is rejected."""
+    with pytest.raises(ValueError):
+        MirrorIndex(b"{}")
+
+    with pytest.raises(ValueError):
+        MirrorIndex(b"X" * 64)
+
+
+@ALL_PKG_FILES
+def test_mirror_show(mirror: Path) -> None:
+    """Package versions are served from the mirror's index."""
+    repo = RepositoryFactory().get_repository(_config(mirror))
+    assert isinstance(repo, LocalMirrorRepository)
+
+    assert repo.show("django", "3.0.4").name == "Django"
+    assert (mirror / INDEX_FILE).is_file()
+    assert len(repo.index) == 4
+
+    assert repo.show("Flask", "0.1").version == "0.1"
+    # The latest version is served from the project metadata
+    assert repo.show("flask", "1.1.1").version == "1.1.1"
+
+    with pytest.raises(PackageNotFoundException):
+        repo.show("flask", "1.0")
+
+    with pytest.raises(PackageNotFoundException):
+        repo.show("missing", "1.0")
+
+
+@ALL_PKG_FILES
+def test_mirror_file_url(mirror: Path) -> None:
+    """The mirror can be configured with a file URL."""
+    config = RepositoryConfiguration(
+        name="mirror", base_url=mirror.as_uri(), repository_type="local"
+    )
+    assert LocalMirrorRepository(config).show("six", "1.14.0").version == "1.14.0"
+
+
+@ALL_PKG_FILES
+def test_mirror_updated(mirror: Path, datafiles: py.path) -> None:
+    """Files added after indexing are found."""
+    LocalMirrorRepository(_config(mirror)).index
+
+    target = mirror / "flask" / "1.1.1"
+    target.mkdir()
+    shutil.copy(str(datafiles / "flask-1.1.1.json"), target / "json")
+    (mirror / "flask" / "json").unlink()
+
+    repo = LocalMirrorRepository(_config(mirror))
+    assert repo.show("flask", "1.1.1").version == "1.1.1"
+    assert len(repo.index) == 4
+
+    # Delete the index to rebuild it
+    repo.close()
+    (mirror / INDEX_FILE).unlink()
+    assert len(LocalMirrorRepository(_config(mirror)).index) == 4
+
+
+def test_mirror_missing_dir(tmp_path: Path) -> None:
+    """A missing mirror directory fails lookups."""
+    repo = LocalMirrorRepository(_config(tmp_path / "nowhere"))
+    with pytest.raises(PackageNotFoundException):
+        repo.show("flask", "1.1.1")
+
+
+@ALL_PKG_FILES
+def test_async_mirror(mirror: Path) -> None:
+    """The mirror is available to asyncio audits."""
+    factory = RepositoryFactory()
+    repo = factory.get_async_repository(_config(mirror))
+    assert isinstance(repo, AsyncLocalMirrorRepository)
+
+    async def run() -> list:
+        try:
+            return await repo.show_many([("six", "1.14.0"), ("flask", "0.1")])
+        finally:
+            await factory.close_async_repositories()
+
+    assert [p.version for p in asyncio.run(run())] == ["1.14.0", "0.1"]
+
+
+@ALL_PKG_FILES
+def test_bandersnatch_mirror(bandersnatch_mirror: Path, datafiles: py.path) -> None:
+    """The latest versions are served from a bandersnatch mirror."""
+    repo = LocalMirrorRepository(_config(bandersnatch_mirror))
+
+    assert repo.show("Flask", "1.1.1").version == "1.1.1"
+    assert repo.show("six", "1.14.0").version == "1.14.0"
+    assert sorted(repo.index.lookup(n, None) or "" for n in ["flask", "six"]) == [
+        "json/flask",
+        "pypi/six/json",
+    ]
+    assert len(repo.index) == 2
+
+    # bandersnatch only keeps the project metadata
+    with pytest.raises(PackageNotFoundException):
+        repo.show("flask", "0.1")
+
+    # Projects added after indexing are found
+    shutil.copy(
+        str(datafiles / "django-3.0.4.json"), bandersnatch_mirror / "json" / "django"
+    )
+    assert repo.show("Django", "3.0.4").version == "3.0.4"
@@ -19,13 +19,35 @@ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
 IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
+from typing import Generator
+
 import pytest
 
 from valiant.repositories import RepositoryConfiguration
 from valiant.repositories.pypi import PyPiRepository
 
+from .warehouse import FakeWarehouse
+
 
 @pytest.fixture
 def pypi_config() -> RepositoryConfiguration:
     """Returns the default PyPi config."""
     return PyPiRepository.get_pypi_config()  # noqa:DAR201
+
+
+@pytest.fixture
+def warehouse() -> Generator[FakeWarehouse, None, None]:
+    """Runs a local fake Warehouse server for the test."""
+    server = FakeWarehouse().start()  # noqa: DAR301
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def warehouse_config(warehouse: FakeWarehouse) -> RepositoryConfiguration:
+    """A repository config pointing to the fake Warehouse server."""
+    return RepositoryConfiguration(  # noqa: DAR201
+        name="fake-warehouse",
+        base_url=warehouse.base_url,
+        repository_type="warehouse",
+    )
@@ -45,8 +45,8 @@ def test_data_load(
         def mock_get(*args, **kwargs):  # noqa: ANN
             return MockResponse(status_code=200, json_data=data)
 
-        # apply the monkeypatch for requests.get to mock_get
-        monkeypatch.setattr(requests, "get", mock_get)
+        # apply the monkeypatch for requests.Session.get to mock_get
+        monkeypatch.setattr(requests.Session, "get", mock_get)
 
         p = Path(data_file.basename)
         pname, _, pversion = p.stem.rpartition("-")
@@ -0,0 +1,135 @@
+"""Test the asyncio PyPi repository.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+
+from dataclasses import replace
+
+import py
+import pytest
+
+from valiant.repositories import (
+    PackageNotFoundException,
+    RepositoryConfiguration,
+    RepositoryFactory,
+)
+
+from . import ALL_PKG_FILES
+from .warehouse import FakeWarehouse
+
+
+pytest.importorskip("aiohttp")
+
+from valiant.repositories.pypi import AsyncPyPiRepository  # noqa: E402
+
+
+def _load_packages(warehouse: FakeWarehouse, datafiles: py.path) -> list:
+    packages = []
+    for data_file in sorted(datafiles.listdir()):
+        name, _, version = data_file.purebasename.rpartition("-")
+        warehouse.add_package_file(name, version, data_file)
+        packages.append((name, version))
+    return packages
+
+
+@ALL_PKG_FILES
+def test_show(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """Load a package over asyncio."""
+    _load_packages(warehouse, datafiles)
+    repo = AsyncPyPiRepository(warehouse_config)
+
+    async def run() -> None:
+        try:
+            pkg = await repo.show("flask", "1.1.1")
+            assert pkg.name == "Flask"
+            assert pkg.version == "1.1.1"
+        finally:
+            await repo.close()
+
+    asyncio.run(run())
+    assert "gzip" in warehouse.requests[0][1]["Accept-Encoding"]
+
+
+@ALL_PKG_FILES
+def test_show_many(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """Results come back in order and respect the connection limit."""
+    packages = _load_packages(warehouse, datafiles) * 3
+    repo = AsyncPyPiRepository(replace(warehouse_config, pool_maxsize=2))
+
+    async def run() -> list:
+        try:
+            return await repo.show_many(packages, concurrency=8)
+        finally:
+            await repo.close()
+
+    results = asyncio.run(run())
+
+    assert [r.version for r in results] == [v for _, v in packages]
+    assert warehouse.connections <= 2
+
+
+def test_not_found(
+    warehouse: FakeWarehouse, warehouse_config: RepositoryConfiguration
+) -> None:
+    """A missing package raises PackageNotFoundException."""
+    repo = AsyncPyPiRepository(warehouse_config)
+
+    async def run() -> None:
+        try:
+            await repo.show("FAKE", "3.14")
+        finally:
+            await repo.close()
+
+    with pytest.raises(PackageNotFoundException):
+        asyncio.run(run())
+
+
+def test_multiple_loops(
+    warehouse: FakeWarehouse, warehouse_config: RepositoryConfiguration
+) -> None:
+    """A repository can be reused from a new event loop."""
+    repo = AsyncPyPiRepository(warehouse_config)
+
+    for _ in range(2):
+        with pytest.raises(PackageNotFoundException):
+            asyncio.run(repo.show("FAKE", "3.14"))
+
+    asyncio.run(repo.close())
+
+
+def test_factory(pypi_config: RepositoryConfiguration) -> None:
+    """The factory hands out one async repository per configuration."""
+    factory = RepositoryFactory()
+    repo = factory.get_async_repository(pypi_config)
+
+    assert isinstance(repo, AsyncPyPiRepository)
+    assert factory.get_async_repository(pypi_config) is repo
+
+    with pytest.raises(ValueError):
+        factory.get_async_repository(replace(pypi_config, base_url="http://x"))
@@ -0,0 +1,193 @@
+"""Test the range-request artifact reader.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import hashlib
+import io
+import json
+import os
+import zipfile
+
+from pathlib import Path
+from typing import Any, List, Tuple
+
+import py
+import pytest
+
+from valiant.package import PackageMetadata
+from valiant.repositories import (
+    ArtifactDownloader,
+    HttpRangeFile,
+    RepositoryConfiguration,
+)
+from valiant.repositories.archive import RangeNotSupported
+from valiant.repositories.pypi import PyPiRepository
+
+from . import ALL_PKG_FILES
+from .warehouse import FakeWarehouse
+
+
+WHEEL = "Flask-1.1.1-py2.py3-none-any.whl"
+METADATA = "Flask-1.1.1.dist-info/METADATA"
+
+
+def _wheel() -> bytes:
+    """A wheel with a small METADATA file and a large (incompressible) module."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as wheel:
+        wheel.writestr("flask/big.py", os.urandom(1024 * 1024))
+        wheel.writestr(METADATA, "Metadata-Version: 2.1\nName: Flask\n")
+        wheel.writestr("Flask-1.1.1.dist-info/RECORD", "flask/big.py,,\n")
+    return buffer.getvalue()
+
+
+def _serve_wheel(warehouse: FakeWarehouse, datafiles: py.path) -> bytes:
+    with open(datafiles / "flask-1.1.1.json") as f:
+        data = json.load(f)
+
+    body = _wheel()
+    files_url = warehouse.base_url.replace("/pypi", "/files")
+    for entry in data["urls"]:
+        entry["url"] = f"{files_url}/{entry['filename']}"
+        entry["digests"]["sha256"] = hashlib.sha256(body).hexdigest()
+    warehouse.add_file(f"/files/{WHEEL}", body)
+    warehouse.add_document("/pypi/flask/1.1.1/json", data)
+    return body
+
+
+def _wheel_artifact(metadata: PackageMetadata):  # type: ignore
+    return next(a for a in metadata.artifacts if a.package_type == "bdist_wheel")
+
+
+@ALL_PKG_FILES
+def test_open_artifact_with_ranges(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+    tmp_path: Path,
+) -> None:
+    """Only the central directory and the members read are fetched."""
+    body = _serve_wheel(warehouse, datafiles)
+    downloader = ArtifactDownloader(tmp_path / "artifacts")
+    repo = PyPiRepository(warehouse_config, downloader=downloader)
+    metadata = repo.show("flask", "1.1.1")
+
+    with metadata.open_artifact(_wheel_artifact(metadata)) as wheel:
+        assert "Flask-1.1.1.dist-info/RECORD" in wheel.namelist()
+        assert wheel.read(METADATA).startswith(b"Metadata-Version: 2.1")
+        fetched = wheel.fp.bytes_fetched  # type: ignore
+
+    assert fetched < len(body) / 4
+    ranges = [h.get("Range") for p, h in warehouse.requests if p == f"/files/{WHEEL}"]
+    assert ranges and all(ranges)
+    assert downloader.stats["downloaded"] == 0
+
+
+@ALL_PKG_FILES
+def test_open_artifact_without_ranges(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+    tmp_path: Path,
+) -> None:
+    """The artifact is downloaded in full when ranges aren't supported."""
+    _serve_wheel(warehouse, datafiles)
+    warehouse.accept_ranges = False
+    downloader = ArtifactDownloader(tmp_path / "artifacts")
+    repo = PyPiRepository(warehouse_config, downloader=downloader)
+    metadata = repo.show("flask", "1.1.1")
+
+    with metadata.open_artifact(_wheel_artifact(metadata)) as wheel:
+        assert wheel.read(METADATA).startswith(b"Metadata-Version: 2.1")
+
+    assert downloader.stats["downloaded"] == 1
+
+
+def test_range_file_reads(warehouse: FakeWarehouse) -> None:
+    """Reads across fetched blocks return the right bytes."""
+    import requests
+
+    body = bytes(range(256)) * 100
+    warehouse.add_file("/files/data.bin", body)
+    url = warehouse.base_url.replace("/pypi", "/files/data.bin")
+
+    with requests.Session() as session:
+        f = HttpRangeFile(url, session, block_size=1000)
+        assert f.size == len(body)
+        assert f.requests == 1
+
+        f.seek(500)
+        assert f.read(2000) == body[500:2500]
+        f.seek(-800, os.SEEK_END)
+        assert f.read() == body[-800:]
+        f.seek(700)
+        assert f.read(300) == body[700:1000]
+
+        # The tail was fetched up front and the final reads were already cached
+        assert f.requests == 2
+
+        f.seek(-1500, os.SEEK_END)
+        assert f.read() == body[-1500:]
+        assert f.requests == 3
+
+
+class _ScriptedResponse:
+    def __init__(self, start: int, data: bytes, size: int):
+        self.status_code = 206
+        self.headers = {
+            "Content-Range": f"bytes {start}-{start + max(len(data), 1) - 1}/{size}"
+        }
+        self.content = data
+
+    def __enter__(self) -> "_ScriptedResponse":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+
+class _ScriptedSession:
+    """Answers range requests with a scripted list of (start, data) chunks."""
+
+    def __init__(self, size: int, chunks: List[Tuple[int, bytes]]):
+        self.size = size
+        self.chunks = chunks
+        self.requests = 0
+
+    def get(self, url: str, **kwargs: Any) -> _ScriptedResponse:
+        self.requests += 1
+        start, data = self.chunks[min(self.requests, len(self.chunks)) - 1]
+        return _ScriptedResponse(start, data, self.size)
+
+
+@pytest.mark.parametrize(
+    "chunk",
+    [(100, b""), (200, b"x" * 100)],
+    ids=["empty body", "later start"],
+)
+def test_range_file_unusable_response(chunk: Tuple[int, bytes]) -> None:
+    """A partial response that doesn't cover the position read is an error."""
+    session = _ScriptedSession(1000, [(900, b"t" * 100), chunk])
+    f = HttpRangeFile("https://files.example/data.bin", session)  # type: ignore
+
+    f.seek(100)
+    with pytest.raises(RangeNotSupported):
+        f.read(10)
+    assert session.requests == 2
@@ -0,0 +1,127 @@
+"""Test request coalescing in the PyPi repositories.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+import py
+import pytest
+
+from valiant.repositories import PackageNotFoundException, RepositoryConfiguration
+from valiant.repositories.pypi import PyPiRepository
+
+from . import ALL_PKG_FILES
+from .warehouse import FakeWarehouse
+
+
+@ALL_PKG_FILES
+def test_concurrent_duplicates(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """Concurrent lookups for the same version share a request and result."""
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-1.1.1.json")
+    warehouse.add_package_file("six", "1.14.0", datafiles / "six-1.14.0.json")
+    warehouse.delay = 0.2
+    repo = PyPiRepository(warehouse_config)
+    lookups = [("flask", "1.1.1"), ("Flask", "1.1.1"), ("six", "1.14.0")] * 4
+
+    with ThreadPoolExecutor(max_workers=len(lookups)) as executor:
+        results = list(executor.map(lambda p: repo.show(*p), lookups))
+
+    assert [r.version for r in results] == [v for _, v in lookups]
+    assert results[0] is results[1]
+    assert len(warehouse.requests) == 2
+    assert repo.fetch_stats["coalesced"] == len(lookups) - 2
+    assert repo.fetch_stats["requests_saved"] == len(lookups) - 2
+
+
+def test_concurrent_not_found(
+    warehouse: FakeWarehouse, warehouse_config: RepositoryConfiguration
+) -> None:
+    """Callers sharing a failed request all see the failure."""
+    warehouse.delay = 0.2
+    repo = PyPiRepository(warehouse_config)
+
+    def show() -> None:
+        with pytest.raises(PackageNotFoundException):
+            repo.show("FAKE", "3.14")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for f in [executor.submit(show) for _ in range(4)]:
+            f.result()
+
+    assert len(warehouse.requests) == 1
+
+
+@ALL_PKG_FILES
+def test_concurrent_project_mode(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """Concurrent lookups for a project share the project request."""
+    warehouse.add_package_file("flask", "0.1", datafiles / "flask-0.1.json")
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-1.1.1.json")
+    with open(datafiles / "flask-1.1.1.json", "rb") as f:
+        warehouse.documents["/pypi/flask/json"] = f.read()
+    warehouse.delay = 0.2
+    repo = PyPiRepository(replace(warehouse_config, metadata_fetch_mode="project"))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(
+            executor.map(lambda v: repo.show("flask", v), ["1.1.1", "0.1"] * 2)
+        )
+
+    assert [r.version for r in results] == ["1.1.1", "0.1"] * 2
+    assert sorted(p for p, _ in warehouse.requests) == [
+        "/pypi/flask/0.1/json",
+        "/pypi/flask/json",
+    ]
+
+
+@ALL_PKG_FILES
+def test_async_concurrent_duplicates(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """The asyncio repository also coalesces duplicate lookups."""
+    pytest.importorskip("aiohttp")
+    from valiant.repositories.pypi import AsyncPyPiRepository
+
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-1.1.1.json")
+    warehouse.delay = 0.1
+    repo = AsyncPyPiRepository(warehouse_config)
+
+    async def run() -> list:
+        try:
+            return await repo.show_many([("flask", "1.1.1")] * 6)
+        finally:
+            await repo.close()
+
+    results = asyncio.run(run())
+
+    assert len({id(r) for r in results}) == 1
+    assert len(warehouse.requests) == 1
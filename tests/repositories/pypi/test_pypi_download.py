@@ -19,13 +19,168 @@ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
 IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
+import hashlib
+import json
+
+from pathlib import Path
+from typing import Dict
+
+import py
 import pytest
+import requests
 
-from valiant.repositories import RepositoryConfiguration
+from valiant.package import ArtifactMetadataImpl
+from valiant.repositories import (
+    ArtifactDownloader,
+    RepositoryConfiguration,
+    ValidationError,
+)
 from valiant.repositories.pypi import PyPiRepository
 
+from . import ALL_PKG_FILES
+from .warehouse import FakeWarehouse
+
+
+def _serve_artifacts(
+    warehouse: FakeWarehouse, datafiles: py.path, name: str, version: str
+) -> Dict[str, bytes]:
+    """Serves the package metadata with its artifacts hosted by the warehouse."""
+    with open(datafiles / f"{name}-{version}.json") as f:
+        data = json.load(f)
+
+    files_url = warehouse.base_url.replace("/pypi", "/files")
+    contents = {}
+    for entry in data["urls"]:
+        body = f"{entry['filename']} content".encode() * 1000
+        contents[entry["filename"]] = body
+        entry["url"] = f"{files_url}/{entry['filename']}"
+        entry["digests"]["sha256"] = hashlib.sha256(body).hexdigest()
+        warehouse.add_file(f"/files/{entry['filename']}", body)
+
+    warehouse.add_document(f"/pypi/{name}/{version}/json", data)
+    return contents
+
+
+@ALL_PKG_FILES
+def test_download(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+    tmp_path: Path,
+) -> None:
+    """The preferred artifact is downloaded, verified and cached."""
+    contents = _serve_artifacts(warehouse, datafiles, "flask", "1.1.1")
+    downloader = ArtifactDownloader(tmp_path / "artifacts")
+    repo = PyPiRepository(warehouse_config, downloader=downloader)
+
+    path = repo.download("flask", "1.1.1")
+
+    assert path.name == "Flask-1.1.1-py2.py3-none-any.whl"
+    assert path.read_bytes() == contents[path.name]
+    assert path.parent.name == hashlib.sha256(contents[path.name]).hexdigest()
+    assert tmp_path / "artifacts" in path.parents
+
+    # A second download is served from the cache
+    assert repo.download("flask", "1.1.1") == path
+    assert downloader.stats == {
+        "downloaded": 1,
+        "skipped": 1,
+        "bytes": len(contents[path.name]),
+    }
+    paths = [p for p, _ in warehouse.requests]
+    assert paths.count(f"/files/{path.name}") == 1
+
+
+@ALL_PKG_FILES
+def test_download_many(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+    tmp_path: Path,
+) -> None:
+    """A batch of artifacts is downloaded in parallel."""
+    packages = [("flask", "1.1.1"), ("six", "1.14.0"), ("django", "3.0.4")]
+    for name, version in packages:
+        _serve_artifacts(warehouse, datafiles, name, version)
+    warehouse.delay = 0.1
+
+    repo = PyPiRepository(
+        warehouse_config, downloader=ArtifactDownloader(tmp_path / "artifacts", jobs=3)
+    )
+    paths = repo.download_many(packages)
+
+    assert [p.name.split("-")[0].lower() for p in paths] == ["flask", "six", "django"]
+    assert all(p.is_file() for p in paths)
+
+
+@ALL_PKG_FILES
+def test_download_digest_mismatch(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+    tmp_path: Path,
+) -> None:
+    """Artifacts that don't match their digest are discarded."""
+    _serve_artifacts(warehouse, datafiles, "flask", "1.1.1")
+    warehouse.add_file("/files/Flask-1.1.1-py2.py3-none-any.whl", b"tampered")
+
+    downloader = ArtifactDownloader(tmp_path / "artifacts")
+    repo = PyPiRepository(warehouse_config, downloader=downloader)
+    with pytest.raises(ValidationError):
+        repo.download("flask", "1.1.1")
+
+    assert not [p for p in downloader.cache_dir.rglob("*") if p.is_file()]
+
+
+def _artifact(url: str) -> ArtifactMetadataImpl:
+    return ArtifactMetadataImpl(
+        comment_text="",
+        digests={},
+        sha256_digest="a" * 64,
+        signed=False,
+        signature_url="",
+        package_type="sdist",
+        python_version="source",
+        requires_python=[],
+        size=0,
+        upload_time_iso_8601=None,  # type: ignore
+        url=url,
+    )
+
+
+def test_download_path_traversal(tmp_path: Path) -> None:
+    """Encoded path separators in artifact URLs can't escape the cache."""
+    downloader = ArtifactDownloader(tmp_path / "artifacts")
+    artifact = _artifact(
+        "https://evil.example/pkgs/..%2F..%2F..%2F..%2Fhome%2Fuser%2F.bashrc"
+    )
+
+    filename = downloader.filename(artifact)
+    assert filename == ".bashrc"
+    assert downloader.path_for("a" * 64, filename) == (
+        tmp_path / "artifacts" / "aa" / ("a" * 64) / ".bashrc"
+    )
+
+    with pytest.raises(ValidationError):
+        downloader.path_for("a" * 64, "../../../.bashrc")
+
+    with pytest.raises(ValidationError):
+        downloader.path_for("../../" + "a" * 58, "demo.tar.gz")
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://evil.example/pkgs/..",
+        "https://evil.example/pkgs/",
+        "https://evil.example/pkgs/a%5C..%5C..%5Cb",
+    ],
+)
+def test_download_unusable_filename(url: str, tmp_path: Path) -> None:
+    """Artifacts without a usable file name aren't downloaded."""
+    downloader = ArtifactDownloader(tmp_path / "artifacts")
+
+    with pytest.raises(ValidationError):
+        downloader.fetch(_artifact(url), requests.Session())
 
-def test_basic(pypi_config: RepositoryConfiguration) -> None:
-    """Not implemented."""
-    with pytest.raises(NotImplementedError):
-        PyPiRepository(pypi_config).download("flask", "1.1.1")
+    assert not [p for p in tmp_path.rglob("*") if p.is_file()]
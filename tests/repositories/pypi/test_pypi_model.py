@@ -203,3 +203,97 @@ def test_json_load(
                     break
 
             assert flag, f"No match for requires_dist item: {ereq}."
+
+
+def test_schema_is_shared() -> None:
+    """The package schemas are only built once."""
+    from valiant.repositories.pypi.model import (
+        pypi_package_core_schema,
+        pypi_release_schema,
+    )
+
+    assert pypi_package_core_schema() is pypi_package_core_schema()
+    assert pypi_release_schema() is pypi_release_schema()
+
+
+@ALL_PKG_FILES
+def test_lazy_loading(datafiles: py.path) -> None:
+    """The description and releases are only loaded when requested."""
+    with open(datafiles / "flask-1.1.1.json", "r") as f:
+        package_data = json.load(f)
+
+    pkg = PyPiPackageMetadata("https://pypi.org/pypi", package_data)
+    assert pkg._pkg.info.description is None
+    assert pkg._releases is None
+    assert pkg._artifacts is None
+
+    assert pkg.description == package_data["info"]["description"]
+    assert pkg.artifacts[0].url == package_data["urls"][0]["url"]
+
+    releases = pkg.releases
+    assert set(releases.keys()) == set(package_data["releases"].keys())
+    assert releases["0.1"][0].filename == "Flask-0.1.tar.gz"
+    assert pkg.releases is releases
+
+
+@pytest.mark.datafiles(TEST_FILE_DIR / "basic_package.json")
+def test_lazy_loading_invalid(datafiles: py.path) -> None:
+    """Invalid description and releases data is reported when requested."""
+    package_data = load_test_json_data(datafiles, "basic_package.json")
+    package_data["info"]["description"] = 42
+    package_data["releases"] = {"0.1": [{"filename": "demo-0.1.tar.gz"}]}
+
+    pkg = PyPiPackageMetadata("https://pypi.org/pypi", package_data)
+    assert pkg.name == "Demo"
+
+    with pytest.raises(ValidationError):
+        pkg.description
+
+    with pytest.raises(ValidationError):
+        pkg.releases
+
+
+@pytest.mark.benchmark
+@ALL_PKG_FILES
+def test_benchmark_parse(datafiles: py.path) -> None:
+    """Time the parsing of 1,000 Warehouse JSON documents.
+
+    The documents cycle through the real-world package data files. Parsing with
+    a fresh schema per document (the earlier approach) is compared with fully
+    parsing via the shared schema and with the lazy PyPiPackageMetadata.
+    """
+    import time
+
+    from itertools import cycle, islice
+
+    from marshmallow_dataclass import class_schema
+    from valiant.repositories.pypi.model import PyPiPackage
+
+    rounds = 1000
+    documents = []
+    for data_file in sorted(datafiles.listdir()):
+        with open(data_file, "r") as f:
+            documents.append(json.load(f))
+
+    start = time.perf_counter()
+    for doc in islice(cycle(documents), rounds):
+        class_schema(PyPiPackage)().load(doc)
+    per_document = time.perf_counter() - start
+
+    schema = class_schema(PyPiPackage)()
+    start = time.perf_counter()
+    for doc in islice(cycle(documents), rounds):
+        schema.load(doc)
+    shared = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for doc in islice(cycle(documents), rounds):
+        PyPiPackageMetadata("https://pypi.org/pypi", doc).to_dict()
+    lazy = time.perf_counter() - start
+
+    print(
+        f"\n{rounds} documents: "
+        f"schema per document {per_document:.3f}s, shared schema {shared:.3f}s, "
+        f"lazy metadata {lazy:.3f}s"
+    )
+    assert lazy < shared
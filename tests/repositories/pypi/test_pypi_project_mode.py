@@ -0,0 +1,147 @@
+"""Test the per-project metadata fetch mode.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+import json
+
+from dataclasses import replace
+
+import py
+import pytest
+
+from valiant.repositories import PackageNotFoundException, RepositoryConfiguration
+from valiant.repositories.pypi import PyPiRepository
+
+from . import ALL_PKG_FILES
+from .warehouse import FakeWarehouse
+
+
+def _load_flask(warehouse: FakeWarehouse, datafiles: py.path) -> None:
+    for version in ["0.1", "1.1.1"]:
+        warehouse.add_package_file(
+            "flask", version, datafiles / f"flask-{version}.json"
+        )
+
+    with open(datafiles / "flask-1.1.1.json", "r") as f:
+        warehouse.add_document("/pypi/flask/json", json.load(f))
+
+
+@pytest.fixture
+def project_config(
+    warehouse_config: RepositoryConfiguration,
+) -> RepositoryConfiguration:
+    """A repository config using the project fetch mode."""
+    return replace(warehouse_config, metadata_fetch_mode="project")  # noqa: DAR201
+
+
+@ALL_PKG_FILES
+def test_version_mode(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """The default mode requests each version."""
+    _load_flask(warehouse, datafiles)
+    repo = PyPiRepository(warehouse_config)
+
+    for _ in range(2):
+        assert repo.show("flask", "1.1.1").version == "1.1.1"
+
+    assert [p for p, _ in warehouse.requests] == ["/pypi/flask/1.1.1/json"] * 2
+    assert repo.fetch_stats == {
+        "lookups": 2,
+        "requests": 2,
+        "requests_saved": 0,
+        "coalesced": 0,
+    }
+
+
+@ALL_PKG_FILES
+def test_project_mode(
+    warehouse: FakeWarehouse,
+    project_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """The project metadata is requested once and reused."""
+    _load_flask(warehouse, datafiles)
+    repo = PyPiRepository(project_config)
+
+    for name in ["flask", "Flask", "flask"]:
+        pkg = repo.show(name, "1.1.1")
+        assert pkg.version == "1.1.1"
+        assert pkg.license == "BSD-3-Clause"
+
+    with pytest.raises(PackageNotFoundException):
+        repo.show("flask", "99.0")
+
+    # Other versions still need their own metadata
+    assert repo.show("flask", "0.1").version == "0.1"
+
+    assert [p for p, _ in warehouse.requests] == [
+        "/pypi/flask/json",
+        "/pypi/flask/99.0/json",
+        "/pypi/flask/0.1/json",
+    ]
+    assert repo.fetch_stats == {
+        "lookups": 5,
+        "requests": 3,
+        "requests_saved": 2,
+        "coalesced": 0,
+    }
+
+
+def test_project_mode_not_found(
+    warehouse: FakeWarehouse, project_config: RepositoryConfiguration
+) -> None:
+    """A missing project raises PackageNotFoundException."""
+    repo = PyPiRepository(project_config)
+
+    with pytest.raises(PackageNotFoundException):
+        repo.show("FAKE", "3.14")
+
+
+@ALL_PKG_FILES
+def test_project_mode_async(
+    warehouse: FakeWarehouse,
+    project_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """The asyncio repository also reuses the project metadata."""
+    pytest.importorskip("aiohttp")
+    from valiant.repositories.pypi import AsyncPyPiRepository
+
+    _load_flask(warehouse, datafiles)
+    repo = AsyncPyPiRepository(project_config)
+
+    async def run() -> list:
+        try:
+            await repo.show("flask", "1.1.1")
+            return await repo.show_many([("flask", "1.1.1"), ("flask", "0.1")])
+        finally:
+            await repo.close()
+
+    results = asyncio.run(run())
+
+    assert [r.version for r in results] == ["1.1.1", "0.1"]
+    assert [p for p, _ in warehouse.requests] == [
+        "/pypi/flask/json",
+        "/pypi/flask/0.1/json",
+    ]
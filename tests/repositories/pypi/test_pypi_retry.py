@@ -0,0 +1,69 @@
+"""Test PyPi retries for throttled requests.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+from dataclasses import replace
+
+import py
+import pytest
+
+from valiant.repositories import PackageNotFoundException, RepositoryConfiguration
+from valiant.repositories.pypi import PyPiRepository
+
+from . import ALL_PKG_FILES
+from .warehouse import FakeWarehouse
+
+
+@ALL_PKG_FILES
+def test_throttled_request_retried(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """A 429 response is retried after the Retry-After delay."""
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-1.1.1.json")
+    warehouse.fail("/pypi/flask/1.1.1/json", 429, headers={"Retry-After": "0"})
+    warehouse.fail("/pypi/flask/1.1.1/json", 503)
+
+    repo = PyPiRepository(replace(warehouse_config, backoff_factor=0.01))
+    assert repo.show("flask", "1.1.1").version == "1.1.1"
+
+    stats = repo.scheduler.stats
+    assert stats["requests"] == 3
+    assert stats["retries"] == 2
+    assert stats["throttled"] == 1
+
+
+@ALL_PKG_FILES
+def test_throttled_request_retries_exhausted(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """Once retries run out the lookup fails (without marking the package missing)."""
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-1.1.1.json")
+    warehouse.fail("/pypi/flask/1.1.1/json", 503, times=3)
+
+    repo = PyPiRepository(replace(warehouse_config, max_retries=1, backoff_factor=0))
+    with pytest.raises(PackageNotFoundException, match="unavailable"):
+        repo.show("flask", "1.1.1")
+
+    assert repo.scheduler.stats["retries"] == 1
+    assert repo.show("flask", "1.1.1").version == "1.1.1"
@@ -0,0 +1,210 @@
+"""Test conditional revalidation of cached metadata.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+import time
+
+from dataclasses import replace
+from pathlib import Path
+
+import py
+import pytest
+
+from valiant.repositories import (
+    MetadataCache,
+    PackageNotFoundException,
+    RepositoryConfiguration,
+)
+from valiant.repositories.pypi import PyPiRepository
+
+from . import ALL_PKG_FILES
+from .warehouse import FakeWarehouse
+
+
+def _statuses(warehouse: FakeWarehouse) -> list:
+    return [
+        headers.get("If-None-Match") is not None for _, headers in warehouse.requests
+    ]
+
+
+@ALL_PKG_FILES
+def test_fresh_cache(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+    tmp_path: Path,
+) -> None:
+    """Fresh responses are served without a request."""
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-1.1.1.json")
+    cache = MetadataCache(tmp_path / "metadata.sqlite", expire_after=60)
+
+    for _ in range(2):
+        repo = PyPiRepository(warehouse_config, metadata_cache=cache)
+        assert repo.show("flask", "1.1.1").version == "1.1.1"
+
+    assert len(warehouse.requests) == 1
+    entry = cache.get(f"{warehouse.base_url}/flask/1.1.1/json")
+    assert entry and entry.etag and entry.last_serial == 1
+
+
+@ALL_PKG_FILES
+def test_revalidation(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+    tmp_path: Path,
+) -> None:
+    """Expired responses are revalidated and a 304 reuses the cached body."""
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-1.1.1.json")
+    cache = MetadataCache(tmp_path / "metadata.sqlite", expire_after=0)
+    repo = PyPiRepository(warehouse_config, metadata_cache=cache)
+
+    assert repo.show("flask", "1.1.1").version == "1.1.1"
+    stored_at = cache.get(f"{warehouse.base_url}/flask/1.1.1/json").stored_at
+
+    time.sleep(0.01)
+    assert repo.show("flask", "1.1.1").version == "1.1.1"
+
+    assert _statuses(warehouse) == [False, True]
+    assert cache.get(f"{warehouse.base_url}/flask/1.1.1/json").stored_at > stored_at
+
+
+@ALL_PKG_FILES
+def test_revalidation_changed(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+    tmp_path: Path,
+) -> None:
+    """A changed document replaces the cached copy."""
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-1.1.1.json")
+    cache = MetadataCache(tmp_path / "metadata.sqlite", expire_after=0)
+    repo = PyPiRepository(warehouse_config, metadata_cache=cache)
+    repo.show("flask", "1.1.1")
+
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-0.1.json")
+    warehouse.serial = 2
+
+    assert repo.show("flask", "1.1.1").version == "0.1"
+    assert cache.get(f"{warehouse.base_url}/flask/1.1.1/json").last_serial == 2
+
+
+@ALL_PKG_FILES
+def test_stale_while_revalidate(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+    tmp_path: Path,
+) -> None:
+    """Stale responses are served straight away and revalidated afterwards."""
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-1.1.1.json")
+    cache = MetadataCache(
+        tmp_path / "metadata.sqlite", expire_after=0, stale_while_revalidate=True
+    )
+    repo = PyPiRepository(warehouse_config, metadata_cache=cache)
+    repo.show("flask", "1.1.1")
+
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-0.1.json")
+    warehouse.delay = 0.2
+
+    start = time.perf_counter()
+    assert repo.show("flask", "1.1.1").version == "1.1.1"
+    assert time.perf_counter() - start < warehouse.delay
+
+    repo.wait_for_revalidation()
+    assert _statuses(warehouse) == [False, True]
+    cached = cache.get(f"{warehouse.base_url}/flask/1.1.1/json")
+    assert cached and cached.json()["info"]["version"] == "0.1"
+
+
+@ALL_PKG_FILES
+def test_async_revalidation(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+    tmp_path: Path,
+) -> None:
+    """The asyncio repository also revalidates cached responses."""
+    pytest.importorskip("aiohttp")
+    from valiant.repositories.pypi import AsyncPyPiRepository
+
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-1.1.1.json")
+    cache = MetadataCache(
+        tmp_path / "metadata.sqlite", expire_after=0, stale_while_revalidate=True
+    )
+    repo = AsyncPyPiRepository(warehouse_config, metadata_cache=cache)
+
+    async def run() -> None:
+        try:
+            await repo.show("flask", "1.1.1")
+            await repo.show("flask", "1.1.1")
+        finally:
+            await repo.close()
+
+    asyncio.run(run())
+
+    assert _statuses(warehouse) == [False, True]
+
+
+def test_negative_cache(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    tmp_path: Path,
+) -> None:
+    """Known-missing packages fail without a request."""
+    cache = MetadataCache(tmp_path / "metadata.sqlite", negative_expire_after=60)
+
+    for _ in range(3):
+        repo = PyPiRepository(warehouse_config, metadata_cache=cache)
+        with pytest.raises(PackageNotFoundException):
+            repo.show("internal-lib", "1.0")
+
+    assert len(warehouse.requests) == 1
+
+    # The negative cache is per repository
+    other = PyPiRepository(
+        replace(warehouse_config, name="other-warehouse"), metadata_cache=cache
+    )
+    with pytest.raises(PackageNotFoundException):
+        other.show("Internal_Lib", "1.0")
+
+    assert len(warehouse.requests) == 2
+
+
+@ALL_PKG_FILES
+def test_negative_cache_expiry(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+    tmp_path: Path,
+) -> None:
+    """Missing packages are retried once the negative entry expires."""
+    cache = MetadataCache(tmp_path / "metadata.sqlite", negative_expire_after=0.05)
+    repo = PyPiRepository(warehouse_config, metadata_cache=cache)
+
+    with pytest.raises(PackageNotFoundException):
+        repo.show("flask", "1.1.1")
+
+    time.sleep(0.1)
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-1.1.1.json")
+
+    assert repo.show("flask", "1.1.1").version == "1.1.1"
+    assert len(warehouse.requests) == 2
@@ -0,0 +1,163 @@
+"""Test the pooled repository session.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+import py
+import pytest
+import requests
+
+from valiant.repositories import RepositoryConfiguration, create_session
+from valiant.repositories.pypi import PyPiRepository
+
+from . import ALL_PKG_FILES, TEST_FILE_DIR
+from .warehouse import FakeWarehouse
+
+
+def _load_packages(warehouse: FakeWarehouse, datafiles: py.path) -> list:
+    packages = []
+    for data_file in sorted(datafiles.listdir()):
+        name, _, version = data_file.purebasename.rpartition("-")
+        warehouse.add_package_file(name, version, data_file)
+        packages.append((name, version))
+    return packages
+
+
+def test_session_configuration(pypi_config: RepositoryConfiguration) -> None:
+    """The session has a bounded pool and negotiates compression."""
+    session = create_session(replace(pypi_config, pool_maxsize=4))
+    adapter = session.get_adapter("https://pypi.org/pypi")
+
+    assert adapter._pool_maxsize == 4
+    assert adapter._pool_block
+    assert "gzip" in session.headers["Accept-Encoding"]
+    assert pypi_config.timeout == (10.0, 30.0)
+
+
+def test_session_credentials(pypi_config: RepositoryConfiguration) -> None:
+    """Credentials are only sent to the repository host."""
+    session = create_session(replace(pypi_config, username="user", password="pw"))
+
+    def auth_header(url: str) -> str:
+        request = requests.Request("GET", url, auth=session.auth).prepare()
+        return request.headers.get("Authorization", "")
+
+    assert auth_header("https://pypi.org/pypi/flask/json").startswith("Basic ")
+    assert auth_header("https://files.pythonhosted.org/packages/flask.whl") == ""
+    assert create_session(pypi_config).auth is None
+
+
+def test_repository_owns_session(pypi_config: RepositoryConfiguration) -> None:
+    """Each repository instance has its own session."""
+    assert (
+        PyPiRepository(pypi_config).session is not PyPiRepository(pypi_config).session
+    )
+
+
+@ALL_PKG_FILES
+def test_keep_alive(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """All lookups from a single thread share a single connection."""
+    packages = _load_packages(warehouse, datafiles)
+    repo = PyPiRepository(warehouse_config)
+
+    for name, version in packages:
+        assert repo.show(name, version).version == version
+
+    assert warehouse.connections == 1
+    assert len(warehouse.requests) == len(packages)
+    for _, headers in warehouse.requests:
+        assert "gzip" in headers["Accept-Encoding"]
+
+
+@ALL_PKG_FILES
+def test_pool_limit(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """Concurrent lookups never open more connections than the pool allows."""
+    packages = _load_packages(warehouse, datafiles) * 3
+    repo = PyPiRepository(replace(warehouse_config, pool_maxsize=2))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda p: repo.show(*p), packages))
+
+    assert [r.version for r in results] == [v for _, v in packages]
+    assert warehouse.connections <= 2
+
+
+@pytest.mark.benchmark
+@pytest.mark.datafiles(TEST_FILE_DIR / "basic_package.json")
+def test_benchmark_pooled_session(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """Compare the pooled session with a new connection per request.
+
+    A small document is used so that the timings are dominated by the
+    per-request overheads rather than by JSON handling.
+    """
+    rounds = 200
+    warehouse.add_package_file("demo", "1.0", datafiles / "basic_package.json")
+    url = f"{warehouse.base_url}/demo/1.0/json"
+    repo = PyPiRepository(warehouse_config)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        requests.get(url).json()
+    unpooled = time.perf_counter() - start
+    unpooled_connections = warehouse.connections
+
+    warehouse.connections = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        repo._load_package_manifest("demo", "1.0")
+    pooled = time.perf_counter() - start
+
+    print(
+        f"\n{rounds} requests: "
+        f"unpooled {unpooled:.3f}s ({unpooled_connections} connections), "
+        f"pooled {pooled:.3f}s ({warehouse.connections} connections)"
+    )
+    assert unpooled_connections == rounds
+    assert warehouse.connections == 1
+
+
+def test_download_session_scheduler(pypi_config: RepositoryConfiguration) -> None:
+    """Artifact hosts don't share the repository's scheduler."""
+    repository = PyPiRepository(replace(pypi_config, rate_limit=5.0))
+    session = repository.download_session
+
+    index = session.get_adapter("https://pypi.org/packages/flask.whl")
+    files = session.get_adapter("https://files.pythonhosted.org/packages/flask.whl")
+
+    assert index.scheduler is repository.scheduler
+    assert files.scheduler is not repository.scheduler
+    assert files.scheduler.rate_limit == 0.0
+    assert session.get_adapter("https://pypi.org.example.com/x") is files
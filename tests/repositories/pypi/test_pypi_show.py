@@ -42,6 +42,7 @@ from . import (
     MockResponse,
     MonkeyPatch,
 )
+from .warehouse import FakeWarehouse
 
 
 @pytest.mark.datafiles(TEST_FILE_DIR / "basic_package.json")
@@ -55,8 +56,8 @@ def test_basic(
     def mock_get(*args, **kwargs):  # noqa: ANN
         return MockResponse(status_code=200, json_data=package_data)
 
-    # apply the monkeypatch for requests.get to mock_get
-    monkeypatch.setattr(requests, "get", mock_get)
+    # apply the monkeypatch for requests.Session.get to mock_get
+    monkeypatch.setattr(requests.Session, "get", mock_get)
 
     pkg = PyPiRepository(pypi_config).show("flask", "-1.1.1")
     assert pkg.name == "Demo"
@@ -73,8 +74,8 @@ def test_basic_classifiers(
     def mock_get(*args, **kwargs):  # noqa: ANN
         return MockResponse(status_code=200, json_data=package_data)
 
-    # apply the monkeypatch for requests.get to mock_get
-    monkeypatch.setattr(requests, "get", mock_get)
+    # apply the monkeypatch for requests.Session.get to mock_get
+    monkeypatch.setattr(requests.Session, "get", mock_get)
 
     pkg = PyPiRepository(pypi_config).show("flask", "-1.1.1")
     test_classifiers = [
@@ -99,8 +100,8 @@ def test_fail(monkeypatch: MonkeyPatch, pypi_config: RepositoryConfiguration) ->
     def mock_get(*args, **kwargs):  # noqa: ANN
         return MockResponse(status_code=404, json_data={})
 
-    # apply the monkeypatch for requests.get to mock_get
-    monkeypatch.setattr(requests, "get", mock_get)
+    # apply the monkeypatch for requests.Session.get to mock_get
+    monkeypatch.setattr(requests.Session, "get", mock_get)
 
     with pytest.raises(PackageNotFoundException):
         PyPiRepository(pypi_config).show("FAKE", "-3.14")
@@ -114,8 +115,8 @@ def test_empty_json(
     def mock_get(*args, **kwargs):  # noqa: ANN
         return MockResponse(status_code=200, json_data=None)
 
-    # apply the monkeypatch for requests.get to mock_get
-    monkeypatch.setattr(requests, "get", mock_get)
+    # apply the monkeypatch for requests.Session.get to mock_get
+    monkeypatch.setattr(requests.Session, "get", mock_get)
 
     with pytest.raises(PackageNotFoundException):
         PyPiRepository(pypi_config).show("FAKE", "-3.14")
@@ -132,8 +133,8 @@ def test_bad_package_fails(
     def mock_get(*args, **kwargs):  # noqa: ANN
         return MockResponse(status_code=200, json_data=package_data)
 
-    # apply the monkeypatch for requests.get to mock_get
-    monkeypatch.setattr(requests, "get", mock_get)
+    # apply the monkeypatch for requests.Session.get to mock_get
+    monkeypatch.setattr(requests.Session, "get", mock_get)
 
     with pytest.raises(ValidationError):
         PyPiRepository(pypi_config).show("FAKE", "-3.14")
@@ -157,8 +158,8 @@ def test_json_load(
     def mock_get(*args, **kwargs):  # noqa: ANN
         return MockResponse(status_code=200, json_data=data)
 
-    # apply the monkeypatch for requests.get to mock_get
-    monkeypatch.setattr(requests, "get", mock_get)
+    # apply the monkeypatch for requests.Session.get to mock_get
+    monkeypatch.setattr(requests.Session, "get", mock_get)
 
     pkg = PyPiRepository(pypi_config).show("X", "-1")
 
@@ -166,3 +167,36 @@ def test_json_load(
     assert pkg.version == expected["version"]
     assert pkg.license == expected["license"]
     assert pkg.classifiers_parsed
+
+
+@ALL_PKG_FILES
+@pytest.mark.parametrize("mode", ["fallback", "hedged"])
+def test_lookup_unreachable_repository(
+    mode: str,
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """An unreachable repository is skipped by repository lookups."""
+    from valiant.repositories.lookup import RepositoryLookup
+
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-1.1.1.json")
+    unreachable = PyPiRepository(
+        RepositoryConfiguration(
+            name="unreachable",
+            base_url="http://127.0.0.1:9/pypi",
+            repository_type="warehouse",
+            max_retries=0,
+        )
+    )
+    lookup = RepositoryLookup(
+        [unreachable, PyPiRepository(warehouse_config)], mode=mode, hedge_delay=10
+    )
+
+    try:
+        assert lookup.show("flask", "1.1.1").version == "1.1.1"
+    finally:
+        lookup.close()
+
+    assert lookup.stats["fallbacks"] == 1
+    assert lookup.stats[warehouse_config.name] == 1
@@ -0,0 +1,146 @@
+"""Test the parsed metadata store with the PyPi repository.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+import json
+
+from pathlib import Path
+
+import py
+import pytest
+
+from valiant.repositories import (
+    MetadataCache,
+    MetadataStore,
+    RepositoryConfiguration,
+)
+from valiant.repositories.pypi import PyPiRepository
+from valiant.repositories.pypi.model import PyPiPackageMetadata
+
+from . import ALL_PKG_FILES
+from .warehouse import FakeWarehouse
+
+
+def _block_parsing(monkeypatch: pytest.MonkeyPatch) -> None:
+    def fail(*args, **kwargs) -> None:  # type: ignore
+        raise AssertionError("The metadata was parsed")
+
+    monkeypatch.setattr(PyPiPackageMetadata, "__init__", fail)
+
+
+@ALL_PKG_FILES
+def test_record_roundtrip(datafiles: py.path) -> None:
+    """Stored records produce the same metadata as the JSON."""
+    with open(datafiles / "django-3.0.4.json") as f:
+        data = json.load(f)
+
+    parsed = PyPiPackageMetadata("https://example.com", data)
+    restored = PyPiPackageMetadata.from_record(
+        "https://example.com", parsed.to_record()
+    )
+
+    assert restored.to_dict() == parsed.to_dict()
+    assert restored.description == parsed.description
+    assert restored.releases == parsed.releases
+    assert restored.requires_dist == parsed.requires_dist
+
+    # Records can be prepared after lazy loading
+    again = PyPiPackageMetadata.from_record("https://example.com", parsed.to_record())
+    assert again.releases == parsed.releases
+    assert again.description == parsed.description
+
+
+@ALL_PKG_FILES
+def test_warm_lookup_uses_store(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Warm lookups load the stored metadata rather than parsing the response."""
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-1.1.1.json")
+    cache = MetadataCache(tmp_path / "metadata.sqlite", expire_after=60)
+    store = MetadataStore(tmp_path / "store")
+
+    cold = PyPiRepository(warehouse_config, metadata_cache=cache, metadata_store=store)
+    expected = cold.show("flask", "1.1.1").to_dict()
+
+    _block_parsing(monkeypatch)
+    warm = PyPiRepository(warehouse_config, metadata_cache=cache, metadata_store=store)
+    assert warm.show("flask", "1.1.1").to_dict() == expected
+    assert len(warehouse.requests) == 1
+
+
+@ALL_PKG_FILES
+def test_changed_response_invalidates_store(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+    tmp_path: Path,
+) -> None:
+    """A revalidated response with new content is parsed again."""
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-1.1.1.json")
+    cache = MetadataCache(tmp_path / "metadata.sqlite", expire_after=0)
+    store = MetadataStore(tmp_path / "store")
+    repo = PyPiRepository(warehouse_config, metadata_cache=cache, metadata_store=store)
+    assert repo.show("flask", "1.1.1").version == "1.1.1"
+
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-0.1.json")
+
+    repo = PyPiRepository(warehouse_config, metadata_cache=cache, metadata_store=store)
+    assert repo.show("flask", "1.1.1").version == "0.1"
+
+    cache.expire_after = 60
+    repo = PyPiRepository(warehouse_config, metadata_cache=cache, metadata_store=store)
+    assert repo.show("flask", "1.1.1").version == "0.1"
+
+
+@ALL_PKG_FILES
+def test_async_warm_lookup_uses_store(
+    warehouse: FakeWarehouse,
+    warehouse_config: RepositoryConfiguration,
+    datafiles: py.path,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """The asyncio repository also uses the stored metadata."""
+    pytest.importorskip("aiohttp")
+    from valiant.repositories.pypi import AsyncPyPiRepository
+
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-1.1.1.json")
+    cache = MetadataCache(tmp_path / "metadata.sqlite", expire_after=60)
+    store = MetadataStore(tmp_path / "store")
+
+    async def run() -> str:
+        repo = AsyncPyPiRepository(
+            warehouse_config, metadata_cache=cache, metadata_store=store
+        )
+        try:
+            return (await repo.show("flask", "1.1.1")).version
+        finally:
+            await repo.close()
+
+    assert asyncio.run(run()) == "1.1.1"
+
+    _block_parsing(monkeypatch)
+    assert asyncio.run(run()) == "1.1.1"
+    assert len(warehouse.requests) == 1
@@ -0,0 +1,144 @@
+"""Test streamed metadata responses.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+import json
+
+from dataclasses import replace
+from pathlib import Path
+
+import py
+import pytest
+
+from valiant.repositories import MetadataCache, RepositoryConfiguration
+from valiant.repositories.pypi import PyPiRepository
+
+from . import ALL_PKG_FILES
+from .warehouse import FakeWarehouse
+
+
+@pytest.fixture
+def stream_config(
+    warehouse_config: RepositoryConfiguration,
+) -> RepositoryConfiguration:
+    """A repository config that streams metadata."""
+    return replace(warehouse_config, stream_metadata=True)  # noqa: DAR201
+
+
+@ALL_PKG_FILES
+def test_stream(
+    warehouse: FakeWarehouse,
+    stream_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """Streamed metadata skips the description and release files."""
+    warehouse.add_package_file("django", "3.0.4", datafiles / "django-3.0.4.json")
+    with open(datafiles / "django-3.0.4.json", "r") as f:
+        package_data = json.load(f)
+
+    pkg = PyPiRepository(stream_config).show("django", "3.0.4")
+    full = PyPiRepository(replace(stream_config, stream_metadata=False)).show(
+        "django", "3.0.4"
+    )
+
+    assert pkg.to_dict() == full.to_dict()
+    assert pkg.requires_dist == full.requires_dist
+    assert pkg.description == ""
+    assert full.description == package_data["info"]["description"]
+    assert set(pkg.releases.keys()) == set(package_data["releases"].keys())
+    assert not any(pkg.releases.values())
+
+
+@ALL_PKG_FILES
+def test_stream_cached(
+    warehouse: FakeWarehouse,
+    stream_config: RepositoryConfiguration,
+    datafiles: py.path,
+    tmp_path: Path,
+) -> None:
+    """Streamed responses are cached apart from full responses."""
+    warehouse.add_package_file("flask", "1.1.1", datafiles / "flask-1.1.1.json")
+    cache = MetadataCache(tmp_path / "metadata.sqlite")
+
+    streamed = PyPiRepository(stream_config, metadata_cache=cache)
+    full = PyPiRepository(
+        replace(stream_config, stream_metadata=False), metadata_cache=cache
+    )
+
+    assert streamed.show("flask", "1.1.1").description == ""
+    assert full.show("flask", "1.1.1").description != ""
+    assert streamed.show("flask", "1.1.1").description == ""
+    assert len(warehouse.requests) == 2
+
+
+@ALL_PKG_FILES
+def test_stream_async(
+    warehouse: FakeWarehouse,
+    stream_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """The asyncio repository can also stream metadata."""
+    pytest.importorskip("aiohttp")
+    from valiant.repositories.pypi import AsyncPyPiRepository
+
+    warehouse.add_package_file("django", "3.0.4", datafiles / "django-3.0.4.json")
+    repo = AsyncPyPiRepository(stream_config)
+
+    async def run() -> None:
+        try:
+            pkg = await repo.show("django", "3.0.4")
+            assert pkg.version == "3.0.4"
+            assert pkg.description == ""
+            assert pkg.releases and not any(pkg.releases.values())
+        finally:
+            await repo.close()
+
+    asyncio.run(run())
+
+
+@pytest.mark.benchmark
+@ALL_PKG_FILES
+def test_benchmark_stream_memory(
+    warehouse: FakeWarehouse,
+    stream_config: RepositoryConfiguration,
+    datafiles: py.path,
+) -> None:
+    """Compare the peak memory used to load a large document."""
+    import tracemalloc
+
+    warehouse.add_package_file("django", "3.0.4", datafiles / "django-3.0.4.json")
+    repos = {
+        "full": PyPiRepository(replace(stream_config, stream_metadata=False)),
+        "streamed": PyPiRepository(stream_config),
+    }
+    peaks = {}
+
+    for label, repo in repos.items():
+        tracemalloc.start()
+        repo._load_package_manifest("django", "3.0.4")
+        peaks[label] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    print(
+        f"\nPeak memory: full {peaks['full'] / 1024:.0f}KiB, "
+        f"streamed {peaks['streamed'] / 1024:.0f}KiB"
+    )
+    assert peaks["streamed"] < peaks["full"]
@@ -0,0 +1,213 @@
+"""A small, local stand-in for a Warehouse (pypi.org) server.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import gzip
+import hashlib
+import json
+import socket
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class FakeWarehouse:
+    """Serves Warehouse JSON documents from memory over HTTP/1.1.
+
+    Documents are registered against their URL path (e.g. `/pypi/flask/1.1.1/json`).
+    The server keeps a log of requests and counts the connections it accepts so that
+    tests can check how the client behaves on the wire. Set `delay` to slow down
+    responses.
+
+    Responses carry `ETag`, `Last-Modified` and `X-PyPI-Last-Serial` headers and
+    conditional requests are answered with `304 Not Modified` where appropriate.
+    Single range requests are answered with `206 Partial Content` unless
+    `accept_ranges` is turned off. Use `fail` to have the next requests for a
+    path answered with an error status.
+    """
+
+    LAST_MODIFIED = "Wed, 01 Apr 2020 10:00:00 GMT"
+
+    def __init__(self) -> None:  # noqa: D107
+        self.documents: Dict[str, bytes] = {}
+        self.content_types: Dict[str, str] = {}
+        self.requests: List[Tuple[str, Dict[str, str]]] = []
+        self.connections = 0
+        self.delay = 0.0
+        self.serial = 1
+        self.accept_ranges = True
+        self._failures: Dict[str, List[Tuple[int, Dict[str, str]]]] = {}
+        self._lock = threading.Lock()
+        self._compressed: Dict[str, bytes] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """The base url for use in a RepositoryConfiguration."""
+        assert self._server  # noqa: DAR201
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/pypi"
+
+    def add_document(self, path: str, data: Any) -> None:
+        """Serve a JSON document at the path."""  # noqa: DAR101
+        self.documents[path] = json.dumps(data).encode("utf-8")
+        self._compressed.pop(path, None)
+
+    def add_file(
+        self, path: str, body: bytes, content_type: str = "application/octet-stream"
+    ) -> None:
+        """Serve any content at the path."""  # noqa: DAR101
+        self.documents[path] = body
+        self.content_types[path] = content_type
+        self._compressed.pop(path, None)
+
+    def fail(
+        self,
+        path: str,
+        status: int,
+        times: int = 1,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Answer the next requests for the path with the status."""  # noqa: DAR101
+        self._failures.setdefault(path, []).extend([(status, headers or {})] * times)
+
+    def add_package_file(self, name: str, version: str, file: Path) -> None:
+        """Serve a JSON file for the package version."""  # noqa: DAR101
+        path = f"/pypi/{name}/{version}/json"
+        with open(file, "rb") as f:
+            self.documents[path] = f.read()
+        self._compressed.pop(path, None)
+
+    def _compress(self, path: str, body: bytes) -> bytes:
+        with self._lock:
+            if path not in self._compressed:
+                self._compressed[path] = gzip.compress(body)
+            return self._compressed[path]
+
+    def start(self) -> "FakeWarehouse":
+        """Start serving on a free local port."""  # noqa: DAR201
+        handler = type("Handler", (_Handler,), {"warehouse": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Shut down the server."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answers requests using the documents held by a FakeWarehouse."""
+
+    protocol_version = "HTTP/1.1"
+    warehouse: FakeWarehouse
+
+    def setup(self) -> None:
+        super().setup()
+        # Avoid Nagle/delayed-ACK stalls on keep-alive connections
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.warehouse._lock:
+            self.warehouse.connections += 1
+
+    def do_GET(self) -> None:  # noqa: N802
+        with self.warehouse._lock:
+            self.warehouse.requests.append((self.path, dict(self.headers)))
+
+        if self.warehouse.delay:
+            time.sleep(self.warehouse.delay)
+
+        if self._send_failure():
+            return
+
+        body = self.warehouse.documents.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        byte_range = self.headers.get("Range")
+        if byte_range and self.warehouse.accept_ranges:
+            self._send_range(body, byte_range)
+            return
+
+        self.send_response(200)
+        self.send_header(
+            "Content-Type",
+            self.warehouse.content_types.get(self.path, "application/json"),
+        )
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.warehouse.LAST_MODIFIED)
+        self.send_header("X-PyPI-Last-Serial", str(self.warehouse.serial))
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = self.warehouse._compress(self.path, body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_failure(self) -> bool:
+        with self.warehouse._lock:
+            failures = self.warehouse._failures.get(self.path)
+            failure = failures.pop(0) if failures else None
+        if not failure:
+            return False
+
+        self.send_response(failure[0])
+        for header, value in failure[1].items():
+            self.send_header(header, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        return True
+
+    def _send_range(self, body: bytes, byte_range: str) -> None:
+        first, last = byte_range[len("bytes=") :].split("-")
+        if not first:
+            start, end = max(0, len(body) - int(last)), len(body)
+        else:
+            start = int(first)
+            end = min(len(body), int(last) + 1) if last else len(body)
+
+        self.send_response(206)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(body)}")
+        self.send_header("Content-Length", str(end - start))
+        self.end_headers()
+        self.wfile.write(body[start:end])
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
@@ -0,0 +1,46 @@
+"""Fixtures for the simple index tests.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+from typing import Generator
+
+import pytest
+
+from valiant.repositories import RepositoryConfiguration
+
+from ..pypi.warehouse import FakeWarehouse
+
+
+@pytest.fixture
+def warehouse() -> Generator[FakeWarehouse, None, None]:
+    """Runs a local fake server for the test."""
+    server = FakeWarehouse().start()  # noqa: DAR301
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def simple_config(warehouse: FakeWarehouse) -> RepositoryConfiguration:
+    """A repository config pointing to the fake server's simple index."""
+    return RepositoryConfiguration(  # noqa: DAR201
+        name="fake-simple",
+        base_url=warehouse.base_url.replace("/pypi", "/simple"),
+        repository_type="simple",
+    )
@@ -0,0 +1,243 @@
+"""Test the simple index repository.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import hashlib
+import json
+
+from pathlib import Path
+
+import pytest
+
+from valiant.repositories import (
+    PackageNotFoundException,
+    RepositoryConfiguration,
+    RepositoryFactory,
+    ValidationError,
+)
+from valiant.repositories.metadata_cache import MetadataCache
+from valiant.repositories.simple import (
+    SimpleFile,
+    SimpleIndexRepository,
+    parse_html_page,
+    parse_json_page,
+)
+
+from ..pypi.warehouse import FakeWarehouse
+
+
+CORE_METADATA = b"""Metadata-Version: 2.1
+Name: Demo-Pkg
+Version: 1.0
+Summary: A demonstration
+Home-page: https://example.com/demo
+License: MIT
+Project-URL: Documentation, https://docs.example.com
+Project-URL: Source, https://git.example.com/demo
+Classifier: Development Status :: 5 - Production/Stable
+Classifier: License :: OSI Approved :: MIT License
+Requires-Python: >=3.6, <4
+Requires-Dist: requests (>=2.0)
+Requires-Dist: toml ; extra == "config"
+
+The long description.
+"""
+
+HTML_PAGE = """<!DOCTYPE html>
+<html><body>
+<a href="../../files/demo_pkg-1.0-py3-none-any.whl#sha256={whl}"
+   data-requires-python="&gt;=3.6" data-core-metadata="sha256={meta}"
+   >demo_pkg-1.0-py3-none-any.whl</a><br/>
+<a href="../../files/demo-pkg-1.0.tar.gz#sha256=abc">demo-pkg-1.0.tar.gz</a><br/>
+<a href="../../files/demo-pkg-0.9.tar.gz" data-yanked="">demo-pkg-0.9.tar.gz</a>
+</body></html>
+"""
+
+
+def _serve_html(warehouse: FakeWarehouse, metadata: bytes = CORE_METADATA) -> None:
+    meta_hash = hashlib.sha256(CORE_METADATA).hexdigest()
+    page = HTML_PAGE.format(whl="f" * 64, meta=meta_hash)
+    warehouse.add_file("/simple/demo-pkg/", page.encode(), "text/html")
+    warehouse.add_file("/files/demo_pkg-1.0-py3-none-any.whl.metadata", metadata)
+
+
+def _serve_json(warehouse: FakeWarehouse) -> None:
+    page = {
+        "meta": {"api-version": "1.1"},
+        "name": "demo-pkg",
+        "files": [
+            {
+                "filename": "demo-pkg-1.0.tar.gz",
+                "url": "/files/demo-pkg-1.0.tar.gz",
+                "hashes": {"sha256": "abc"},
+                "core-metadata": True,
+                "size": 1234,
+                "upload-time": "2020-04-01T10:00:00.000000Z",
+            },
+            {
+                "filename": "demo_pkg-2.0-py3-none-any.whl",
+                "url": "/files/demo_pkg-2.0-py3-none-any.whl",
+                "hashes": {"sha256": "def"},
+            },
+        ],
+    }
+    warehouse.add_file(
+        "/simple/demo-pkg/",
+        json.dumps(page).encode(),
+        "application/vnd.pypi.simple.v1+json",
+    )
+    warehouse.add_file("/files/demo-pkg-1.0.tar.gz.metadata", CORE_METADATA)
+
+
+def test_file_versions() -> None:
+    """Versions are extracted from the file names."""
+    wheel = SimpleFile("Demo_Pkg-1.0-py2.py3-none-any.whl", "u")
+    sdist = SimpleFile("demo-pkg-1.0.0.tar.gz", "u")
+
+    assert wheel.version("demo.pkg") == "1.0"
+    assert wheel.python_version == "py2.py3"
+    assert wheel.package_type == "bdist_wheel"
+    assert sdist.version("demo-pkg") == "1.0.0"
+    assert sdist.is_version("Demo_Pkg", "1.0")
+    assert sdist.python_version == "source"
+    assert not sdist.is_version("demo", "1.0")
+    assert SimpleFile("demo-pkg-1.0.exe", "u").version("demo-pkg") is None
+
+
+def test_parse_pages() -> None:
+    """HTML pages are parsed in chunks and links are resolved."""
+    page = HTML_PAGE.format(whl="f" * 64, meta="0" * 64).encode()
+    url = "https://example.com/simple/demo-pkg/"
+    chunks = [page[i : i + 7] for i in range(0, len(page), 7)]
+    files = parse_html_page(url, chunks)
+
+    assert [f.filename for f in files] == [
+        "demo_pkg-1.0-py3-none-any.whl",
+        "demo-pkg-1.0.tar.gz",
+        "demo-pkg-0.9.tar.gz",
+    ]
+    assert files[0].url.startswith("https://example.com/files/demo_pkg-1.0")
+    assert files[0].hashes == {"sha256": "f" * 64}
+    assert files[0].requires_python == ">=3.6"
+    assert files[0].core_metadata == {"sha256": "0" * 64}
+    assert files[1].core_metadata is None
+    assert files[2].yanked and not files[1].yanked
+
+    files = parse_json_page(
+        url,
+        {
+            "files": [
+                {"filename": "a-1.0.tar.gz", "url": "a", "dist-info-metadata": True}
+            ]
+        },
+    )
+    assert files[0].url == f"{url}a"
+    assert files[0].core_metadata == {}
+
+
+def test_show_html(
+    warehouse: FakeWarehouse, simple_config: RepositoryConfiguration
+) -> None:
+    """Metadata is read from the PEP 658 file listed in an HTML page."""
+    _serve_html(warehouse)
+    repo = RepositoryFactory().get_repository(simple_config)
+    assert isinstance(repo, SimpleIndexRepository)
+
+    pkg = repo.show("Demo_Pkg", "1.0")
+
+    assert pkg.name == "Demo-Pkg"
+    assert pkg.version == "1.0"
+    assert pkg.license == "MIT"
+    assert pkg.summary == "A demonstration"
+    assert pkg.description.strip() == "The long description."
+    assert pkg.url_project == "https://example.com/demo"
+    assert pkg.url_code == "https://git.example.com/demo"
+    assert pkg.url_documentation == "https://docs.example.com"
+    assert pkg.requires_python == [">=3.6", "<4"]
+    assert sorted(pkg.requires_dist) == ["requests", "toml"]
+    assert len(pkg.classifiers_parsed) == 2
+    assert [a.package_type for a in pkg.artifacts] == ["bdist_wheel", "sdist"]
+    assert pkg.to_dict()["artifacts"][0]["upload_time_iso_8601"] is None
+
+    # The page is only requested once per project
+    repo.show("demo-pkg", "1.0")
+    paths = [path for path, _ in warehouse.requests]
+    assert paths.count("/simple/demo-pkg/") == 1
+    assert not any(p.endswith((".whl", ".tar.gz")) for p in paths)
+
+    with pytest.raises(PackageNotFoundException):
+        repo.show("demo-pkg", "3.0")
+
+
+def test_show_json(
+    warehouse: FakeWarehouse, simple_config: RepositoryConfiguration
+) -> None:
+    """JSON pages are requested and files without core metadata are handled."""
+    _serve_json(warehouse)
+    repo = SimpleIndexRepository(simple_config)
+
+    pkg = repo.show("demo-pkg", "1.0")
+    assert pkg.license == "MIT"
+    assert pkg.artifacts[0].size == 1234
+    assert pkg.artifacts[0].upload_time_iso_8601.year == 2020
+    assert "application/vnd.pypi.simple.v1+json" in warehouse.requests[0][1]["Accept"]
+
+    pkg = repo.show("demo-pkg", "2.0")
+    assert pkg.name == "demo-pkg"
+    assert pkg.version == "2.0"
+    assert pkg.license == ""
+    assert pkg.requires_dist == {}
+
+
+def test_bad_core_metadata(
+    warehouse: FakeWarehouse, simple_config: RepositoryConfiguration
+) -> None:
+    """Core metadata must match its hash."""
+    _serve_html(warehouse, metadata=CORE_METADATA + b"tampered")
+
+    with pytest.raises(ValidationError):
+        SimpleIndexRepository(simple_config).show("demo-pkg", "1.0")
+
+
+def test_missing_project(
+    warehouse: FakeWarehouse, simple_config: RepositoryConfiguration
+) -> None:
+    """Unknown projects aren't found."""
+    with pytest.raises(PackageNotFoundException):
+        SimpleIndexRepository(simple_config).show("nothing", "1.0")
+
+
+def test_show_cached(
+    tmp_path: Path, warehouse: FakeWarehouse, simple_config: RepositoryConfiguration
+) -> None:
+    """Cached pages are revalidated and cached core metadata is reused."""
+    _serve_html(warehouse)
+    cache = MetadataCache(tmp_path / "metadata.sqlite", expire_after=0)
+
+    SimpleIndexRepository(simple_config, metadata_cache=cache).show("demo-pkg", "1.0")
+    pkg = SimpleIndexRepository(simple_config, metadata_cache=cache).show(
+        "demo-pkg", "1.0"
+    )
+
+    assert pkg.license == "MIT"
+    paths = [path for path, _ in warehouse.requests]
+    assert paths.count("/simple/demo-pkg/") == 2
+    assert paths.count("/files/demo_pkg-1.0-py3-none-any.whl.metadata") == 1
+    assert "If-None-Match" in warehouse.requests[-1][1]
@@ -0,0 +1,217 @@
+"""Tests for the metadata cache backends.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import time
+
+from pathlib import Path
+
+import pytest
+
+from valiant.repositories.cache import CacheBackend, open_backend
+
+
+@pytest.fixture(params=["sqlite", "mmap", "memory"])
+def backend_factory(request, tmp_path: Path, monkeypatch):  # noqa: ANN001, ANN201
+    """Opens backends of each type."""
+    monkeypatch.setattr("valiant.repositories.cache.sqlite.ACCESS_RESOLUTION", 0)
+    monkeypatch.setattr("valiant.repositories.cache.mmap.ACCESS_RESOLUTION", 0)
+    path = tmp_path / "cache.sqlite" if request.param == "sqlite" else tmp_path
+    backends = []
+
+    def _open(max_size: int = 0) -> CacheBackend:
+        backend = open_backend(request.param, path, max_size)
+        backends.append(backend)
+        return backend
+
+    yield _open
+
+    for backend in backends:
+        backend.close()
+
+
+def test_put_get_delete(backend_factory) -> None:  # noqa: ANN001
+    """Values can be stored, replaced and removed."""
+    backend = backend_factory()
+    assert backend.get("a") is None
+
+    backend.put("a", b"first")
+    backend.put("b", b"second")
+    backend.put("a", b"replaced")
+    assert backend.get("a") == b"replaced"
+    assert backend.size == len(b"replaced") + len(b"second")
+    assert sorted(e.key for e in backend.entries()) == ["a", "b"]
+
+    assert backend.delete("a")
+    assert not backend.delete("a")
+    assert backend.get("a") is None
+    assert backend.size == len(b"second")
+
+
+def test_lru_eviction(backend_factory) -> None:  # noqa: ANN001
+    """The least recently used entries are evicted to stay within max_size."""
+    backend = backend_factory(max_size=25)
+    backend.put("a", b"a" * 10)
+    time.sleep(0.01)
+    backend.put("b", b"b" * 10)
+    time.sleep(0.01)
+    assert backend.get("a")
+    time.sleep(0.01)
+    backend.put("c", b"c" * 10)
+
+    assert backend.get("b") is None
+    assert backend.get("a") == b"a" * 10
+    assert backend.get("c") == b"c" * 10
+    assert backend.size <= 25
+
+
+def test_prune(backend_factory) -> None:  # noqa: ANN001
+    """Pruning removes old entries and then the least recently used."""
+    backend = backend_factory()
+    backend.put("old", b"o" * 10)
+    time.sleep(0.05)
+    for key in ("a", "b", "c"):
+        time.sleep(0.01)
+        backend.put(key, key.encode() * 10)
+
+    assert backend.prune(max_age=0.04) == 1
+    assert backend.get("old") is None
+
+    assert backend.prune(max_size=20) == 1
+    assert backend.get("a") is None
+    assert sorted(e.key for e in backend.entries()) == ["b", "c"]
+
+    assert backend.prune(max_age=3600, max_size=100) == 0
+
+
+def test_records(backend_factory) -> None:  # noqa: ANN001
+    """Named records are kept apart from the entries and never evicted."""
+    backend = backend_factory(max_size=25)
+    assert backend.get_record("stats") is None
+
+    backend.put_record("stats", b"first")
+    backend.put_record("stats", b"replaced")
+    for key in ("a", "b", "c"):
+        backend.put(key, key.encode() * 10)
+    backend.prune(max_age=0, max_size=0)
+
+    assert backend.get_record("stats") == b"replaced"
+    assert list(backend.entries()) == []
+    assert backend.size == 0
+
+
+@pytest.mark.parametrize("backend_type", ["sqlite", "mmap"])
+def test_shared_backend(tmp_path: Path, backend_type: str) -> None:
+    """Backends sharing a path (as separate processes would) see each other's writes."""
+    path = tmp_path / "cache.sqlite" if backend_type == "sqlite" else tmp_path
+    first = open_backend(backend_type, path)
+    second = open_backend(backend_type, path)
+
+    first.put("a", b"from first")
+    assert second.get("a") == b"from first"
+
+    second.put("a", b"from second")
+    second.put("b", b"b")
+    assert first.get("a") == b"from second"
+    assert first.delete("b")
+    assert second.get("b") is None
+
+    first.close()
+    second.close()
+
+
+def test_mmap_compaction(tmp_path: Path) -> None:
+    """The mmap data file is compacted once it's mostly replaced values."""
+    from valiant.repositories.cache import MmapBackend
+
+    first = MmapBackend(tmp_path)
+    second = MmapBackend(tmp_path)
+    value = b"x" * (256 * 1024)
+    for i in range(12):
+        first.put("key", value + str(i).encode())
+
+    assert (tmp_path / "data").stat().st_size < 8 * len(value)
+    assert second.get("key") == value + b"11"
+    assert second.size == len(value) + 2
+
+    first.close()
+    second.close()
+
+
+def test_mmap_access_times(tmp_path: Path, monkeypatch) -> None:  # noqa: ANN001
+    """Reads are recorded in the mmap data file so other processes see them."""
+    from valiant.repositories.cache import MmapBackend
+
+    monkeypatch.setattr("valiant.repositories.cache.mmap.ACCESS_RESOLUTION", 0)
+    backend = MmapBackend(tmp_path)
+    backend.put("a", b"a" * 10)
+    backend.put("b", b"b" * 10)
+    time.sleep(0.01)
+    assert backend.get("a")
+    backend.close()
+
+    backend = MmapBackend(tmp_path, max_size=25)
+    accessed = {e.key: e.accessed_at for e in backend.entries()}
+    assert accessed["a"] > accessed["b"]
+
+    backend.put("c", b"c" * 10)
+    assert backend.get("b") is None
+    assert backend.get("a") == b"a" * 10
+
+    backend.close()
+    backend = MmapBackend(tmp_path)
+    assert {e.key: e.accessed_at for e in backend.entries()}["a"] >= accessed["a"]
+    backend.close()
+
+
+def test_mmap_old_file(tmp_path: Path) -> None:
+    """A data file written by an older version is replaced."""
+    from valiant.repositories.cache import MmapBackend
+
+    (tmp_path / "data").write_bytes(b"VALCACH1")
+    backend = MmapBackend(tmp_path)
+    backend.put("a", b"value")
+    assert backend.get("a") == b"value"
+    backend.close()
+
+
+def test_mmap_torn_write(tmp_path: Path) -> None:
+    """A partly written record is ignored and cleaned up by the next writer."""
+    from valiant.repositories.cache import MmapBackend
+
+    backend = MmapBackend(tmp_path)
+    backend.put("a", b"value")
+    with open(tmp_path / "data", "ab") as f:
+        f.write(b"\x01\x05\x00")
+
+    assert backend.get("a") == b"value"
+    backend.put("b", b"other")
+    backend.close()
+
+    backend = MmapBackend(tmp_path)
+    assert backend.get("a") == b"value"
+    assert backend.get("b") == b"other"
+    backend.close()
+
+
+def test_unknown_backend(tmp_path: Path) -> None:
+    """Only the known backends can be opened."""
+    with pytest.raises(ValueError):
+        open_backend("lmdb", tmp_path)
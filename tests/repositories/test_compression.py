@@ -0,0 +1,131 @@
+"""Tests for compressing cached metadata bodies.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import zlib
+
+from pathlib import Path
+
+import pytest
+
+from valiant.repositories import MetadataCache
+from valiant.repositories.compression import (
+    ZlibCodec,
+    ZstdCodec,
+    decompress,
+    get_codec,
+    zstandard,
+)
+
+from .pypi import FIXTURE_DIR
+
+
+FLASK_JSON = Path(FIXTURE_DIR / "flask-1.1.1.json").read_bytes()
+
+
+def test_zlib_codec() -> None:
+    """The preset dictionary beats plain zlib on Warehouse JSON."""
+    codec = ZlibCodec()
+    compressed = codec.compress(FLASK_JSON)
+
+    assert len(compressed) < len(zlib.compress(FLASK_JSON, 6))
+    assert codec.decompress(compressed) == FLASK_JSON
+    assert decompress(codec.name, compressed) == FLASK_JSON
+
+
+@pytest.mark.skipif(zstandard is None, reason="zstandard isn't installed")
+def test_zstd_codec() -> None:
+    """Zstandard is used when it's available."""
+    codec = get_codec("auto")
+    assert isinstance(codec, ZstdCodec)
+    assert decompress(codec.name, codec.compress(FLASK_JSON)) == FLASK_JSON
+
+
+def test_get_codec() -> None:
+    """Codecs are selected by the compression setting."""
+    assert get_codec("none") is None
+    assert isinstance(get_codec("zlib", 9), ZlibCodec)
+    if zstandard is None:
+        assert isinstance(get_codec("auto"), ZlibCodec)
+        with pytest.raises(ValueError):
+            get_codec("zstd")
+
+    with pytest.raises(ValueError):
+        get_codec("brotli")
+    with pytest.raises(ValueError):
+        decompress("brotli+warehouse1", b"")
+
+
+def test_metadata_cache_compression(tmp_path: Path) -> None:
+    """Bodies are stored compressed and can be read with any setting."""
+    url = "https://example.com/flask/1.1.1/json"
+    path = tmp_path / "metadata.sqlite"
+    cache = MetadataCache(path, compression="zlib")
+    cache.put(url, FLASK_JSON, {"ETag": '"1"'})
+    cache.put("https://example.com/tiny/json", b"{}", {})
+
+    assert cache.backend.size < len(FLASK_JSON) / 3
+    assert cache.get(url).body == FLASK_JSON  # type: ignore
+    assert cache.get(url, with_body=False).body == b""  # type: ignore
+
+    cache.touch(url)
+    assert cache.get(url).body == FLASK_JSON  # type: ignore
+    assert cache.get("https://example.com/tiny/json").body == b"{}"  # type: ignore
+
+    summary = cache.summary()
+    assert summary.body_bytes == len(FLASK_JSON) + 2
+    assert summary.compression_ratio > 3  # type: ignore
+    cache.close()
+
+    cache = MetadataCache(path, compression="none")
+    assert cache.get(url).body == FLASK_JSON  # type: ignore
+    assert cache.summary().compression_ratio > 3  # type: ignore
+
+
+@pytest.mark.parametrize(
+    "codec,body",
+    [
+        ("zstd+warehouse1", b"\x28\xb5\x2f\xfd not really zstd"),
+        ("zlib+warehouse1", b"not really zlib"),
+        ("brotli+warehouse1", b"an unknown codec"),
+    ],
+)
+def test_metadata_cache_unreadable(tmp_path: Path, codec: str, body: bytes) -> None:
+    """Entries that can't be decoded are discarded and treated as misses."""
+    url = "https://example.com/flask/1.1.1/json"
+    cache = MetadataCache(tmp_path / "metadata.sqlite")
+    key = f"url:{cache._key(url)}"
+    header = {
+        "etag": '"1"',
+        "last_modified": None,
+        "last_serial": None,
+        "stored_at": 0.0,
+        "content_type": None,
+        "codec": codec,
+    }
+    cache.backend.put(key, MetadataCache._pack(header, body))
+
+    assert cache.get(url, with_body=False) is not None
+    assert cache.get(url) is None
+    assert cache.backend.get(key) is None
+
+    cache.backend.put(key, b"\x00")
+    assert cache.get(url) is None
+    assert cache.backend.get(key) is None
@@ -0,0 +1,211 @@
+"""Test the adaptive concurrency limit.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import threading
+import time
+
+import requests
+
+from valiant.repositories import AdaptiveConcurrency, RequestScheduler
+
+
+class FakeClock:
+    """A clock moved by the test."""
+
+    def __init__(self) -> None:  # noqa: D107
+        self.now = 0.0
+
+    def __call__(self) -> float:  # noqa: D102
+        return self.now
+
+
+def _request(limiter: AdaptiveConcurrency, clock: FakeClock, latency: float) -> None:
+    started = limiter.acquire()
+    clock.now += latency
+    limiter.release(started, ok=True)
+
+
+def test_additive_increase() -> None:
+    """The limit grows by one for each limit's worth of saturated requests."""
+    clock = FakeClock()
+    limiter = AdaptiveConcurrency("test", initial_limit=1, max_limit=4, clock=clock)
+
+    _request(limiter, clock, 0.1)
+    assert limiter.limit == 2
+
+    # Requests that don't reach the limit don't grow it
+    for _ in range(5):
+        _request(limiter, clock, 0.1)
+    assert limiter.limit == 2
+
+    for _ in range(20):
+        starts = [limiter.acquire() for _ in range(limiter.limit)]
+        clock.now += 0.1
+        for started in starts:
+            limiter.release(started, ok=True)
+    assert limiter.limit == 4
+
+
+def test_decrease_on_errors() -> None:
+    """Errors decrease the limit once per window."""
+    clock = FakeClock()
+    limiter = AdaptiveConcurrency("test", initial_limit=8, clock=clock)
+
+    starts = [limiter.acquire() for _ in range(4)]
+    clock.now += 0.1
+    for started in starts:
+        limiter.release(started, ok=False)
+    assert limiter.limit == 6
+
+    started = limiter.acquire()
+    clock.now += 0.1
+    limiter.release(started, ok=False)
+    assert limiter.limit == 4
+
+
+def _batch(limiter: AdaptiveConcurrency, clock: FakeClock, latencies: list) -> None:
+    # Fills the limit and completes the requests fastest first
+    starts = [limiter.acquire() for _ in range(limiter.limit)]
+    now = clock.now
+    for started, latency in zip(starts, sorted(latencies[: len(starts)])):
+        clock.now = now + latency
+        limiter.release(started, ok=True)
+
+
+def test_decrease_on_latency() -> None:
+    """Latency that stays well above the baseline decreases the limit."""
+    clock = FakeClock()
+    limiter = AdaptiveConcurrency("test", initial_limit=8, min_limit=3, clock=clock)
+
+    for _ in range(20):
+        _request(limiter, clock, 0.1)
+    assert limiter.limit == 8
+    assert round(limiter.baseline, 3) == 0.1
+
+    # A single slow response isn't enough
+    _request(limiter, clock, 1.0)
+    assert limiter.limit == 8
+    for _ in range(10):
+        _request(limiter, clock, 0.1)
+
+    slow = 0
+    while limiter.limit == 8:
+        _request(limiter, clock, 1.0)
+        slow += 1
+    assert 1 < slow <= 10
+    assert limiter.limit == 6
+    assert limiter.recent > 2 * limiter.baseline
+
+    for _ in range(5):
+        _request(limiter, clock, 1.0)
+    assert limiter.limit == 3
+
+
+def test_varied_latency() -> None:
+    """Healthy but varied latencies keep the limit up."""
+    import random
+
+    clock = FakeClock()
+    limiter = AdaptiveConcurrency("test", initial_limit=10, max_limit=20, clock=clock)
+    rnd = random.Random(1)
+    lowest = limiter.limit
+
+    for _ in range(200):
+        _batch(limiter, clock, [rnd.uniform(0.02, 0.2) for _ in range(20)])
+        lowest = min(lowest, limiter.limit)
+
+    assert lowest == 10
+    assert limiter.limit == 20
+
+
+def test_recovers_after_congestion() -> None:
+    """The baseline adjusts to a slower repository and the limit recovers."""
+    clock = FakeClock()
+    limiter = AdaptiveConcurrency("test", initial_limit=8, clock=clock)
+
+    for _ in range(20):
+        _batch(limiter, clock, [0.1] * 8)
+    for _ in range(5):
+        _batch(limiter, clock, [1.0] * 8)
+    assert limiter.limit < 8
+
+    for _ in range(100):
+        _batch(limiter, clock, [1.0] * 8)
+    assert limiter.limit == 8
+
+
+def test_scheduler_limits() -> None:
+    """The limiter is optional and can grow past pool_maxsize."""
+    from dataclasses import replace
+
+    from valiant.repositories import RepositoryConfiguration
+
+    pypi_config = RepositoryConfiguration(name="pypi", base_url="https://pypi.org/pypi")
+    assert not pypi_config.adaptive_concurrency
+    assert RequestScheduler.for_configuration(pypi_config).concurrency is None
+
+    conf = replace(
+        pypi_config, adaptive_concurrency=True, pool_maxsize=4, max_concurrency=16
+    )
+    limiter = RequestScheduler.for_configuration(conf).concurrency
+    assert limiter.limit == 4
+    assert limiter.max_limit == 16
+    assert conf.connection_pool_size == 16
+
+
+def test_limit_blocks() -> None:
+    """Requests wait for a free slot."""
+    limiter = AdaptiveConcurrency("test", initial_limit=2)
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def work() -> None:
+        started = limiter.acquire()
+        with lock:
+            in_flight.append(1)
+            peak.append(len(in_flight))
+        time.sleep(0.02)
+        with lock:
+            in_flight.pop()
+        limiter.release(started, ok=False)
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert max(peak) <= 2
+    assert limiter.in_flight == 0
+
+
+def test_scheduler_reports_outcomes() -> None:
+    """The scheduler tells the limiter about throttled responses."""
+    limiter = AdaptiveConcurrency("test", initial_limit=4)
+    scheduler = RequestScheduler(max_retries=0, concurrency=limiter)
+
+    r = requests.Response()
+    r.status_code = 429
+    scheduler.send(lambda: r)
+
+    assert limiter.limit == 3
+    assert limiter.in_flight == 0
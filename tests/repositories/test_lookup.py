@@ -0,0 +1,245 @@
+"""Test lookups across several repositories.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+import time
+
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from valiant.repositories import (
+    BaseAsyncRepository,
+    BaseRepository,
+    PackageNotFoundException,
+    RepositoryConfiguration,
+    ValidationError,
+)
+from valiant.repositories.lookup import AsyncRepositoryLookup, RepositoryLookup
+
+
+class FakeRepository(BaseRepository):
+    """Answers lookups from a dict, optionally after a delay."""
+
+    def __init__(
+        self, name: str, packages: Dict[Tuple[str, str], Any], delay: float = 0
+    ):
+        """New instance."""  # noqa: DAR101
+        super().__init__(
+            RepositoryConfiguration(
+                name=name,
+                base_url=f"https://{name}.example.com",
+                repository_type="fake",
+            )
+        )
+        self.packages = packages
+        self.delay = delay
+        self.calls = 0
+
+    @classmethod
+    def list_supported_repository_types(cls) -> List[str]:  # noqa: D102
+        return ["fake"]
+
+    def show(self, name: str, version: str) -> Any:  # noqa: D102
+        self.calls += 1
+        time.sleep(self.delay)
+        result = self.packages.get((name, version))
+        if isinstance(result, Exception):
+            raise result
+        if result is None:
+            raise PackageNotFoundException(f"{name} {version} not in {self.name}")
+        return result
+
+    @property
+    def name(self) -> str:  # noqa: D102
+        return self.repository_configuration.name
+
+    def download(self, name: str, version: str) -> Path:  # noqa: D102
+        raise NotImplementedError
+
+
+class FakeAsyncRepository(BaseAsyncRepository):
+    """The asyncio version of `FakeRepository`."""
+
+    def __init__(
+        self, name: str, packages: Dict[Tuple[str, str], Any], delay: float = 0
+    ):
+        """New instance."""  # noqa: DAR101
+        super().__init__(
+            RepositoryConfiguration(
+                name=name,
+                base_url=f"https://{name}.example.com",
+                repository_type="fake",
+            )
+        )
+        self.repository = FakeRepository(name, packages)
+        self.delay = delay
+        self.cancelled = 0
+
+    @classmethod
+    def list_supported_repository_types(cls) -> List[str]:  # noqa: D102
+        return ["fake"]
+
+    async def show(self, name: str, version: str) -> Any:  # noqa: D102
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return self.repository.show(name, version)
+
+
+def test_fallback() -> None:
+    """Repositories are tried in order until one has the package."""
+    first = FakeRepository("first", {("a", "1"): "first-a"})
+    second = FakeRepository("second", {("a", "1"): "second-a", ("b", "1"): "b"})
+    lookup = RepositoryLookup([first, second], mode="fallback")
+
+    assert lookup.show("a", "1") == "first-a"
+    assert lookup.show("b", "1") == "b"
+    assert second.calls == 1
+
+    with pytest.raises(PackageNotFoundException, match="not in first.*not in second"):
+        lookup.show("c", "1")
+
+    assert lookup.stats == {
+        "lookups": 3,
+        "fallbacks": 2,
+        "hedges": 0,
+        "first": 1,
+        "second": 1,
+    }
+
+
+def test_single() -> None:
+    """Single mode only uses the first repository."""
+    first = FakeRepository("first", {})
+    second = FakeRepository("second", {("a", "1"): "a"})
+    lookup = RepositoryLookup([first, second], mode="single")
+
+    with pytest.raises(PackageNotFoundException):
+        lookup.show("a", "1")
+    assert second.calls == 0
+
+
+def test_hedged_slow_repository() -> None:
+    """A slow repository is raced by the next one after the hedge delay."""
+    slow = FakeRepository("slow", {("a", "1"): "slow-a"}, delay=1)
+    fast = FakeRepository("fast", {("a", "1"): "fast-a"})
+    lookup = RepositoryLookup([slow, fast], mode="hedged", hedge_delay=0.05)
+
+    started = time.monotonic()
+    assert lookup.show("a", "1") == "fast-a"
+    assert time.monotonic() - started < 0.5
+    assert lookup.stats["hedges"] == 1
+
+
+def test_hedged_prompt_repository() -> None:
+    """A repository that answers within the hedge delay isn't raced."""
+    first = FakeRepository("first", {("a", "1"): "first-a"})
+    second = FakeRepository("second", {("a", "1"): "second-a"})
+    lookup = RepositoryLookup([first, second], mode="hedged", hedge_delay=1)
+
+    assert lookup.show("a", "1") == "first-a"
+    assert second.calls == 0
+
+
+def test_hedged_missing_package() -> None:
+    """A miss moves straight on to the next repository."""
+    first = FakeRepository("first", {})
+    second = FakeRepository("second", {("a", "1"): "second-a"})
+    lookup = RepositoryLookup([first, second], mode="hedged", hedge_delay=10)
+
+    assert lookup.show("a", "1") == "second-a"
+    assert lookup.stats["fallbacks"] == 1
+
+    with pytest.raises(PackageNotFoundException):
+        lookup.show("b", "1")
+
+
+def test_hedged_executor_shared() -> None:
+    """Hedged lookups share the lookup's thread pool until it's closed."""
+    first = FakeRepository("first", {("a", "1"): "a", ("b", "1"): "b"})
+    lookup = RepositoryLookup([first, FakeRepository("second", {})], mode="hedged")
+
+    lookup.show("a", "1")
+    executor = lookup._executor
+    lookup.show("b", "1")
+    assert executor is not None and lookup._executor is executor
+
+    lookup.close()
+    assert lookup._executor is None
+
+
+def test_validation_error_reported() -> None:
+    """Invalid metadata is reported if no repository has good metadata."""
+    first = FakeRepository("first", {("a", "1"): ValidationError("Bad")})
+    second = FakeRepository("second", {})
+    lookup = RepositoryLookup([first, second])
+
+    with pytest.raises(ValidationError):
+        lookup.show("a", "1")
+
+
+def test_invalid_mode() -> None:
+    """Unknown modes are rejected."""
+    with pytest.raises(ValueError):
+        RepositoryLookup([FakeRepository("first", {})], mode="random")
+
+
+def test_async_fallback() -> None:
+    """Async lookups try the repositories in order."""
+    first = FakeAsyncRepository("first", {("a", "1"): "first-a"})
+    second = FakeAsyncRepository("second", {("b", "1"): "b"})
+    lookup = AsyncRepositoryLookup([first, second], mode="fallback")
+
+    assert asyncio.run(lookup.show("a", "1")) == "first-a"
+    assert asyncio.run(lookup.show("b", "1")) == "b"
+
+    with pytest.raises(PackageNotFoundException, match="not in first.*not in second"):
+        asyncio.run(lookup.show("c", "1"))
+
+    assert lookup.stats == {
+        "lookups": 3,
+        "fallbacks": 2,
+        "hedges": 0,
+        "first": 1,
+        "second": 1,
+    }
+
+
+def test_async_hedged() -> None:
+    """Async hedged lookups race a slow repository and cancel the loser."""
+    slow = FakeAsyncRepository("slow", {("a", "1"): "slow-a"}, delay=5)
+    fast = FakeAsyncRepository("fast", {("a", "1"): "fast-a"})
+    lookup = AsyncRepositoryLookup([slow, fast], mode="hedged", hedge_delay=0.05)
+
+    async def show() -> Any:
+        result = await lookup.show("a", "1")
+        await asyncio.sleep(0)
+        return result
+
+    started = time.monotonic()
+    assert asyncio.run(show()) == "fast-a"
+    assert time.monotonic() - started < 1
+    assert slow.cancelled == 1
+    assert lookup.stats["hedges"] == 1
@@ -0,0 +1,129 @@
+"""Test the parsed metadata store.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import os
+import time
+
+from pathlib import Path
+from unittest.mock import ANY
+
+from valiant.repositories import MetadataStore, StoreStats
+
+
+def _objects(path: Path) -> list:
+    return [p for p in path.glob("*/objects/*/*") if p.is_file()]
+
+
+def test_metadata_store_roundtrip(tmp_path: Path) -> None:
+    """Records are returned for a matching source."""
+    store = MetadataStore(tmp_path / "store")
+    record = {"info": {"name": "flask", "version": "1.1.1"}, "urls": [1, 2.5, None]}
+
+    assert store.get("pypi", "abc", "repo", "flask/1.1.1", "tag1") is None
+
+    store.put("pypi", "abc", "repo", "flask/1.1.1", "tag1", record)
+
+    assert store.get("pypi", "abc", "repo", "flask/1.1.1", "tag1") == record
+    assert store.get("pypi", "abc", "repo", "flask/1.1.1", "tag2") is None
+    assert store.get("pypi", "abc", "other-repo", "flask/1.1.1", "tag1") is None
+
+    # A second instance sees the same data
+    assert (
+        MetadataStore(tmp_path / "store").get(
+            "pypi", "abc", "repo", "flask/1.1.1", "tag1"
+        )
+        == record
+    )
+
+
+def test_metadata_store_content_addressed(tmp_path: Path) -> None:
+    """Identical records are only stored once."""
+    store = MetadataStore(tmp_path)
+    record = {"a": 1}
+
+    d1 = store.put("pypi", "abc", "repo1", "key", "tag", record)
+    d2 = store.put("pypi", "abc", "repo2", "key", "tag", record)
+
+    assert d1 == d2
+    assert len(_objects(tmp_path)) == 1
+
+
+def test_metadata_store_versioned(tmp_path: Path) -> None:
+    """Records for other versions of a namespace are kept until pruned."""
+    store = MetadataStore(tmp_path)
+    store.put("pypi", "v1", "repo", "key", "tag", {"a": 1})
+    store.put("other", "v1", "repo", "key", "tag", {"a": 1})
+
+    store = MetadataStore(tmp_path)
+    assert store.get("pypi", "v2", "repo", "key", "tag") is None
+    assert store.get("pypi", "v1", "repo", "key", "tag") == {"a": 1}
+
+    # Only the most recently opened version is kept
+    store = MetadataStore(tmp_path)
+    store.get("pypi", "v2", "repo", "key", "tag")
+    os.utime(tmp_path / "pypi-v1-v1" / ".used", (0, 0))
+
+    assert store.prune() == {"versions": 1, "refs": 0, "objects": 0}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["other-v1-v1", "pypi-v1-v2"]
+    assert store.get("other", "v1", "repo", "key", "tag") == {"a": 1}
+
+
+def test_metadata_store_corrupt(tmp_path: Path) -> None:
+    """Damaged objects are ignored."""
+    store = MetadataStore(tmp_path)
+    store.put("pypi", "v1", "repo", "key", "tag", {"a": 1})
+
+    for obj in _objects(tmp_path):
+        obj.write_bytes(b"junk")
+
+    assert store.get("pypi", "v1", "repo", "key", "tag") is None
+
+
+def test_metadata_store_prune(tmp_path: Path) -> None:
+    """Expired refs are removed along with the objects no ref uses."""
+    store = MetadataStore(tmp_path)
+    store.put("pypi", "v1", "repo", "old", "tag", {"a": 1})
+    store.put("pypi", "v1", "repo", "new", "tag", {"b": 2})
+    store.put("pypi", "v1", "repo", "shared", "tag", {"b": 2})
+
+    assert store.summary() == StoreStats(versions=1, refs=3, objects=2, size=ANY)
+
+    old = time.time() - 2 * 86400
+    for path in tmp_path.glob("*/*/*/*"):
+        os.utime(path, (old, old))
+    store.put("pypi", "v1", "repo", "new", "tag", {"b": 2})
+
+    # Only "new" was written within the day - its object was reused
+    assert store.prune(max_age=86400) == {"versions": 0, "refs": 2, "objects": 1}
+    assert store.get("pypi", "v1", "repo", "new", "tag") == {"b": 2}
+    assert store.get("pypi", "v1", "repo", "old", "tag") is None
+    assert store.summary().objects == 1
+
+
+def test_metadata_store_gc_grace(tmp_path: Path) -> None:
+    """Recently written objects survive GC even without a ref."""
+    store = MetadataStore(tmp_path)
+    store.put("pypi", "v1", "repo", "key", "tag", {"a": 1})
+    for ref in tmp_path.glob("*/refs/*/*"):
+        ref.unlink()
+
+    assert store.prune()["objects"] == 0
+    assert len(_objects(tmp_path)) == 1
@@ -98,3 +98,19 @@ def test_repo_config_token_port() -> None:
         token=token,
     )
     assert repo.get_access_url() == f"https://{token}@private.repo.org:8080/pypi"
+
+
+def test_repo_config_fetch_mode() -> None:
+    """Only the known metadata fetch modes are accepted."""
+    repo = RepositoryConfiguration(name="pypi", base_url="https://pypi.org/pypi")
+    assert repo.metadata_fetch_mode == "version"
+
+    repo = RepositoryConfiguration(
+        name="pypi", base_url="https://pypi.org/pypi", metadata_fetch_mode="project"
+    )
+    assert repo.metadata_fetch_mode == "project"
+
+    with pytest.raises(ValueError):
+        RepositoryConfiguration(
+            name="pypi", base_url="https://pypi.org/pypi", metadata_fetch_mode="all"
+        )
@@ -0,0 +1,124 @@
+"""Test the single-flight helpers.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import asyncio
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from valiant.repositories import AsyncSingleFlight, SingleFlight
+
+
+def test_single_flight_shares_result() -> None:
+    """Concurrent calls for a key run the function once."""
+    flights: SingleFlight[int] = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def work() -> int:
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return 42
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        leader = executor.submit(flights.do, "key", work)
+        started.wait()
+        followers = [executor.submit(flights.do, "key", work) for _ in range(4)]
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert results == [42] * 5
+    assert len(calls) == 1
+    assert flights.coalesced == 4
+
+    # Nothing is kept once the call completes
+    assert flights.do("key", lambda: 7) == 7
+
+
+def test_single_flight_keys() -> None:
+    """Different keys don't share calls."""
+    flights: SingleFlight[str] = SingleFlight()
+    assert flights.do(("a", 1), lambda: "a") == "a"
+    assert flights.do(("b", 1), lambda: "b") == "b"
+    assert flights.coalesced == 0
+
+
+def test_single_flight_shares_error() -> None:
+    """All waiting callers see the exception."""
+    flights: SingleFlight[int] = SingleFlight()
+    started = threading.Event()
+
+    def work() -> int:
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("Nope")
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        leader = executor.submit(flights.do, "key", work)
+        started.wait()
+        followers = [executor.submit(flights.do, "key", work) for _ in range(2)]
+
+        for f in [leader] + followers:
+            with pytest.raises(ValueError):
+                f.result()
+
+
+def test_async_single_flight() -> None:
+    """Concurrent awaits for a key run the coroutine once."""
+    flights: AsyncSingleFlight[int] = AsyncSingleFlight()
+    calls = []
+
+    async def work() -> int:
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def run() -> list:
+        return await asyncio.gather(*[flights.do("key", work) for _ in range(5)])
+
+    assert asyncio.run(run()) == [42] * 5
+    assert len(calls) == 1
+    assert flights.coalesced == 4
+
+    # A new event loop gets a new call
+    assert asyncio.run(flights.do("key", work)) == 42
+    assert len(calls) == 2
+
+
+def test_async_single_flight_cancel() -> None:
+    """Cancelling one waiter doesn't cancel the shared call."""
+    flights: AsyncSingleFlight[int] = AsyncSingleFlight()
+
+    async def work() -> int:
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def run() -> int:
+        first = asyncio.ensure_future(flights.do("key", work))
+        second = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == 42
@@ -0,0 +1,101 @@
+"""Test the streaming JSON filter.
+
+Copyright (c) 2020 The Valiant Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+the Software, and to permit persons to whom the Software is furnished to do so,
+subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+import json
+
+from typing import Any, List
+
+import pytest
+
+from valiant.util.jsonstream import JsonSubtreeFilter, filter_json, loads_filtered
+
+
+DOCUMENT = {
+    "info": {
+        "name": "demo",
+        "description": 'A "quoted" description with {braces}, [brackets] and \\ é',
+        "project_urls": {"Homepage": "https://example.com"},
+    },
+    "last_serial": 42,
+    "releases": {
+        "0.1": [{"filename": "demo-0.1.tar.gz", "digests": {"sha256": "abc"}}],
+        "0.2": [],
+        "1.0": [{"filename": "demo-1.0.tar.gz", "yanked": False, "size": 12}],
+    },
+    "urls": [{"filename": "demo-1.0.tar.gz", "description": "kept"}],
+}
+
+REPLACEMENTS = {("info", "description"): "null", ("releases", "*"): "[]"}
+
+EXPECTED = {
+    "info": {
+        "name": "demo",
+        "description": None,
+        "project_urls": {"Homepage": "https://example.com"},
+    },
+    "last_serial": 42,
+    "releases": {"0.1": [], "0.2": [], "1.0": []},
+    "urls": [{"filename": "demo-1.0.tar.gz", "description": "kept"}],
+}
+
+
+def _chunks(data: bytes, size: int) -> List[bytes]:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 16, 1024])
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_filter_chunked(size: int, ensure_ascii: bool, indent: Any) -> None:
+    """The result doesn't depend on how the document is chunked."""
+    data = json.dumps(DOCUMENT, ensure_ascii=ensure_ascii, indent=indent).encode()
+    assert loads_filtered(_chunks(data, size), REPLACEMENTS) == EXPECTED
+
+
+def test_filter_wildcards_and_arrays() -> None:
+    """Wildcards match any key and `#` matches array elements."""
+    data = json.dumps({"a": [1, {"b": 2}, "x"], "c": {"d": "e", "f": 1.5}}).encode()
+
+    assert loads_filtered([data], {("a", "#"): "0"}) == {
+        "a": [0, 0, 0],
+        "c": {"d": "e", "f": 1.5},
+    }
+    assert loads_filtered([data], {("*", "f"): '"skipped"'}) == {
+        "a": [1, {"b": 2}, "x"],
+        "c": {"d": "e", "f": "skipped"},
+    }
+    assert loads_filtered([data], {}) == json.loads(data)
+
+
+def test_filter_output_is_small() -> None:
+    """Skipped values aren't copied to the output."""
+    doc = {"keep": 1, "skip": ["x" * 1000] * 1000}
+    text = filter_json([json.dumps(doc).encode()], {("skip",): "null"})
+    assert text == '{"keep": 1, "skip": null}'
+
+
+def test_filter_incomplete() -> None:
+    """An incomplete document is reported."""
+    f = JsonSubtreeFilter(REPLACEMENTS)
+    f.feed(b'{"info": {"name": "de')
+
+    with pytest.raises(ValueError):
+        f.close()
@@ -20,6 +20,7 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 from pathlib import Path
+from typing import Any, List, Set, Tuple
 
 import pytest
 
@@ -106,3 +107,286 @@ def test_config_default(configured_valiant: Valiant) -> None:
     v = configured_valiant
     assert v.cache_dir is not None
     assert v.configuration_dir is not None
+
+
+def test_audit_packages_order(configured_valiant: Valiant, monkeypatch: Any) -> None:
+    """The worker pool must return payloads in the order they were requested."""
+    import random
+    import time
+
+    from valiant.valiant import PythonPackagePayload
+
+    def mock_metadata(package_name: str, package_version: str) -> PythonPackagePayload:
+        time.sleep(random.uniform(0, 0.02))  # noqa: S311
+        return PythonPackagePayload(
+            repository_base_url="http://repo.example.com",
+            package_name=package_name,
+            package_version=package_version,
+            package_metadata=None,  # type: ignore
+        )
+
+    def mock_reports(
+        payloads: List[PythonPackagePayload], reports: Set[str] = None, jobs: int = 1
+    ) -> List[PythonPackagePayload]:
+        return payloads
+
+    monkeypatch.setattr(configured_valiant, "get_package_metadata", mock_metadata)
+    monkeypatch.setattr(configured_valiant, "get_batch_reports", mock_reports)
+
+    packages = [(f"package-{i}", f"{i}.0") for i in range(25)]
+    serial = configured_valiant.audit_packages(packages, jobs=1)
+    pooled = configured_valiant.audit_packages(packages, jobs=8)
+
+    assert [(p.package_name, p.package_version) for p in serial] == packages
+    assert [(p.package_name, p.package_version) for p in pooled] == packages
+
+
+def test_audit_packages_failure(configured_valiant: Valiant, monkeypatch: Any) -> None:
+    """An error for any package is raised to the caller."""
+    from valiant.repositories import PackageNotFoundException
+
+    def mock_metadata(package_name: str, package_version: str) -> None:
+        raise PackageNotFoundException(package_name)
+
+    monkeypatch.setattr(configured_valiant, "get_package_metadata", mock_metadata)
+
+    with pytest.raises(PackageNotFoundException):
+        configured_valiant.audit_packages([("fake", "1.0"), ("fake", "2.0")], jobs=2)
+
+
+def test_audit_packages_bad_jobs(configured_valiant: Valiant) -> None:
+    """At least one worker is needed."""
+    with pytest.raises(ValueError):
+        configured_valiant.audit_packages([("fake", "1.0")], jobs=0)
+
+
+def test_audit_packages_async(configured_valiant: Valiant, monkeypatch: Any) -> None:
+    """The async audit returns payloads in the order they were requested."""
+    import asyncio
+    import random
+
+    from valiant.valiant import PythonPackagePayload
+
+    async def mock_metadata(
+        package_name: str, package_version: str
+    ) -> PythonPackagePayload:
+        await asyncio.sleep(random.uniform(0, 0.02))  # noqa: S311
+        return PythonPackagePayload(
+            repository_base_url="http://repo.example.com",
+            package_name=package_name,
+            package_version=package_version,
+            package_metadata=None,  # type: ignore
+        )
+
+    def mock_reports(
+        payloads: List[PythonPackagePayload], reports: Set[str] = None, jobs: int = 1
+    ) -> List[PythonPackagePayload]:
+        return payloads
+
+    monkeypatch.setattr(configured_valiant, "get_package_metadata_async", mock_metadata)
+    monkeypatch.setattr(configured_valiant, "get_batch_reports", mock_reports)
+
+    packages = [(f"package-{i}", f"{i}.0") for i in range(25)]
+    results = asyncio.run(
+        configured_valiant.audit_packages_async(packages, concurrency=4)
+    )
+
+    assert [(p.package_name, p.package_version) for p in results] == packages
+
+    with pytest.raises(ValueError):
+        asyncio.run(configured_valiant.audit_packages_async(packages, concurrency=0))
+
+
+def test_batch_reports(configured_valiant: Valiant, monkeypatch: Any) -> None:
+    """Batch plugins are called once and the others once per package."""
+    from importlib.metadata import EntryPoint
+    from pathlib import Path
+    from typing import Sequence
+
+    from valiant.package import PackageMetadata
+    from valiant.plugins import PluginWrapper
+    from valiant.plugins.reports import BaseReportPlugin
+    from valiant.reports import Report
+    from valiant.valiant import PythonPackagePayload
+
+    calls: List[Any] = []
+
+    class BatchPlugin(BaseReportPlugin):
+        name = "batch"
+
+        @classmethod
+        def prepare_reports(
+            cls, packages: Sequence[PackageMetadata], configuration_dir: Path
+        ) -> List[Report]:
+            calls.append((cls.name, list(packages)))
+            return [Report(cls.report_provider_details()) for _ in packages]
+
+    class SinglePlugin(BaseReportPlugin):
+        name = "single"
+
+        @classmethod
+        def prepare_report(
+            cls, package_metadata: PackageMetadata, configuration_dir: Path
+        ) -> Report:
+            calls.append((cls.name, package_metadata))
+            return Report(cls.report_provider_details())
+
+    def wrap(plugin: Any) -> PluginWrapper:
+        wrapper = PluginWrapper(
+            plugin.name, EntryPoint(plugin.name, "x:y", "valiant.report")
+        )
+        wrapper._plugin = plugin
+        return wrapper
+
+    monkeypatch.setattr(
+        configured_valiant,
+        "_get_report_plugins",
+        lambda reports: [wrap(BatchPlugin), wrap(SinglePlugin)],
+    )
+
+    payloads = [
+        PythonPackagePayload(
+            repository_base_url="http://repo.example.com",
+            package_name=f"package-{i}",
+            package_version="1.0",
+            package_metadata=f"metadata-{i}",  # type: ignore
+        )
+        for i in range(5)
+    ]
+    results = configured_valiant.get_batch_reports(payloads, jobs=3)
+
+    assert BatchPlugin.batched() and not SinglePlugin.batched()
+    assert calls[0] == ("batch", [f"metadata-{i}" for i in range(5)])
+    assert sorted(c[1] for c in calls[1:]) == [f"metadata-{i}" for i in range(5)]
+    assert [r.package_name for r in results] == [p.package_name for p in payloads]
+    assert all(sorted(r.reports.to_dict()) == ["batch", "single"] for r in results)
+
+    # The default batch hook reports on each package
+    assert len(SinglePlugin.prepare_reports(["a", "b"], Path("."))) == 2  # type: ignore
+
+    BatchPlugin.prepare_reports = classmethod(  # type: ignore
+        lambda cls, packages, configuration_dir: []
+    )
+    with pytest.raises(ValueError):
+        configured_valiant.get_batch_reports(payloads)
+
+
+def test_batch_reports_unloadable_plugin(
+    configured_valiant: Valiant, monkeypatch: Any
+) -> None:
+    """A report plugin that can't be loaded fails the batch rather than being skipped."""
+    from importlib.metadata import EntryPoint
+
+    from valiant.plugins import PluginWrapper
+    from valiant.plugins.exceptions import FailedToLoadPlugin
+    from valiant.valiant import PythonPackagePayload
+
+    wrapper = PluginWrapper(
+        "missing", EntryPoint("missing", "valiant_missing:Plugin", "valiant.report")
+    )
+    monkeypatch.setattr(
+        configured_valiant, "_get_report_plugins", lambda reports: [wrapper]
+    )
+
+    payloads = [
+        PythonPackagePayload(
+            repository_base_url="http://repo.example.com",
+            package_name="package",
+            package_version="1.0",
+            package_metadata="metadata",  # type: ignore
+        )
+    ]
+    with pytest.raises(FailedToLoadPlugin):
+        configured_valiant.get_batch_reports(payloads)
+    assert wrapper.run_batch(packages=[], configuration_dir=None) is None
+
+
+def test_report_plugin_configuration(
+    config_builder: ConfigBuilder, monkeypatch: Any
+) -> None:
+    """Report plugins receive their entry in report_configurations."""
+    from valiant.config.util import ConfigMapBuilder
+    from valiant.plugins.reports.safety import SafetyReportPlugin
+
+    monkeypatch.setattr(SafetyReportPlugin, "configuration", {})
+    monkeypatch.setattr(SafetyReportPlugin, "cache_dir", None)
+
+    config_builder.add_source(
+        MappingSource(
+            {
+                "tool": {
+                    "valiant": {
+                        "report_configurations": {
+                            "safety": {"db_mirror": "/srv/safety-db", "cache": True}
+                        }
+                    }
+                }
+            }
+        )
+    )
+    conf = ConfigMapBuilder.generate_valiant_config_from_map(config_builder.build())
+    Valiant(conf)
+
+    assert SafetyReportPlugin.configuration == {
+        "db_mirror": "/srv/safety-db",
+        "cache": True,
+    }
+    assert SafetyReportPlugin.cache_dir == conf.cache_dir / "plugins" / "safety"
+
+
+def test_repository_lookup_shared(
+    configured_valiant: Valiant, monkeypatch: Any
+) -> None:
+    """Worker threads share a single repository lookup."""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    import valiant.valiant
+    from valiant.repositories.lookup import RepositoryLookup
+
+    class SlowLookup(RepositoryLookup):
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            time.sleep(0.05)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(valiant.valiant, "RepositoryLookup", SlowLookup)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        lookups = list(
+            executor.map(lambda _: configured_valiant.repository_lookup, range(8))
+        )
+
+    assert all(lookup is lookups[0] for lookup in lookups)
+
+
+def test_package_metadata_async_lookup(
+    configured_valiant: Valiant, monkeypatch: Any
+) -> None:
+    """Async metadata lookups use the configured repository lookup."""
+    import asyncio
+    from types import SimpleNamespace
+
+    from valiant.config import Config
+    from valiant.repositories.lookup import AsyncRepositoryLookup
+
+    metadata = SimpleNamespace(repository_url="https://mirror.example.com")
+
+    class FakeLookup(AsyncRepositoryLookup):
+        def __init__(self) -> None:
+            self.calls: List[Tuple[str, str]] = []
+
+        async def show(self, name: str, version: str) -> Any:
+            self.calls.append((name, version))
+            return metadata
+
+    lookup = FakeLookup()
+    configured_valiant._async_repository_lookup = lookup
+    monkeypatch.setattr(
+        Config, "repository_lookup_mode", property(lambda self: "fallback")
+    )
+
+    payload = asyncio.run(configured_valiant.get_package_metadata_async("a", "1"))
+
+    assert lookup.calls == [("a", "1")]
+    assert payload.package_metadata is metadata
+    assert payload.repository_base_url == "https://mirror.example.com"